@@ -35,6 +35,8 @@ RADIUS_IN_EARTH_FOR_MILE = 3955.7  # mean radius or use your radius value
 DETECTOR_DATA_INTERVAL = 30  # detector data saved with 30 seconds interval
 SAMPLES_PER_DAY = 24 * 60 * 60 // DETECTOR_DATA_INTERVAL  # detector data sample length per day (= 2880)
 USE_DETECTOR_CACHE = False
+DETECTOR_CACHE_SIZE = 2000  # max number of detector data lists kept in memory (`pyticas.tool.cache`)
+DETECTOR_CACHE_TTL = 600  # seconds to keep detector data in memory
 RWIS_DISTANCE_THRESHOLD = 15
 RWIS_SITE_INFO = []
 
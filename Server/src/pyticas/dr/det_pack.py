@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+""" Detector Data Pack module
+
+    - this module stores all detector data files of a day in one packed file (``DATA_PATH/cache/det/YYYY/YYYYMMDD.pack``)
+    - a pack file is memory-mapped and the data of a detector is sliced from it without copying
+    - pack files are read-only; data files downloaded after packing are kept as loose files
+      in the day directory until the day is packed again
+
+    Pack file layout::
+
+        MAGIC (4 bytes) | VERSION (uint16) | INDEX LENGTH (uint32) | INDEX (json) | DATA
+
+    - INDEX : {'<detector name><extension>' : [offset from the start of DATA, length], ...}
+"""
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+
+from pyticas import logger
+from pyticas.ticas import get_path
+
+PACK_MAGIC = b'TTPK'
+PACK_VERSION = 1
+PACK_EXTENSION = '.pack'
+MAX_OPENED_PACKS = 62  # two months of daily packs
+
+_HEADER = struct.Struct('>4sHI')
+
+_lock = threading.RLock()
+_opened_packs = OrderedDict()
+""":type: OrderedDict[str, _DayPack] """
+
+logging = logger.getDefaultLogger(__name__)
+
+
+class _DayPack(object):
+    def __init__(self, pack_path):
+        """
+        :type pack_path: str
+        """
+        self.pack_path = pack_path
+        self.mtime = os.path.getmtime(pack_path)
+        with open(pack_path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, index_length = _HEADER.unpack_from(self.mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError('Invalid detector pack file : %s' % pack_path)
+        index_start = _HEADER.size
+        self.data_start = index_start + index_length
+        self.index = json.loads(self.mm[index_start:self.data_start].decode('utf-8'))
+        self.view = memoryview(self.mm)
+
+    def get(self, file_name):
+        """
+        :type file_name: str
+        :rtype: memoryview
+        """
+        loc = self.index.get(file_name, None)
+        if not loc:
+            return None
+        offset = self.data_start + loc[0]
+        return self.view[offset:offset + loc[1]]
+
+
+def pack_path(date):
+    """ return pack file path of the given date
+
+    :type date: datetime.date
+    :rtype: str
+    """
+    return os.path.join(get_path('cache'), 'det', str(date.year),
+                        '{0}{1:02}{2:02}{3}'.format(date.year, date.month, date.day, PACK_EXTENSION))
+
+
+def day_dir_path(date):
+    """ return directory path of the loose data files of the given date
+
+    :type date: datetime.date
+    :rtype: str
+    """
+    return os.path.join(get_path('cache'), 'det', str(date.year),
+                        '{0}{1:02}{2:02}'.format(date.year, date.month, date.day))
+
+
+def read(det_name, date, traffic_type):
+    """ return data of the detector in the pack file of the given date
+
+    :type det_name: str
+    :type date: datetime.date
+    :type traffic_type: pyticas.ttypes.TrafficType
+    :return: zero-copy view of the binary data or None if the pack file or the detector data does not exist
+    :rtype: memoryview
+    """
+    day_pack = _get_pack(pack_path(date))
+    if not day_pack:
+        return None
+    return day_pack.get('{0}{1}'.format(det_name, traffic_type.extension))
+
+
+def _get_pack(path):
+    """
+    :type path: str
+    :rtype: _DayPack
+    """
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        mtime = None
+
+    with _lock:
+        day_pack = _opened_packs.get(path, None)
+        if day_pack is not None:
+            if day_pack.mtime == mtime:
+                _opened_packs.move_to_end(path)
+                return day_pack
+            # the pack file is replaced or removed (e.g. packed again by another process)
+            del _opened_packs[path]
+
+        if mtime is None:
+            return None
+
+        try:
+            day_pack = _DayPack(path)
+        except Exception as ex:
+            logging.warning('Fail to open detector pack file : %s (%s)' % (path, str(ex)))
+            return None
+
+        _opened_packs[path] = day_pack
+        while len(_opened_packs) > MAX_OPENED_PACKS:
+            # mmap is closed when the last data view is released
+            _opened_packs.popitem(last=False)
+        return day_pack
+
+
+def _release_pack(path):
+    with _lock:
+        _opened_packs.pop(path, None)
+
+
+def write_pack(path, files):
+    """ write pack file
+
+    :param path: pack file path
+    :type path: str
+    :param files: iterable of (file name, binary data)
+    :type files: collections.Iterable[(str, bytes)]
+    :return: number of packed files
+    :rtype: int
+    """
+    index = OrderedDict()
+    tmp_data_path = path + '.data.tmp'
+    tmp_path = path + '.tmp'
+    offset = 0
+    with open(tmp_data_path, 'wb') as df:
+        for file_name, bin_data in files:
+            if not bin_data:
+                continue
+            df.write(bin_data)
+            index[file_name] = [offset, len(bin_data)]
+            offset += len(bin_data)
+
+    index_bytes = json.dumps(index).encode('utf-8')
+    with open(tmp_path, 'wb') as pf:
+        pf.write(_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(index_bytes)))
+        pf.write(index_bytes)
+        with open(tmp_data_path, 'rb') as df:
+            while True:
+                chunk = df.read(1024 * 1024)
+                if not chunk:
+                    break
+                pf.write(chunk)
+    os.remove(tmp_data_path)
+
+    _release_pack(path)
+    os.replace(tmp_path, path)
+    return len(index)
+
+
+def pack_day(date, remove_loose_files=False):
+    """ pack loose data files of the given date (data in existing pack file is kept)
+
+    :type date: datetime.date
+    :type remove_loose_files: bool
+    :return: number of packed files
+    :rtype: int
+    """
+    path = pack_path(date)
+    day_dir = day_dir_path(date)
+    loose_files = sorted(os.listdir(day_dir)) if os.path.isdir(day_dir) else []
+    if not loose_files:
+        return 0
+
+    def _files():
+        names = set(loose_files)
+        for file_name in loose_files:
+            with open(os.path.join(day_dir, file_name), 'rb') as f:
+                yield file_name, f.read()
+        old_pack = _get_pack(path)
+        if old_pack:
+            for file_name in old_pack.index:
+                if file_name not in names:
+                    yield file_name, bytes(old_pack.get(file_name))
+
+    n_files = write_pack(path, _files())
+
+    if remove_loose_files:
+        for file_name in loose_files:
+            os.remove(os.path.join(day_dir, file_name))
+        try:
+            os.rmdir(day_dir)
+        except OSError:
+            pass
+
+    return n_files
+
@@ -7,6 +7,8 @@
 """
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.dr import det_reader_raw
 from pyticas.ttypes import TrafficType
@@ -34,7 +36,7 @@ class DetectorDataReader(object):
         :type prd: Period
         :rtype: list[float]
         """
-        return self._check_max(det_reader_raw.read(det.name, prd, TrafficType.volume), cfg.MAX_VOLUME)
+        return self._check_max(det_reader_raw.read_array(det.name, prd, TrafficType.volume), cfg.MAX_VOLUME)
 
     @lru_cache
     def get_scan(self, det, prd):
@@ -52,7 +54,7 @@ class DetectorDataReader(object):
         :type prd: Period
         :rtype: list[float]
         """
-        return self._check_max(det_reader_raw.read(det.name, prd, TrafficType.scan), cfg.MAX_SCANS)
+        return self._check_max(det_reader_raw.read_array(det.name, prd, TrafficType.scan), cfg.MAX_SCANS)
 
     @lru_cache
     def get_density(self, det, prd):
@@ -117,7 +119,7 @@ class DetectorDataReader(object):
         :rtype: list[float]
         """
         if det.is_wavetronics():
-            return self._check_max(det_reader_raw.read(det.name, prd, TrafficType.speed_wavetronics), cfg.MAX_SCANS)
+            return self._check_max(det_reader_raw.read_array(det.name, prd, TrafficType.speed_wavetronics), cfg.MAX_SCANS)
 
         u = []
         q = self.get_flow(det, prd)
@@ -180,6 +182,9 @@ class DetectorDataReader(object):
         return ret
 
     def _check_max(self, data, maximum):
-        for i in range(len(data)):
-            data[i] = data[i] if data[i] < maximum else -1
-        return data
+        """
+        :type data: numpy.ndarray
+        :type maximum: int
+        :rtype: list[int]
+        """
+        return np.where(data < maximum, data, -1).tolist()
@@ -6,6 +6,7 @@
     - this module read traffic data archive files on IRIS server
     - server URL is specified ``pyticas.config.mn.TRAFFIC_DATA_URL``
     - traffic data is downloaded and cached into local disk (``DATA_PATH/cache``)
+    - cached data of a day can be packed into one memory-mapped file (see ``det_pack`` module)
 """
 import global_settings
 from pyticas.tool import http
@@ -15,7 +16,10 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 import datetime
 import os
 
+import numpy as np
+
 from pyticas import cfg, logger
+from pyticas.dr import det_pack
 from pyticas.ticas import get_path
 
 MAX_TRY_NUM = 3
@@ -24,7 +28,6 @@ CACHE_TYPE_FAIL = 'fail'
 
 logging = logger.getDefaultLogger(__name__)
 
-
 def _path():
     PATHS = {
         CACHE_TYPE_DET: os.path.join(get_path('cache'), 'det'),
@@ -54,34 +57,32 @@ def _cache_path(cache_type, det_name, date, traffic_type):
     return os.path.join(cache_path, '{0}{1}'.format(det_name, traffic_type.extension))
 
 
-def _convert_to_list(binData, traffic_type):
-    """ convert binary data to list """
-    import array
-    if not binData or len(binData) == 0:
-        return []
-
-    data = []
-    ar = array.array("b")
+def _convert_to_array(bin_data, traffic_type):
+    """ convert binary data to numpy array
 
-    # `fromstring` has been deprecated
-    # ar.fromstring(binData)
+    - 1-byte samples are signed values (negative means missing)
+    - 2-byte samples are big-endian unsigned values (out-of-range values are filtered by ``DetectorDataReader``),
+      so they are decoded as `int32` because they do not fit into `int16`
 
-    ar.frombytes(binData)
+    :type bin_data: bytes
+    :type traffic_type: pyticas.ttypes.TrafficType
+    :rtype: numpy.ndarray
+    """
+    if not bin_data:
+        return np.empty(0, dtype=np.int16)
 
-    itr = iter(ar)
-    for v in itr:
+    if traffic_type.sample_size == 2:
+        n_bytes = len(bin_data) - len(bin_data) % 2
+        return np.frombuffer(bin_data, dtype='>u2', count=n_bytes // 2).astype(np.int32)
 
-        if traffic_type.sample_size == 2:
-            nextValue = next(itr)
-            value = ((v << 8) & 0x0000ff00) + (nextValue & 0x000000ff)
-        else:
-            value = v
+    data = np.frombuffer(bin_data, dtype=np.int8).astype(np.int16)
+    data[data < 0] = cfg.MISSING_VALUE
+    return data
 
-        if value < 0:
-            value = cfg.MISSING_VALUE
-        data.append(value)
 
-    return data
+def _convert_to_list(binData, traffic_type):
+    """ convert binary data to list """
+    return _convert_to_array(binData, traffic_type).tolist()
 
 
 def _save_file_to_cache(det_name, date, bin_data, traffic_type):
@@ -91,8 +92,12 @@ def _save_file_to_cache(det_name, date, bin_data, traffic_type):
 
 
 def _read_cached_data_file(det_name, date, trafficType):
-    """ fetch cached data from db """
-    cache_path = _cache_path(CACHE_TYPE_DET, det_name, date, trafficType)
+    """ fetch cached data from the day pack file or from the loose data file """
+    packed = det_pack.read(det_name, date, trafficType)
+    if packed is not None:
+        return packed
+    # day directory of the loose files is not created on reading (it is removed after packing)
+    cache_path = os.path.join(det_pack.day_dir_path(date), '{0}{1}'.format(det_name, trafficType.extension))
     if not os.path.exists(cache_path):
         return None
     with open(cache_path, 'rb') as cfile:
@@ -103,7 +108,7 @@ def _load(det_name, year, month, day, traffic_type, missing_data):
     # faverolles 1/18/2020: Reworked the downloading operation
     #   No longer saves all of the "fail" files
     #   Checks if global option to download data files is "TRUE"
-    """ Return raw data of the detector as list """
+    """ Return raw data of the detector as numpy array """
     if det_name is None:
         raise Exception("Detector number must be passed")
 
@@ -113,15 +118,15 @@ def _load(det_name, year, month, day, traffic_type, missing_data):
     data = _read_cached_data_file(det_name, date, traffic_type)
 
     if data is not None:
-        return _convert_to_list(data, traffic_type)
+        return _convert_to_array(data, traffic_type)
 
     if global_settings.DOWNLOAD_TRAFFIC_DATA_FILES:
         print(f"Downloading traffic data file [{remote_file}]")
         try:
             with http.get_url_opener(remote_file, timeout=30) as res:
                 bin_data = res.read()
-                data = _convert_to_list(bin_data, traffic_type)
-                if not data:
+                data = _convert_to_array(bin_data, traffic_type)
+                if not len(data):
                     return missing_data
                 _save_file_to_cache(det_name, date, bin_data, traffic_type)
                 return data
@@ -133,7 +138,23 @@ def _load(det_name, year, month, day, traffic_type, missing_data):
 
 
 def read(det_name, prd, traffic_type):
-    """ read detector data according to period and traffic_type """
+    """ read detector data according to period and traffic_type
+
+    :rtype: list[int]
+    """
+    return read_array(det_name, prd, traffic_type).tolist()
+
+
+def read_array(det_name, prd, traffic_type):
+    """ read detector data according to period and traffic_type as numpy array
+
+    only the samples in the index window of the period are copied from each day's data
+
+    :type det_name: str
+    :type prd: pyticas.ttypes.Period
+    :type traffic_type: pyticas.ttypes.TrafficType
+    :rtype: numpy.ndarray
+    """
 
     # faverolles 1/16/2020 NOTE: _read() is the entry point to _loadByDate()
     #  which is the only entry point to _load() which downloads traffic data files.
@@ -146,7 +167,6 @@ def read(det_name, prd, traffic_type):
 
     day_count = ((datetime.date(end_date.year, end_date.month, end_date.day)
                   - datetime.date(start_date.year, start_date.month, start_date.day)).days + 1)
-    all_data = []
     interval = cfg.SAMPLES_PER_DAY // traffic_type.samples_per_day * cfg.DETECTOR_DATA_INTERVAL
 
     start_index = (int)(start_date.hour * 3600 // interval
@@ -158,12 +178,23 @@ def read(det_name, prd, traffic_type):
 
     # faverolles 1/16/2020 NOTE: missing_data is a list of [-1's]
     #   Moved out of _load() to fix recursive initialization of 'missing_data'
-    missing_data = [cfg.MISSING_VALUE] * cfg.SAMPLES_PER_DAY
+    missing_data = np.full(cfg.SAMPLES_PER_DAY, cfg.MISSING_VALUE, dtype=np.int16)
 
+    # `offset` is the index of the first sample of each day in the concatenated multi-day data
+    clips = []
+    offset = 0
     for date in (start_date + datetime.timedelta(n) for n in range(day_count)):
-        all_data += _load(det_name, date.year, date.month, date.day, traffic_type, missing_data)
-
-    clip = all_data[start_index:end_index]
-
-    del all_data
-    return clip
+        if offset >= end_index:
+            break
+        day_data = _load(det_name, date.year, date.month, date.day, traffic_type, missing_data)
+        sidx = max(start_index - offset, 0)
+        eidx = min(end_index - offset, len(day_data))
+        if sidx < eidx:
+            clips.append(day_data[sidx:eidx])
+        offset += len(day_data)
+
+    if not clips:
+        return np.empty(0, dtype=np.int16)
+    if len(clips) == 1:
+        return clips[0].copy()
+    return np.concatenate(clips)
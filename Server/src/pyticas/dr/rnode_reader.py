@@ -3,7 +3,6 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
 from pyticas import cfg
 from pyticas.ttypes import TrafficType, RNodeData
-from pyticas.tool.cache import lru_cache
 
 
 class RNodeDataReader(object):
@@ -113,7 +112,6 @@ class RNodeDataReader(object):
         """
         return self._get_traffic_data(rn, prd, TrafficType.occupancy, dc, self.ddr.get_occupancy, **kwargs)
     
-    @lru_cache
     def _get_traffic_data(self, rn, prd, traffic_type, dc, dm, **kwargs):
         """ real routine to retrieve and manipulate traffic data
     
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+Route Data Bundle Module
+========================
+
+- traffic data of a route and a period that are shared by several MOE modules
+- each traffic type is read once and virtual rnodes are added with one rnode layout
+- station data for ``*_with_virtual_nodes`` are read without detector checker as those modules do,
+  and the detector checker is applied only to data for travel time and MRF
+
+    e.g.
+        bundle = RouteDataBundle(route, prd)
+        tq = total_flow_with_virtual_nodes.run(route, prd, bundle=bundle)
+        us = speed_with_virtual_nodes.run(route, prd, bundle=bundle)
+        tt = moe.travel_time(route, prd, bundle=bundle)
+
+"""
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+import threading
+
+import numpy as np
+
+from pyticas.infra import Infra
+from pyticas.moe import moe_helper
+from pyticas.moe.imputation import spatial_avg
+from pyticas.moe.mods import mrf
+
+
+class RouteDataBundle(object):
+    def __init__(self, route, prd, **kwargs):
+        """
+        :type route: pyticas.ttypes.Route
+        :type prd: pyticas.ttypes.Period
+        :param layout: (optional) rnode layout of the route to share it with bundles for other periods
+        """
+        self.route = route
+        """:type: pyticas.ttypes.Route """
+
+        self.prd = prd
+        """:type: pyticas.ttypes.Period """
+
+        kwargs.pop('bundle', None)
+        layout = kwargs.pop('layout', None)
+        kwargs['detector_checker'] = kwargs.get('detector_checker', None) or route.get_detector_checker()
+        self.kwargs = kwargs
+
+        self.stations = route.get_stations()
+        """:type: list[pyticas.ttypes.RNodeObject] """
+
+        self._layout = layout
+        self._data = {}
+        self._lock = threading.RLock()
+
+    def is_for(self, route, prd):
+        """ check if the bundle has data of the given route and period
+
+        :type route: pyticas.ttypes.Route
+        :type prd: pyticas.ttypes.Period
+        :rtype: bool
+        """
+        return (route is self.route
+                and prd.start_date == self.prd.start_date
+                and prd.end_date == self.prd.end_date
+                and prd.interval == self.prd.interval)
+
+    def layout(self):
+        """ rnode layout with virtual rnodes (see ``moe_helper.virtual_rnode_layout()``)
+
+        :rtype: list[(int, int)]
+        """
+        with self._lock:
+            if self._layout is None:
+                self._layout = moe_helper.virtual_rnode_layout(self._station_data('tq', False), self.route)
+            return self._layout
+
+    def total_flow(self):
+        """ same as ``total_flow_with_virtual_nodes.run()``
+
+        :return: (flow, flow data, flow with virtual nodes, flow data with virtual nodes)
+        :rtype: (list[pyticas.ttypes.RNodeData], list[list[float]], list[pyticas.ttypes.RNodeData], list[list[float]])
+        """
+        def _load():
+            tq = self._station_data('tq', False)
+            tq_with_virtual_nodes = moe_helper.add_virtual_rnodes(tq, self.route, layout=self.layout())
+            return (tq, [res.data for res in tq],
+                    tq_with_virtual_nodes, [res.data for res in tq_with_virtual_nodes])
+
+        return self._get('total_flow', _load)
+
+    def density(self):
+        """ same as ``density_with_virtual_nodes.run()``
+
+        :return: (density, density data, density with virtual nodes, density data with virtual nodes)
+        :rtype: (list[pyticas.ttypes.RNodeData], list[list[float]], list[pyticas.ttypes.RNodeData], list[list[float]])
+        """
+        def _load():
+            ks = self._station_data('k', False)
+            ks_with_virtual_nodes = moe_helper.add_virtual_rnodes(ks, self.route, layout=self.layout())
+            return (ks, [res.data for res in ks],
+                    ks_with_virtual_nodes, [res.data for res in ks_with_virtual_nodes])
+
+        return self._get('density', _load)
+
+    def speed(self):
+        """ same as ``speed_with_virtual_nodes.run()`` (data lists are imputed)
+
+        :return: (speed, speed data, speed with virtual nodes, speed data with virtual nodes)
+        :rtype: (list[pyticas.ttypes.RNodeData], list[list[float]], list[pyticas.ttypes.RNodeData], list[list[float]])
+        """
+        def _load():
+            us = self._station_data('u', False)
+            us_with_virtual_nodes = moe_helper.add_virtual_rnodes(us, self.route, layout=self.layout())
+            return (us, spatial_avg.imputation([res.data for res in us]),
+                    us_with_virtual_nodes, spatial_avg.imputation([res.data for res in us_with_virtual_nodes]))
+
+        return self._get('speed', _load)
+
+    def speed_for(self, prd):
+        """ speed data of stations for another period (e.g. extended period to calculate travel time)
+
+        :type prd: pyticas.ttypes.Period
+        :rtype: list[pyticas.ttypes.RNodeData]
+        """
+        key = ('speed', prd.start_date, prd.end_date, prd.interval)
+        return self._get(key, lambda: moe_helper.get_speed(self.stations, prd, **self.kwargs))
+
+    def mrf(self):
+        """ same as ``mrf.run()``, station flows are read with the detector checker
+
+        :rtype: list[pyticas.ttypes.RNodeData]
+        """
+        def _load():
+            kwargs = dict(self.kwargs)
+            kwargs['station_flows'] = {res.rnode_name: res for res in self._station_data('tq', True)}
+            infra = kwargs.pop('infra', None) or Infra.get_infra()
+            return mrf.get_total_flow(infra, self.route.get_rnodes(), self.prd, **kwargs)
+
+        return self._get('mrf', _load)
+
+    def array(self, name, with_virtual_nodes=False):
+        """ return data as rnode x time array
+
+        :param name: 'total_flow', 'density' or 'speed'
+        :type name: str
+        :type with_virtual_nodes: bool
+        :rtype: numpy.ndarray
+        """
+        key = ('array', name, with_virtual_nodes)
+
+        def _load():
+            res = getattr(self, name)()
+            return np.array(res[3] if with_virtual_nodes else res[1], dtype=np.float64)
+
+        return self._get(key, _load)
+
+    def _station_data(self, datatype, with_detector_checker):
+        """
+        :type datatype: str
+        :type with_detector_checker: bool
+        :rtype: list[pyticas.ttypes.RNodeData]
+        """
+        funcs = {
+            'tq': moe_helper.get_total_flow,
+            'k': moe_helper.get_density,
+            'u': moe_helper.get_speed,
+        }
+        kwargs = dict(self.kwargs)
+        if not with_detector_checker:
+            kwargs['detector_checker'] = None
+        return self._get(('station', datatype, with_detector_checker),
+                         lambda: funcs[datatype](self.stations, self.prd, **kwargs))
+
+    def _get(self, key, loader):
+        with self._lock:
+            if key not in self._data:
+                self._data[key] = loader()
+            return self._data[key]
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
-import copy
+import numpy as np
+
 from pyticas import cfg
 
 def imputation(data, **kwargs):
@@ -18,23 +19,50 @@ def imputation(data, **kwargs):
     #               [ d31, d32, d33, d34 ], # of rnode3
     #               ...
     #           ]
-    imp_data = copy.deepcopy(data)
-    n_rows = len(imp_data)
-    n_cols = len(imp_data[0])
+    if not len(data):
+        return []
+
+    arr = np.array(data, dtype=np.float64)
+    imp_arr = imputation_array(arr)
+
+    # rows without imputed values are copied as they are
+    imputed_rows = ((arr == cfg.MISSING_VALUE) & (imp_arr != cfg.MISSING_VALUE)).any(axis=1)
+    return [imp_arr[r].tolist() if imputed_rows[r] else list(row) for r, row in enumerate(data)]
+
+def imputation_array(arr):
+    """ imputation over rnode x time array
+
+    - a missing value is filled with the average of the nearest upstream and downstream values
+      or with one of them if the other one does not exist
+    - as the rnodes are filled from upstream, the nearest upstream value is searched in the imputed data
 
+    :type arr: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    missing_value = cfg.MISSING_VALUE
+    n_rows = arr.shape[0]
+    missing = (arr == missing_value)
+
+    # nearest downstream data of each rnode (backward fill along the station axis)
+    dn_arr = np.full(arr.shape, missing_value, dtype=np.float64)
+    for r in range(n_rows - 2, -1, -1):
+        dn_arr[r] = np.where(missing[r + 1], dn_arr[r + 1], arr[r + 1])
+
+    # nearest upstream data of each rnode in the imputed data (forward fill along the station axis)
+    up_data = np.full(arr.shape[1], missing_value, dtype=np.float64)
+
+    imp_arr = arr.astype(np.float64)
     for r in range(n_rows):
-        for c in range(n_cols):
-            v = imp_data[r][c]
-            if v != cfg.MISSING_VALUE: continue
-            (up_data, dn_data) = find_up_dn_data(r, c, imp_data)
-            if cfg.MISSING_VALUE not in [up_data, dn_data]:
-                imp_data[r][c] = sum([up_data, dn_data])/2
-            elif up_data != cfg.MISSING_VALUE:
-                imp_data[r][c] = up_data
-            elif dn_data != cfg.MISSING_VALUE:
-                imp_data[r][c] = dn_data
-
-    return imp_data
+        if missing[r].any():
+            dn_data = dn_arr[r]
+            has_up = (up_data != missing_value)
+            has_dn = (dn_data != missing_value)
+            filled = np.where(has_up & has_dn, (up_data + dn_data) / 2,
+                              np.where(has_up, up_data, dn_data))
+            imp_arr[r] = np.where(missing[r], filled, imp_arr[r])
+        up_data = np.where(imp_arr[r] != missing_value, imp_arr[r], up_data)
+
+    return imp_arr
 
 def find_up_dn_data(cur_r, cur_c, data):
     # dt_data = [
@@ -58,4 +86,4 @@ def find_up_dn_data(cur_r, cur_c, data):
             dn_data = data[r][cur_c]
             break
 
-    return (up_data, dn_data)
\ No newline at end of file
+    return (up_data, dn_data)
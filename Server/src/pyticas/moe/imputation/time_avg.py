@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
-import copy
+import numpy as np
+
 from pyticas import cfg
 
 ALLOWED_TIME_DIFF = 5
@@ -20,24 +21,54 @@ def imputation(data, **kwargs):
     #               [ d31, d32, d33, d34 ], # of rnode3
     #               ...
     #           ]
-    imp_data = copy.deepcopy(data)
-    n_rows = len(imp_data)
-    n_cols = len(imp_data[0])
-    allowed_time_diff = kwargs.get('allowed_time_diff', None)
-    for r in range(n_rows):
-        for c in range(n_cols):
-            v = imp_data[r][c]
-            if v != cfg.MISSING_VALUE:
-                continue
-            (prev_data, next_data) = find_prev_next_data(r, c, imp_data, allowed_time_diff=allowed_time_diff)
-            if cfg.MISSING_VALUE not in [prev_data, next_data]:
-                imp_data[r][c] = sum([prev_data, next_data])/2
-            elif prev_data != cfg.MISSING_VALUE:
-                imp_data[r][c] = prev_data
-            elif next_data != cfg.MISSING_VALUE:
-                imp_data[r][c] = next_data
-
-    return imp_data
+    if not len(data):
+        return []
+
+    arr = np.array(data, dtype=np.float64)
+    imp_arr = imputation_array(arr, allowed_time_diff=kwargs.get('allowed_time_diff', ALLOWED_TIME_DIFF))
+
+    # rows without imputed values are copied as they are
+    imputed_rows = ((arr == cfg.MISSING_VALUE) & (imp_arr != cfg.MISSING_VALUE)).any(axis=1)
+    return [imp_arr[r].tolist() if imputed_rows[r] else list(row) for r, row in enumerate(data)]
+
+def imputation_array(arr, allowed_time_diff=ALLOWED_TIME_DIFF):
+    """ imputation over rnode x time array
+
+    - a missing value is filled with the average of the nearest previous and next values
+      or with one of them if the other one does not exist
+    - as the data is filled from the beginning, the nearest previous value is searched in the imputed data
+    - a missing value is filled only if the distance between the previous and next data is in `allowed_time_diff`
+
+    :type arr: numpy.ndarray
+    :type allowed_time_diff: int
+    :rtype: numpy.ndarray
+    """
+    missing_value = cfg.MISSING_VALUE
+    n_cols = arr.shape[1]
+    imp_arr = arr.astype(np.float64)
+    missing = (arr == missing_value)
+
+    for r in np.nonzero(missing.any(axis=1))[0]:
+        row = imp_arr[r]
+        # start and end (exclusive) indexes of the runs of missing values
+        edges = np.diff(np.concatenate(([0], missing[r].view(np.int8), [0])))
+        for (sidx, eidx) in zip(np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]):
+            (prev_data, prev_idx) = (row[sidx - 1], sidx - 1) if sidx > 0 else (missing_value, 0)
+            (next_data, next_idx) = (row[eidx], eidx) if eidx < n_cols else (missing_value, n_cols - 1)
+
+            for c in range(sidx, eidx):
+                if next_idx - prev_idx > allowed_time_diff:
+                    continue
+                if prev_data != missing_value and next_data != missing_value:
+                    row[c] = (prev_data + next_data) / 2
+                elif prev_data != missing_value:
+                    row[c] = prev_data
+                elif next_data != missing_value:
+                    row[c] = next_data
+                if row[c] != missing_value:
+                    (prev_data, prev_idx) = (row[c], c)
+
+    return imp_arr
 
 def find_prev_next_data(cur_r, cur_c, data, allowed_time_diff=ALLOWED_TIME_DIFF):
     # dt_data = [
@@ -66,4 +97,4 @@ def find_prev_next_data(cur_r, cur_c, data, allowed_time_diff=ALLOWED_TIME_DIFF)
     if next_idx - prev_idx > allowed_time_diff:
         return (-1, -1)
 
-    return (prev_data, next_data)
\ No newline at end of file
+    return (prev_data, next_data)
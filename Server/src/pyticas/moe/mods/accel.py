@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import copy
+import numpy as np
 
 from pyticas import cfg
 from pyticas.moe import moe_helper
@@ -41,24 +41,31 @@ def _calculate_accel(speed_results, interval, **kwargs):
     :return:
     """
     missing_data = kwargs.get('missing_data', cfg.MISSING_VALUE)
-    us_data = [res.data for res in speed_results]
-    accel_data = copy.deepcopy(us_data)
+    accel_data = calculate_accel_array(speed_results, missing_data=missing_data).tolist()
     accel_data[0] = [0] * len(accel_data[0])
-    for ridx, rnode_data in enumerate(us_data):
-        if not ridx: continue
-        for tidx, value in enumerate(rnode_data):
-            u1 = us_data[ridx - 1][tidx]
-            u2 = value
-            if missing_data in [u1, u2]:
-                a = missing_data
-            else:
-                d = distance_in_mile(speed_results[ridx].rnode, speed_results[ridx - 1].rnode)
-                a = calculate_acceleration(u1, u2, d)
-
-            accel_data[ridx][tidx] = a
-
     return accel_data
 
 
+def calculate_accel_array(speed_results, **kwargs):
+    """ acceleration between each station and its upstream station for all time steps
+
+    :type speed_results: list[RNodeData]
+    :type kwargs: dict
+    :return: acceleration data (rnode x time), the first row is 0
+    :rtype: numpy.ndarray
+    """
+    missing_data = kwargs.get('missing_data', cfg.MISSING_VALUE)
+    us = np.array([res.data for res in speed_results], dtype=np.float64)
+    accel = np.zeros(us.shape)
+    if len(speed_results) < 2:
+        return accel
+    distances = np.array([distance_in_mile(speed_results[ridx].rnode, speed_results[ridx - 1].rnode)
+                          for ridx in range(1, len(speed_results))]).reshape(-1, 1)
+    u1, u2 = us[:-1], us[1:]
+    accel[1:] = np.where((u1 == missing_data) | (u2 == missing_data),
+                         missing_data, calculate_acceleration(u1, u2, distances))
+    return accel
+
+
 def calculate_acceleration(u1, u2, mileDistance):
     return (u2 * u2 - u1 * u1) / (2 * mileDistance)
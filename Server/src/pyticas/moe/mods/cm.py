@@ -3,6 +3,8 @@
 import copy
 from collections import defaultdict
 
+import numpy as np
+
 from pyticas.moe import moe_helper
 from pyticas.moe.imputation import spatial_avg
 
@@ -61,6 +63,24 @@ def calculate_cm_dynamically(data, moe_congestion_threshold_speed, **kwargs):
         return 0
 
 
+def calculate_cm_array(speed, moe_congestion_threshold_speed, **kwargs):
+    """ vectorized ``calculate_cm_dynamically()`` for all time steps
+
+    :param speed: speed data with virtual nodes (rnode x time)
+    :type speed: numpy.ndarray
+    :type moe_congestion_threshold_speed: float
+    :return: CM for each time step
+    :rtype: numpy.ndarray
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    if moe_congestion_threshold_speed is None or speed.ndim != 2 or not speed.shape[0]:
+        return np.zeros(speed.shape[1] if speed.ndim == 2 else 0)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    congested = (speed < moe_congestion_threshold_speed) & (speed >= 0)
+    congested[-1] = False
+    return np.where(congested, vd, 0).sum(axis=0)
+
+
 def _calculate_cm(data, interval, moe_congestion_threshold_speed, **kwargs):
     """
      Congested Miles (Miles, %)
@@ -3,6 +3,8 @@
 import copy
 from collections import defaultdict
 
+import numpy as np
+
 from pyticas.moe import moe_helper
 from pyticas.moe.imputation import spatial_avg
 
@@ -61,6 +63,27 @@ def calculate_cmh_dynamically(data, interval, moe_congestion_threshold_speed, **
         return 0
 
 
+def calculate_cmh_array(speed, interval, moe_congestion_threshold_speed, **kwargs):
+    """ vectorized ``calculate_cmh_dynamically()`` for all time steps
+
+    :param speed: speed data with virtual nodes (rnode x time)
+    :type speed: numpy.ndarray
+    :param interval: data interval in second
+    :type interval: int
+    :type moe_congestion_threshold_speed: float
+    :return: CMH for each time step
+    :rtype: numpy.ndarray
+    """
+    speed = np.asarray(speed, dtype=np.float64)
+    if moe_congestion_threshold_speed is None or speed.ndim != 2 or not speed.shape[0]:
+        return np.zeros(speed.shape[1] if speed.ndim == 2 else 0)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    cmh_unit = (interval / 3600.0) * vd
+    congested = (speed < moe_congestion_threshold_speed) & (speed >= 0)
+    congested[-1] = False
+    return np.where(congested, cmh_unit, 0).sum(axis=0)
+
+
 def _calculate_cmh(data, interval, moe_congestion_threshold_speed, **kwargs):
     """
      Congested Miles*Hours (Miles, %)
@@ -13,6 +13,9 @@ def run(route, prd, **kwargs):
     :type prd: pyticas.ttypes.Period
     :return:
     """
+    bundle = kwargs.get('bundle', None)
+    if bundle and bundle.is_for(route, prd):
+        return bundle.density()
 
     # load_data total flow data
     ks = density.run(route, prd)
@@ -2,6 +2,8 @@
 
 import copy
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.moe import moe_helper
 from pyticas.moe.mods import speed
@@ -96,3 +98,31 @@ def calculate_dvh_dynamically(meta_data, interval, **kwargs):
             dvh = 0
         dvh_data.append(dvh)
     return sum(dvh_data)
+
+
+def calculate_dvh_array(flow, speed, speed_limit, interval, **kwargs):
+    """ vectorized ``calculate_dvh_dynamically()`` for all time steps
+
+    :param flow: flow data with virtual nodes (rnode x time)
+    :type flow: numpy.ndarray
+    :param speed: speed data with virtual nodes (rnode x time)
+    :type speed: numpy.ndarray
+    :param speed_limit: speed limit of each rnode
+    :type speed_limit: list[float]
+    :param interval: data interval in second
+    :type interval: int
+    :type kwargs: dict
+    :return: DVH for each time step
+    :rtype: numpy.ndarray
+    """
+    missing_data = kwargs.get('missing_data', cfg.MISSING_VALUE)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    seconds_per_hour = 3600
+    flow = np.asarray(flow, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    speed_limit = np.array([sl if sl else np.nan for sl in speed_limit], dtype=np.float64).reshape(-1, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dvh_data = ((vd / speed) - (vd / speed_limit)) * flow * interval / seconds_per_hour
+        # `nan >= 0` is False, so rnodes without speed limit and zero speeds are excluded
+        valid = (dvh_data >= 0) & np.isfinite(dvh_data) & (flow != missing_data) & (speed != missing_data)
+    return np.where(valid, dvh_data, 0).sum(axis=0)
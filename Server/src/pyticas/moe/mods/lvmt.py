@@ -2,6 +2,8 @@
 
 import copy
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.moe import moe_helper
 from pyticas.moe.mods import density
@@ -105,3 +107,35 @@ def calculate_lvmt_dynamically(data, interval, critical_denisty, lane_capacity):
         logger = getLogger(__name__)
         logger.warning('fail to calculate calculate lvmt dynamically. Error: {}'.format(e))
         return 0
+
+
+def calculate_lvmt_array(flow, density, lanes, interval, critical_denisty, lane_capacity):
+    """ vectorized ``calculate_lvmt_dynamically()`` for all time steps
+
+    :param flow: flow data with virtual nodes (rnode x time)
+    :type flow: numpy.ndarray
+    :param density: density data with virtual nodes (rnode x time)
+    :type density: numpy.ndarray
+    :param lanes: number of lanes of each rnode
+    :type lanes: list[int]
+    :param interval: data interval in second
+    :type interval: int
+    :type critical_denisty: float
+    :type lane_capacity: float
+    :return: LVMT for each time step
+    :rtype: numpy.ndarray
+    """
+    flow = np.asarray(flow, dtype=np.float64)
+    density = np.asarray(density, dtype=np.float64)
+    if critical_denisty is None or lane_capacity is None:
+        return np.zeros(flow.shape[1] if flow.ndim == 2 else 0)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    seconds_per_hour = 3600
+    lanes = np.array(lanes, dtype=np.float64).reshape(-1, 1)
+    lvmt_data = np.maximum(lane_capacity * lanes - flow, 0) * interval / seconds_per_hour * vd
+    lvmt_data = np.where(critical_denisty < density, lvmt_data, 0)
+    lvmt_data[lvmt_data < 0] = 0
+    # the time steps that have invalid lanes are not calculated as in ``calculate_lvmt_dynamically()``
+    lvmt_sum = lvmt_data.sum(axis=0)
+    lvmt_sum[np.isnan(lvmt_sum)] = 0
+    return lvmt_sum
@@ -14,6 +14,10 @@ def run(route, prd, **kwargs):
     :type prd: pyticas.ttypes.Period
     :return:
     """
+    bundle = kwargs.get('bundle', None)
+    if bundle and bundle.is_for(route, prd):
+        return bundle.mrf()
+
     infra = kwargs.get('infra', Infra.get_infra())
     kwargs['detector_checker'] = route.get_detector_checker()
     return get_total_flow(infra, route.get_rnodes(), prd, **kwargs)
@@ -96,14 +100,19 @@ def get_total_flow(infra, rnode_list, prd, **kwargs):
     :typoe infra: Infra
     :type rnode_list: list[pyticas.ttypes.RNodeObject]
     :type prd: Period
+    :param station_flows: (optional) total flow data of stations that are already loaded
+    :type station_flows: dict[str, RNodeData]
     :rtype: list[RNodeData]
     """
     dc = kwargs.get('detector_checker', None)
     infra = kwargs.get('infra', Infra.get_infra())
+    station_flows = kwargs.get('station_flows', {})
     results = []
     for rnode in rnode_list:
         res = None
-        if rnode.is_station():
+        if rnode.is_station() and rnode.name in station_flows:
+            res = station_flows[rnode.name]
+        elif rnode.is_station():
             res = infra.rdr.get_total_flow(rnode, prd, dc)
         elif rnode.is_entrance():
             res = _tq_entrance(infra, rnode, prd, dc=dc)
@@ -13,6 +13,10 @@ def run(route, prd, **kwargs):
     :type prd: pyticas.ttypes.Period
     :return:
     """
+    # speed data of the bundle are read without detector checker
+    bundle = kwargs.get('bundle', None)
+    if bundle and bundle.is_for(route, prd) and not kwargs.get('detector_checker', None):
+        return bundle.speed()
     rnode_list = route.get_stations()
 
     # load_data total flow data
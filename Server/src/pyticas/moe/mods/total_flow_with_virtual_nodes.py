@@ -13,6 +13,9 @@ def run(route, prd, **kwargs):
     :type prd: pyticas.ttypes.Period
     :return:
     """
+    bundle = kwargs.get('bundle', None)
+    if bundle and bundle.is_for(route, prd):
+        return bundle.total_flow()
 
     # load_data total flow data
     tq = total_flow.run(route, prd)
@@ -3,6 +3,8 @@
 import datetime
 import math
 
+import numpy as np
+
 from pyticas.moe import moe_helper
 from pyticas.moe.imputation import spatial_avg
 from pyticas.ttypes import TrafficType
@@ -33,11 +35,15 @@ def run(route, prd, **kwargs):
     n_origin_data = len(prd.get_timeline())
 
     # load_data speed data (load_data more data than given period)
-    us = moe_helper.get_speed(route.get_stations(), ext_prd, **kwargs)
-    us_results = moe_helper.add_virtual_rnodes(us, route)
+    bundle = kwargs.get('bundle', None)
+    if bundle and bundle.is_for(route, prd):
+        us = bundle.speed_for(ext_prd)
+        us_results = moe_helper.add_virtual_rnodes(us, route, layout=bundle.layout())
+    else:
+        us = moe_helper.get_speed(route.get_stations(), ext_prd, **kwargs)
+        us_results = moe_helper.add_virtual_rnodes(us, route)
 
-    us_data = [res.data for res in us_results]
-    us_data = spatial_avg.imputation(us_data)
+    us_data = spatial_avg.imputation_array(np.array([res.data for res in us_results], dtype=np.float64))
 
     # make empty whole_data for travel time by copying speed whole_data and reseting data
     tt_results = [res.clone() for res in us_results]
@@ -48,16 +54,81 @@ def run(route, prd, **kwargs):
         tt_results[ridx].data = [-1] * n_origin_data
         tt_results[ridx].prd = prd
 
-    # calculate travel time by increasing time index
-    for tidx in range(n_origin_data):
-        partial_data = [pd[tidx:] for pd in us_data]
-        tts = _calculate_tt(partial_data, prd.interval, **kwargs)
-        for ridx, tt_data in enumerate(tt_results):
-            tt_results[ridx].data[tidx] = tts[ridx]
+    # calculate travel time for all departure times at once
+    tts = _calculate_tts(us_data, n_origin_data, prd.interval, **kwargs)
+    for ridx, tt_data in enumerate(tt_results):
+        tt_results[ridx].data = tts[:, ridx].tolist()
 
     return tt_results
 
 
+def _calculate_tts(data, n_departures, interval, **kwargs):
+    """ calculate travel times of the vehicles departing at each time index
+
+    This is the same algorithm as ``_calculate_tt()``, but the trajectories of all departure times
+    move forward together over the speed matrix, one step (to the next time or rnode boundary) at a time.
+
+    :param data: list of speed data list for each rnode (imputed, including virtual rnodes)
+    :type data: Union(list[list[float]], numpy.ndarray)
+    :param n_departures: number of departure times (from time index 0)
+    :type n_departures: int
+    :param interval: data interval in second
+    :type interval: int
+    :type kwargs: dict
+    :return: travel time (minute) matrix, shape=(n_departures, n_rnodes), -1 if it can not be calculated
+    :rtype: numpy.ndarray
+    """
+    vd = VIRTUAL_RNODE_DISTANCE
+    seconds_per_hour = 3600
+    us = np.asarray(data, dtype=np.float64)
+    (max_ridx, n_times) = us.shape
+    goal_distance = vd * (max_ridx - 1)
+
+    tts = np.full((n_departures, max_ridx), -1.0)
+    tts[:, 0] = 0
+
+    departures = np.arange(n_departures)
+    tt = np.zeros(n_departures)
+    td = np.zeros(n_departures)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        while len(departures):
+            ridx = np.floor(td / vd).astype(np.int64)
+            tidx = np.floor(np.floor_divide(tt, interval)).astype(np.int64)
+            tidx[interval * (tidx + 1) - tt == 0] += 1
+            ridx[vd * (ridx + 1) - td == 0] += 1
+
+            # out of the data range
+            out = (ridx >= max_ridx) | (tidx + departures >= n_times)
+            if out.any():
+                tts[departures[out], -1] = -1
+                keep = ~out
+                (departures, tt, td, ridx, tidx) = (departures[keep], tt[keep], td[keep], ridx[keep], tidx[keep])
+                if not len(departures):
+                    break
+
+            moved = ridx != 0
+            tts[departures[moved], ridx[moved]] = tt[moved] / 60.0
+
+            remaining_interval = (interval * (tidx + 1)) - tt
+            remaining_distance = (vd * (ridx + 1)) - td
+            u = us[ridx, tidx + departures]
+            tt_for_remaining_distance = remaining_distance / u * seconds_per_hour
+            tt_to_go = np.minimum(remaining_interval, tt_for_remaining_distance)
+            d_to_go = u * tt_to_go / seconds_per_hour
+            tt = tt + tt_to_go
+            td = td + d_to_go
+
+            stopped = (tt == 0) | (td == 0) | (tt < 0)
+            arrived = td >= goal_distance
+            done = stopped | arrived
+            if done.any():
+                tts[departures[done], -1] = np.where(arrived[done], tt[done] / 60.0, -1)
+                keep = ~done
+                (departures, tt, td) = (departures[keep], tt[keep], td[keep])
+
+    return tts
+
+
 def _calculate_tt(data, interval, **kwargs):
     """
 
@@ -148,11 +219,9 @@ def calculate_tt_dynamically(us_results, us_data, prd, **kwargs):
         tt_results[ridx].data = [-1] * n_origin_data
         tt_results[ridx].prd = prd
 
-    # calculate travel time by increasing time index
-    for tidx in range(n_origin_data):
-        partial_data = [pd[tidx:] for pd in us_data]
-        tts = _calculate_tt(partial_data, prd.interval, **kwargs)
-        for ridx, tt_data in enumerate(tt_results):
-            tt_results[ridx].data[tidx] = tts[ridx]
+    # calculate travel time for all departure times at once
+    tts = _calculate_tts(us_data, n_origin_data, prd.interval, **kwargs)
+    for ridx, tt_data in enumerate(tt_results):
+        tt_results[ridx].data = tts[:, ridx].tolist()
 
     return tt_results
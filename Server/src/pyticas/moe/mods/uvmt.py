@@ -3,6 +3,8 @@
 
 import copy
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.moe import moe_helper
 from pyticas.moe.mods import density
@@ -118,3 +120,35 @@ def calculate_uvmt_dynamically(data, interval, critical_denisty, lane_capacity):
         logger = getLogger(__name__)
         logger.warning('fail to calculate calculate uvmt dynamically. Error: {}'.format(e))
         return 0
+
+
+def calculate_uvmt_array(flow, density, lanes, interval, critical_denisty, lane_capacity):
+    """ vectorized ``calculate_uvmt_dynamically()`` for all time steps
+
+    :param flow: flow data with virtual nodes (rnode x time)
+    :type flow: numpy.ndarray
+    :param density: density data with virtual nodes (rnode x time)
+    :type density: numpy.ndarray
+    :param lanes: number of lanes of each rnode
+    :type lanes: list[int]
+    :param interval: data interval in second
+    :type interval: int
+    :type critical_denisty: float
+    :type lane_capacity: float
+    :return: UVMT for each time step
+    :rtype: numpy.ndarray
+    """
+    flow = np.asarray(flow, dtype=np.float64)
+    density = np.asarray(density, dtype=np.float64)
+    if critical_denisty is None or lane_capacity is None:
+        return np.zeros(flow.shape[1] if flow.ndim == 2 else 0)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    seconds_per_hour = 3600
+    lanes = np.array(lanes, dtype=np.float64).reshape(-1, 1)
+    uvmt_data = np.maximum(lane_capacity * lanes - flow, 0) * interval / seconds_per_hour * vd
+    uvmt_data = np.where(density <= critical_denisty, uvmt_data, 0)
+    uvmt_data[uvmt_data < 0] = 0
+    # the time steps that have invalid lanes are not calculated as in ``calculate_uvmt_dynamically()``
+    uvmt_sum = uvmt_data.sum(axis=0)
+    uvmt_sum[np.isnan(uvmt_sum)] = 0
+    return uvmt_sum
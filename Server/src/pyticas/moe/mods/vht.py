@@ -2,6 +2,8 @@
 
 import copy
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.moe import moe_helper
 from pyticas.moe.mods import speed
@@ -97,3 +99,28 @@ def calculate_vht_dynamically(meta_data, interval, **kwargs):
             vht = 0
         vht_data.append(vht)
     return sum(vht_data)
+
+
+def calculate_vht_array(flow, speed, interval, **kwargs):
+    """ vectorized ``calculate_vht_dynamically()`` for all time steps
+
+    :param flow: flow data with virtual nodes (rnode x time)
+    :type flow: numpy.ndarray
+    :param speed: speed data with virtual nodes (rnode x time)
+    :type speed: numpy.ndarray
+    :param interval: data interval in second
+    :type interval: int
+    :type kwargs: dict
+    :return: VHT for each time step
+    :rtype: numpy.ndarray
+    """
+    missing_data = kwargs.get('missing_data', cfg.MISSING_VALUE)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    seconds_per_hour = 3600
+    flow = np.asarray(flow, dtype=np.float64)
+    speed = np.asarray(speed, dtype=np.float64)
+    valid = (flow != missing_data) & (speed != missing_data) & (flow != 0) & (speed != 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        vht_data = np.where(valid, flow / speed * interval / seconds_per_hour * vd, 0)
+    vht_data[vht_data < 0] = 0
+    return vht_data.sum(axis=0)
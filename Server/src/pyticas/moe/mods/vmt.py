@@ -2,6 +2,8 @@
 
 import copy
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.moe import moe_helper
 
@@ -85,3 +87,22 @@ def calculate_vmt_dynamically(meta_data, interval, **kwargs):
             vmt = value * interval / seconds_per_hour * vd
         vmt_data.append(vmt)
     return sum(vmt_data)
+
+
+def calculate_vmt_array(flow, interval, **kwargs):
+    """ vectorized ``calculate_vmt_dynamically()`` for all time steps
+
+    :param flow: flow data with virtual nodes (rnode x time)
+    :type flow: numpy.ndarray
+    :param interval: data interval in second
+    :type interval: int
+    :type kwargs: dict
+    :return: VMT for each time step
+    :rtype: numpy.ndarray
+    """
+    missing_data = kwargs.get('missing_data', cfg.MISSING_VALUE)
+    vd = moe_helper.VIRTUAL_RNODE_DISTANCE
+    seconds_per_hour = 3600
+    flow = np.asarray(flow, dtype=np.float64)
+    vmt_data = np.where(flow == missing_data, 0, flow * interval / seconds_per_hour * vd)
+    return vmt_data.sum(axis=0)
@@ -9,6 +9,7 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 import importlib
 
 from pyticas.moe import moe_helper
+from pyticas.moe.bundle import RouteDataBundle
 from pyticas.moe.imputation import spatial_avg
 from pyticas.ttypes import Period, RNodeData
 
@@ -402,6 +403,18 @@ def mrf_md(route, prds, **kwargs):
     return _do_moe_md(route, prds, 'mrf', **kwargs)
 
 
+def route_data_bundle(route, prd, **kwargs):
+    """ return traffic data bundle of the route to share loaded data among MOE functions
+
+        e.g. ``moe.travel_time(route, prd, bundle=moe.route_data_bundle(route, prd))``
+
+    :type route: pyticas.ttypes.Route
+    :type prd: Period
+    :rtype: RouteDataBundle
+    """
+    return RouteDataBundle(route, prd, **kwargs)
+
+
 def _do_moe(route, prd, eval_name, **kwargs):
     """
 
@@ -416,14 +429,27 @@ def _do_moe(route, prd, eval_name, **kwargs):
 
 
 def _do_moe_md(route, prds, eval_name, **kwargs):
-    """
+    """ evaluate MOE for each period
+
+    - the MOE module, the detector checker and the rnode layout of the route are made once for all periods,
+      and each period is evaluated with its own data bundle (see ``pyticas.moe.bundle``)
 
     :type route: pyticas.ttypes.Route
     :type prds: list[Period]
     :type eval_name: str
     :rtype: list[list[RNodeData]]
     """
-    return [_do_moe(route, each_prd, eval_name, **kwargs) for each_prd in prds]
+    est_module = importlib.import_module('pyticas.moe.mods.{}'.format(eval_name))
+    kwargs.pop('bundle', None)
+    kwargs['detector_checker'] = kwargs.get('detector_checker', None) or route.get_detector_checker()
+    try:
+        layout = moe_helper.route_rnode_layout(route)
+    except TypeError:
+        # mile point of a station is not found, then each bundle makes the layout when it is needed
+        layout = None
+
+    return [est_module.run(route, prd, bundle=RouteDataBundle(route, prd, layout=layout, **kwargs), **kwargs)
+            for prd in prds]
 
 
 def add_virtual_rnodes(results, route, **kwargs):
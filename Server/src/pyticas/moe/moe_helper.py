@@ -9,10 +9,11 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 import os
 import math
 
+import numpy as np
+
 from pyticas import cfg
 from pyticas.ttypes import RNodeData
 from pyticas.infra import Infra
-from pyticas.tool.cache import lru_cache
 from pyticas.tool.concurrent import Worker
 from pyticas.rn.geo import get_mile_point_map
 
@@ -91,7 +92,6 @@ def get_scan(rnode_list, prd, **kwargs):
     return get_traffic_data(rnode_list, prd, 's', **kwargs)
 
 
-@lru_cache
 def get_traffic_data(rnode_list, prd, datatype, **kwargs):
     """
 
@@ -124,83 +124,204 @@ def get_traffic_data(rnode_list, prd, datatype, **kwargs):
     return worker.run()
 
 
+def virtual_rnode_layout(results, r):
+    """ return rnode layout with virtual rnodes
+
+    each item is a pair of (upstream rnode index, downstream rnode index) of ``results``
+
+        - (ridx, ridx) : real rnode
+        - (ridx, ridx + 1) : virtual rnode between two rnodes
+        - (ridx, None) or (None, ridx + 1) : virtual rnode copying the upstream or downstream rnode
+
+    :type results: list[RNodeData]
+    :type r: pyticas.ttypes.Route
+    :rtype: list[(int, int)]
+    """
+    return _virtual_rnode_layout([res.rnode_name for res in results], r)
+
+
+def route_rnode_layout(r):
+    """ return rnode layout with virtual rnodes for data of the stations of the route
+
+    - the same as ``virtual_rnode_layout()`` of station data, but without data
+
+    :type r: pyticas.ttypes.Route
+    :rtype: list[(int, int)]
+    """
+    return _virtual_rnode_layout([st.name for st in r.get_stations()], r)
+
+
+def _virtual_rnode_layout(rnode_names, r):
+    """
+    :type rnode_names: list[str]
+    :type r: pyticas.ttypes.Route
+    :rtype: list[(int, int)]
+    """
+    mp_map = get_mile_point_map(r.get_stations())
+
+    layout = []
+    for ridx in range(len(rnode_names) - 1):
+        layout.append((ridx, ridx))
+        up_acc_distance = mp_map.get(rnode_names[ridx])
+        acc_distance = mp_map.get(rnode_names[ridx + 1])
+        if not acc_distance:
+            print('up:', rnode_names[ridx])
+            print('down:', rnode_names[ridx + 1])
+        n_v = round(round(acc_distance, 1) - round(up_acc_distance, 1) - VIRTUAL_RNODE_DISTANCE, 1)
+        n_13 = int(math.floor(n_v / 3.0 * 10)) if n_v >= 0.3 else 0
+        n_2 = int((n_v * 10.0) - 2 * n_13)
+        layout += [(ridx, None)] * n_13
+        layout += [(ridx, ridx + 1)] * n_2
+        layout += [(None, ridx + 1)] * n_13
+
+    layout.append((len(rnode_names) - 1, len(rnode_names) - 1))
+
+    return layout
+
+
+class RouteDataMatrix(object):
+    def __init__(self, values, rows, layout):
+        """ traffic data of a route with virtual rnodes as one rnode x time array
+
+        - ``rows`` are ``RNodeData`` of the rnodes, those of real rnodes are the given objects as they are,
+          and ``data`` of virtual rnodes are views of the rows of ``values``
+
+        :type values: numpy.ndarray
+        :type rows: list[RNodeData]
+        :param layout: rnode layout (see ``virtual_rnode_layout()``)
+        :type layout: list[(int, int)]
+        """
+        self.values = values
+        """:type: numpy.ndarray """
+        self.rows = rows
+        """:type: list[RNodeData] """
+        self.layout = layout
+        """:type: list[(int, int)] """
+        self.is_virtual = np.array([up_idx != dn_idx for (up_idx, dn_idx) in layout], dtype=bool)
+        """:type: numpy.ndarray """
+        self.mile_points = np.arange(len(layout)) * VIRTUAL_RNODE_DISTANCE
+        """:type: numpy.ndarray """  # the same as ``accumulated_distances()`` of data with virtual rnodes
+        self.lanes = [rnd.lanes for rnd in rows]
+        """:type: list[int] """
+        self.speed_limits = [rnd.speed_limit for rnd in rows]
+        """:type: list[int] """
+
+
+def virtual_rnode_matrix(results, r, **kwargs):
+    """ return traffic data with virtual rnodes as ``RouteDataMatrix``
+
+    - data of virtual rnodes are interpolated at once
+
+    :type results: list[RNodeData]
+    :type r: pyticas.ttypes.Route
+    :param layout: (optional) layout from ``virtual_rnode_layout()`` to reuse it for the same route
+    :rtype: RouteDataMatrix
+    """
+    layout = kwargs.get('layout', None) or virtual_rnode_layout(results, r)
+    missing_data = kwargs.get('missing_value', cfg.MISSING_VALUE)
+
+    station_values = np.array([res.data for res in results], dtype=np.float64)
+    if station_values.ndim != 2:
+        raise ValueError('data of rnodes are not in the same length')
+
+    up_idx = np.array([up if up is not None else dn for (up, dn) in layout], dtype=np.intp)
+    dn_idx = np.array([dn if dn is not None else up for (up, dn) in layout], dtype=np.intp)
+    up_values, dn_values = station_values[up_idx], station_values[dn_idx]
+
+    # virtual rnode between two rnodes : average of the two rnodes if both of them are valid
+    values = np.where((up_values > 0) & (dn_values > 0), (up_values + dn_values) / 2, missing_data)
+
+    # real rnode and virtual rnode copying the upstream or downstream rnode
+    copied = np.array([up is None or dn is None or up == dn for (up, dn) in layout], dtype=bool)
+    values[copied] = up_values[copied]
+
+    rows = []
+    for vidx, (up, dn) in enumerate(layout):
+        if up == dn:
+            rows.append(results[up])
+        else:
+            rows.append(_virtual_rnode_data(results[up] if up is not None else results[dn], values[vidx]))
+
+    return RouteDataMatrix(values, rows, layout)
+
+
 def add_virtual_rnodes(results, r, **kwargs):
     """
     :type results: list[RNodeData]
     :type r: pyticas.ttypes.Route
+    :param layout: (optional) layout from ``virtual_rnode_layout()`` to reuse it for the same route
     :rtype: list[RNodeData]
     """
+    if not results:
+        return []
+
+    try:
+        return virtual_rnode_matrix(results, r, **kwargs).rows
+    except (ValueError, TypeError):
+        # data can not be an array (e.g. having non-numeric value)
+        return _add_virtual_rnodes(results, r, **kwargs)
 
-    # if isinstance(results[0], list):
-    #    return [ add_virtual_rnodes(res, **kwargs) for res in results ]
-    mp_map = get_mile_point_map(r.get_stations())
 
-    def _add_virtual_data(new_data, n, up_data_obj, dn_data_obj, missing_data):
+def _virtual_rnode_data(src, data):
+    """ return data of virtual rnode that has the attributes of the given rnode data
+
+    :type src: RNodeData
+    :type data: Union(list[float], numpy.ndarray)
+    :rtype: RNodeData
+    """
+    idata = RNodeData.__new__(RNodeData)
+    idata.rnode = ''
+    idata.rnode_name = ''
+    idata.station_id = ''
+    idata.speed_limit = src.speed_limit
+    idata.prd = src.prd.clone()
+    idata.traffic_type = src.traffic_type
+    idata.data = data
+    idata.detector_names = []
+    idata.detectors = list(src.detectors)
+    idata.dup_detector_names = []
+    idata.detector_data = []
+    idata.lanes = src.lanes
+    idata.missing_lanes = []
+    return idata
+
+
+def _add_virtual_rnodes(results, r, **kwargs):
+    """ add virtual rnodes to the list of data (for data that can not be an array)
+
+    :type results: list[RNodeData]
+    :type r: pyticas.ttypes.Route
+    :rtype: list[RNodeData]
+    """
+    layout = kwargs.get('layout', None) or virtual_rnode_layout(results, r)
+    missing_data = kwargs.get('missing_value', cfg.MISSING_VALUE)
+
+    def _virtual_data(up_data_obj, dn_data_obj):
         """
-        :type new_data: list[RNodeData]
-        :type n: int
         :type up_data_obj: RNodeData
         :type dn_data_obj: RNodeData
-        :type missing_data: number
-        :return:
-        """
-        for _ in range(n):
-            i_data = _virtual_data(up_data_obj, dn_data_obj)
-            if not up_data_obj or not dn_data_obj:
-                new_data.append(i_data)
-                continue
-            i_data.data = []
-            for didx, up_data in enumerate(up_data_obj.data):
-                dn_data = dn_data_obj.data[didx]
-                if up_data > 0 and dn_data > 0:
-                    i_data.data.append((up_data + dn_data) / 2)
-                else:
-                    i_data.data.append(missing_data)
-            new_data.append(i_data)
-
-    def _virtual_data(idata1=None, idata2=None):
-        """
-
-        :type idata1: RNodeData
-        :type idata2: RNodeData
         :rtype: RNodeData
         """
-        idata = idata1.clone() if idata1 else idata2.clone()
-        idata.rnode = ''
-        idata.rnode_name = ''  # '({}, {})'.format(idata1.rnode_name if idata1 else 'NA', idata2.rnode_name if idata2 else 'NA')
-        idata.station_id = ''
-        idata.detector_data = []
-        idata.detector_names = []
-        idata.dup_detector_names = []
-        idata.missing_lanes = []
-        # if idata1 and idata2:
-        #     #if idata1.lanes == None: print('idata1 : ', idata1.rnode_name, idata1.station_id)
-        #     #if idata2.lanes == None: print('idata2 : ', idata2.rnode_name, idata2.station_id)
-        #     idata.lanes = (idata1.lanes + idata2.lanes) / 2
-        #     idata.speed_limit = (idata1.speed_limit + idata2.speed_limit) / 2
-
-        return idata
-
-    missing_data = kwargs.get('missing_value', cfg.MISSING_VALUE)
+        if not up_data_obj or not dn_data_obj:
+            return _virtual_rnode_data(up_data_obj or dn_data_obj, list((up_data_obj or dn_data_obj).data))
+
+        data = []
+        for didx, up_data in enumerate(up_data_obj.data):
+            dn_data = dn_data_obj.data[didx]
+            if up_data > 0 and dn_data > 0:
+                data.append((up_data + dn_data) / 2)
+            else:
+                data.append(missing_data)
+        return _virtual_rnode_data(up_data_obj, data)
 
     new_data = []
-    for ridx in range(len(results) - 1):
-        up_data_obj = results[ridx]
-        dn_data_obj = results[ridx + 1]
-        new_data.append(up_data_obj)
-        up_acc_distance = mp_map.get(up_data_obj.rnode_name)
-        acc_distance = mp_map.get(dn_data_obj.rnode_name)
-        if not acc_distance:
-            print('up:', up_data_obj)
-            print('down:', dn_data_obj)
-        n_v = round(round(acc_distance, 1) - round(up_acc_distance, 1) - VIRTUAL_RNODE_DISTANCE, 1)
-        n_13 = int(math.floor(n_v / 3.0 * 10)) if n_v >= 0.3 else 0
-        n_2 = int((n_v * 10.0) - 2 * n_13)
-        _add_virtual_data(new_data, n_13, up_data_obj, None, missing_data)
-        _add_virtual_data(new_data, n_2, up_data_obj, dn_data_obj, missing_data)
-        _add_virtual_data(new_data, n_13, None, dn_data_obj, missing_data)
-
-    new_data.append(results[-1])
+    for (up_idx, dn_idx) in layout:
+        if up_idx == dn_idx:
+            new_data.append(results[up_idx])
+            continue
+        up_data_obj = results[up_idx] if up_idx is not None else None
+        dn_data_obj = results[dn_idx] if dn_idx is not None else None
+        new_data.append(_virtual_data(up_data_obj, dn_data_obj))
 
     return new_data
 
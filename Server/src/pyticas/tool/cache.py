@@ -1,63 +1,113 @@
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+import datetime
 import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from pyticas import cfg
+
 
 class LRUCache:
+    """ bounded, thread-safe LRU cache with TTL-based eviction
 
-    def __init__(self, maxsize=1000):
-        self.maxsize = maxsize
-        self.mapping = {}
+    - entries are evicted in least-recently-used order when `maxsize` is reached
+    - entries older than `ttl` seconds are evicted on access (`ttl=None` means no expiry)
+    - list results are copied on the way out, so callers can modify the returned data
+      without corrupting the cached value
+    """
 
-        PREV, NEXT, KEY, VALUE = 0, 1, 2, 3 
-        self.head = [None, None, None, None]        # oldest
-        self.tail = [self.head, None, None, None]   # newest
-        self.head[NEXT] = self.tail
+    def __init__(self, maxsize=1000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.mapping = OrderedDict()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
 
     def make_key(self, obj):
-        try:
-            hash(obj)
+        # `Period` and infra objects are mutable and do not define `__hash__`,
+        # so they must be keyed by their values, not by their identities
+        if hasattr(obj, 'start_date') and hasattr(obj, 'end_date') and hasattr(obj, 'interval'):
+            return 'Period', obj.start_date, obj.end_date, obj.interval
+        if hasattr(obj, '_obj_type_') and hasattr(obj, 'name'):
+            return obj._obj_type_, obj.name, obj.infra_cfg_date
+        if isinstance(obj, (str, int, float, bool, datetime.date, datetime.time)) or obj is None:
             return obj, type(obj)
-        except:
-            pass
-        if isinstance(obj, set): obj = sorted(obj)        
+        if isinstance(obj, set): obj = sorted(obj)
         if isinstance(obj, (list, tuple)): return tuple(self.make_key(e) for e in obj)
         if isinstance(obj, dict):
             return tuple(sorted(((self.make_key(k), self.make_key(v)) for k, v in obj.items())))
+        try:
+            hash(obj)
+            return obj, type(obj)
+        except TypeError:
+            pass
         raise ValueError("%r can not be hashed. Try providing a custom key function." % obj)
 
     def cache(self, func):
 
-        context = threading.RLock()
-
+        @wraps(func)
         def _cache_func(*args, **kwargs):
-            return func(*args, **kwargs)
-
-        #     PREV, NEXT = 0, 1
-        #     mapping, head, tail = self.mapping, self.head, self.tail
-        #     hash_key = self.make_key([func, list(args), kwargs])
-        #     link = mapping.get(hash_key, head)
-        #     if link is head:
-        #         value = func(*args, **kwargs)
-        #         with context:
-        #             if len(mapping) >= self.maxsize:
-        #                 old_prev, old_next, old_key, old_value = head[NEXT]
-        #                 head[NEXT] = old_next
-        #                 old_next[PREV] = head
-        #                 del mapping[old_key]
-        #             last = tail[PREV]
-        #             link = [last, tail, hash_key, value]
-        #             mapping[hash_key] = last[NEXT] = tail[PREV] = link
-        #     else:
-        #         with context:
-        #             link_prev, link_next, hash_key, value = link
-        #             link_prev[NEXT] = link_next
-        #             link_next[PREV] = link_prev
-        #             last = tail[PREV]
-        #             last[NEXT] = tail[PREV] = link
-        #             link[PREV] = last
-        #             link[NEXT] = tail
-        #     return value
-        #
+            hash_key = (func, self.make_key(args), self.make_key(kwargs))
+            now = time.time()
+            with self.lock:
+                entry = self.mapping.get(hash_key, None)
+                if entry is not None:
+                    (created, value) = entry
+                    if self.ttl is not None and now - created > self.ttl:
+                        del self.mapping[hash_key]
+                        self.evictions += 1
+                    else:
+                        self.mapping.move_to_end(hash_key)
+                        self.hits += 1
+                        return self._copy(value)
+                self.misses += 1
+
+            # the function is called out of the lock
+            # because cached functions can call another cached function
+            value = func(*args, **kwargs)
+
+            with self.lock:
+                self.mapping[hash_key] = (now, value)
+                self.mapping.move_to_end(hash_key)
+                while len(self.mapping) > self.maxsize:
+                    self.mapping.popitem(last=False)
+                    self.evictions += 1
+
+            return self._copy(value)
+
         return _cache_func
 
-lru_cache = LRUCache(maxsize=1000).cache
\ No newline at end of file
+    def cache_info(self):
+        """ return cache counters
+
+        :rtype: dict
+        """
+        with self.lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+                    'size': len(self.mapping),
+                    'maxsize': self.maxsize,
+                    'ttl': self.ttl}
+
+    def cache_clear(self):
+        """ remove all cached items and reset counters """
+        with self.lock:
+            self.mapping.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def _copy(self, value):
+        if isinstance(value, list):
+            return list(value)
+        return value
+
+
+_detector_cache = LRUCache(maxsize=cfg.DETECTOR_CACHE_SIZE, ttl=cfg.DETECTOR_CACHE_TTL)
+
+lru_cache = _detector_cache.cache
+cache_info = _detector_cache.cache_info
+cache_clear = _detector_cache.cache_clear
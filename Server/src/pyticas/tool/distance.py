@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 import math
 
+import numpy as np
+
 from pyticas import cfg
 
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
@@ -36,6 +38,24 @@ def distance_in_mile_with_coordinate(lat1, lon1, lat2, lon2):
     return c * cfg.RADIUS_IN_EARTH_FOR_MILE
 
 
+def distances_in_mile_with_coordinate(lat, lon, lats, lons):
+    """ return distances from the given coordinates to each of coordinates in `lats` and `lons`
+
+    :type lat: float
+    :type lon: float
+    :type lats: numpy.ndarray
+    :type lons: numpy.ndarray
+    :rtype: numpy.ndarray
+    """
+    lat1 = _deg2rad(lat)
+    lon1 = _deg2rad(lon)
+    lat2 = np.radians(lats)
+    lon2 = np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return c * cfg.RADIUS_IN_EARTH_FOR_MILE
+
+
 def _deg2rad(deg):
     return float(deg) * math.pi / 180.0
 
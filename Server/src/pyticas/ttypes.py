@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+import copy
 import datetime
 import os
 import re
 import sys
+import weakref
 from collections import defaultdict, OrderedDict
 from enum import Enum
 
@@ -19,29 +21,110 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 # Base Types
 ###############################
 class Serializable(object):
+    __slots__ = ()
+
     def serialize(self):
         d = {'__class__': self.__class__.__name__,
              '__module__': self.__module__,
              }
-        d.update(self.__dict__)
+        d.update(self._attrs())
         return d
 
     def clone(self):
+        """ return copy of the object
+
+        - infra objects and traffic types are shared, and the other attributes are copied structurally
+        - objects having their own ``serialize()`` are copied through json
+
+        """
         try:
-            return json.loads(json.dumps(self, only_name=False))
+            if type(self).serialize is not Serializable.serialize:
+                return json.loads(json.dumps(self, only_name=False))
+            obj = self.__class__.__new__(self.__class__)
+            for k, v in self._attrs().items():
+                setattr(obj, k, _clone_value(v))
+            return obj
         except Exception:
             logger = getDefaultLogger(__name__)
             logger.error('Fail to cloning object : %s' % self.__repr__(), exc_info=True)
             return None
 
+    def _attrs(self):
+        """ return attributes including ones in `__slots__`
+
+        :rtype: dict
+        """
+        d = {k: getattr(self, k) for k in _slot_names(type(self)) if hasattr(self, k)}
+        d.update(getattr(self, '__dict__', {}))
+        return d
+
     @classmethod
     def unserialize(cls, kwargs):
         obj = cls.__new__(cls)
+        slots = None if hasattr(obj, '__dict__') else _slot_names(cls)
         for k, v in kwargs.items():
-            setattr(obj, k, v)
+            # attributes that are not in `__slots__` (e.g. from old version) are ignored
+            if slots is None or k in slots:
+                setattr(obj, k, v)
         return obj
 
 
+_SLOT_NAMES = {}
+
+
+def _slot_names(cls):
+    """ return attribute names defined in `__slots__` of the class and its base classes
+
+    :type cls: type
+    :rtype: list[str]
+    """
+    names = _SLOT_NAMES.get(cls, None)
+    if names is None:
+        names = []
+        for c in reversed(cls.__mro__):
+            slots = c.__dict__.get('__slots__', ())
+            for name in ([slots] if isinstance(slots, str) else slots):
+                if name not in ('__dict__', '__weakref__') and name not in names:
+                    names.append(name)
+        _SLOT_NAMES[cls] = names
+    return names
+
+
+_IMMUTABLE_TYPES = (str, int, float, bool, complex, bytes, datetime.date, datetime.time, datetime.timedelta, Enum)
+
+
+def _clone_value(v):
+    """ return copy of an attribute value for ``Serializable.clone()``
+
+    :type v: object
+    :rtype: object
+    """
+    if v is None or isinstance(v, _IMMUTABLE_TYPES) or isinstance(v, (InfraObject, TrafficType)):
+        return v
+    if isinstance(v, Serializable):
+        return v.clone()
+    if isinstance(v, list):
+        return [_clone_value(item) for item in v]
+    if isinstance(v, tuple):
+        return tuple(_clone_value(item) for item in v)
+    if type(v) in (dict, OrderedDict):
+        return type(v)((k, _clone_value(item)) for k, item in v.items())
+    if hasattr(v, 'copy') and type(v).__module__ == 'numpy':
+        return v.copy()
+    return copy.deepcopy(v)
+
+
+def _clone_data(v):
+    """ return copy of a data list (items are numbers, strings or infra objects)
+
+    :type v: object
+    :rtype: object
+    """
+    if type(v) is list:
+        return list(v)
+    return _clone_value(v)
+
+
 class TupleEnum(Enum):
     def get_name(self):
         return self.name
@@ -851,6 +934,8 @@ class MeterObject(InfraObject):
 # Route and Period
 ###############################
 class Period(Serializable):
+    __slots__ = ('start_date', 'end_date', 'interval')
+
     def __init__(self, start_date, end_date, interval=30):
         """
         :type start_date: str
@@ -1000,7 +1085,11 @@ class Period(Serializable):
         """
         :rtype: Period
         """
-        return super().clone()
+        prd = self.__class__.__new__(self.__class__)
+        prd.start_date = self.start_date
+        prd.end_date = self.end_date
+        prd.interval = self.interval
+        return prd
 
     def __str__(self):
         """ return period string e.g. 20150901060000-20150901100030-30
@@ -1070,52 +1159,31 @@ class Route(Serializable):
         return [st for st in self.get_rnodes() if st.is_station()]
 
     def get_detector_checker(self):
+        """ return function to check if a detector is in the open lanes of the route
+
+        - the route configuration is compiled once and the checker is cached for the route
+        - the cached checker is discarded when ``cfg`` is replaced,
+          and ``invalidate_detector_checker()`` must be called when ``cfg`` is modified in place
 
+        :rtype: callable
+        """
         if not self.cfg:
             return lambda det: True
 
-        def find_nodeset(rn):
-            """
-
-            :type rn: RNodeObject
-            :rtype: (RouteConfigNodeSet, RouteConfigNode)
-            """
-            for idx, node_set in enumerate(self.cfg.node_sets):
-                if node_set.node1.rnode == rn:
-                    return node_set, node_set.node1
-                elif node_set.node2.rnode == rn:
-                    return node_set, node_set.node2
-            return None, None
-
-        def checker(det):
-            """
-
-            :type det: DetectorObject
-            :rtype: bool
-            """
-            node_set, node = find_nodeset(det.rnode)
-            if not node_set:
-                return False
-
-            if node_set.node1.rnode == det.rnode:
-                node1 = node_set.node1
-                lanes1 = [n for n in range(1, node1.lanes + 1)]
-                open_lanes = list(set(lanes1)
-                                  - set(node1.node_config.closed_lanes)
-                                  - set(node1.node_config.shifted_lanes)
-                                  - set(node1.node_config.od_lanes))
-                return det.lane in open_lanes
+        checker = _DETECTOR_CHECKERS.get(self, None)
+        if checker is None or checker.cfg is not self.cfg:
+            checker = RouteDetectorChecker(self.cfg)
+            _DETECTOR_CHECKERS[self] = checker
+        return checker
 
-            elif node_set.node2.rnode == det.rnode:
-                node2 = node_set.node2
-                lanes2 = [n for n in range(1, node2.lanes + 1)]
-                open_lanes = list(set(lanes2)
-                                  - set(node2.node_config.closed_lanes)
-                                  - set(node2.node_config.shifted_lanes))
+    def invalidate_detector_checker(self):
+        """ discard the cached detector checker """
+        _DETECTOR_CHECKERS.pop(self, None)
 
-                return det.lane in open_lanes and det.lane in node2.node_config.od_lanes
-
-        return checker
+    def __setattr__(self, name, value):
+        if name == 'cfg':
+            _DETECTOR_CHECKERS.pop(self, None)
+        super().__setattr__(name, value)
 
     def corridors(self):
         """
@@ -1170,6 +1238,11 @@ class Route(Serializable):
         )
 
 
+# detector checkers compiled from route configurations (see `Route.get_detector_checker()`)
+#   - it is not an attribute of `Route` not to be serialized and cloned with the route
+_DETECTOR_CHECKERS = weakref.WeakKeyDictionary()
+
+
 class RouteConfig(Serializable):
     def __init__(self):
         self.infra_cfg_date = None
@@ -1311,6 +1384,77 @@ class RouteConfigInfo(Serializable):
         """:type: dict[int, str] """
 
 
+class RouteDetectorChecker(object):
+    def __init__(self, rc):
+        """ detector checker compiled from route configuration
+
+        - rnode -> (node set, node) index
+        - rnode -> open lanes
+        - detector -> allowed (for detectors of rnodes in the route configuration)
+
+        :type rc: RouteConfig
+        """
+        self.cfg = rc
+        """:type: RouteConfig """
+
+        self.nodesets = {}
+        """:type: dict[RNodeObject, (RouteConfigNodeSet, RouteConfigNode)] """
+
+        self.open_lanes = {}
+        """:type: dict[RNodeObject, set[int]] """
+
+        self.allowed = {}
+        """:type: dict[DetectorObject, bool] """
+
+        for node_set in rc.node_sets:
+            for node in [node_set.node1, node_set.node2]:
+                if node.rnode not in self.nodesets:
+                    self.nodesets[node.rnode] = (node_set, node)
+
+        for rn, (node_set, node) in self.nodesets.items():
+            open_lanes = self._open_lanes(node_set, rn)
+            self.open_lanes[rn] = open_lanes
+            for det in getattr(rn, 'detectors', None) or []:
+                self.allowed[det] = det.lane in open_lanes
+
+    def find_nodeset(self, rn):
+        """
+        :type rn: RNodeObject
+        :rtype: (RouteConfigNodeSet, RouteConfigNode)
+        """
+        return self.nodesets.get(rn, (None, None))
+
+    def __call__(self, det):
+        """
+        :type det: DetectorObject
+        :rtype: bool
+        """
+        allowed = self.allowed.get(det, None)
+        if allowed is None:
+            open_lanes = self.open_lanes.get(det.rnode, None)
+            allowed = open_lanes is not None and det.lane in open_lanes
+        return allowed
+
+    def _open_lanes(self, node_set, rn):
+        """
+        :type node_set: RouteConfigNodeSet
+        :type rn: RNodeObject
+        :rtype: set[int]
+        """
+        if node_set.node1.rnode == rn:
+            node1 = node_set.node1
+            return (set(range(1, node1.lanes + 1))
+                    - set(node1.node_config.closed_lanes)
+                    - set(node1.node_config.shifted_lanes)
+                    - set(node1.node_config.od_lanes))
+
+        node2 = node_set.node2
+        return ((set(range(1, node2.lanes + 1))
+                 - set(node2.node_config.closed_lanes)
+                 - set(node2.node_config.shifted_lanes))
+                & set(node2.node_config.od_lanes))
+
+
 ######################################
 # For Traffic Data Reader
 #####################################
@@ -1322,6 +1466,9 @@ class RouteConfigInfo(Serializable):
 
 
 class RNodeData(Serializable):
+    __slots__ = ('rnode', 'rnode_name', 'station_id', 'speed_limit', 'prd', 'traffic_type', 'data',
+                 'detector_names', 'detectors', 'dup_detector_names', 'detector_data', 'lanes', 'missing_lanes')
+
     def __init__(self, rnode, prd, traffic_type):
         """
         :type rnode: pyticas.ttypes.RNodeObject
@@ -1367,15 +1514,27 @@ class RNodeData(Serializable):
     def __repr__(self):
         return self.__str__()
 
-    # def clone(self):
-    #     rd = RNodeData(self.rnode, self.prd.clone(), self.traffic_type)
-    #     rd.data = list(self.data)
-    #     rd.detector_names = list(self.detector_names)
-    #     rd.dup_detector_names = list(self.dup_detector_names)
-    #     rd.detector_data = dict(self.detector_data)
-    #     rd.lanes = self.lanes
-    #     rd.missing_lanes = list(self.missing_lanes)
-    #     return rd
+    def clone(self):
+        """ return copy of the data (rnode, detectors and traffic type are shared)
+
+        :rtype: RNodeData
+        """
+        rd = self.__class__.__new__(self.__class__)
+        rd.rnode = self.rnode
+        rd.rnode_name = self.rnode_name
+        rd.station_id = self.station_id
+        rd.speed_limit = self.speed_limit
+        rd.prd = self.prd.clone() if self.prd else self.prd
+        rd.traffic_type = self.traffic_type
+        rd.data = _clone_data(self.data)
+        rd.detector_names = _clone_data(self.detector_names)
+        rd.detectors = _clone_data(self.detectors)
+        rd.dup_detector_names = _clone_data(self.dup_detector_names)
+        rd.detector_data = ({k: _clone_data(v) for k, v in self.detector_data.items()}
+                            if isinstance(self.detector_data, dict) else _clone_data(self.detector_data))
+        rd.lanes = _clone_value(self.lanes)
+        rd.missing_lanes = _clone_data(self.missing_lanes)
+        return rd
 
     def get_title(self, **kwargs):
         # is it virtual station
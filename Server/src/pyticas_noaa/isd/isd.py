@@ -4,7 +4,7 @@ import datetime
 
 from pyticas.tool import distance
 from pyticas_noaa.isd.isdreader import download as _download_data
-from pyticas_noaa.isd.isdreader import parse as _read_station_data
+from pyticas_noaa.isd.isdreader import read as _read_station_data
 from pyticas_noaa.isd.isdstations import download_isd_stations as _download_isd_stations
 from pyticas_noaa.isd.isdstations import load_isd_stations as _load_isd_stations
 
@@ -88,7 +88,6 @@ def get_day_data(isd_station, year, month, day):
     :rtype: Generator: pyticas_noaa.isd.isdtypes.ISDData
     """
     current_year = datetime.datetime.now().year
-    YEAR_COL = 15
     filepath1, filepath2, filepath3 = None, None, None
 
     if month == 1 and day == 1:
@@ -115,16 +114,13 @@ def get_day_data(isd_station, year, month, day):
         edt = datetime.datetime(year, month, day, 23, 59, 59)
         return sdt <= isd_data.time() <= edt
 
-    def _line_filter(line):
-        line_year = int(line[YEAR_COL:YEAR_COL + 4])
-        line_month = int(line[YEAR_COL + 4:YEAR_COL + 6])
-        line_day = int(line[YEAR_COL + 6:YEAR_COL + 8])
+    def _date_filter(line_year, line_month, line_day):
         if line_year != year or line_month != month or line_day not in [day - 1, day, day + 1]:
             return False
         else:
             return True
 
-    return _read_station_data(filepaths, _filter, _line_filter)
+    return _read_station_data(filepaths, _filter, _date_filter)
 
 
 def get_year_data(isd_station, year):
@@ -134,7 +130,6 @@ def get_year_data(isd_station, year):
     :rtype: Generator: pyticas_noaa.isd.isdtypes.ISDData
     """
     current_year = datetime.datetime.now().year
-    YEAR_COL = 15
     filepath1 = _download_data(isd_station.usaf, isd_station.wban, year - 1)
     filepath2 = _download_data(isd_station.usaf, isd_station.wban, year)
     filepath3 = None
@@ -157,16 +152,13 @@ def get_year_data(isd_station, year):
         """
         return isd_data.time().year == year
 
-    def _line_filter(line):
-        line_year = int(line[YEAR_COL:YEAR_COL + 4])
-        line_month = int(line[YEAR_COL + 4:YEAR_COL + 6])
-        line_day = int(line[YEAR_COL + 6:YEAR_COL + 8])
+    def _date_filter(line_year, line_month, line_day):
         if line_year != year and not ((line_month == 12 and line_day == 31) or (line_month == 1 and line_day == 1)):
             return False
         else:
             return True
 
-    return _read_station_data(filepaths, _filter, _line_filter)
+    return _read_station_data(filepaths, _filter, _date_filter)
 
 
 def apply_interval(isddata_list, prd):
@@ -1,20 +1,51 @@
 # -*- coding: utf-8 -*-
 
+import calendar
 import gzip
+import hashlib
+import json
 import os
 import platform
+import re
+import threading
 import urllib.error
 import urllib.request
+from collections import OrderedDict
 
 import datetime
 
 from pyticas.infra import Infra
 from pyticas.logger import getLogger
+from pyticas.ttypes import AttrDict
 from pyticas_noaa.cfg import ISD_DATA_URL, ISD_DIR
 from pyticas_noaa.isd.isdtypes import CDS, MDS, ISD_AA, ISD_AU, ISD_OC, ISDRawData, ISDData
 
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+PARSED_CACHE_EXTENSION = '.parsed'
+PARSED_CACHE_VERSION = 2
+MAX_LOADED_PARSED_DATA = 12
+
+# fields used by `ISDRawData`
+_CDS_FIELDS = ('geophysical_point_observation_year', 'geophysical_point_observation_month',
+               'geophysical_point_observation_day', 'geophysical_point_observation_hour',
+               'geophysical_point_observation_minute', 'geophysical_report_type')
+_MDS_FIELDS = ('wind_observation_direction_angle', 'wind_observation_direction_quality_code',
+               'wind_observation_speed_rate', 'visibility_observation_distance_dimension',
+               'visibility_observation_quality_code', 'air_temperature_observation_air_temperature',
+               'air_temperature_observation_air_temperature_quality_code',
+               'air_temperature_observation_dew_point_temperature',
+               'air_temperature_observation_dew_point_quality_code')
+_AA_FIELDS = ('liquid_precipitation_period_quantity_in_hours', 'liquid_precipitation_depth_dimension',
+              'liquid_precipitation_condition_code', 'liquid_precipitation_quality_code')
+_AU_FIELDS = ('present_weather_observation_intensity_code', 'present_weather_observation_descriptor_code',
+              'present_weather_observation_precipitation_code', 'present_weather_observation_obscuration_code')
+_OC_FIELDS = ('speed_rate', 'quality_code')
+
+_lock = threading.RLock()
+_loaded_parsed_data = OrderedDict()
+""":type: OrderedDict[str, _ParsedData] """
+
 
 def download(usaf, wban, year):
     """
@@ -63,13 +94,7 @@ def parse(filepath, data_filter=None, line_filter=None):
     :type data_filter: function
     :rtype: Generator : pyticas_noaa.isd.isdtypes.ISDData
     """
-
-    cds = CDS()
-    mds = MDS()
-    aa = ISD_AA()
-    au = ISD_AU()
-    oc = ISD_OC()
-    time_cache = []
+    time_cache = set()
     filepaths = []
     if filepath is str:
         filepaths.append(filepath)
@@ -81,25 +106,294 @@ def parse(filepath, data_filter=None, line_filter=None):
             for num, line in enumerate(f):
                 if line_filter and not line_filter(line):
                     continue
-                res_cds = cds.parse(line)
-                res_mds = mds.parse(line, cds.total_field_length())
-                ads_start = cds.total_field_length() + mds.total_field_length()
-                ad_line = _additional_data_string(line, ads_start)
-                if not ad_line:
+                cds_data, raw_data = _parse_line(line)
+                if not raw_data:
                     continue
-                ress_aa = aa.parse(ad_line)
-                ress_au = au.parse(ad_line)
-                ress_oc = oc.parse(ad_line)
-                isd_data = ISDData(ISDRawData(res_cds, res_mds, ress_aa, ress_au, ress_oc))
+                isd_data = ISDData(raw_data)
                 # to avoid duplicated data
                 dtime = isd_data.time().timestamp()
                 if dtime in time_cache:
                     continue
                 if not data_filter or data_filter(isd_data):
-                    time_cache.append(dtime)
+                    time_cache.add(dtime)
                     yield isd_data
 
 
+def read(filepath, data_filter=None, date_filter=None):
+    """ same as `parse()`, but data are read from the parsed data cache of each file
+
+    :type filepath: list[str]
+    :type data_filter: function
+    :param date_filter: function to filter data with UTC date of observation, `date_filter(year, month, day) -> bool`
+    :type date_filter: function
+    :rtype: Generator : pyticas_noaa.isd.isdtypes.ISDData
+    """
+    time_cache = set()
+    for fpath in filepath:
+        parsed = _get_parsed_data(fpath)
+        if date_filter:
+            row_indices = sorted(ridx for (year, month, day), ridxs in parsed.date_index.items()
+                                 if date_filter(year, month, day) for ridx in ridxs)
+        else:
+            row_indices = range(len(parsed.timestamps))
+
+        for ridx in row_indices:
+            isd_data = ISDData(ISDRawData.from_values(datetime.datetime.fromtimestamp(parsed.timestamps[ridx]),
+                                                      parsed.row(ridx)))
+            # to avoid duplicated data
+            dtime = isd_data.time().timestamp()
+            if dtime in time_cache:
+                continue
+            if not data_filter or data_filter(isd_data):
+                time_cache.add(dtime)
+                yield isd_data
+
+
+class _ParsedData(object):
+    def __init__(self, source_size, source_mtime, source_md5, timestamps, utc_dates, columns):
+        """ parsed data of an ISD file as columns
+
+        :type source_size: int
+        :param source_mtime: modified time of the ISD file in nanoseconds
+        :type source_mtime: int
+        :type source_md5: str
+        :param timestamps: UTC timestamp of each observation
+        :type timestamps: list[int]
+        :param utc_dates: UTC date of each observation as `[year, month, day]`
+        :type utc_dates: list[list[int]]
+        :param columns: attributes of `ISDRawData` (except `dt`) as columns
+        :type columns: dict[str, list]
+        """
+        self.source_size = source_size
+        self.source_mtime = source_mtime
+        self.source_md5 = source_md5
+        self.timestamps = timestamps
+        self.utc_dates = utc_dates
+        self.columns = columns
+        self.date_index = OrderedDict()
+        """:type: dict[(int, int, int), list[int]] """
+        for ridx, utc_date in enumerate(utc_dates):
+            self.date_index.setdefault(tuple(utc_date), []).append(ridx)
+
+    def row(self, ridx):
+        """
+        :type ridx: int
+        :rtype: dict
+        """
+        return {name: values[ridx] for name, values in self.columns.items()}
+
+    def to_json(self):
+        return json.dumps({'version': PARSED_CACHE_VERSION,
+                           'source_size': self.source_size,
+                           'source_mtime': self.source_mtime,
+                           'source_md5': self.source_md5,
+                           'timestamps': self.timestamps,
+                           'utc_dates': self.utc_dates,
+                           'columns': self.columns})
+
+
+def _get_parsed_data(filepath):
+    """ return parsed data of the given ISD file
+
+    - parsed data are saved as `<ISD file>.parsed` and are used while the ISD file is not changed
+    - md5 of the ISD file is checked only when its modified time is changed (e.g. downloaded again)
+
+    :type filepath: str
+    :rtype: _ParsedData
+    """
+    stat = os.stat(filepath)
+    source_size, source_mtime = stat.st_size, stat.st_mtime_ns
+    cache_path = filepath + PARSED_CACHE_EXTENSION
+
+    with _lock:
+        parsed = _loaded_parsed_data.get(filepath, None)
+    if not parsed:
+        parsed = _load_parsed_cache(cache_path)
+
+    source_md5 = None
+    if parsed and parsed.source_size == source_size and parsed.source_mtime != source_mtime:
+        # the file can be downloaded again without changes
+        source_md5 = _md5(filepath)
+        if parsed.source_md5 == source_md5:
+            parsed.source_mtime = source_mtime
+            _save_parsed_cache(cache_path, parsed)
+        else:
+            parsed = None
+
+    if not parsed or parsed.source_size != source_size:
+        parsed = _parse_file(filepath, source_size, source_mtime, source_md5 or _md5(filepath))
+        _save_parsed_cache(cache_path, parsed)
+
+    with _lock:
+        _loaded_parsed_data[filepath] = parsed
+        _loaded_parsed_data.move_to_end(filepath)
+        while len(_loaded_parsed_data) > MAX_LOADED_PARSED_DATA:
+            _loaded_parsed_data.popitem(last=False)
+
+    return parsed
+
+
+def _save_parsed_cache(cache_path, parsed):
+    """
+    :type cache_path: str
+    :type parsed: _ParsedData
+    """
+    try:
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(parsed.to_json())
+        os.replace(tmp_path, cache_path)
+    except Exception as ex:
+        getLogger(__name__).warn('Could not save parsed ISD data : %s (%s)' % (cache_path, ex))
+
+
+def _load_parsed_cache(cache_path):
+    """
+    :type cache_path: str
+    :rtype: _ParsedData
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        with open(cache_path, 'r') as f:
+            data = json.load(f)
+        if data.get('version', None) != PARSED_CACHE_VERSION:
+            return None
+        return _ParsedData(data['source_size'], data['source_mtime'], data['source_md5'], data['timestamps'],
+                           data['utc_dates'], data['columns'])
+    except Exception as ex:
+        getLogger(__name__).warn('Could not load parsed ISD data : %s (%s)' % (cache_path, ex))
+        return None
+
+
+def _parse_file(filepath, source_size, source_mtime, source_md5):
+    """ parse all lines of the given ISD file
+
+    :type filepath: str
+    :type source_size: int
+    :type source_mtime: int
+    :type source_md5: str
+    :rtype: _ParsedData
+    """
+    timestamps, utc_dates, columns = [], [], OrderedDict()
+    n_errors = 0
+    with open(filepath, 'r') as f:
+        for line in f:
+            try:
+                cds_data, raw_data = _parse_line(line)
+            except Exception:
+                n_errors += 1
+                continue
+            if not raw_data:
+                continue
+            utc_time = (cds_data.geophysical_point_observation_year,
+                        cds_data.geophysical_point_observation_month,
+                        cds_data.geophysical_point_observation_day,
+                        cds_data.geophysical_point_observation_hour,
+                        cds_data.geophysical_point_observation_minute, 0)
+            timestamps.append(calendar.timegm(utc_time))
+            utc_dates.append(list(utc_time[:3]))
+            for name, value in raw_data.__dict__.items():
+                if name != 'dt':
+                    columns.setdefault(name, []).append(value)
+    if n_errors:
+        getLogger(__name__).warn('%d lines could not be parsed : %s' % (n_errors, filepath))
+    return _ParsedData(source_size, source_mtime, source_md5, timestamps, utc_dates, columns)
+
+
+def _parse_line(line):
+    """ parse fields used by `ISDRawData` with precomputed slices
+
+    :type line: str
+    :return: control data section and raw data or (None, None) if the line has no additional data section
+    :rtype: (AttrDict, ISDRawData)
+    """
+    ad_line = _additional_data_string(line, _ADS_START)
+    if not ad_line:
+        return None, None
+    cds_data = _field_values(line, _CDS_SLICES)
+    mds_data = _field_values(line, _MDS_SLICES)
+    aa_data = _additional_field_values(ad_line, _AA_PATTERN, _AA_SLICES)
+    au_data = _additional_field_values(ad_line, _AU_PATTERN, _AU_SLICES)
+    oc_data = _additional_field_values(ad_line, _OC_PATTERN, _OC_SLICES)
+    return cds_data, ISDRawData(cds_data, mds_data, aa_data, au_data, oc_data)
+
+
+def _field_slices(isd_field, field_names, offset=0):
+    """ return slices of the given fields
+
+    :type isd_field: pyticas_noaa.isd.isdtypes.ISDField
+    :type field_names: tuple[str]
+    :param offset: start position of the data section
+    :type offset: int
+    :rtype: list[(str, int, int)]
+    """
+    slices = []
+    cur_offset = offset
+    for field_name, field_len in isd_field.fields:
+        if field_name in field_names:
+            slices.append((field_name, cur_offset, cur_offset + field_len))
+        cur_offset += field_len
+    return slices
+
+
+def _field_values(text, slices, offset=0):
+    """ same as `ISDField.parse()` for the fields of the given slices
+
+    :type text: str
+    :type slices: list[(str, int, int)]
+    :type offset: int
+    :rtype: AttrDict
+    """
+    result = AttrDict()
+    for field_name, start, end in slices:
+        v = text[offset + start:offset + end]
+        if v.replace('.', '', 1).isdigit():
+            if '.' in v:
+                v = float(v)
+            else:
+                v = int(v)
+        result[field_name] = v
+    return result
+
+
+def _additional_field_values(ad_line, pattern, slices):
+    """ return values of the first data in the additional data section (as list for `ISDRawData`)
+
+    :type ad_line: str
+    :type pattern: re.Pattern
+    :type slices: list[(str, int, int)]
+    :rtype: list[AttrDict]
+    """
+    m = pattern.search(ad_line)
+    if not m:
+        return []
+    return [_field_values(ad_line, slices, m.start())]
+
+
+def _md5(filepath):
+    """
+    :type filepath: str
+    :rtype: str
+    """
+    md5 = hashlib.md5()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(chunk)
+    return md5.hexdigest()
+
+
+_ADS_START = CDS().total_field_length() + MDS().total_field_length()
+_CDS_SLICES = _field_slices(CDS, _CDS_FIELDS)
+_MDS_SLICES = _field_slices(MDS, _MDS_FIELDS, CDS().total_field_length())
+_AA_SLICES = _field_slices(ISD_AA, _AA_FIELDS)
+_AU_SLICES = _field_slices(ISD_AU, _AU_FIELDS)
+_OC_SLICES = _field_slices(ISD_OC, _OC_FIELDS)
+_AA_PATTERN = re.compile(ISD_AA.tag_pattern)
+_AU_PATTERN = re.compile(ISD_AU.tag_pattern)
+_OC_PATTERN = re.compile(ISD_OC.tag_pattern)
+
+
 def _dataurl(usaf, wban, year):
     """
     :type usaf: int or str
@@ -766,6 +766,20 @@ class ISDRawData(object):
                 - 9 = Passed gross limits check if element is present
         """
 
+    @classmethod
+    def from_values(cls, dt, values):
+        """ create raw data with values parsed already (e.g. values in the parsed data cache)
+
+        :type dt: datetime.datetime
+        :param values: attributes of `ISDRawData` except `dt`
+        :type values: dict
+        :rtype: ISDRawData
+        """
+        raw_data = cls.__new__(cls)
+        raw_data.__dict__.update(values)
+        raw_data.dt = dt
+        return raw_data
+
     def utc_2_local(self, utc):
         """
         :type utc: str
@@ -7,4 +7,10 @@ LOG_FILE_NAME = 'pyticas-server'
 LOG_LEVEL = cfg.ROOT_LOGGER_LEVEL
 LOG_TO_CONSOLE = cfg.ROOT_LOGGER_TO_CONSOLE
 
-LOCAL_MODE = False
\ No newline at end of file
+LOCAL_MODE = False
+
+# Number of Worker Threads for MOE Jobs (asynchronous MOE requests)
+N_MOE_WORKERS = 2
+
+# Retention Time of MOE Job Results (in seconds)
+MOE_RESULT_RETENTION_TIME = 3600
@@ -8,7 +8,7 @@ import json
 import os
 import uuid
 
-from flask import request
+from flask import request, send_from_directory
 
 from pyticas import period
 from pyticas.infra import Infra
@@ -17,6 +17,7 @@ from pyticas.moe import writer
 from pyticas.tool import tb
 from pyticas_server import protocol as prot
 from pyticas_server.protocol import json2route
+from pyticas_server.ticas_app import moe_jobs
 
 
 def register_api(app):
@@ -88,10 +89,35 @@ def register_api(app):
     def moe_rwis():
         return prot.response_fail('Not Implemented')
 
+    @app.route(api_urls.MOE_JOB_STATUS, methods=['POST'])
+    def moe_job_status():
+        uid = request.form.get('uid')
+        if not uid:
+            return prot.response_error('invalid request')
+
+        job_status = moe_jobs.status(uid)
+        if not job_status:
+            return prot.response_error('invalid uid')
+
+        return prot.response_success(job_status)
+
+    @app.route(api_urls.MOE_JOB_DOWNLOAD, methods=['GET'])
+    def moe_job_download():
+        uid = request.args.get('uid')
+        filepath = moe_jobs.result_path(uid) if uid else None
+        if not filepath:
+            return 'not found', 404
+
+        return send_from_directory(directory=os.path.dirname(filepath), filename=os.path.basename(filepath),
+                                   as_attachment=True)
+
 
 def _moe(moe_func, moe_name, **kwargs):
     """
 
+    - the MOE is calculated in background if `async` parameter is 'true',
+      then uid of the job is returned (see `moe_jobs` module)
+
     :type moe_func: callable
     :type moe_name: str
     :return:
@@ -116,12 +142,16 @@ def _moe(moe_func, moe_name, **kwargs):
             )
             period_list.append(prd)
 
+        if request.form.get('async', 'false').lower() == 'true':
+            key = moe_jobs.request_key(moe_name, route_json, periods)
+            uid = moe_jobs.submit(key, moe_name,
+                                  lambda filepath: _write_moe(filepath, moe_func, r, period_list, **kwargs))
+            return prot.response_success({'uid': uid})
+
         tmp_dir = Infra.get_infra().get_path('moe_tmp', create=True)
         uid = str(uuid.uuid4())
         est_file = os.path.join(tmp_dir, '%s.xlsx' % uid)
-        res = moe_func(r, period_list)
-        write = kwargs.get('write_function', writer.write)
-        write(est_file, r, res, **kwargs)
+        _write_moe(est_file, moe_func, r, period_list, **kwargs)
 
         encoded = None
         with open(est_file, 'rb') as f:
@@ -140,6 +170,19 @@ def _moe(moe_func, moe_name, **kwargs):
         return prot.response_error('ERROR : %s' % moe_name)
 
 
+def _write_moe(filepath, moe_func, r, period_list, **kwargs):
+    """ calculate MOE and write the workbook
+
+    :type filepath: str
+    :type moe_func: callable
+    :type r: pyticas.ttypes.Route
+    :type period_list: list[pyticas.ttypes.Period]
+    """
+    res = moe_func(r, period_list)
+    write = kwargs.get('write_function', writer.write)
+    write(filepath, r, res, **kwargs)
+
+
 def _output_path(sub_dir='', create=True):
     infra = Infra.get_infra()
     if sub_dir:
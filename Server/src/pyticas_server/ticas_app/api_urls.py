@@ -21,6 +21,8 @@ MOE_SV = '/ticas/moe/sv'
 MOE_CM = '/ticas/moe/cm'
 MOE_CMH = '/ticas/moe/cmh'
 MOE_RWIS = '/ticas/moe/rwis'
+MOE_JOB_STATUS = '/ticas/moe/job/status'
+MOE_JOB_DOWNLOAD = '/ticas/moe/job/download'
 
 ROUTE_FROM_XLSX = '/ticas/route/fromcfg'
 ROUTE_FROM_JSON = '/ticas/route/fromjson'
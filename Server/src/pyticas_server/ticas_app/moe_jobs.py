@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+MOE Job Module
+==============
+
+- MOE requests of TICAS client can be run by a pool of worker threads in background
+- a client submits a request, polls status of the job and downloads the workbook when the job is done
+- identical requests that are queued or running share one job
+- workbooks of finished jobs are removed after `cfg.MOE_RESULT_RETENTION_TIME`
+
+    e.g.
+        key = moe_jobs.request_key('Travel Time', route_json, periods_json)
+        uid = moe_jobs.submit(key, 'Travel Time', write_function)  # `write_function(filepath)` writes the workbook
+        moe_jobs.status(uid)  # {'uid': uid, 'state': 'running', ...}
+        moe_jobs.result_path(uid)  # path of the workbook if the job is done
+
+"""
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+import concurrent.futures
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from pyticas.infra import Infra
+from pyticas.tool import tb
+from pyticas_server import cfg
+from pyticas_server.logger import getLogger
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+_jobs = {}  # uid -> _Job
+_in_flight = {}  # request key -> uid of the queued or running job
+_lock = threading.Lock()
+_executor = None
+
+
+class _Job(object):
+    def __init__(self, uid, key, name):
+        """
+        :type uid: str
+        :type key: str
+        :type name: str
+        """
+        self.uid = uid
+        self.key = key
+        self.name = name
+        self.state = JOB_QUEUED
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def status(self):
+        """
+        :rtype: dict
+        """
+        now = time.time()
+        return {
+            'uid': self.uid,
+            'name': self.name,
+            'state': self.state,
+            'error': self.error,
+            'submitted': self.submitted,
+            'started': self.started,
+            'finished': self.finished,
+            'elapsed': ((self.finished or now) - self.started) if self.started else 0,
+        }
+
+
+def request_key(moe_name, route_json, periods_json):
+    """ return key of the MOE request to find identical requests
+
+    :type moe_name: str
+    :type route_json: str
+    :type periods_json: str
+    :rtype: str
+    """
+    canonical = json.dumps([moe_name, json.loads(route_json), json.loads(periods_json)],
+                           sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def submit(key, name, write_function):
+    """ add MOE job, and return uid of the job
+
+    - uid of the queued or running job is returned if there is the identical request
+
+    :param key: request key (see `request_key()`)
+    :type key: str
+    :param name: MOE name
+    :type name: str
+    :param write_function: function to write the workbook to the given file path
+    :type write_function: callable
+    :rtype: str
+    """
+    with _lock:
+        _remove_expired()
+        uid = _in_flight.get(key, None)
+        if uid:
+            return uid
+
+        job = _Job(str(uuid.uuid4()), key, name)
+        _jobs[job.uid] = job
+        _in_flight[key] = job.uid
+        _get_executor().submit(_run, job, write_function)
+        return job.uid
+
+
+def status(uid):
+    """ return status of the job
+
+    :type uid: str
+    :return: None if there is no job for the uid (or it was expired)
+    :rtype: dict
+    """
+    with _lock:
+        _remove_expired()
+        job = _jobs.get(uid, None)
+        return job.status() if job else None
+
+
+def result_path(uid):
+    """ return path of the workbook of the job
+
+    :type uid: str
+    :return: None if the job is not done
+    :rtype: str
+    """
+    with _lock:
+        job = _jobs.get(uid, None)
+        if not job or job.state != JOB_DONE:
+            return None
+    filepath = _result_path(uid)
+    return filepath if os.path.exists(filepath) else None
+
+
+def _run(job, write_function):
+    """
+    :type job: _Job
+    :type write_function: callable
+    """
+    with _lock:
+        job.state = JOB_RUNNING
+        job.started = time.time()
+
+    filepath = _result_path(job.uid)
+    tmp_filepath = os.path.join(os.path.dirname(filepath), '.%s' % os.path.basename(filepath))
+    try:
+        write_function(tmp_filepath)
+        os.rename(tmp_filepath, filepath)
+        state, error = JOB_DONE, None
+    except Exception as ex:
+        getLogger(__name__).warning('fail to run MOE job (%s) : %s' % (job.name, tb.traceback(ex, f_print=False)))
+        if os.path.exists(tmp_filepath):
+            os.remove(tmp_filepath)
+        state, error = JOB_FAILED, str(ex)
+
+    with _lock:
+        job.state = state
+        job.error = error
+        job.finished = time.time()
+        if _in_flight.get(job.key, None) == job.uid:
+            del _in_flight[job.key]
+
+
+def _remove_expired():
+    """ remove finished jobs and their workbooks after the retention time (called in `_lock`) """
+    expired = time.time() - cfg.MOE_RESULT_RETENTION_TIME
+    for uid in [uid for uid, job in _jobs.items() if job.finished and job.finished < expired]:
+        del _jobs[uid]
+        filepath = _result_path(uid)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def _remove_old_files():
+    """ remove workbooks left by the previous server process """
+    expired = time.time() - cfg.MOE_RESULT_RETENTION_TIME
+    tmp_dir = _tmp_dir()
+    for name in os.listdir(tmp_dir):
+        filepath = os.path.join(tmp_dir, name)
+        try:
+            if name.endswith('.xlsx') and os.path.getmtime(filepath) < expired:
+                os.remove(filepath)
+        except OSError:
+            pass
+
+
+def _get_executor():
+    """
+    :rtype: concurrent.futures.ThreadPoolExecutor
+    """
+    global _executor
+    if _executor is None:
+        _remove_old_files()
+        _executor = concurrent.futures.ThreadPoolExecutor(max_workers=cfg.N_MOE_WORKERS)
+    return _executor
+
+
+def _result_path(uid):
+    """
+    :type uid: str
+    :rtype: str
+    """
+    return os.path.join(_tmp_dir(), '%s.xlsx' % uid)
+
+
+def _tmp_dir():
+    """
+    :rtype: str
+    """
+    return Infra.get_infra().get_path('moe_tmp', create=True)
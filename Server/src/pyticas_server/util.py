@@ -63,3 +63,5 @@ def route_setup(r):
                 ns.node2.corridor = infra.get_corridor_by_name(ns.node2.corridor)
             except AttributeError as ex:
                 raise ex
+
+        r.invalidate_detector_checker()
@@ -15,6 +15,7 @@ from flask import request, send_from_directory
 
 from pyticas.tool import json
 from pyticas_server import protocol as prot
+from pyticas_tetres import admin_auth
 from pyticas_tetres import api_urls_user
 from pyticas_tetres.est import workers
 from pyticas_tetres.est.helper import util
@@ -34,7 +35,9 @@ def register_api(app):
         if not hasattr(eparam, 'oc_param'):
             return prot.response_invalid_request(message="Invalid Request (no oc_param)")
 
-        uid = workers.estimate(route_ids, eparam)
+        priority = _priority(request.form.get('priority', None))
+
+        uid = workers.estimate(route_ids, eparam, user=request.remote_addr, priority=priority)
 
         return prot.response_success({'uid': uid})
 
@@ -44,6 +47,17 @@ def register_api(app):
         if not uid:
             return prot.response_error('invalid request')
 
+        job_status = workers.status(uid)
+        if job_status and job_status['state'] == workers.JOB_CANCELLED:
+            return prot.response_error('cancelled')
+
+        if job_status and job_status['state'] == workers.JOB_FAILED:
+            return prot.response_error('failed')
+
+        # result file is being packed
+        if job_status and job_status['state'] != workers.JOB_DONE:
+            return prot.response_fail('process is running')
+
         output_path = util.output_path(uid, create=False)
         output_filepath = '%s.zip' % output_path
 
@@ -59,6 +73,36 @@ def register_api(app):
         else:
             return prot.response_error('invalid uid')
 
+    @app.route(api_urls_user.ESTIMATION_STATUS, methods=['POST'])
+    def tetres_user_get_status():
+        uid = request.form.get('uid')
+        if not uid:
+            return prot.response_error('invalid request')
+
+        job_status = workers.status(uid)
+        if not job_status:
+            return prot.response_error('invalid uid')
+
+        return prot.response_success(job_status)
+
+    @app.route(api_urls_user.ESTIMATION_CANCEL, methods=['POST'])
+    def tetres_user_cancel():
+        uid = request.form.get('uid')
+        if not uid:
+            return prot.response_error('invalid request')
+
+        job_status = workers.status(uid)
+        if not job_status:
+            return prot.response_error('invalid uid')
+
+        if job_status['user'] != request.remote_addr:
+            return prot.response_fail('not allowed')
+
+        if not workers.cancel(uid):
+            return prot.response_fail('process is finished already')
+
+        return prot.response_success('cancelled')
+
     @app.route(api_urls_user.ESTIMATION_DOWNLOAD, methods=['GET'])
     def tetres_user_download():
         uid = request.args.get('uid')
@@ -75,6 +119,25 @@ def register_api(app):
         return send_from_directory(directory=output_dir_path, filename='%s.zip' % uid)
 
 
+def _priority(value):
+    """ return priority of the estimation request from the client value
+
+    - the value is clamped to `PRIORITY_HIGH` ~ `PRIORITY_LOW`,
+      and priority higher than `PRIORITY_NORMAL` is allowed only for administrator
+    - `PRIORITY_NORMAL` is used if the value is not given or invalid
+
+    :type value: str
+    :rtype: int
+    """
+    try:
+        priority = int(value)
+    except (TypeError, ValueError):
+        return workers.PRIORITY_NORMAL
+
+    highest = workers.PRIORITY_HIGH if admin_auth.check_auth() else workers.PRIORITY_NORMAL
+    return min(max(priority, highest), workers.PRIORITY_LOW)
+
+
 def fix_operating_condition_info(params):
     import json
     json_params = json.loads(params)
@@ -12,6 +12,7 @@ import json as python_json
 from flask import request
 from pyticas_server import protocol as prot
 from pyticas_tetres.da.actionlog import ActionLogDataAccess
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.util import actionlog
 from pyticas_tetres import admin_auth
 
@@ -266,6 +267,9 @@ class TeTRESApi(object):
         if not da_instance.commit():
             return prot.response_fail("fail to delete items")
 
+        # links between travel time data and the deleted data are deleted by cascade
+        self.invalidate_result_cache(deleted_objs)
+
         callback = getattr(self, 'on_delete_success', None)
         if callback:
             callback(deleted_objs, da_instance.get_session())
@@ -283,6 +287,32 @@ class TeTRESApi(object):
 
         return prot.response_success(ids)
 
+    def invalidate_result_cache(self, deleted_objs):
+        """ invalidate cached estimation results that were made with the deleted data
+
+        - the period of the deleted data is used if it has `start_time` and `end_time`
+          (`lane_lost_time` and `lane_regain_time` for snow management), otherwise the whole period
+        - routes affected by the deleted data can not be found after the links are deleted,
+          so cached results of all routes are invalidated except for travel time routes
+
+        :type deleted_objs: list[pyticas_tetres.ttypes.InfoBase]
+        """
+        for obj in deleted_objs:
+            if self.datatype == ActionLogDataAccess.DT_TTROUTE:
+                route_ids = [obj.id]
+            elif self.datatype == ActionLogDataAccess.DT_ROUTE_WISE_MOE_PARAMETERS and obj.reference_tt_route_id:
+                route_ids = [obj.reference_tt_route_id]
+            else:
+                route_ids = None
+
+            sdt, edt = None, None
+            for (sattr, eattr) in [('start_time', 'end_time'), ('lane_lost_time', 'lane_regain_time')]:
+                if getattr(obj, sattr, None) and getattr(obj, eattr, None):
+                    sdt, edt = getattr(obj, sattr), getattr(obj, eattr)
+                    break
+
+            result_cache.invalidate(route_ids, sdt, edt)
+
     def years(self):
         if self.requires_auth and not admin_auth.check_auth():
             return admin_auth.authenticate()
@@ -5,3 +5,5 @@ ROUTE_LIST = '/tetres/user/route/list'
 ESTIMATION = '/tetres/user/estimation'
 ESTIMATION_RESULT = '/tetres/user/result'
 ESTIMATION_DOWNLOAD = '/tetres/user/download'
+ESTIMATION_STATUS = '/tetres/user/status'
+ESTIMATION_CANCEL = '/tetres/user/cancel'
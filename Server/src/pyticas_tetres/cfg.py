@@ -25,8 +25,16 @@ for ip in ip_list:
     if ip:
         ADMIN_IP_ADDRESSES.append(ip)
 
-# Number of Workers for Estimation
-N_WORKERS_FOR_USER_CLIENT = 2
+# Number of Workers for Estimation (auto-sized by the number of CPUs if None)
+N_WORKERS_FOR_USER_CLIENT = None
+
+# Number of Processes for each Estimation Worker to Extract Travel Time Data
+# (monthly partitions are queried in parallel, or queried in the estimation worker if 1)
+N_PROCESSES_FOR_TT_EXTRACTION = 4
+
+# Number of Processes for Daily Travel Time Calculation
+# (routes are calculated in spawned processes and saved by the current process, or calculated in it if 1)
+N_PROCESSES_FOR_TT_CALCULATION = 4
 
 # Data Interval (Do not change this)
 TT_DATA_INTERVAL = 300
@@ -2,6 +2,9 @@
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
 import datetime
+import io
+import math
+import numbers
 
 from sqlalchemy import or_, and_
 from sqlalchemy.orm.exc import NoResultFound
@@ -445,6 +448,152 @@ class DataAccessBase(object):
                 tb.traceback(ex)
             return False
 
+    def copy_insert(self, dict_list, **kwargs):
+        """ same as ``bulk_insert()``, but data are loaded with `COPY` (faster for large data)
+
+        :type dict_list: list[dict]
+        :rtype: Union(list[int], False)
+        """
+        print_exception = kwargs.get('print_exception', DEFAULT_PRINT_EXCEPTION)
+        if not dict_list:
+            return []
+
+        ids = []
+        pk = self.get_next_pk()
+        for idx, data in enumerate(dict_list):
+            data['id'] = pk + idx
+            ids.append(pk + idx)
+        try:
+            self._copy(self._raw_cursor(), self.dbModel.__table__.name, _columns_of(dict_list), dict_list)
+            return ids
+        except Exception as ex:
+            if print_exception:
+                tb.traceback(ex)
+            return False
+
+    def bulk_upsert(self, dict_list, constraint, update_columns=None, **kwargs):
+        """ insert data or update the existing data violating the given unique constraint
+
+        - data are loaded into a temporary table with `COPY`
+          and merged into the table with `INSERT ... ON CONFLICT ... DO UPDATE`
+        - new data get ids in the same way as ``bulk_insert()`` and the existing data keep their ids
+
+        :type dict_list: list[dict]
+        :param constraint: name of the unique constraint (e.g. `_tt_uc_2017`)
+        :type constraint: str
+        :param update_columns: columns to be updated for the existing data (default: all given columns)
+        :type update_columns: list[str]
+        :return: ids of the inserted and updated data
+        :rtype: Union(list[int], False)
+        """
+        print_exception = kwargs.get('print_exception', DEFAULT_PRINT_EXCEPTION)
+        if not dict_list:
+            return []
+
+        table_name = self.dbModel.__table__.name
+        staging_table_name = '_staging_%s' % table_name
+        columns = [c for c in _columns_of(dict_list) if c != self.primary_key]
+        update_columns = columns if update_columns is None else update_columns
+        column_names = ', '.join('"%s"' % c for c in columns)
+        if update_columns:
+            on_conflict = 'DO UPDATE SET %s' % ', '.join('"{0}" = EXCLUDED."{0}"'.format(c) for c in update_columns)
+        else:
+            on_conflict = 'DO NOTHING'
+        try:
+            cursor = self._raw_cursor()
+            cursor.execute('CREATE TEMP TABLE "{0}" ON COMMIT DROP AS SELECT {1} FROM "{2}" WITH NO DATA'.format(
+                staging_table_name, column_names, table_name))
+            self._copy(cursor, staging_table_name, columns, dict_list)
+            cursor.execute(('INSERT INTO "{0}" ("{1}", {2}) '
+                            'SELECT {3} + row_number() OVER (), {2} FROM "{4}" '
+                            'ON CONFLICT ON CONSTRAINT "{5}" {6} RETURNING "{1}"').format(
+                table_name, self.primary_key, column_names, self.get_next_pk() - 1,
+                staging_table_name, constraint, on_conflict))
+            ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute('DROP TABLE "%s"' % staging_table_name)
+            return ids
+        except Exception as ex:
+            if print_exception:
+                tb.traceback(ex)
+            return False
+
+    def bulk_update(self, dict_list, **kwargs):
+        """ update data with one `UPDATE ... FROM (VALUES ...)` query
+
+        :param dict_list: list of dict that has the primary key and the values to be updated
+        :type dict_list: list[dict]
+        :rtype: bool
+        """
+        print_exception = kwargs.get('print_exception', DEFAULT_PRINT_EXCEPTION)
+        if not dict_list:
+            return True
+
+        table = self.dbModel.__table__
+        columns = [c for c in _columns_of(dict_list) if c != self.primary_key]
+        all_columns = [self.primary_key] + columns
+        values = ', '.join('(%s)' % ', '.join(_to_sql_literal(data.get(c, None)) for c in all_columns)
+                           for data in dict_list)
+        dialect = self.session.get_bind().dialect
+        set_clause = ', '.join('"{0}" = CAST(v."{0}" AS {1})'.format(c, table.c[c].type.compile(dialect=dialect))
+                               for c in columns)
+        try:
+            self._raw_cursor().execute(
+                'UPDATE "{0}" AS t SET {1} FROM (VALUES {2}) AS v ({3}) WHERE t."{4}" = v."{4}"'.format(
+                    table.name, set_clause, values, ', '.join('"%s"' % c for c in all_columns), self.primary_key))
+            return True
+        except Exception as ex:
+            if print_exception:
+                tb.traceback(ex)
+            return False
+
+    def chunks(self, sql, chunk_size=1000):
+        """ read the result of the given query in chunks with a server-side cursor
+
+        - the cursor is opened in a separated connection,
+          so that data can be updated and committed in the session while reading
+
+        :type sql: str
+        :type chunk_size: int
+        :rtype: collections.Iterable[list[tuple]]
+        """
+        cursor_name = '_chunks_%s' % self.dbModel.__table__.name
+        raw_connection = conn.engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            cursor.execute('DECLARE "%s" NO SCROLL CURSOR FOR %s' % (cursor_name, sql))
+            while True:
+                cursor.execute('FETCH FORWARD %d FROM "%s"' % (chunk_size, cursor_name))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                yield rows
+            cursor.execute('CLOSE "%s"' % cursor_name)
+        finally:
+            raw_connection.rollback()
+            raw_connection.close()
+
+    def _raw_cursor(self):
+        """ returns DB-API cursor of the connection used in the current transaction of the session """
+        return self.session.connection().connection.cursor()
+
+    def _copy(self, cursor, table_name, columns, dict_list):
+        """ load data into the table with `COPY ... FROM STDIN`
+
+        :type table_name: str
+        :type columns: list[str]
+        :type dict_list: list[dict]
+        """
+        stream = io.BytesIO(''.join(
+            ','.join(_to_csv_value(data.get(c, None)) for c in columns) + '\n' for data in dict_list
+        ).encode('utf-8'))
+        sql = 'COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (table_name, ', '.join('"%s"' % c for c in columns))
+        if hasattr(cursor, 'copy_expert'):
+            # psycopg2
+            cursor.copy_expert(sql, stream)
+        else:
+            # pg8000
+            cursor.execute(sql, stream=stream)
+
     def transaction_start(self):
         if self.session.transaction is None:
             self.session.begin_nested()
@@ -454,3 +603,59 @@ class DataAccessBase(object):
 
     def close(self):
         self.session.close()
+
+
+def _columns_of(dict_list):
+    """ returns column names of the data in the order of appearance
+
+    :type dict_list: list[dict]
+    :rtype: list[str]
+    """
+    columns = []
+    for data in dict_list:
+        for c in data.keys():
+            if c not in columns:
+                columns.append(c)
+    return columns
+
+
+def _to_sql_literal(value):
+    """ returns a value as SQL literal
+
+    :rtype: str
+    """
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        if math.isnan(value):
+            return "'NaN'::float8"
+        if math.isinf(value):
+            return "'Infinity'::float8" if value > 0 else "'-Infinity'::float8"
+        return repr(value)
+    return "'%s'" % str(value).replace("'", "''")
+
+
+def _to_csv_value(value):
+    """ returns a value in the CSV format of `COPY` (unquoted empty string is NULL)
+
+    :rtype: str
+    """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, numbers.Integral):
+        return str(int(value))
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return 'Infinity' if value > 0 else '-Infinity'
+        return repr(value)
+    return '"%s"' % str(value).replace('"', '""')
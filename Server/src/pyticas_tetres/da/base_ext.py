@@ -61,9 +61,42 @@ class ExtDataAccessBase(DataAccessBase):
                 data_list.append(model_data)
         return data_list
 
+    def list_columns(self, ttri_id, prd, columns, **kwargs):
+        """ return values of the given columns of the data linked to the travel time data during the given period
+
+        - rows are (tt_id, <id of external data>, <values of the given columns>...) and ordered by id
+        - filtering arguments are same as ``TravelTimeDataAccess.list_by_period()``
+
+        :type ttri_id: int
+        :type prd: pyticas.ttypes.Period
+        :type columns: list[str]
+        :rtype: list[tuple]
+        """
+        tt_ids = self.ttDA.ids_by_period(ttri_id, prd, **kwargs)
+        qry = (self.session.query(self.dbModel.tt_id, getattr(self.dbModel, self.dbModel.oc_field),
+                                  *[getattr(self.dbModel, col) for col in columns])
+               .filter(self.dbModel.tt_id.in_(tt_ids.subquery()))
+               .order_by(self.dbModel.id))
+        return [tuple(row) for row in qry]
+
+    def ext_models(self, ids, chunk_size=1000):
+        """ return external data models (e.g. incident, workzone) of the given ids
+
+        :type ids: collections.Iterable[int]
+        :type chunk_size: int
+        :rtype: dict[int, object]
+        """
+        ids = sorted(set(ids))
+        res = {}
+        for idx in range(0, len(ids), chunk_size):
+            for m in self.session.query(self.extModel).filter(self.extModel.id.in_(ids[idx:idx + chunk_size])):
+                res[m.id] = m
+        return res
+
     def delete_range(self, ttri_id, sdt, edt, **kwargs):
         """
-        :type ttri_id: int
+        :param ttri_id: route id or list of route ids
+        :type ttri_id: int or list[int]
         :type sdt: datetime.datetime
         :type edt: datetime.datetime
         """
@@ -71,8 +104,13 @@ class ExtDataAccessBase(DataAccessBase):
         item_ids = kwargs.get('item_ids', None)
 
         try:
+            if isinstance(ttri_id, (list, tuple, set)):
+                route_cond = self.ttModel.route_id.in_(list(ttri_id))
+            else:
+                route_cond = self.ttModel.route_id == ttri_id
+
             tt_ids = (self.session.query(self.ttModel.id)
-                      .filter(self.ttModel.route_id == ttri_id)
+                      .filter(route_cond)
                       .filter(self.ttModel.time <= edt)
                       .filter(self.ttModel.time >= sdt))
 
@@ -56,6 +56,23 @@ class DataAccess(object):
         """
         return self.da_base.bulk_insert(dict_list, **kwargs)
 
+    def copy_insert(self, dict_list, **kwargs):
+        """ same as ``bulk_insert()``, but data are loaded with `COPY`
+
+        :type dict_list: list[dict]
+        :rtype: Union(list[int], False)
+        """
+        return self.da_base.copy_insert(dict_list, **kwargs)
+
+    def bulk_update(self, dict_list, **kwargs):
+        """ update data with one query
+
+        :param dict_list: list of dict that has `id` and the values to be updated
+        :type dict_list: list[dict]
+        :rtype: bool
+        """
+        return self.da_base.bulk_update(dict_list, **kwargs)
+
     def transaction_start(self):
         return self.da_base.transaction_start()
 
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, asc
 
 from pyticas_tetres.db.tetres import model_yearly
 from pyticas.tool import tb
@@ -41,6 +41,32 @@ class NoaaWeatherDataAccess(DataAccess):
             data_list.append(self.da_base.to_info(model_data))
         return data_list
 
+    def list_by_stations(self, stations, prd):
+        """ return weather data of the given stations with one query
+
+        :param stations: list of (usaf, wban)
+        :type stations: list[(str, str)]
+        :type prd: pyticas.ttypes.Period
+        :return: weather data of each station ordered by time, {(usaf, wban) : list of weather data}
+        :rtype: dict[(str, str), list[NoaaWeatherInfo]]
+        """
+        res = {(usaf, wban): [] for (usaf, wban) in stations}
+        if not stations:
+            return res
+
+        dbModel = self.da_base.dbModel
+        qry = (self.da_base.session.query(dbModel)
+               .filter(or_(*[and_(dbModel.usaf == usaf, dbModel.wban == wban) for (usaf, wban) in stations]))
+               .filter(dbModel.dtime <= prd.end_date)
+               .filter(dbModel.dtime >= prd.start_date)
+               .order_by(asc(dbModel.dtime)))
+
+        station_keys = {(str(usaf), str(wban)): (usaf, wban) for (usaf, wban) in stations}
+        for model_data in qry:
+            wi = self.da_base.to_info(model_data)
+            res[station_keys[(str(wi.usaf), str(wi.wban))]].append(wi)
+        return res
+
     def get_by_id(self, id):
         """
         :type id: int
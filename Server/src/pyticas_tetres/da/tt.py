@@ -17,6 +17,7 @@ from pyticas_tetres.ttypes import TravelTimeInfo
 class TravelTimeDataAccess(DataAccess):
     def __init__(self, year, **kwargs):
         super().__init__(**kwargs)
+        self.year = year
         self.da_base = DataAccessBase(model_yearly.get_tt_table(year), TravelTimeInfo,
                                       **kwargs)
 
@@ -113,36 +114,14 @@ class TravelTimeDataAccess(DataAccess):
         """
         :type ttr_id: int
         :type prd: pyticas.ttypes.Period
+        :param route_ids: list of route ids (used when `ttr_id` is not given)
         :rtype: list[pyticas_tetres.ttypes.TravelTimeInfo]
         """
-        weekdays = kwargs.get('weekdays', None)
-        window_size = kwargs.get('window_size', 1000)
-        start_time = kwargs.get('start_time', None)
-        end_time = kwargs.get('end_time', None)
         as_model = kwargs.get('as_model', False)
         order_by = kwargs.get('order_by', None)
         limit = kwargs.get('limit', None)
 
-        sfield, sdt = 'time', prd.start_date
-        efield, edt = 'time', prd.end_date
-
-        qry = self.da_base.session.query(self.da_base.dbModel)
-
-        if ttr_id:
-            qry = qry.filter(self.da_base.dbModel.route_id == ttr_id)
-
-        if sdt:
-            qry = qry.filter(self.da_base.dbModel.time <= edt)
-
-        if edt:
-            qry = qry.filter(self.da_base.dbModel.time >= sdt)
-
-        if weekdays:
-            qry = qry.filter(extract('dow', self.da_base.dbModel.time).in_(weekdays))
-
-        if start_time and end_time:
-            qry = qry.filter(cast(self.da_base.dbModel.time, Time) >= start_time).filter(
-                cast(self.da_base.dbModel.time, Time) <= end_time)
+        qry = self._filter_by_period(self.da_base.session.query(self.da_base.dbModel), ttr_id, prd, **kwargs)
 
         if order_by and isinstance(order_by, tuple):
             # e.g. order_by = ('id', 'desc')
@@ -163,6 +142,65 @@ class TravelTimeDataAccess(DataAccess):
                 data_list.append(self.da_base.to_info(model_data))
         return data_list
 
+    def columns_by_period(self, ttr_id, prd, columns, **kwargs):
+        """ return values of the given columns without creating DB model objects (ordered by time)
+
+        - filtering arguments are same as ``list_by_period()``
+
+        :type ttr_id: int
+        :type prd: pyticas.ttypes.Period
+        :type columns: list[str]
+        :rtype: list[tuple]
+        """
+        dbModel = self.da_base.dbModel
+        qry = self.da_base.session.query(*[getattr(dbModel, col) for col in columns])
+        qry = self._filter_by_period(qry, ttr_id, prd, **kwargs).order_by(asc(dbModel.time))
+        return [tuple(row) for row in qry]
+
+    def ids_by_period(self, ttr_id, prd, **kwargs):
+        """ return query for ids of the travel time data (filtering arguments are same as ``list_by_period()``)
+
+        :type ttr_id: int
+        :type prd: pyticas.ttypes.Period
+        :rtype: sqlalchemy.orm.Query
+        """
+        return self._filter_by_period(self.da_base.session.query(self.da_base.dbModel.id), ttr_id, prd, **kwargs)
+
+    def _filter_by_period(self, qry, ttr_id, prd, **kwargs):
+        """
+        :type qry: sqlalchemy.orm.Query
+        :type ttr_id: int
+        :type prd: pyticas.ttypes.Period
+        :rtype: sqlalchemy.orm.Query
+        """
+        weekdays = kwargs.get('weekdays', None)
+        route_ids = kwargs.get('route_ids', None)
+        start_time = kwargs.get('start_time', None)
+        end_time = kwargs.get('end_time', None)
+
+        sfield, sdt = 'time', prd.start_date
+        efield, edt = 'time', prd.end_date
+
+        if ttr_id:
+            qry = qry.filter(self.da_base.dbModel.route_id == ttr_id)
+        elif route_ids:
+            qry = qry.filter(self.da_base.dbModel.route_id.in_(route_ids))
+
+        if sdt:
+            qry = qry.filter(self.da_base.dbModel.time <= edt)
+
+        if edt:
+            qry = qry.filter(self.da_base.dbModel.time >= sdt)
+
+        if weekdays:
+            qry = qry.filter(extract('dow', self.da_base.dbModel.time).in_(weekdays))
+
+        if start_time and end_time:
+            qry = qry.filter(cast(self.da_base.dbModel.time, Time) >= start_time).filter(
+                cast(self.da_base.dbModel.time, Time) <= end_time)
+
+        return qry
+
     def get_by_id(self, id):
         """
         :type id: int
@@ -209,6 +247,17 @@ class TravelTimeDataAccess(DataAccess):
                 tb.traceback(ex)
             return False
 
+    def bulk_upsert(self, dict_list, update_columns=None, **kwargs):
+        """ insert travel time data or update the existing data of the same route and time
+
+        :type dict_list: list[dict]
+        :param update_columns: columns to be updated for the existing data (default: all given columns)
+        :type update_columns: list[str]
+        :return: ids of the inserted and updated data
+        :rtype: Union(list[int], False)
+        """
+        return self.da_base.bulk_upsert(dict_list, '_tt_uc_%d' % self.year, update_columns, **kwargs)
+
     def insert(self, tti, **kwargs):
         """
         :type tti: TravelTimeInfo
@@ -225,6 +274,37 @@ class TravelTimeDataAccess(DataAccess):
         """
         return self.da_base.search_date_range(('time', sdt), ('time', edt))
 
+    def meta_data_chunks(self, sdt, edt, route_ids=None, chunk_size=1000):
+        """ read `id` and `meta_data` of travel time data in chunks with a server-side cursor
+
+        :type sdt: datetime.datetime
+        :type edt: datetime.datetime
+        :type route_ids: list[int]
+        :type chunk_size: int
+        :rtype: collections.Iterable[list[(int, str)]]
+        """
+        return self.da_base.chunks('SELECT id, meta_data FROM "%s" WHERE %s ORDER BY route_id, time' % (
+            self.get_tablename(), self._meta_data_condition(sdt, edt, route_ids)), chunk_size)
+
+    def get_meta_data_count(self, sdt, edt, route_ids=None):
+        """ returns number of travel time data that have meta data
+
+        :type sdt: datetime.datetime
+        :type edt: datetime.datetime
+        :type route_ids: list[int]
+        :rtype: int
+        """
+        qry = 'SELECT count(*) FROM "%s" WHERE %s' % (self.get_tablename(),
+                                                      self._meta_data_condition(sdt, edt, route_ids))
+        return self.execute(qry).scalar()
+
+    def _meta_data_condition(self, sdt, edt, route_ids):
+        cond = "meta_data IS NOT NULL AND time >= '%s' AND time <= '%s'" % (
+            sdt.strftime('%Y-%m-%d %H:%M:%S'), edt.strftime('%Y-%m-%d %H:%M:%S'))
+        if route_ids:
+            cond += ' AND route_id IN (%s)' % ', '.join(str(int(v)) for v in route_ids)
+        return cond
+
     def get_count(self, route_id, sdt, edt):
         """
 
@@ -27,6 +27,22 @@ class TTIncidentDataAccess(DataAccess):
         """
         return self.da_base.list(ttri_id, sdt, edt, **kwargs)
 
+    def list_columns(self, ttri_id, prd, columns, **kwargs):
+        """
+        :type ttri_id: int
+        :type prd: pyticas.ttypes.Period
+        :type columns: list[str]
+        :rtype: list[tuple]
+        """
+        return self.da_base.list_columns(ttri_id, prd, columns, **kwargs)
+
+    def ext_models(self, ids):
+        """
+        :type ids: collections.Iterable[int]
+        :rtype: dict[int, object]
+        """
+        return self.da_base.ext_models(ids)
+
     def get_by_id(self, id):
         """
         :type id: int
@@ -36,7 +52,7 @@ class TTIncidentDataAccess(DataAccess):
 
     def delete_range(self, ttri_id, sdt, edt, **kwargs):
         """
-        :type ttri_id: int
+        :type ttri_id: int or list[int]
         :type sdt: datetime.datetime
         :type edt: datetime.datetime
         """
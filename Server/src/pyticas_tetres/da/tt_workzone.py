@@ -77,6 +77,22 @@ class TTWorkZoneDataAccess(DataAccess):
 
         return ttwzs, features, lncfgs
 
+    def list_columns(self, ttri_id, prd, columns, **kwargs):
+        """
+        :type ttri_id: int
+        :type prd: pyticas.ttypes.Period
+        :type columns: list[str]
+        :rtype: list[tuple]
+        """
+        return self.da_base.list_columns(ttri_id, prd, columns, **kwargs)
+
+    def ext_models(self, ids):
+        """
+        :type ids: collections.Iterable[int]
+        :rtype: dict[int, object]
+        """
+        return self.da_base.ext_models(ids)
+
     def get_by_id(self, id):
         """
         :type id: int
@@ -86,7 +102,7 @@ class TTWorkZoneDataAccess(DataAccess):
 
     def delete_range(self, ttri_id, sdt, edt, **kwargs):
         """
-        :type ttri_id: int
+        :type ttri_id: int or list[int]
         :type sdt: datetime.datetime
         :type edt: datetime.datetime
         """
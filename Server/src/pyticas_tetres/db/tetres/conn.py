@@ -20,6 +20,9 @@ engine = None
 SESSIONS = {}
 """:type: dict[str, sqlalchemy.orm.Session]"""
 
+DB_INFO = None
+""":type: dict """
+
 
 def get_session():
     """
@@ -29,14 +32,23 @@ def get_session():
     return Session()
 
 
-def connect(DB_INFO):
-    global Session, session, engine, connection
+def get_db_info():
+    """ return database information used to connect (e.g. to connect in another process)
+
+    :rtype: dict
+    """
+    return DB_INFO
+
+
+def connect(db_info):
+    global Session, session, engine, connection, DB_INFO
 
+    DB_INFO = db_info
     connectors = {
         'postgresql': postgresql_connector
     }
 
-    (engine, connection, Session) = connectors.get(DB_INFO['engine'], 'postgresql').connect(DB_INFO)
+    (engine, connection, Session) = connectors.get(db_info['engine'], 'postgresql').connect(db_info)
 
     model.Base.metadata.create_all(engine)
 
@@ -8,6 +8,8 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 import datetime
 import time
 
+import numpy as np
+
 from pyticas.tool import timeutil
 from pyticas_tetres.logger import getLogger
 
@@ -15,25 +17,55 @@ from pyticas_tetres import cfg
 from pyticas_tetres.rengine import extractor, reliability
 from pyticas_tetres.rengine.filter.ftypes import ExtFilterGroup, ExtData
 from pyticas_tetres.est.helper import util
-from pyticas_tetres.est import report, operating_condition as oc_filter_creator
+from pyticas_tetres.est import report, result_cache, operating_condition as oc_filter_creator
 import gc
 
-def estimate(eparam, uid=None):
+MINUTES_OF_DAY = 1440
+
+STAGE_RETRIEVING = 'retrieving data'
+STAGE_PREPARING = 'preparing data'
+STAGE_CALCULATING = 'calculating reliabilities'
+STAGE_WRITING = 'writing reports'
+ESTIMATION_STAGES = [STAGE_RETRIEVING, STAGE_PREPARING, STAGE_CALCULATING, STAGE_WRITING]
+
+
+def estimate(eparam, uid=None, progress=None, use_cache=True):
     """
     :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
     :type uid: str
+    :param progress: function called with the name of stage (one of `ESTIMATION_STAGES`) when each stage starts,
+                     estimation is stopped if the function raises an exception
+    :type progress: callable
+    :param use_cache: if True, the cached result of the same request is used (see `result_cache`)
+    :type use_cache: bool
     :rtype:
     """
     use_pause = False
+    progress = progress or (lambda stage: None)
+    estimation_start_time = time.time()
 
     if use_pause:
         a = input('Enter to continue (Starting Estimation): ')
 
     logger = getLogger(__name__)
+
+    if not uid:
+        uid = str(uuid.uuid4())
+
+    cache_key = result_cache.entry_key(eparam) if use_cache else None
+    if use_cache:
+        cache_entry = result_cache.get(eparam, key=cache_key)
+        if cache_entry:
+            logger.debug('>> Using the cached result (%s)' % cache_entry)
+            progress(STAGE_WRITING)
+            result_cache.restore(cache_entry, uid)
+            return
+
     # retrieve travel time and non-traffic data during the given time period
     # each filter-group represents a `regime` as operating condition
 
     proc_start_time = time.time()
+    progress(STAGE_RETRIEVING)
     logger.debug('>> Retrieving TT data from DB')
     operating_conditions = _retrieve_tt_data(eparam)
     logger.debug('<< End of retrieving TT data from DB (elapsed time=%s)' % (
@@ -60,6 +92,7 @@ def estimate(eparam, uid=None):
         mode_monthly = True
 
     proc_start_time = time.time()
+    progress(STAGE_PREPARING)
 
     logger.debug('>> Preparing Yearly-Monthly-Daily Data')
     _prepare_yearly_monthly_daily_data(eparam, operating_conditions)
@@ -67,6 +100,7 @@ def estimate(eparam, uid=None):
                     timeutil.human_time(seconds=(time.time() - proc_start_time))))
 
     proc_start_time = time.time()
+    progress(STAGE_CALCULATING)
     logger.debug('>> Calculate reliabilities for each operating condition')
 
     # estimate reliabilities
@@ -104,7 +138,7 @@ def estimate(eparam, uid=None):
             if mode_yearly:
                 proc_start_time3 = time.time()
                 logger.debug('>>>> calculate yearly reliabilities')
-                res_yearly, res_years = _calculate_reliabilities_by_ymd(eparam, oc.yearly_data)
+                res_yearly, res_years = _calculate_reliabilities_by_ymd(eparam, oc, 'Y')
                 yearly.append((res_yearly, res_years))
                 logger.debug('<<<< end of calculation of yearly reliabilities (elapsed time=%s, n=%d)' % (
                 timeutil.human_time(seconds=(time.time() - proc_start_time3)), len(res_yearly) if res_yearly else 0))
@@ -112,14 +146,14 @@ def estimate(eparam, uid=None):
             if mode_monthly:
                 proc_start_time3 = time.time()
                 logger.debug('>>>> calculate monthly reliabilities')
-                res_monthly, res_months = _calculate_reliabilities_by_ymd(eparam, oc.monthly_data)
+                res_monthly, res_months = _calculate_reliabilities_by_ymd(eparam, oc, 'M')
                 monthly.append((res_monthly, res_months))
                 logger.debug('<<<< end of calculation of monthly reliabilities (elapsed time=%s, n=%d)' % (
                 timeutil.human_time(seconds=(time.time() - proc_start_time3)), len(res_monthly) if res_monthly else 0))
 
             proc_start_time3 = time.time()
             logger.debug('>>>> calculate daily reliabilities')
-            res_daily, res_dates = _calculate_reliabilities_by_ymd(eparam, oc.daily_data)
+            res_daily, res_dates = _calculate_reliabilities_by_ymd(eparam, oc, 'D')
             daily.append((res_daily, res_dates))
             logger.debug('<<<< end of calculation of daily reliabilities (elapsed time=%s, n=%d)' % (
             timeutil.human_time(seconds=(time.time() - proc_start_time3)), len(res_daily) if res_daily else 0))
@@ -136,7 +170,7 @@ def estimate(eparam, uid=None):
             if mode_yearly:
                 proc_start_time3 = time.time()
                 logger.debug('>>>> calculate yearly TOD reliabilities')
-                res_tod_yearly = _calculate_reliabilities_tod_by_ymd(eparam, oc.all_years, oc.yearly_data)
+                res_tod_yearly = _calculate_reliabilities_tod_by_ymd(eparam, oc, oc.all_years, 'Y')
                 TOD_yearly.append(res_tod_yearly)
                 logger.debug('<<<< end of calculation of yearly TOD reliabilities (elapsed time=%s, n=%d)' % (
                 timeutil.human_time(seconds=(time.time() - proc_start_time3)), len(res_tod_yearly) if res_tod_yearly else 0))
@@ -144,7 +178,7 @@ def estimate(eparam, uid=None):
             if mode_monthly:
                 proc_start_time3 = time.time()
                 logger.debug('>>>> calculate monthly TOD reliabilities')
-                res_tod_monthly = _calculate_reliabilities_tod_by_ymd(eparam, oc.all_months, oc.monthly_data)
+                res_tod_monthly = _calculate_reliabilities_tod_by_ymd(eparam, oc, oc.all_months, 'M')
                 TOD_monthly.append(res_tod_monthly)
                 logger.debug('<<<< end of calculation of monthly TOD reliabilities (elapsed time=%s, n=%d)' % (
                 timeutil.human_time(seconds=(time.time() - proc_start_time3)), len(res_tod_monthly) if res_tod_monthly else 0))
@@ -160,14 +194,13 @@ def estimate(eparam, uid=None):
     if use_pause:
         c = input('Enter to continue (All Data Categorized): ')
 
-    # write result
-    if not uid:
-        uid = str(uuid.uuid4())
-
     # write graphs
-    report.write(uid, eparam, operating_conditions, (
-        whole, yearly, monthly, daily, TOD_whole, TOD_yearly, TOD_monthly
-    ))
+    progress(STAGE_WRITING)
+    results = (whole, yearly, monthly, daily, TOD_whole, TOD_yearly, TOD_monthly)
+    report.write(uid, eparam, operating_conditions, results)
+
+    if use_cache:
+        result_cache.put(eparam, uid, estimation_start_time, key=cache_key)
 
     del operating_conditions
     gc.collect()
@@ -210,13 +243,19 @@ def _retrieve_tt_data(eparam):
                          ext_filter_groups,
                          target_days=target_days,
                          remove_holiday=remove_holiday,
-                         except_dates=except_dates)
+                         except_dates=except_dates,
+                         columnar=True,
+                         n_processes=cfg.N_PROCESSES_FOR_TT_EXTRACTION,
+                         partition='month')
 
     return ext_filter_groups
 
 
 def _prepare_yearly_monthly_daily_data(eparam, operating_conditions):
-    """
+    """ set years, months, dates and times of the estimation period to the operating conditions
+
+    - data are grouped by year, month and day when reliabilities are calculated (see ``_ymd_keys()``)
+
     :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
     :type operating_conditions: list[pyticas_tetres.rengine.filter.ftypes.ExtFilterGroup]
     """
@@ -231,34 +270,6 @@ def _prepare_yearly_monthly_daily_data(eparam, operating_conditions):
         oc.all_months = all_months
         oc.all_dates = all_dates
         oc.all_times = all_times
-        if not oc.whole_data:
-            continue
-        prev_day = util.get_datetime(oc.whole_data[0].tti.time).date()
-        years, results, one_year_data, one_month_data, one_day_data = [], [], [], [], []
-
-        for ext_data in oc.whole_data:
-            cur_day = util.get_datetime(ext_data.tti.time).date()
-            if cur_day.year != prev_day.year:
-                oc.yearly_data.append((prev_day.year, one_year_data))
-                one_year_data = []
-            if cur_day.month != prev_day.month:
-                oc.monthly_data.append(([prev_day.year, prev_day.month], one_month_data))
-                one_month_data = []
-            if cur_day != prev_day:
-                oc.daily_data.append((prev_day, one_day_data))
-                one_day_data = []
-
-            prev_day = cur_day
-            one_year_data.append(ext_data)
-            one_month_data.append(ext_data)
-            one_day_data.append(ext_data)
-
-        if one_year_data:
-            oc.yearly_data.append((prev_day.year, one_year_data))
-        if one_month_data:
-            oc.monthly_data.append(([prev_day.year, prev_day.month], one_month_data))
-        if one_day_data:
-            oc.daily_data.append((prev_day, one_day_data))
 
 
 def _calculate_reliabilities_whole(eparam, oc):
@@ -267,26 +278,29 @@ def _calculate_reliabilities_whole(eparam, oc):
     :type oc: pyticas_tetres.rengine.filter.ftypes.ExtFilterGroup
     :rtype: dict
     """
-    return reliability.calculate(eparam.travel_time_route, oc.whole_data)
+    times, tts = _tt_data(oc)
+    return reliability.calculate_groups(eparam.travel_time_route, tts, np.zeros(len(tts), dtype=np.int64)).get(0, None)
 
 
-def _calculate_reliabilities_by_ymd(eparam, data_set):
+def _calculate_reliabilities_by_ymd(eparam, oc, unit):
     """
     :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
-    :type data_set: Union(list[(int, list[ExtData])],
-                          list[([int, int], list[ExtData])],
-                          list[(datetime.date, list[ExtData])])
+    :type oc: pyticas_tetres.rengine.filter.ftypes.ExtFilterGroup
+    :param unit: 'Y' (yearly), 'M' (monthly) or 'D' (daily)
+    :type unit: str
     :rtype: list[dict], list
     """
-    if not data_set:
+    times, tts = _tt_data(oc)
+    if not len(tts):
         return None, None
 
+    keys = _ymd_keys(times, unit)
+    grouped = reliability.calculate_groups(eparam.travel_time_route, tts, keys)
+
     results, ymds = [], []
-    for ymd, a_ymd_data in data_set:
-        if a_ymd_data:
-            res = reliability.calculate(eparam.travel_time_route, a_ymd_data)
-            results.append(res)
-            ymds.append(ymd)
+    for key in np.unique(keys):
+        results.append(grouped.get(int(key), None))
+        ymds.append(_ymd(int(key), unit))
 
     return results, ymds
 
@@ -297,47 +311,98 @@ def _calculate_reliabilities_tod_whole(eparam, oc):
     :type oc: pyticas_tetres.rengine.filter.ftypes.ExtFilterGroup
     :rtype: list[dict]
     """
-    results = []
-    for h, m, dt in _time_of_day_generator(eparam):
-        ext_datas = _extract_tod_data(oc.whole_data, h, m)
-        if ext_datas:
-            res = reliability.calculate(eparam.travel_time_route, ext_datas)
-            results.append(res)
-        else:
-            results.append(None)
-
-    return results
+    times, tts = _tt_data(oc)
+    grouped = reliability.calculate_groups(eparam.travel_time_route, tts, _tod_keys(times))
+    return [grouped.get(h * 60 + m, None) for h, m, dt in _time_of_day_generator(eparam)]
 
 
-def _calculate_reliabilities_tod_by_ymd(eparam, all_ymds, data_set):
+def _calculate_reliabilities_tod_by_ymd(eparam, oc, all_ymds, unit):
     """
     :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+    :type oc: pyticas_tetres.rengine.filter.ftypes.ExtFilterGroup
     :type all_ymds: Union(list[int], list[[int, int]])
-    :type data_set: Union(list[(int, list[ExtData])],
-                          list[([int, int], list[ExtData])],
-                          list[(datetime.date, list[ExtData])])
+    :param unit: 'Y' (yearly) or 'M' (monthly)
+    :type unit: str
     :rtype: list[list[dict]]
     """
+    times, tts = _tt_data(oc)
+    ymd_keys = _ymd_keys(times, unit)
+    grouped = reliability.calculate_groups(eparam.travel_time_route, tts, ymd_keys * MINUTES_OF_DAY + _tod_keys(times))
+    tod_keys = [h * 60 + m for h, m, dt in _time_of_day_generator(eparam)]
+    existing_keys = set(ymd_keys.tolist())
+
     results = []
     for ymd in all_ymds:
-        ext_data_list = None
-        for idx, (_ymd, _ext_data_list) in enumerate(data_set):
-            if _ymd == ymd:
-                ext_data_list = _ext_data_list
-                break
-        if ext_data_list:
-            a_ymd_results = []
-            for h, m, dt in _time_of_day_generator(eparam):
-                ext_datas = _extract_tod_data(ext_data_list, h, m)
-                res = reliability.calculate(eparam.travel_time_route, ext_datas)
-                a_ymd_results.append(res)
-            results.append(a_ymd_results)
+        ymd_key = _ymd_key(ymd, unit)
+        if ymd_key in existing_keys:
+            results.append([grouped.get(ymd_key * MINUTES_OF_DAY + tod_key, None) for tod_key in tod_keys])
         else:
             results.append(None)
 
     return results
 
 
+def _tt_data(oc):
+    """ return times and travel times of the operating condition
+
+    :type oc: pyticas_tetres.rengine.filter.ftypes.ExtFilterGroup
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    if oc.columns is not None and oc.rows is not None:
+        return oc.columns.times[oc.rows], oc.columns.values['tt'][oc.rows]
+    times = np.array([util.get_datetime(ext_data.tti.time) for ext_data in oc.whole_data], dtype='datetime64[s]')
+    tts = np.array([ext_data.tti.tt for ext_data in oc.whole_data], dtype=np.float64)
+    return times, tts
+
+
+def _ymd_keys(times, unit):
+    """
+    :type times: numpy.ndarray
+    :param unit: 'Y', 'M' or 'D'
+    :type unit: str
+    :return: years, months or days from 1970-01-01
+    :rtype: numpy.ndarray
+    """
+    return times.astype('datetime64[%s]' % unit).astype(np.int64)
+
+
+def _tod_keys(times):
+    """
+    :type times: numpy.ndarray
+    :return: minutes from midnight
+    :rtype: numpy.ndarray
+    """
+    return (times.astype('datetime64[m]') - times.astype('datetime64[D]')).astype(np.int64)
+
+
+def _ymd_key(ymd, unit):
+    """
+    :type ymd: Union(int, [int, int], datetime.date)
+    :type unit: str
+    :rtype: int
+    """
+    if unit == 'Y':
+        return int(np.datetime64('%04d' % ymd, 'Y').astype(np.int64))
+    if unit == 'M':
+        return int(np.datetime64('%04d-%02d' % (ymd[0], ymd[1]), 'M').astype(np.int64))
+    return int(np.datetime64(ymd, 'D').astype(np.int64))
+
+
+def _ymd(key, unit):
+    """ inverse of ``_ymd_key()``
+
+    :type key: int
+    :type unit: str
+    :rtype: Union(int, [int, int], datetime.date)
+    """
+    d = np.datetime64(key, unit).astype(datetime.date)
+    if unit == 'Y':
+        return d.year
+    if unit == 'M':
+        return [d.year, d.month]
+    return d
+
+
 def _time_of_day_generator(eparam):
     """
 
@@ -353,16 +418,3 @@ def _time_of_day_generator(eparam):
         h, m = cursor.hour, cursor.minute
         yield h, m, cursor
         cursor += step
-
-def _extract_tod_data(data_set, hour, minute):
-    """
-    :type data_set: list[ExtData]
-    :type hour: int
-    :type minute: int
-    :rtype: list[ExtData]
-    """
-    if not data_set:
-        return data_set
-
-    return [ext_data for ext_data in data_set
-            if (ext_data.tti.time.hour == hour and ext_data.tti.time.minute == minute)]
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+"""
+Estimation Result Cache Module
+==============================
+
+- results of estimation are cached for each route with the key of the canonicalized request
+  (`EstimationRequestInfo` except the route + route id + route configuration)
+- a cache entry has the output files of the route
+- the key of an entry includes `CACHE_VERSION`, so entries made by an older format are not used
+- the travel time calculation and categorization modules call `invalidate()` after writing data,
+  then the entries that were made from the data before the change are not used anymore
+
+    e.g.
+        entry = result_cache.get(eparam)
+        if entry:
+            result_cache.restore(entry, uid)
+        else:
+            started = time.time()
+            ... estimate and write reports ...
+            result_cache.put(eparam, uid, started)
+
+- structure of cache directory ::
+
+    tetres/output/.cache/
+        invalidated                     : invalidation log for all routes
+        <route id>/
+            invalidated                 : invalidation log for the route (`start date,end date,timestamp`)
+            <entry key>/
+                meta.json
+                output/<corridor> - <route name>/...
+
+"""
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+
+from pyticas.tool import json as tjson
+from pyticas.tool import tb
+from pyticas_tetres.est.helper import util
+from pyticas_tetres.logger import getLogger
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+# increase this when the output files or the estimation results are changed
+CACHE_VERSION = 2
+
+CACHE_DIR_NAME = '.cache'
+INVALIDATION_LOG_NAME = 'invalidated'
+META_FILE_NAME = 'meta.json'
+OUTPUT_DIR_NAME = 'output'
+
+# period for invalidation when the period of the changed data is unknown
+MIN_DATE = '0001-01-01'
+MAX_DATE = '9999-12-31'
+
+# attributes of `EstimationRequestInfo` that are not a part of the request
+EXCLUDED_ATTRS = ['travel_time_route', '_dbsession']
+
+
+def request_key(eparam, route_id):
+    """ return key of the estimation request for a route
+
+    :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+    :type route_id: int
+    :rtype: str
+    """
+    attrs = {k: v for k, v in eparam.__dict__.items() if k not in EXCLUDED_ATTRS}
+    canonical = tjson.dumps({'route_id': route_id, 'request': attrs}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+
+
+def entry_key(eparam):
+    """ return key of the cache entry (cache version + request key + route configuration)
+
+    :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+    :rtype: str
+    """
+    ttri = eparam.travel_time_route
+    route_json = tjson.dumps(ttri.route, sort_keys=True, separators=(',', ':'))
+    key = '%s:%s:%s:%s:%s' % (CACHE_VERSION, request_key(eparam, ttri.id), ttri.corridor, ttri.name, route_json)
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def get(eparam, key=None):
+    """ return path of the valid cache entry for the estimation request
+
+    :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+    :param key: entry key (see `entry_key()`)
+    :type key: str
+    :return: None if there is no valid entry
+    :rtype: str
+    """
+    entry_path = os.path.join(_cache_path(eparam.travel_time_route.id), key or entry_key(eparam))
+    meta = _read_meta(entry_path)
+    if not meta:
+        return None
+
+    if not _is_valid(meta):
+        shutil.rmtree(entry_path, ignore_errors=True)
+        return None
+
+    return entry_path
+
+
+def restore(entry_path, uid):
+    """ put output files of the cache entry into the output directory of `uid`
+
+    :type entry_path: str
+    :type uid: str
+    """
+    src_dir = os.path.join(entry_path, OUTPUT_DIR_NAME)
+    dest_dir = util.output_path(uid)
+    for name in os.listdir(src_dir):
+        dest = os.path.join(dest_dir, name)
+        if os.path.exists(dest):
+            shutil.rmtree(dest)
+        shutil.copytree(os.path.join(src_dir, name), dest, copy_function=_link_or_copy)
+
+
+def put(eparam, uid, started, key=None):
+    """ save output files of the estimation as a cache entry
+
+    :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+    :type uid: str
+    :param started: time when the estimation started (time in seconds since the epoch)
+    :type started: float
+    :param key: entry key (see `entry_key()`)
+    :type key: str
+    :rtype: bool
+    """
+    ttri = eparam.travel_time_route
+    meta = {'route_id': ttri.id,
+            'start_date': eparam.start_date,
+            'end_date': eparam.end_date,
+            'created': started}
+
+    # data has been changed during the estimation
+    if not _is_valid(meta):
+        return False
+
+    route_dir = '%s - %s' % (ttri.corridor, ttri.name)
+    output_dir = os.path.join(util.output_path(uid, create=False), route_dir)
+    if not os.path.exists(output_dir):
+        return False
+
+    cache_path = _cache_path(ttri.id)
+    entry_path = os.path.join(cache_path, key or entry_key(eparam))
+    tmp_path = os.path.join(cache_path, '.%s' % uuid.uuid4())
+    try:
+        shutil.copytree(output_dir, os.path.join(tmp_path, OUTPUT_DIR_NAME, route_dir), copy_function=_link_or_copy)
+        with open(os.path.join(tmp_path, META_FILE_NAME), 'w') as f:
+            json.dump(meta, f)
+
+        if os.path.exists(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+        os.rename(tmp_path, entry_path)
+        return True
+    except Exception as ex:
+        getLogger(__name__).warning('fail to save estimation result to cache : %s' % tb.traceback(ex, f_print=False))
+        return False
+    finally:
+        if os.path.exists(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def invalidate(route_ids, start_date, end_date):
+    """ invalidate cache entries whose period overlaps with the given period
+
+    - called after travel time data or categorized data of the routes are changed
+
+    :param route_ids: route ids (all routes if None)
+    :type route_ids: list[int]
+    :param start_date: start date of the period (the whole period if `start_date` and `end_date` are None)
+    :type start_date: Union(datetime.date, datetime.datetime, str)
+    :type end_date: Union(datetime.date, datetime.datetime, str)
+    """
+    sdate = _date_str(start_date) if start_date else MIN_DATE
+    edate = _date_str(end_date) if end_date else MAX_DATE
+    line = '%s,%s,%f\n' % (sdate, edate, time.time())
+    try:
+        if route_ids is None:
+            with open(os.path.join(_cache_path(), INVALIDATION_LOG_NAME), 'a') as f:
+                f.write(line)
+            route_dirs = [name for name in os.listdir(_cache_path()) if name.isdigit()]
+        else:
+            route_dirs = [str(route_id) for route_id in route_ids]
+            for route_dir in route_dirs:
+                with open(os.path.join(_cache_path(route_dir), INVALIDATION_LOG_NAME), 'a') as f:
+                    f.write(line)
+
+        # remove invalidated entries
+        for route_dir in route_dirs:
+            cache_path = _cache_path(route_dir)
+            for name in os.listdir(cache_path):
+                entry_path = os.path.join(cache_path, name)
+                meta = _read_meta(entry_path)
+                if meta and _overlaps(meta, sdate, edate):
+                    shutil.rmtree(entry_path, ignore_errors=True)
+    except Exception as ex:
+        getLogger(__name__).warning('fail to invalidate estimation result cache : %s' % tb.traceback(ex, f_print=False))
+
+
+def remove_expired(retention_time):
+    """ remove cache entries and invalidation logs older than `retention_time`
+
+    :param retention_time: in seconds
+    :type retention_time: int
+    """
+    expired = time.time() - retention_time
+    root_path = _cache_path()
+    _trim_invalidation_log(os.path.join(root_path, INVALIDATION_LOG_NAME), expired)
+    for route_dir in os.listdir(root_path):
+        cache_path = os.path.join(root_path, route_dir)
+        if not os.path.isdir(cache_path):
+            continue
+        _trim_invalidation_log(os.path.join(cache_path, INVALIDATION_LOG_NAME), expired)
+        for name in os.listdir(cache_path):
+            entry_path = os.path.join(cache_path, name)
+            if os.path.isdir(entry_path) and os.stat(entry_path).st_mtime < expired:
+                shutil.rmtree(entry_path, ignore_errors=True)
+
+
+def _is_valid(meta):
+    """ check if data of the entry have not been changed since the entry was made
+
+    :type meta: dict
+    :rtype: bool
+    """
+    for log_path in [os.path.join(_cache_path(), INVALIDATION_LOG_NAME),
+                     os.path.join(_cache_path(meta['route_id']), INVALIDATION_LOG_NAME)]:
+        for sdate, edate, invalidated in _read_invalidation_log(log_path):
+            if invalidated >= meta['created'] and _overlaps(meta, sdate, edate):
+                return False
+    return True
+
+
+def _overlaps(meta, sdate, edate):
+    """
+    :type meta: dict
+    :type sdate: str
+    :type edate: str
+    :rtype: bool
+    """
+    return _date_str(meta['start_date']) <= edate and sdate <= _date_str(meta['end_date'])
+
+
+def _read_meta(entry_path):
+    """
+    :type entry_path: str
+    :rtype: dict
+    """
+    filepath = os.path.join(entry_path, META_FILE_NAME)
+    if not os.path.exists(filepath):
+        return None
+    try:
+        with open(filepath, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _read_invalidation_log(log_path):
+    """
+    :type log_path: str
+    :rtype: list[(str, str, float)]
+    """
+    if not os.path.exists(log_path):
+        return []
+    res = []
+    with open(log_path, 'r') as f:
+        for line in f:
+            items = line.strip().split(',')
+            if len(items) == 3:
+                res.append((items[0], items[1], float(items[2])))
+    return res
+
+
+def _trim_invalidation_log(log_path, expired):
+    """
+    :type log_path: str
+    :type expired: float
+    """
+    logs = [log for log in _read_invalidation_log(log_path) if log[2] >= expired]
+    if not logs and os.path.exists(log_path):
+        os.remove(log_path)
+    elif logs:
+        with open(log_path, 'w') as f:
+            f.writelines(['%s,%s,%f\n' % log for log in logs])
+
+
+def _date_str(d):
+    """
+    :type d: Union(datetime.date, datetime.datetime, str)
+    :rtype: str
+    """
+    if isinstance(d, str):
+        return d[:10]
+    if isinstance(d, datetime.datetime):
+        d = d.date()
+    return d.strftime('%Y-%m-%d')
+
+
+def _link_or_copy(src, dst):
+    """ hard-link files instead of copying if possible """
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def _cache_path(route_id=None):
+    """
+    :type route_id: Union(int, str)
+    :rtype: str
+    """
+    if route_id is None:
+        return util.output_path(CACHE_DIR_NAME)
+    return util.output_path('%s/%s' % (CACHE_DIR_NAME, route_id))
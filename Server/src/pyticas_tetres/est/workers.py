@@ -1,4 +1,25 @@
 # -*- coding: utf-8 -*-
+"""
+Estimation Workers Module
+=========================
+
+- estimation requests (jobs) are scheduled in this process and the estimation of each route (task)
+  runs in a worker process
+- the next task is chosen by (priority, number of running tasks of the user, number of running tasks of the job,
+  request order), so that tasks of jobs and users are interleaved and a heavy multi-route job can not starve others
+- workers report progress as events (`ready`, `take`, `start`, `stage`, `done` and `exit`)
+- a job is done after the result files are packed into a zip file (or failed if packing fails)
+- if a job is waiting while all workers are busy with other jobs,
+  an extra worker is started (up to `max_workers`), and it exits after being idle for `WORKER_IDLE_TIMEOUT`
+- a job can be cancelled : pending tasks are removed and running tasks stop at the next estimation stage
+
+    e.g.
+        uid = workers.estimate(route_ids, eparam, user='127.0.0.1')
+        status = workers.status(uid)   # {'state': 'running', 'progress': 0.5, ...}
+        workers.cancel(uid)
+
+"""
+import collections
 import threading
 import time
 import uuid
@@ -6,69 +27,507 @@ import zipfile
 
 from pyticas.infra import Infra
 from pyticas.tool import tb
+from pyticas_tetres import cfg
 from pyticas_tetres.da.route import TTRouteDataAccess
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.est.helper import util
 from pyticas_tetres.logger import getLogger
 
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
 import os
-from multiprocessing import Process, Queue, Lock, Manager
+from multiprocessing import Process, Queue, Manager
 from pyticas_tetres.est import estimation
 from pyticas import ticas
 import shutil
 
 DEFAULT_NUMBER_OF_PROCESSES = 2
+MAX_NUMBER_OF_PROCESSES = 8
+WORKER_IDLE_TIMEOUT = 600  # extra workers exit after being idle (in seconds)
+RESULT_RETENTION_TIME = 7 * 86400  # results and job states are removed after 7 days (in seconds)
 VACCUM_IS_RUNNING = False
-WORKER_IS_RUNNING = False
 
-m = None
-queue = None
-shared_counters = None
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_CANCELLED = 'cancelled'
+JOB_FAILED = 'failed'
+
+TASK_DONE = 'done'
+TASK_FAILED = 'failed'
+TASK_CANCELLED = 'cancelled'
+
+scheduler = None
+""":type: Scheduler """
+
+
+class EstimationCancelled(Exception):
+    pass
+
+
+class Job(object):
+    def __init__(self, uid, route_ids, eparam, user, priority, seq):
+        """
+        :type uid: str
+        :type route_ids: list[int]
+        :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+        :type user: str
+        :type priority: int
+        :param seq: request order
+        :type seq: int
+        """
+        self.uid = uid
+        self.route_ids = list(route_ids)
+        self.eparam = eparam
+        self.user = user
+        self.priority = priority
+        self.seq = seq
+        self.state = JOB_QUEUED
+        self.pending = list(route_ids)
+        """:type: list[int] """
+        self.running = collections.OrderedDict()
+        """:type: dict[int, dict] """
+        self.keys = {route_id: result_cache.request_key(eparam, route_id) for route_id in route_ids}
+        """:type: dict[int, str] """
+        self.results = {}
+        """:type: dict[int, str] """
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    def is_finished(self):
+        """
+        :rtype: bool
+        """
+        return not self.pending and not self.running
+
+    def progress(self):
+        """ progress of the job (0 ~ 1)
+
+        :rtype: float
+        """
+        if not self.route_ids:
+            return 1.0
+        running = sum(task['stage_index'] / task['n_stages'] for task in self.running.values() if task['n_stages'])
+        return (len(self.results) + running) / len(self.route_ids)
+
+    def status(self, queue_position=None):
+        """
+        :param queue_position: number of jobs to be served before this job (None if nothing is pending)
+        :type queue_position: int
+        :rtype: dict
+        """
+        now = time.time()
+        tasks = []
+        for route_id, task in self.running.items():
+            stage_elapsed = dict(task['stage_elapsed'])
+            if task['stage']:
+                stage_elapsed[task['stage']] = now - task['stage_started']
+            tasks.append({'route_id': route_id,
+                          'stage': task['stage'],
+                          'stage_index': task['stage_index'],
+                          'n_stages': task['n_stages'],
+                          'elapsed': (now - task['started']) if task['started'] else 0,
+                          'stage_elapsed': stage_elapsed})
+
+        return {
+            'uid': self.uid,
+            'state': self.state,
+            'user': self.user,
+            'priority': self.priority,
+            'queue_position': queue_position,
+            'progress': self.progress(),
+            'n_routes': len(self.route_ids),
+            'n_pending': len(self.pending),
+            'n_running': len(self.running),
+            'n_done': len([r for r in self.results.values() if r == TASK_DONE]),
+            'n_failed': len([r for r in self.results.values() if r == TASK_FAILED]),
+            'running_tasks': tasks,
+            'wait_time': ((self.started or now) - self.created),
+            'elapsed_time': ((self.finished or now) - self.started) if self.started else 0,
+        }
+
+
+class Scheduler(object):
+    def __init__(self, n_workers, worker_args):
+        """
+        :param n_workers: number of worker processes (auto-sized if None or 0)
+        :type n_workers: int
+        :param worker_args: (data path, db info, cad db info, iris db info)
+        :type worker_args: tuple
+        """
+        self.base_workers = n_workers or _auto_number_of_processes()
+        self.max_workers = max(self.base_workers + 1, min(MAX_NUMBER_OF_PROCESSES, (os.cpu_count() or 1) // 2))
+        self.worker_args = worker_args
+
+        self.manager = Manager()
+        self.task_queue = self.manager.Queue()
+        self.event_queue = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+
+        self.cond = threading.Condition()
+        self.jobs = collections.OrderedDict()
+        """:type: dict[str, Job] """
+        self.workers = {}
+        """:type: dict[int, Process] """
+        self.worker_states = {}
+        """:type: dict[int, str] """  # 'starting', 'idle', 'busy' or 'stopping'
+        self.worker_tasks = {}
+        """:type: dict[int, (str, int)] """
+        self.user_running = collections.defaultdict(int)
+        self.running_keys = collections.Counter()  # request keys of running tasks
+        self.n_queued = 0  # tasks and stop signals put in the task queue, but not taken by workers yet
+        self.last_busy = time.time()
+        self._seq = 0
+        self._next_worker_id = 0
+
+    def start(self):
+        with self.cond:
+            for _ in range(self.base_workers):
+                self._start_worker()
+        for target in [self._dispatch_loop, self._event_loop]:
+            t = threading.Thread(target=target, daemon=True)
+            t.start()
+
+    def submit(self, route_ids, eparam, user=None, priority=PRIORITY_NORMAL):
+        """
+        :type route_ids: list[int]
+        :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+        :type user: str
+        :type priority: int
+        :rtype: str
+        """
+        uid = _get_uid()
+        with self.cond:
+            self._seq += 1
+            job = Job(uid, route_ids, eparam, user or '', priority, self._seq)
+            self.jobs[uid] = job
+            if job.is_finished():
+                self._finish(job)
+            self.cond.notify_all()
+        return uid
+
+    def cancel(self, uid):
+        """ cancel the job (running tasks are stopped at the next estimation stage)
+
+        :type uid: str
+        :rtype: bool
+        """
+        with self.cond:
+            job = self.jobs.get(uid, None)
+            if not job or job.finished or job.state in [JOB_DONE, JOB_CANCELLED, JOB_FAILED]:
+                return False
+            self.cancelled[uid] = True
+            job.state = JOB_CANCELLED
+            for route_id in job.pending:
+                job.results[route_id] = TASK_CANCELLED
+            job.pending = []
+            if job.is_finished():
+                self._finish(job)
+            self.cond.notify_all()
+        return True
+
+    def status(self, uid):
+        """
+        :type uid: str
+        :rtype: dict
+        """
+        with self.cond:
+            job = self.jobs.get(uid, None)
+            if not job:
+                return None
+            queue_position = None
+            if job.pending:
+                queue_position = [j.uid for j in sorted(self._waiting_jobs(), key=self._job_order)].index(uid)
+            return job.status(queue_position)
+
+    def remove_finished_jobs(self, older_than):
+        """
+        :param older_than: remove jobs finished before this time (time in seconds since the epoch)
+        :type older_than: float
+        """
+        with self.cond:
+            for uid in [uid for uid, job in self.jobs.items() if job.finished and job.finished < older_than]:
+                del self.jobs[uid]
+                self.cancelled.pop(uid, None)
+
+    def _waiting_jobs(self):
+        """
+        :rtype: list[Job]
+        """
+        return [job for job in self.jobs.values() if job.pending]
+
+    def _job_order(self, job):
+        """
+        :type job: Job
+        :rtype: tuple
+        """
+        return job.priority, self.user_running[job.user], len(job.running), job.seq
+
+    def _dispatch_loop(self):
+        logger = getLogger(__name__)
+        while True:
+            try:
+                with self.cond:
+                    self._check_workers()
+                    waiting_jobs = sorted(self._waiting_jobs(), key=self._job_order)
+                    next_task = self._next_task(waiting_jobs)
+                    n_available = self._n_workers('idle') - self.n_queued
+                    if next_task and n_available > 0:
+                        self._dispatch(*next_task)
+                        continue
+
+                    if (next_task and not self._n_workers('starting') and len(self.workers) < self.max_workers
+                            and any(not job.running for job in waiting_jobs)):
+                        # a job is waiting while all workers are busy with the other jobs
+                        logger.debug('[EST SCHEDULER] starting an extra worker')
+                        self._start_worker()
+
+                    elif (not waiting_jobs and n_available > 0 and len(self.workers) - self.n_queued > self.base_workers
+                          and time.time() - self.last_busy > WORKER_IDLE_TIMEOUT):
+                        # one of idle workers takes this and exits
+                        self.task_queue.put(None)
+                        self.n_queued += 1
+
+                    self.cond.wait(timeout=10)
+            except Exception as ex:
+                tb.traceback(ex)
+                time.sleep(1)
+
+    def _next_task(self, waiting_jobs):
+        """ return the first task whose result is not being estimated by another task
+
+        - the same request is dispatched after the running one finishes, and it uses the cached result
+
+        :type waiting_jobs: list[Job]
+        :rtype: (Job, int)
+        """
+        for job in waiting_jobs:
+            for route_id in job.pending:
+                if not self.running_keys[job.keys[route_id]]:
+                    return job, route_id
+        return None
+
+    def _dispatch(self, job, route_id):
+        """
+        :type job: Job
+        :type route_id: int
+        """
+        job.pending.remove(route_id)
+        self.running_keys[job.keys[route_id]] += 1
+        job.running[route_id] = {'stage': None, 'stage_index': 0, 'n_stages': len(estimation.ESTIMATION_STAGES),
+                                 'started': None, 'stage_started': None, 'stage_elapsed': {}}
+        if job.state == JOB_QUEUED:
+            job.state = JOB_RUNNING
+            job.started = time.time()
+        self.user_running[job.user] += 1
+        self.n_queued += 1
+        self.task_queue.put((route_id, job.eparam, job.uid))
+
+    def _event_loop(self):
+        while True:
+            event = self.event_queue.get()
+            try:
+                with self.cond:
+                    self._handle_event(event)
+                    self.cond.notify_all()
+            except Exception as ex:
+                tb.traceback(ex)
+
+    def _handle_event(self, event):
+        """
+        :type event: tuple
+        """
+        name, wid = event[0], event[1]
+        if name == 'ready':
+            if wid in self.workers:
+                self.worker_states[wid] = 'idle'
+
+        elif name == 'take':
+            # the task (or stop signal) is dequeued by the worker,
+            # so the worker must not be counted as idle until it reports the task is done
+            self.n_queued -= 1
+            if wid in self.workers:
+                self.worker_states[wid] = 'busy' if event[2] else 'stopping'
+
+        elif name == 'start':
+            uid, route_id = event[2], event[3]
+            self.worker_states[wid] = 'busy'
+            self.worker_tasks[wid] = (uid, route_id)
+            task = self._task(uid, route_id)
+            if task:
+                task['started'] = time.time()
+
+        elif name == 'stage':
+            uid, route_id, stage = event[2], event[3], event[4]
+            task = self._task(uid, route_id)
+            if task:
+                now = time.time()
+                if task['stage']:
+                    task['stage_elapsed'][task['stage']] = now - task['stage_started']
+                task['stage'] = stage
+                task['stage_index'] = estimation.ESTIMATION_STAGES.index(stage)
+                task['stage_started'] = now
+
+        elif name == 'done':
+            uid, route_id, result = event[2], event[3], event[4]
+            self.worker_tasks.pop(wid, None)
+            if wid in self.workers:
+                self.worker_states[wid] = 'idle'
+            self.last_busy = time.time()
+            self._task_done(uid, route_id, result)
+
+        elif name == 'exit':
+            self.worker_states.pop(wid, None)
+            p = self.workers.pop(wid, None)
+            if p:
+                p.join(timeout=10)
+
+    def _task(self, uid, route_id):
+        """
+        :type uid: str
+        :type route_id: int
+        :rtype: dict
+        """
+        job = self.jobs.get(uid, None)
+        return job.running.get(route_id, None) if job else None
+
+    def _task_done(self, uid, route_id, result):
+        """
+        :type uid: str
+        :type route_id: int
+        :type result: str
+        """
+        job = self.jobs.get(uid, None)
+        if not job or route_id not in job.running:
+            return
+        del job.running[route_id]
+        job.results[route_id] = result
+        self.running_keys[job.keys[route_id]] -= 1
+        self.user_running[job.user] -= 1
+        if job.is_finished():
+            self._finish(job)
+
+    def _finish(self, job):
+        """
+        :type job: Job
+        """
+        job.finished = time.time()
+        if job.state == JOB_CANCELLED:
+            target, args = _remove_result, (job.uid,)
+        else:
+            target, args = _pack_result, (job.uid,)
+
+        def _run():
+            state = JOB_DONE
+            try:
+                target(*args)
+            except Exception as ex:
+                state = JOB_FAILED
+                tb.traceback(ex)
+
+            # the job is done after its result file is ready
+            if job.state != JOB_CANCELLED:
+                with self.cond:
+                    job.state = state
+                    self.cond.notify_all()
+
+        # files are handled out of the scheduler lock
+        threading.Thread(target=_run, daemon=True).start()
+
+    def _start_worker(self):
+        wid = self._next_worker_id
+        self._next_worker_id += 1
+        p = Process(target=_estimation_process,
+                    args=(wid, self.task_queue, self.event_queue, self.cancelled) + tuple(self.worker_args))
+        p.start()
+        self.workers[wid] = p
+        self.worker_states[wid] = 'starting'
+
+    def _n_workers(self, state):
+        """
+        :type state: str
+        :rtype: int
+        """
+        return len([s for s in self.worker_states.values() if s == state])
+
+    def _check_workers(self):
+        """ restart workers terminated abruptly (e.g. out of memory) """
+        logger = getLogger(__name__)
+        for wid, p in list(self.workers.items()):
+            if p.is_alive():
+                continue
+            logger.warning('[EST SCHEDULER] worker %d is terminated (exitcode=%s)' % (wid, p.exitcode))
+            del self.workers[wid]
+            self.worker_states.pop(wid, None)
+            task = self.worker_tasks.pop(wid, None)
+            if task:
+                self._task_done(task[0], task[1], TASK_FAILED)
+            if len(self.workers) < self.base_workers:
+                self._start_worker()
 
 
 def start(n_workers, db_info, cad_db_info, iris_db_info):
-    global m, queue, shared_counters
-    m = Manager()
-    queue = m.Queue()
-    shared_counters = m.dict()
+    """
+    :param n_workers: number of worker processes (auto-sized by the number of CPUs if None or 0)
+    :type n_workers: int
+    :type db_info: dict
+    :type cad_db_info: dict
+    :type iris_db_info: dict
+    """
+    global scheduler
+
+    if scheduler:
+        return
+
+    scheduler = Scheduler(n_workers, (ticas._TICAS_.data_path, db_info, cad_db_info, iris_db_info))
+    scheduler.start()
 
     _start_vaccum_thread()
-    _start_worker_processes(n_workers, db_info, cad_db_info, iris_db_info)
 
 
-def estimate(route_ids, eparam):
+def estimate(route_ids, eparam, user=None, priority=PRIORITY_NORMAL):
     """
+    :type route_ids: list[int]
     :type eparam: pyticas_tetres.ttypes.EstimationRequestInfo
+    :param user: requester (e.g. IP address) to share workers fairly among users
+    :type user: str
+    :type priority: int
     :rtype: str
     """
-    global shared_counters
+    return scheduler.submit(route_ids, eparam, user=user, priority=priority)
 
-    uid = _get_uid()
 
-    shared_counters[uid] = len(route_ids)
+def status(uid):
+    """ return state of the estimation job
 
-    for a_route_id in route_ids:
-        queue.put((a_route_id, eparam, uid))
-    return uid
+    :type uid: str
+    :return: None if the job does not exist
+    :rtype: dict
+    """
+    return scheduler.status(uid) if scheduler else None
 
 
-def _start_worker_processes(N, db_info, cad_db_info, iris_db_info):
-    global queue, shared_counters, WORKER_IS_RUNNING
+def cancel(uid):
+    """
+    :type uid: str
+    :return: False if the job does not exist or is finished already
+    :rtype: bool
+    """
+    return scheduler.cancel(uid) if scheduler else False
 
-    if WORKER_IS_RUNNING:
-        return
 
-    lock = Lock()
-    WORKER_IS_RUNNING = True
-    N = N or DEFAULT_NUMBER_OF_PROCESSES
-    workers = []
-    data_path = ticas._TICAS_.data_path
-    for idx in range(N):
-        p = Process(target=_estimation_process,
-                    args=(idx, queue, shared_counters, lock, data_path, db_info, cad_db_info, iris_db_info))
-        p.start()
-        workers.append(p)
+def _auto_number_of_processes():
+    """
+    :rtype: int
+    """
+    # each estimation uses sub-processes to extract data (`cfg.N_PROCESSES_FOR_TT_EXTRACTION`)
+    n_sub_processes = max(cfg.N_PROCESSES_FOR_TT_EXTRACTION or 1, 1)
+    return max(DEFAULT_NUMBER_OF_PROCESSES, min(MAX_NUMBER_OF_PROCESSES // 2, (os.cpu_count() or 1) // n_sub_processes))
 
 
 def _start_vaccum_thread():
@@ -80,7 +539,7 @@ def _start_vaccum_thread():
     VACCUM_IS_RUNNING = True
 
     def _vaccum():
-        allowed_days = 7 * 86400
+        allowed_days = RESULT_RETENTION_TIME
         output_root_path = util.output_path()
         while True:
             now = time.time()
@@ -93,18 +552,22 @@ def _start_vaccum_thread():
                         shutil.rmtree(filepath, ignore_errors=True)
                     else:
                         os.remove(filepath)
+            result_cache.remove_expired(allowed_days)
+            if scheduler:
+                scheduler.remove_finished_jobs(now - allowed_days)
             time.sleep(3 * 3600)  # sleep 3hour
 
     t = threading.Thread(target=_vaccum)
     t.start()
 
 
-def _estimation_process(id, queue, counters, lock, data_path, DB_INFO, CAD_DB_INFO, IRIS_DB_INFO):
+def _estimation_process(id, task_queue, event_queue, cancelled, data_path, DB_INFO, CAD_DB_INFO, IRIS_DB_INFO):
     """
     :type id: int
-    :type queue: Queue
-    :type counters: dict
-    :type lock: Lock
+    :type task_queue: Queue
+    :type event_queue: Queue
+    :param cancelled: uids of cancelled jobs
+    :type cancelled: dict
     :type data_path: str
     :type DB_INFO: dict
     :type CAD_DB_INFO: dict
@@ -128,8 +591,24 @@ def _estimation_process(id, queue, counters, lock, data_path, DB_INFO, CAD_DB_IN
     ttr_da = TTRouteDataAccess()
 
     logger.debug('[EST WORKER %d] is ready' % (id))
+    event_queue.put(('ready', id))
     while True:
-        (a_route_id, eparam, uid) = queue.get()
+        task = task_queue.get()
+        event_queue.put(('take', id, task is not None))
+        if task is None:
+            logger.debug('[EST WORKER %d] is stopped' % (id))
+            event_queue.put(('exit', id))
+            break
+
+        (a_route_id, eparam, uid) = task
+        event_queue.put(('start', id, uid, a_route_id))
+
+        def _progress(stage):
+            if uid in cancelled:
+                raise EstimationCancelled()
+            event_queue.put(('stage', id, uid, a_route_id, stage))
+
+        result = TASK_DONE
         try:
             logger.debug('[EST WORKER %d] >>>>> start estimation (uid=%s, route=%d)' % (id, uid, a_route_id))
             _eparam = eparam.clone()
@@ -138,24 +617,17 @@ def _estimation_process(id, queue, counters, lock, data_path, DB_INFO, CAD_DB_IN
             except Exception as e:
                 logger.debug('Could not add five minutes offset to the starting time. Error: {}'.format(e))
             _eparam.travel_time_route = ttr_da.get_by_id(a_route_id)
-            estimation.estimate(_eparam, uid)
+            estimation.estimate(_eparam, uid, progress=_progress)
             logger.debug('[EST WORKER %d] <<<<< end of estimation (uid=%s, route=%d)' % (id, uid, a_route_id))
+        except EstimationCancelled:
+            result = TASK_CANCELLED
+            logger.debug('[EST WORKER %d] <<<<< estimation is cancelled (uid=%s, route=%d)' % (id, uid, a_route_id))
         except Exception as ex:
+            result = TASK_FAILED
             tb.traceback(ex)
             logger.debug('[EST WORKER %d] <<<<< end of task (exception occured) (uid=%s)' % (id, uid))
 
-        should_pack = False
-
-        with lock:
-            counters[uid] = counters[uid] - 1
-            if counters[uid] <= 0:
-                del counters[uid]
-                should_pack = True
-
-        if should_pack:
-            logger.debug('[EST WORKER %d] >>> make compressed file (uid=%s)' % (id, uid))
-            _pack_result(uid)
-            logger.debug('[EST WORKER %d] <<< end of making compressed file (uid=%s)' % (id, uid))
+        event_queue.put(('done', id, uid, a_route_id, result))
 
 
 def _pack_result(uid):
@@ -164,17 +636,32 @@ def _pack_result(uid):
     """
     odir = _output_path(uid)
     ozip = '%s.zip' % odir
-    os.chdir(os.path.dirname(odir))
-    with zipfile.ZipFile(ozip, "w", zipfile.ZIP_DEFLATED) as zf:
-        for root, _, filenames in os.walk(os.path.basename(odir)):
-            for name in filenames:
-                name = os.path.join(root, name)
-                name = os.path.normpath(name)
-                zf.write(name, name)
+    tmp_zip = '%s.tmp' % ozip
+    base_dir = os.path.dirname(odir)
+    try:
+        with zipfile.ZipFile(tmp_zip, "w", zipfile.ZIP_DEFLATED) as zf:
+            for root, _, filenames in os.walk(odir):
+                for name in filenames:
+                    filepath = os.path.join(root, name)
+                    zf.write(filepath, os.path.normpath(os.path.relpath(filepath, base_dir)))
+        # the zip file is shown to clients only when it is completed
+        os.rename(tmp_zip, ozip)
+    except Exception:
+        if os.path.exists(tmp_zip):
+            os.remove(tmp_zip)
+        raise
     # remove output dir
     shutil.rmtree(odir)
 
 
+def _remove_result(uid):
+    """ remove output of the cancelled job
+
+    :type uid: str
+    """
+    shutil.rmtree(_output_path(uid), ignore_errors=True)
+
+
 def _get_uid(create_dir=True):
     """
     :rtype: str
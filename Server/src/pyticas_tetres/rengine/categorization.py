@@ -1,9 +1,14 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+from collections import OrderedDict
+
+from pyticas_noaa.isd import isd
 from pyticas_tetres.da.tt import TravelTimeDataAccess
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.rengine.cats import weather, incident, snowmgmt, specialevent, workzone
+from pyticas_tetres.rengine.helper import incident as ihelper
+from pyticas_tetres.rengine.helper import wz as wz_helper
 
 
 def categorize(ttri, prd, **kwargs):
@@ -40,3 +45,139 @@ def categorize(ttri, prd, **kwargs):
             res['has_error'] = True
 
     return res
+
+
+def categorize_routes(ttris, prd, **kwargs):
+    """ categorize travel time data of the given routes in one pass
+
+    - each type of event data is loaded once (incidents are loaded once for each corridor)
+    - categorized data of all routes are written at once for each categorizer
+
+    :type ttris: list[pyticas_tetres.ttypes.TTRouteInfo]
+    :type prd: pyticas.ttypes.Period
+    :return: list of result of each route (the same as the result of `categorize()`)
+    :rtype: list[dict]
+    """
+    lock = kwargs.get('lock', None)
+    categorizers = kwargs.get('categorizers', [weather, workzone, specialevent, snowmgmt, incident])
+
+    tt_da = TravelTimeDataAccess(prd.start_date.year)
+    tt_data_list = tt_da.list_by_period(None, prd, route_ids=[ttri.id for ttri in ttris])
+    tt_da.close_session()
+
+    tt_data_by_route = {ttri.id: [] for ttri in ttris}
+    for tti in tt_data_list:
+        tt_data_by_route[tti.route_id].append(tti)
+
+    results = {}
+    target_routes = []
+    for ttri in ttris:
+        tt_data = tt_data_by_route[ttri.id]
+        results[ttri.id] = {
+            'route_id': ttri.id,
+            'duration': prd.get_period_string(),
+            'tt_counts': len(tt_data),
+            'has_error': False,
+            'inserted': {}
+        }
+        if not tt_data:
+            getLogger(__name__).warning(
+                '!categorization.categorize_routes(): no data (%s, %s)' % (ttri.name, prd.get_period_string()))
+            results[ttri.id]['has_error'] = True
+            continue
+        target_routes.append(ttri)
+
+    if not target_routes:
+        return [results[ttri.id] for ttri in ttris]
+
+    event_kwargs = _load_events(target_routes, prd, categorizers)
+
+    for categorizer in categorizers:
+        # routes whose categorized data are replaced with the same event list are written together
+        groups = OrderedDict()
+        for ttri in target_routes:
+            route_kwargs = dict(event_kwargs)
+            group_key = None
+            if categorizer is incident:
+                group_key = _corridor_key(ttri)
+                route_kwargs['incidents'] = event_kwargs['incidents'][group_key]
+
+            data = categorizer.link_data(ttri, prd, tt_data_by_route[ttri.id], **route_kwargs)
+            if data is None:
+                results[ttri.id]['inserted'][categorizer.__name__] = -1
+                results[ttri.id]['has_error'] = True
+                continue
+
+            if group_key not in groups:
+                groups[group_key] = {'item_ids': _item_ids(categorizer, route_kwargs), 'data': OrderedDict()}
+            groups[group_key]['data'][ttri.id] = data
+
+        for group in groups.values():
+            ttri_ids = list(group['data'].keys())
+            dict_data = [row for data in group['data'].values() for row in data]
+            write_kwargs = {'item_ids': group['item_ids']}
+            if lock:
+                write_kwargs['lock'] = lock
+            n_inserted = categorizer.write_data(ttri_ids, prd, dict_data, **write_kwargs)
+            for ttri_id, data in group['data'].items():
+                results[ttri_id]['inserted'][categorizer.__name__] = len(data) if n_inserted >= 0 else -1
+                if n_inserted < 0:
+                    results[ttri_id]['has_error'] = True
+
+    return [results[ttri.id] for ttri in ttris]
+
+
+def _load_events(ttris, prd, categorizers):
+    """ load event data that are shared by the given routes
+
+    :type ttris: list[pyticas_tetres.ttypes.TTRouteInfo]
+    :type prd: pyticas.ttypes.Period
+    :type categorizers: list
+    :rtype: dict
+    """
+    events = {}
+
+    if weather in categorizers:
+        events['isd_stations'] = isd.get_station_list('MN', None, False)
+        events['weather_data'] = {}
+
+    if workzone in categorizers:
+        events['workzones'] = wz_helper.find_workzones(prd)
+
+    if specialevent in categorizers:
+        events['specialevents'] = specialevent.find_specialevents(prd)
+
+    if snowmgmt in categorizers:
+        events['snowmgmts'] = snowmgmt.find_snowmgmts(prd)
+
+    if incident in categorizers:
+        incidents = {}
+        for ttri in ttris:
+            corr_key = _corridor_key(ttri)
+            if corr_key not in incidents:
+                incidents[corr_key] = ihelper.find_incidents(ttri.corridors()[0], prd)
+        events['incidents'] = incidents
+
+    return events
+
+
+def _item_ids(categorizer, events):
+    """ return ids of events whose categorized data are replaced
+
+    :type events: dict
+    :rtype: list[int]
+    """
+    event_key = {workzone: 'workzones', specialevent: 'specialevents',
+                 snowmgmt: 'snowmgmts', incident: 'incidents'}.get(categorizer, None)
+    if not event_key:
+        return None
+    return [v.id for v in events[event_key]]
+
+
+def _corridor_key(ttri):
+    """
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :rtype: (str, str)
+    """
+    corr = ttri.corridors()[0]
+    return corr.route, corr.dir
@@ -3,9 +3,11 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
 from pyticas_tetres.cfg import INCIDENT_DOWNSTREAM_DISTANCE_LIMIT, INCIDENT_UPSTREAM_DISTANCE_LIMIT
 from pyticas_tetres.da.tt_incident import TTIncidentDataAccess
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.rengine.helper import incident as ihelper
 from pyticas_tetres.rengine.helper import loc
+from pyticas_tetres.rengine.helper.interval import IntervalIndex
 from pyticas_tetres.util.noop_context import nonop_with
 
 
@@ -17,10 +19,26 @@ def categorize(ttri, prd, ttdata, **kwargs):
     :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
     :rtype: int
     """
+    given_incidents = kwargs.get('incidents', None)
+    all_incidents = given_incidents if given_incidents is not None else ihelper.find_incidents(ttri.corridors()[0], prd)
+
     lock = kwargs.get('lock', nonop_with())
 
+    dict_data = link_data(ttri, prd, ttdata, incidents=all_incidents)
+    return write_data([ttri.id], prd, dict_data, item_ids=[v.id for v in all_incidents], lock=lock)
+
+
+def link_data(ttri, prd, ttdata, **kwargs):
+    """ return categorized data of the given travel time data
+
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :type prd: pyticas.ttypes.Period
+    :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
+    :param incidents: incidents on the corridor of the route during the period
+    :rtype: list[dict]
+    """
     given_incidents = kwargs.get('incidents', None)
-    all_incidents = given_incidents or ihelper.find_incidents(ttri.corridors()[0], prd)
+    all_incidents = given_incidents if given_incidents is not None else ihelper.find_incidents(ttri.corridors()[0], prd)
 
     route_length = ttri.route.length()
     incd_locations = []
@@ -32,33 +50,55 @@ def categorize(ttri, prd, ttdata, **kwargs):
             off_distance = distance if distance < 0 else max(0, distance - route_length)
             incd_locations.append((distance, off_distance, incd))
 
+    incd_index = _incident_index(incd_locations)
+    dt_list = [tti.str2datetime(tti.time) for tti in ttdata]
+
+    dict_data = []
+    for tti, incds in zip(ttdata, incd_index.find_all(dt_list)):
+        for (dist, off_dist, incd) in incds:
+            dict_data.append({
+                'tt_id': tti.id,
+                'incident_id': incd.id,
+                'distance': dist,
+                'off_distance': off_dist
+            })
+    return dict_data
+
+
+def write_data(ttri_ids, prd, dict_data, **kwargs):
+    """ replace categorized data of the given routes during the given period
+
+    :type ttri_ids: list[int]
+    :type prd: pyticas.ttypes.Period
+    :type dict_data: list[dict]
+    :param item_ids: incident ids whose categorized data are replaced
+    :rtype: int
+    """
+    try:
+        return _write_data(ttri_ids, prd, dict_data, **kwargs)
+    finally:
+        result_cache.invalidate(ttri_ids, prd.start_date, prd.end_date)
+
+
+def _write_data(ttri_ids, prd, dict_data, **kwargs):
+    lock = kwargs.get('lock', nonop_with())
+    item_ids = kwargs.get('item_ids', None)
+
     year = prd.start_date.year
     ttincident_da = TTIncidentDataAccess(year)
 
     # avoid to save duplicated data
     with lock:
-        is_deleted = ttincident_da.delete_range(ttri.id, prd.start_date, prd.end_date,
-                                                item_ids=[v.id for v in all_incidents])
+        is_deleted = ttincident_da.delete_range(ttri_ids, prd.start_date, prd.end_date, item_ids=item_ids)
         if not is_deleted or not ttincident_da.commit():
             ttincident_da.rollback()
             ttincident_da.close_session()
             getLogger(__name__).warning('! incident.categorize(): fail to delete existing data')
             return -1
 
-    dict_data = []
-    for idx, tti in enumerate(ttdata):
-        incds = _find_incident(incd_locations, tti.str2datetime(tti.time))
-        for (dist, off_dist, incd) in incds:
-            dict_data.append({
-                'tt_id': tti.id,
-                'incident_id': incd.id,
-                'distance': dist,
-                'off_distance': off_dist
-            })
-
     if dict_data:
         with lock:
-            inserted_ids = ttincident_da.bulk_insert(dict_data)
+            inserted_ids = ttincident_da.copy_insert(dict_data)
             if not inserted_ids or not ttincident_da.commit():
                 ttincident_da.rollback()
                 ttincident_da.close_session()
@@ -69,17 +109,15 @@ def categorize(ttri, prd, ttdata, **kwargs):
     return len(dict_data)
 
 
-def _find_incident(incidents, dt):
+def _incident_index(incidents):
     """
     :type incidents: list[(float, float, pyticas_tetres.ttypes.IncidentInfo)]
-    :type dt: datetime.datetime
-    :rtype: list[(float, float, pyticas_tetres.ttypes.IncidentInfo)]
+    :rtype: IntervalIndex
     """
-    incds = []
-    for idx, (distance, off_distance, incd) in enumerate(incidents):
+    index = IntervalIndex()
+    for (distance, off_distance, incd) in incidents:
         xdts = incd.xdts if incd.xdts else incd.udts
         if not xdts:
             continue
-        if incd.str2datetime(incd.cdts) <= dt <= incd.str2datetime(xdts):
-            incds.append((distance, off_distance, incd))
-    return incds
+        index.add(incd.str2datetime(incd.cdts), incd.str2datetime(xdts), (distance, off_distance, incd))
+    return index
@@ -5,8 +5,10 @@ import datetime
 
 from pyticas_tetres.da.snowmgmt import SnowMgmtDataAccess
 from pyticas_tetres.da.tt_snowmgmt import TTSnowManagementDataAccess
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.rengine.helper import loc
+from pyticas_tetres.rengine.helper.interval import IntervalIndex
 from pyticas_tetres.ttypes import LOC_TYPE
 from pyticas_tetres.util.noop_context import nonop_with
 
@@ -21,25 +23,43 @@ def categorize(ttri, prd, ttdata, **kwargs):
     """
     lock = kwargs.get('lock', nonop_with())
 
+    given_snowmgmts = kwargs.get('snowmgmts', None)
+    snowmgmts = given_snowmgmts if given_snowmgmts is not None else find_snowmgmts(prd)
+
+    dict_data = link_data(ttri, prd, ttdata, snowmgmts=snowmgmts)
+    return write_data([ttri.id], prd, dict_data, item_ids=[v.id for v in snowmgmts], lock=lock)
+
+
+def find_snowmgmts(prd):
+    """ return snow managements during the given period (snow routes are loaded together)
+
+    :type prd: pyticas.ttypes.Period
+    :rtype: list[pyticas_tetres.ttypes.SnowManagementInfo]
+    """
     snmDA = SnowMgmtDataAccess()
-    ttsnmDA = TTSnowManagementDataAccess(prd.start_date.year, session=snmDA.get_session())
+    snowmgmts = snmDA.list_by_period(prd.start_date, prd.end_date, set_related_model_info=True)
+    snmDA.close_session()
+    return snowmgmts
+
 
+def link_data(ttri, prd, ttdata, **kwargs):
+    """ return categorized data of the given travel time data
+
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :type prd: pyticas.ttypes.Period
+    :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
+    :param snowmgmts: snow managements found by `find_snowmgmts()`
+    :rtype: list[dict]
+    """
     given_snowmgmts = kwargs.get('snowmgmts', None)
-    snowmgmts = given_snowmgmts or snmDA.list_by_period(prd.start_date, prd.end_date, set_related_model_info=True)
+    snowmgmts = given_snowmgmts if given_snowmgmts is not None else find_snowmgmts(prd)
     snmis = _decide_location(ttri, snowmgmts)
 
-    with lock:
-        is_deleted = ttsnmDA.delete_range(ttri.id, prd.start_date, prd.end_date, item_ids=[v.id for v in snowmgmts])
-        if not is_deleted or not ttsnmDA.commit():
-            ttsnmDA.rollback()
-            ttsnmDA.close_session()
-            getLogger(__name__).warning('! snowmgmt.categorize(): fail to delete existing data')
-            return -1
+    snmi_index = _snowmgmt_index(snmis)
+    dt_list = [tti.str2datetime(tti.time) for tti in ttdata]
 
     dict_data = []
-    for idx, tti in enumerate(ttdata):
-        dt = tti.str2datetime(tti.time)
-        _snmis = _find_snowmgmts(snmis, dt)
+    for tti, _snmis in zip(ttdata, snmi_index.find_all(dt_list)):
         for (loc_type, distance, off_distance, snmi, r) in _snmis:
             dict_data.append({
                 'tt_id': tti.id,
@@ -49,10 +69,41 @@ def categorize(ttri, prd, ttdata, **kwargs):
                 'off_distance': off_distance,
                 'road_status': -1,
             })
+    return dict_data
+
+
+def write_data(ttri_ids, prd, dict_data, **kwargs):
+    """ replace categorized data of the given routes during the given period
+
+    :type ttri_ids: list[int]
+    :type prd: pyticas.ttypes.Period
+    :type dict_data: list[dict]
+    :param item_ids: snow management ids whose categorized data are replaced
+    :rtype: int
+    """
+    try:
+        return _write_data(ttri_ids, prd, dict_data, **kwargs)
+    finally:
+        result_cache.invalidate(ttri_ids, prd.start_date, prd.end_date)
+
+
+def _write_data(ttri_ids, prd, dict_data, **kwargs):
+    lock = kwargs.get('lock', nonop_with())
+    item_ids = kwargs.get('item_ids', None)
+
+    ttsnmDA = TTSnowManagementDataAccess(prd.start_date.year)
+
+    with lock:
+        is_deleted = ttsnmDA.delete_range(ttri_ids, prd.start_date, prd.end_date, item_ids=item_ids)
+        if not is_deleted or not ttsnmDA.commit():
+            ttsnmDA.rollback()
+            ttsnmDA.close_session()
+            getLogger(__name__).warning('! snowmgmt.categorize(): fail to delete existing data')
+            return -1
 
     if dict_data:
         with lock:
-            inserted_ids = ttsnmDA.bulk_insert(dict_data, print_exception=True)
+            inserted_ids = ttsnmDA.copy_insert(dict_data, print_exception=True)
             if not inserted_ids or not ttsnmDA.commit():
                 ttsnmDA.rollback()
                 ttsnmDA.close_session()
@@ -99,17 +150,14 @@ def _decide_location(ttri, snowmgmts):
     return snmis
 
 
-def _find_snowmgmts(snowmgmts, dt):
+def _snowmgmt_index(snowmgmts):
     """
     :type snowmgmts: list[(pyticas_tetres.ttypes.LOC_TYPE, float, float, pyticas_tetres.ttypes.SnowManagementInfo, pyticas.ttypes.Route)]
-    :type dt: datetime.datetime
-    :rtype: list[(pyticas_tetres.ttypes.LOC_TYPE, float, float, pyticas_tetres.ttypes.SnowManagementInfo, pyticas.ttypes.Route)]
+    :rtype: IntervalIndex
     """
-    seis = []
-    for idx, (loc_type, distance, off_distance, snmi, r) in enumerate(snowmgmts):
-        start_time = snmi.str2datetime(snmi.lane_lost_time)
-        end_time = snmi.str2datetime(snmi.lane_regain_time)
-        # only for lane-lost data
-        if start_time <= dt < end_time:
-            seis.append((loc_type, distance, off_distance, snmi, r))
-    return seis
+    # only for lane-lost data (`lane_lost_time <= dt < lane_regain_time`)
+    index = IntervalIndex(include_end=False)
+    for (loc_type, distance, off_distance, snmi, r) in snowmgmts:
+        index.add(snmi.str2datetime(snmi.lane_lost_time), snmi.str2datetime(snmi.lane_regain_time),
+                  (loc_type, distance, off_distance, snmi, r))
+    return index
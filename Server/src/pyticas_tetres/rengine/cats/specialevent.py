@@ -5,9 +5,11 @@ import datetime
 
 from pyticas_tetres.cfg import SE_ARRIVAL_WINDOW, SE_DEPARTURE_WINDOW1, SE_DEPARTURE_WINDOW2
 from pyticas_tetres.da.tt_specialevent import TTSpecialeventDataAccess
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.rengine.helper import loc
 from pyticas_tetres.rengine.helper import special_event as se_helper
+from pyticas_tetres.rengine.helper.interval import IntervalIndex
 from pyticas_tetres.util.noop_context import nonop_with
 
 
@@ -22,40 +24,87 @@ def categorize(ttri, prd, ttdata, **kwargs):
     lock = kwargs.get('lock', nonop_with())
 
     given_seis = kwargs.get('specialevents', None)
-    seis = given_seis or se_helper.find_specialevents(prd, SE_ARRIVAL_WINDOW, SE_DEPARTURE_WINDOW1,
-                                                      SE_DEPARTURE_WINDOW2)
+    seis = given_seis if given_seis is not None else find_specialevents(prd)
+
+    dict_data = link_data(ttri, prd, ttdata, specialevents=seis)
+    return write_data([ttri.id], prd, dict_data, item_ids=[v.id for v in seis], lock=lock)
+
+
+def find_specialevents(prd):
+    """ return special events whose arrival or departure time window is overlapped with the given period
+
+    :type prd: pyticas.ttypes.Period
+    :rtype: list[pyticas_tetres.ttypes.SpecialEventInfo]
+    """
+    return se_helper.find_specialevents(prd, SE_ARRIVAL_WINDOW, SE_DEPARTURE_WINDOW1, SE_DEPARTURE_WINDOW2)
+
+
+def link_data(ttri, prd, ttdata, **kwargs):
+    """ return categorized data of the given travel time data
+
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :type prd: pyticas.ttypes.Period
+    :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
+    :param specialevents: special events found by `find_specialevents()`
+    :rtype: list[dict]
+    """
+    given_seis = kwargs.get('specialevents', None)
+    seis = given_seis if given_seis is not None else find_specialevents(prd)
 
     specialevents = []
     for sei in seis:
         distance = loc.minimum_distance(ttri.route, float(sei.lat), float(sei.lon))
         specialevents.append((sei, distance))
 
+    se_index = _specialevent_index(specialevents)
+    dt_list = [tti.str2datetime(tti.time) for tti in ttdata]
+
+    dict_data = []
+    for tti, matched in zip(ttdata, se_index.find_all(dt_list)):
+        for (sei, distance, event_type) in _arrival_first(matched):
+            dict_data.append({
+                'tt_id': tti.id,
+                'specialevent_id': sei.id,
+                'distance': distance,
+                'event_type': event_type
+            })
+    return dict_data
+
+
+def write_data(ttri_ids, prd, dict_data, **kwargs):
+    """ replace categorized data of the given routes during the given period
+
+    :type ttri_ids: list[int]
+    :type prd: pyticas.ttypes.Period
+    :type dict_data: list[dict]
+    :param item_ids: special event ids whose categorized data are replaced
+    :rtype: int
+    """
+    try:
+        return _write_data(ttri_ids, prd, dict_data, **kwargs)
+    finally:
+        result_cache.invalidate(ttri_ids, prd.start_date, prd.end_date)
+
+
+def _write_data(ttri_ids, prd, dict_data, **kwargs):
+    lock = kwargs.get('lock', nonop_with())
+    item_ids = kwargs.get('item_ids', None)
+
     year = prd.start_date.year
     ttseDA = TTSpecialeventDataAccess(year)
 
     # avoid to save duplicated data
     with lock:
-        is_deleted = ttseDA.delete_range(ttri.id, prd.start_date, prd.end_date, item_ids=[v.id for v in seis])
+        is_deleted = ttseDA.delete_range(ttri_ids, prd.start_date, prd.end_date, item_ids=item_ids)
         if not is_deleted or not ttseDA.commit():
             ttseDA.rollback()
             ttseDA.close_session()
             getLogger(__name__).debug('! specialevent.categorize(): fail to delete existing data')
             return -1
 
-    dict_data = []
-    for idx, tti in enumerate(ttdata):
-        seis = _find_ses(specialevents, tti.str2datetime(tti.time))
-        for (sei, distance, event_type) in seis:
-            dict_data.append({
-                'tt_id': tti.id,
-                'specialevent_id': sei.id,
-                'distance': distance,
-                'event_type': event_type
-            })
-
     if dict_data:
         with lock:
-            inserted_ids = ttseDA.bulk_insert(dict_data, print_exception=True)
+            inserted_ids = ttseDA.copy_insert(dict_data, print_exception=True)
             if not inserted_ids or not ttseDA.commit():
                 ttseDA.rollback()
                 ttseDA.close_session()
@@ -66,13 +115,13 @@ def categorize(ttri, prd, ttdata, **kwargs):
     return len(dict_data)
 
 
-def _find_ses(specialevents, dt):
-    """
+def _specialevent_index(specialevents):
+    """ index of arrival and departure time windows of special events
+
     :type specialevents: list[(pyticas_tetres.ttrms_types.SpecialeventInfo, float)]
-    :type dt: datetime.datetime
-    :rtype: list[(pyticas_tetres.ttrms_types.SpecialeventInfo, float, int)]
+    :rtype: IntervalIndex
     """
-    seis = []
+    index = IntervalIndex()
     for idx, (sei, distance) in enumerate(specialevents):
         sdt2 = sei.str2datetime(sei.start_time)
         sdt1 = sdt2 - datetime.timedelta(minutes=SE_ARRIVAL_WINDOW)
@@ -80,12 +129,23 @@ def _find_ses(specialevents, dt):
         edt1 = min(sdt2 + datetime.timedelta(minutes=SE_DEPARTURE_WINDOW1), edt)
         edt2 = edt1 + datetime.timedelta(minutes=SE_DEPARTURE_WINDOW2)
 
-        # print('dt=', dt, ', event: name=', sei.name, ', start_time=', sei.start_time, ', end_time=', sei.end_time, ', arrival=', sdt1, '~', sdt2, ', departure=', edt1, '~', edt2)
-        if sdt1 <= dt <= sdt2:
-            # print(' : type=_A')
-            seis.append((sei, distance, 'A'))  # Arrival
-        elif edt1 <= dt <= edt2:
-            # print(' : type=_D')
-            seis.append((sei, distance, 'D'))  # Departure
+        # arrival window is added first, so it precedes the departure window of the same event
+        index.add(sdt1, sdt2, (idx, sei, distance, 'A'))  # Arrival
+        index.add(edt1, edt2, (idx, sei, distance, 'D'))  # Departure
+    return index
+
+
+def _arrival_first(matched):
+    """ return one event type for each special event (arrival has priority over departure)
 
+    :type matched: list[(int, pyticas_tetres.ttrms_types.SpecialeventInfo, float, str)]
+    :rtype: list[(pyticas_tetres.ttrms_types.SpecialeventInfo, float, str)]
+    """
+    seis = []
+    found = set()
+    for (idx, sei, distance, event_type) in matched:
+        if idx in found:
+            continue
+        found.add(idx)
+        seis.append((sei, distance, event_type))
     return seis
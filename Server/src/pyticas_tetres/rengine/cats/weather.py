@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+import bisect
 import datetime
 
 from pyticas import route
@@ -9,6 +10,7 @@ from pyticas_tetres.da.noaaweather import NoaaWeatherDataAccess
 from pyticas_tetres.da.tt_weather import TTWeatherDataAccess
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.util.noop_context import nonop_with
+from pyticas_tetres.est import result_cache
 
 WEATHER_STATION_DISTANCE_LIMIT = 15
 
@@ -23,77 +25,67 @@ def categorize(ttri, prd, ttdata, **kwargs):
     """
     lock = kwargs.get('lock', nonop_with())
 
+    dict_data = link_data(ttri, prd, ttdata, **kwargs)
+    if dict_data is None:
+        return -1
+
+    return write_data([ttri.id], prd, dict_data, lock=lock)
+
+
+def link_data(ttri, prd, ttdata, **kwargs):
+    """ return categorized data of the given travel time data
+
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :type prd: pyticas.ttypes.Period
+    :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
+    :param isd_stations: ISD station list (`isd.get_station_list('MN', None, False)`)
+    :param weather_data: dictionary to share weather data of each station among routes, {(usaf, wban) : weather data}
+    :return: categorized data or None if there is no weather data near by the route
+    :rtype: list[dict]
+    """
     # prepare : coordinates, target year
     lat, lon = route.center_coordinates(ttri.route)
     year = prd.start_date.year
 
     # nearby weather station list
-    all_isd_stations = isd.get_station_list('MN', None, False)
+    all_isd_stations = kwargs.get('isd_stations', None)
+    if all_isd_stations is None:
+        all_isd_stations = isd.get_station_list('MN', None, False)
     isd_stations = isd.find_nearby_station(lat, lon, prd.start_date.date(), all_isd_stations)
-    station_idx = 0
-    if not isd_stations or not isd_stations[station_idx]:
+    if not isd_stations or not isd_stations[0]:
         getLogger(__name__).warn('! weather.categorize(): no weather information for TTRI(%d)' % (ttri.id))
-        return -1
-
-    nearby = isd_stations[station_idx][1]
+        return None
 
     cprd = prd.clone()
     cprd.extend_start_hour(1)
     cprd.extend_end_hour(1)
 
+    # weather data of all candidate stations are loaded with one query
+    candidates = [st for (distance, st) in isd_stations if distance <= WEATHER_STATION_DISTANCE_LIMIT]
+    weather_data = kwargs.get('weather_data', None)
+    if weather_data is None:
+        weather_data = {}
+    not_loaded = [(st.usaf, st.wban) for st in candidates if (st.usaf, st.wban) not in weather_data]
+    if not_loaded:
+        da_noaa = NoaaWeatherDataAccess(year)
+        weather_data.update(da_noaa.list_by_stations(not_loaded, cprd))
+        da_noaa.close_session()
+
     # decide nearby weather station which has data during a given period
-    # by trying to read weather data
-    wiss = []
     hours = (len(cprd.get_timeline()) * prd.interval) / 60 / 60
-    da_noaa = NoaaWeatherDataAccess(year)
-
-    while True:
-
-        nearby = isd_stations[station_idx][1]
-        distance = isd_stations[station_idx][0]
-        if distance > WEATHER_STATION_DISTANCE_LIMIT:
-            nearby = None
+    wis = None
+    for st in candidates:
+        station_wis = weather_data[(st.usaf, st.wban)]
+        if station_wis and len(station_wis) >= hours * 0.6:
+            wis = station_wis
             break
 
-        wis = da_noaa.list_by_period(nearby.usaf, nearby.wban, cprd)
-        if len(wis) < hours * 0.6:
-            station_idx += 1
-            continue
-
-        if wis:
-            break
-        # if wis:
-        #     wiss.append(wis)
-        #     if len(wiss) >= 3:
-        #         break
-        #     continue
-
-        if station_idx >= len(isd_stations) - 1:
-            nearby = None
-            break
-
-    if not nearby:
+    if not wis:
         getLogger(__name__).warn('! weather.categorize(): no weather information for TTRI(%d)' % (ttri.id))
-        da_noaa.close_session()
-        return -1
-
-    da_ttw = TTWeatherDataAccess(year)
-
-    # avoid to save duplicated data
-    with lock:
-        is_deleted = da_ttw.delete_range(ttri.id, prd.start_date, prd.end_date)
-        if not is_deleted or not da_ttw.commit():
-            da_ttw.rollback()
-            da_ttw.close_session()  # shared session with `da_noaa`
-            da_noaa.close_session()
-            return -1
-
-    # insert weather data to database
-    sidx = 0
+        return None
 
     dict_data = []
-    for idx, tti in enumerate(ttdata):
-        sidx, wd = _find_wd(wis, tti.time, sidx)
+    for tti, wd in zip(ttdata, _find_wds(wis, ttdata)):
         if not wd:
             getLogger(__name__).warn('! weather.categorize(): weather data is not found for (tti.time=%s, usaf=%s, wban=%s)'
                         % (tti.time, wis[-1].usaf, wis[-1].wban))
@@ -102,45 +94,72 @@ def categorize(ttri, prd, ttdata, **kwargs):
             'tt_id': tti.id,
             'weather_id': wd.id
         })
+    return dict_data
+
+
+def write_data(ttri_ids, prd, dict_data, **kwargs):
+    """ replace categorized data of the given routes during the given period
+
+    :type ttri_ids: list[int]
+    :type prd: pyticas.ttypes.Period
+    :type dict_data: list[dict]
+    :rtype: int
+    """
+    try:
+        return _write_data(ttri_ids, prd, dict_data, **kwargs)
+    finally:
+        result_cache.invalidate(ttri_ids, prd.start_date, prd.end_date)
+
+
+def _write_data(ttri_ids, prd, dict_data, **kwargs):
+    lock = kwargs.get('lock', nonop_with())
 
+    da_ttw = TTWeatherDataAccess(prd.start_date.year)
+
+    # avoid to save duplicated data
+    with lock:
+        is_deleted = da_ttw.delete_range(ttri_ids, prd.start_date, prd.end_date)
+        if not is_deleted or not da_ttw.commit():
+            da_ttw.rollback()
+            da_ttw.close_session()
+            return -1
+
+    # insert weather data to database
     if dict_data:
         with lock:
-            inserted_ids = da_ttw.bulk_insert(dict_data, print_exception=True)
+            inserted_ids = da_ttw.copy_insert(dict_data, print_exception=True)
             if not inserted_ids or not da_ttw.commit():
                 getLogger(__name__).warn('! weather.categorize() fail to insert categorized data')
                 da_ttw.rollback()
                 da_ttw.close_session()
-                da_noaa.close_session()
                 return -1
 
-    da_noaa.close_session()
     da_ttw.close_session()
 
     return len(dict_data)
 
 
-def _find_wd(wis, dt, start_idx):
-    """
+def _find_wds(wis, ttdata):
+    """ return weather data of each travel time data
+
+    - weather data at the time or right after the time of travel time data
+    - the last weather data if it is within 30 minutes before the time of travel time data
 
     :type wis: list[NoaaWeatherInfo]
-    :type dt: str
-    :type start_idx: int
-    :rtype: int, NoaaWeatherInfo
+    :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
+    :rtype: list[NoaaWeatherInfo]
     """
-    for idx, wd in enumerate(wis[start_idx:]):
-        if wd.dtime >= dt:
-            return start_idx + idx, wd
-
-    try:
-        wdt = (datetime.datetime.strptime(wis[-1].dtime, '%Y-%m-%d %H:%M:%S')
-               if isinstance(wis[-1].dtime, str) else wis[-1].dtime)
-        dtt = datetime.datetime.strptime(dt, '%Y-%m-%d %H:%M:%S') if isinstance(dt, str) else dt
-        diff = wdt - dtt
-        diff_in_minute = abs(diff.seconds / 60.0)
-        if diff_in_minute <= 30:
-            return len(wis) - 1, wis[-1]
-    except Exception as ex:
-        print(wis[-1])
-        raise ex
-
-    return -1, None
+    wtimes = [wd.str2datetime(wd.dtime) if isinstance(wd.dtime, str) else wd.dtime for wd in wis]
+    last_limit = wtimes[-1] + datetime.timedelta(minutes=30)
+
+    wds = []
+    for tti in ttdata:
+        dt = tti.str2datetime(tti.time)
+        widx = bisect.bisect_left(wtimes, dt)
+        if widx < len(wis):
+            wds.append(wis[widx])
+        elif dt <= last_limit:
+            wds.append(wis[-1])
+        else:
+            wds.append(None)
+    return wds
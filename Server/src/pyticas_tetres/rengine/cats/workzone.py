@@ -3,9 +3,11 @@ __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
 from pyticas_tetres.cfg import WZ_DOWNSTREAM_DISTANCE_LIMIT, WZ_UPSTREAM_DISTANCE_LIMIT
 from pyticas_tetres.da.tt_workzone import TTWorkZoneDataAccess
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.rengine.helper import loc
 from pyticas_tetres.rengine.helper import wz as wz_helper
+from pyticas_tetres.rengine.helper.interval import IntervalIndex
 from pyticas_tetres.ttypes import LOC_TYPE
 from pyticas_tetres.util.noop_context import nonop_with
 
@@ -21,7 +23,23 @@ def categorize(ttri, prd, ttdata, **kwargs):
     lock = kwargs.get('lock', nonop_with())
 
     given_wzs = kwargs.get('workzones', None)
-    wzs = given_wzs or wz_helper.find_workzones(prd)
+    wzs = given_wzs if given_wzs is not None else wz_helper.find_workzones(prd)
+
+    dict_data = link_data(ttri, prd, ttdata, workzones=wzs)
+    return write_data([ttri.id], prd, dict_data, item_ids=[v.id for v in wzs], lock=lock)
+
+
+def link_data(ttri, prd, ttdata, **kwargs):
+    """ return categorized data of the given travel time data
+
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :type prd: pyticas.ttypes.Period
+    :type ttdata: list[pyticas_tetres.ttypes.TravelTimeInfo]
+    :param workzones: workzones during the period
+    :rtype: list[dict]
+    """
+    given_wzs = kwargs.get('workzones', None)
+    wzs = given_wzs if given_wzs is not None else wz_helper.find_workzones(prd)
 
     workzones = []
     for wzi in wzs:
@@ -44,20 +62,11 @@ def categorize(ttri, prd, ttdata, **kwargs):
 
         workzones.append((loc_type, distance, off_distance, wzi, r))
 
-    year = prd.start_date.year
-    da_tt_wz = TTWorkZoneDataAccess(year)
-
-    # avoid to save duplicated data
-    with lock:
-        is_deleted = da_tt_wz.delete_range(ttri.id, prd.start_date, prd.end_date, item_ids=[v.id for v in wzs])
-        if not is_deleted or not da_tt_wz.commit():
-            da_tt_wz.close_session()
-            getLogger(__name__).warning('! workzone.categorize(): fail to delete existing data')
-            return -1
+    wz_index = _workzone_index(workzones)
+    dt_list = [tti.str2datetime(tti.time) for tti in ttdata]
 
     dict_data = []
-    for idx, tti in enumerate(ttdata):
-        wzs = _find_wzs(workzones, tti.str2datetime(tti.time))
+    for tti, wzs in zip(ttdata, wz_index.find_all(dt_list)):
         for (loc_type, distance, off_distance, wzi, r) in wzs:
             dict_data.append({
                 'tt_id': tti.id,
@@ -66,10 +75,42 @@ def categorize(ttri, prd, ttdata, **kwargs):
                 'distance': distance,
                 'off_distance': off_distance
             })
+    return dict_data
+
+
+def write_data(ttri_ids, prd, dict_data, **kwargs):
+    """ replace categorized data of the given routes during the given period
+
+    :type ttri_ids: list[int]
+    :type prd: pyticas.ttypes.Period
+    :type dict_data: list[dict]
+    :param item_ids: workzone ids whose categorized data are replaced
+    :rtype: int
+    """
+    try:
+        return _write_data(ttri_ids, prd, dict_data, **kwargs)
+    finally:
+        result_cache.invalidate(ttri_ids, prd.start_date, prd.end_date)
+
+
+def _write_data(ttri_ids, prd, dict_data, **kwargs):
+    lock = kwargs.get('lock', nonop_with())
+    item_ids = kwargs.get('item_ids', None)
+
+    year = prd.start_date.year
+    da_tt_wz = TTWorkZoneDataAccess(year)
+
+    # avoid to save duplicated data
+    with lock:
+        is_deleted = da_tt_wz.delete_range(ttri_ids, prd.start_date, prd.end_date, item_ids=item_ids)
+        if not is_deleted or not da_tt_wz.commit():
+            da_tt_wz.close_session()
+            getLogger(__name__).warning('! workzone.categorize(): fail to delete existing data')
+            return -1
 
     if dict_data:
         with lock:
-            inserted_ids = da_tt_wz.bulk_insert(dict_data, print_exception=True)
+            inserted_ids = da_tt_wz.copy_insert(dict_data, print_exception=True)
             if not inserted_ids or not da_tt_wz.commit():
                 da_tt_wz.rollback()
                 da_tt_wz.close_session()
@@ -80,17 +121,15 @@ def categorize(ttri, prd, ttdata, **kwargs):
     return len(dict_data)
 
 
-def _find_wzs(workzones, dt):
+def _workzone_index(workzones):
     """
     :type workzones: list[(pyticas_tetres.ttypes.LOC_TYPE, float, float, pyticas_tetres.ttypes.WorkZoneInfo, pyticas.ttypes.Route)]
-    :type dt: datetime.datetime
-    :rtype: list[(pyticas_tetres.ttypes.LOC_TYPE, float, float, pyticas_tetres.ttypes.WorkZoneInfo, pyticas.ttypes.Route)]
+    :rtype: IntervalIndex
     """
-    wzs = []
-    for idx, (loc_type, distance, off_distance, wz, r) in enumerate(workzones):
-        if wz.str2datetime(wz.start_time) <= dt <= wz.str2datetime(wz.end_time):
-            wzs.append((loc_type, distance, off_distance, wz, r))
-    return wzs
+    index = IntervalIndex()
+    for (loc_type, distance, off_distance, wz, r) in workzones:
+        index.add(wz.str2datetime(wz.start_time), wz.str2datetime(wz.end_time), (loc_type, distance, off_distance, wz, r))
+    return index
 
 
 def _get_wz_feature(wzi, wz_features, wz_lncfgs, corridor):
@@ -21,7 +21,19 @@ def extract_tt(route_id, start_date, end_date, start_time, end_time, operating_c
     :type start_time: datetime.time
     :type end_time: datetime.time
     :type filters: list[pyticas_tetres.rengine.filter.ExtFilterGroup]
+    :param columnar: if True, data are loaded as arrays and filtered with boolean masks (see `extractor_columnar`)
+    :type columnar: bool
+    :param n_processes: number of worker processes to query yearly or monthly partitions (columnar mode only)
+    :type n_processes: int
+    :param partition: 'year' or 'month' (columnar mode only)
+    :type partition: str
     """
+    if kwargs.pop('columnar', False):
+        from pyticas_tetres.rengine import extractor_columnar
+        extractor_columnar.extract_tt(route_id, start_date, end_date, start_time, end_time, operating_conditions,
+                                      **kwargs)
+        return
+
     remove_holiday = kwargs.get('remove_holiday', False)
 
     if 'remove_holiday' in kwargs:
@@ -95,34 +107,28 @@ def _retrieve_data_from_db(route_id, operating_conditions, sdate, edate, start_t
     # prd.get_date_string(), timeutil.human_time(seconds=(time.time() - proc_start_time))))
 
 
-def _monthly_basis_data_extraction_multi_thread(route_id, start_date, end_date, start_time, end_time, operating_conditions, **kwargs):
+def _divide_period_by_year(start_date, end_date):
     """
-    :type route_id: int
     :type start_date: datetime.date
     :type end_date: datetime.date
-    :type start_time: datetime.time
-    :type end_time: datetime.time
-    :type operating_conditions: list[pyticas_tetres.rengine.filter.ExtFilterGroup]
+    :rtype: list[[datetime.datetime, datetime.datetime]]
     """
-    # python : 0 => Mon
-    # postgresql : 1 => Mon
-    target_days = kwargs.get('target_days', [0, 1, 2, 3, 4, 5, 6])
-    remove_holiday = kwargs.get('remove_holiday', False)
-    target_days = [(d + 1) % 7 for d in target_days]  # convert to postgresql week days
-
-    yearly_periods = _divide_period_by_year(start_date, end_date)
+    sdt = datetime.datetime.combine(start_date, datetime.time(0, 0, 0, 0))
+    edt = datetime.datetime.combine(end_date, datetime.time(23, 59, 59, 0))
+    from_year = sdt.year
+    to_year = edt.year
 
-    from pyticas.tool.concurrent import Worker
-    worker = Worker(len(yearly_periods))
-    for (sdate, edate) in yearly_periods:
-        worker.add_task(_retrieve_data_from_db, route_id, operating_conditions, sdate, edate, start_time, end_time, target_days, remove_holiday)
+    time_periods = []
+    cursor = sdt
+    for y in range(from_year, to_year + 1):
+        last_date = datetime.datetime(y, 12, 31, 23, 59, 59, 0)
+        time_periods.append([cursor, min(last_date, edt)])
+        cursor = datetime.datetime(y + 1, 1, 1, 0, 0, 0, 0)
 
-    worker.run()
-    for oc in operating_conditions:
-        oc.results = sorted(oc.results, key=lambda item: item.tti.time)
+    return time_periods
 
 
-def _divide_period_by_year(start_date, end_date):
+def _divide_period_by_month(start_date, end_date):
     """
     :type start_date: datetime.date
     :type end_date: datetime.date
@@ -130,15 +136,17 @@ def _divide_period_by_year(start_date, end_date):
     """
     sdt = datetime.datetime.combine(start_date, datetime.time(0, 0, 0, 0))
     edt = datetime.datetime.combine(end_date, datetime.time(23, 59, 59, 0))
-    from_year = sdt.year
-    to_year = edt.year
 
     time_periods = []
     cursor = sdt
-    for y in range(from_year, to_year + 1):
-        last_date = datetime.datetime(y, 12, 31, 23, 59, 59, 0)
-        time_periods.append([cursor, min(last_date, edt)])
-        cursor = datetime.datetime(y + 1, 1, 1, 0, 0, 0, 0)
+    while cursor <= edt:
+        if cursor.month == 12:
+            next_month = datetime.datetime(cursor.year + 1, 1, 1, 0, 0, 0, 0)
+        else:
+            next_month = datetime.datetime(cursor.year, cursor.month + 1, 1, 0, 0, 0, 0)
+        last_time = next_month - datetime.timedelta(seconds=1)
+        time_periods.append([cursor, min(last_time, edt)])
+        cursor = next_month
 
     return time_periods
 
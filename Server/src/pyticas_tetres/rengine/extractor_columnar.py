@@ -0,0 +1,544 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar Extractor Module
+=========================
+
+- this module does the same job as ``extractor.extract_tt()`` without loading travel time data as DB model objects
+- travel time data and the non-traffic data linked to them are loaded as arrays with column queries
+- each filter function is evaluated once for each distinct linked data (e.g. one weather observation is linked to 12
+  travel time data in an hour), and the results are reduced to a boolean mask over the travel time data
+- `ExtData` objects are created only for the travel time data that passed the filters
+- yearly (or monthly) partitions can be queried in parallel by a pool of worker processes,
+  which is shared by all calls in the process
+
+    e.g.
+        extractor_columnar.extract_tt(route_id, sdate, edate, stime, etime, operating_conditions,
+                                      target_days=[0, 1, 2, 3, 4], remove_holiday=True)
+        for oc in operating_conditions:
+            tts = oc.columns.values['tt'][oc.rows]
+
+**important**
+linked data objects are shared by the travel time data,
+so `prev_time`, `prev_item` and `is_extended` attributes are not set by the filters using `keep_result_in_minute`
+"""
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+import concurrent.futures
+import datetime
+import json
+import multiprocessing
+import threading
+
+import numpy as np
+
+from pyticas import period
+from pyticas_tetres import cfg
+from pyticas_tetres.da import tt, tt_weather, tt_incident, tt_workzone, tt_specialevent, tt_snowmgmt
+from pyticas_tetres.db.tetres import conn
+from pyticas_tetres.logger import getLogger
+from pyticas_tetres.rengine.filter.ftypes import And_, Or_, ExtFilter, ExtData
+from pyticas_tetres.rengine.filter.ftypes import SLOT_WEATHER, SLOT_INCIDENT, SLOT_WORKZONE, SLOT_SPECIALEVENT, \
+    SLOT_SNOWMANAGEMENT
+
+TT_VALUE_COLUMNS = ['tt', 'vmt', 'speed', 'vht', 'dvh', 'lvmt', 'uvmt', 'cm', 'cmh', 'acceleration']
+
+# (slot name, data access class, columns of link table, attribute name of the external data model)
+LINK_SLOTS = [
+    (SLOT_WEATHER, tt_weather.TTWeatherDataAccess, [], '_weather'),
+    (SLOT_INCIDENT, tt_incident.TTIncidentDataAccess, ['distance', 'off_distance'], '_incident'),
+    (SLOT_WORKZONE, tt_workzone.TTWorkZoneDataAccess, ['loc_type', 'distance', 'off_distance'], '_workzone'),
+    (SLOT_SPECIALEVENT, tt_specialevent.TTSpecialeventDataAccess, ['distance', 'event_type'], '_specialevent'),
+    (SLOT_SNOWMANAGEMENT, tt_snowmgmt.TTSnowManagementDataAccess,
+     ['loc_type', 'distance', 'off_distance', 'road_status', 'recovery_level'], '_snowmgmt'),
+]
+
+_executor = None
+""":type: concurrent.futures.ProcessPoolExecutor """
+_executor_key = None
+_executor_lock = threading.Lock()
+
+
+class TTRow(object):
+    """ travel time data (stands for `TravelTime<year>` model in `ExtData`) """
+    __slots__ = ['id', 'route_id', 'time', 'meta_data'] + TT_VALUE_COLUMNS
+
+    def __init__(self, **kwargs):
+        for attr in self.__slots__:
+            setattr(self, attr, kwargs.get(attr, None))
+
+
+class LinkItem(object):
+    """ non-traffic data linked to travel time data (stands for `TTIncident<year>` model and so on in `ExtData`) """
+
+    def __init__(self, ext_attr, ext_model, columns, values):
+        """
+        :param ext_attr: attribute name of the external data model (e.g. '_incident')
+        :type ext_attr: str
+        :param ext_model: external data model (e.g. `Incident`)
+        :type columns: list[str]
+        :type values: tuple
+        """
+        setattr(self, ext_attr, ext_model)
+        for col, value in zip(columns, values):
+            setattr(self, col, value)
+        self.is_extended = False
+
+
+class LinkColumns(object):
+    def __init__(self, n_rows, owners, codes, items, single=False):
+        """
+        :param n_rows: number of travel time data
+        :type n_rows: int
+        :param owners: index of travel time data for each link
+        :type owners: numpy.ndarray
+        :param codes: index of `items` for each link
+        :type codes: numpy.ndarray
+        :param items: distinct linked data
+        :type items: list[LinkItem]
+        :param single: if True, only the first link of each travel time data is used (e.g. weather)
+        :type single: bool
+        """
+        order = np.argsort(owners, kind='stable')
+        owners, codes = owners[order], codes[order]
+        if single and len(owners):
+            _, first = np.unique(owners, return_index=True)
+            owners, codes = owners[first], codes[first]
+        self.single = single
+        self.owners = owners
+        self.codes = codes
+        self.items = items
+        self.counts = np.bincount(owners, minlength=n_rows)
+        self.starts = np.concatenate(([0], np.cumsum(self.counts)))
+        self._evaluated = {}
+
+    def data(self, idx):
+        """ return linked data of the travel time data in the same form with `ExtData`
+
+        :type idx: int
+        :rtype: Union(LinkItem, list[LinkItem])
+        """
+        items = [self.items[code] for code in self.codes[self.starts[idx]:self.starts[idx + 1]]]
+        if self.single:
+            return items[0] if items else []
+        return items
+
+    def apply(self, func):
+        """ evaluate filter function for each link
+
+        :type func: callable
+        :return: (result, whether exception is raised) for each link
+        :rtype: (numpy.ndarray, numpy.ndarray)
+        """
+        if func not in self._evaluated:
+            values = np.zeros(len(self.items), dtype=bool)
+            errors = np.zeros(len(self.items), dtype=bool)
+            for idx, item in enumerate(self.items):
+                try:
+                    values[idx] = bool(func(item))
+                except Exception:
+                    errors[idx] = True
+            self._evaluated[func] = (values[self.codes], errors[self.codes])
+        return self._evaluated[func]
+
+    def any(self, values):
+        """ reduce values of links to values of travel time data
+
+        :type values: numpy.ndarray
+        :rtype: numpy.ndarray
+        """
+        return np.bincount(self.owners, weights=values, minlength=len(self.counts)) > 0
+
+
+class TTColumns(object):
+    def __init__(self, route_id):
+        """
+        :type route_id: int
+        """
+        self.route_id = route_id
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.times = np.zeros(0, dtype='datetime64[s]')
+        self.values = {col: np.zeros(0, dtype=np.float64) for col in TT_VALUE_COLUMNS}
+        """:type: dict[str, numpy.ndarray]"""
+        self.meta_data = []
+        self.links = {}
+        """:type: dict[str, LinkColumns]"""
+        self._rows = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def seconds(self):
+        """ return times as seconds from epoch
+
+        :rtype: numpy.ndarray
+        """
+        return self.times.astype(np.int64)
+
+    def row(self, idx):
+        """
+        :type idx: int
+        :rtype: TTRow
+        """
+        row = self._rows.get(idx, None)
+        if row is None:
+            row = TTRow(id=int(self.ids[idx]), route_id=self.route_id, time=self.times[idx].astype(datetime.datetime),
+                        meta_data=self.meta_data[idx],
+                        **{col: _to_value(self.values[col][idx]) for col in TT_VALUE_COLUMNS})
+            self._rows[idx] = row
+        return row
+
+    def ext_data(self, idx):
+        """
+        :type idx: int
+        :rtype: ExtData
+        """
+        return ExtData(self.row(idx),
+                       self.links[SLOT_WEATHER].data(idx),
+                       self.links[SLOT_INCIDENT].data(idx),
+                       self.links[SLOT_WORKZONE].data(idx),
+                       self.links[SLOT_SPECIALEVENT].data(idx),
+                       self.links[SLOT_SNOWMANAGEMENT].data(idx))
+
+
+def extract_tt(route_id, start_date, end_date, start_time, end_time, operating_conditions, **kwargs):
+    """ same as ``extractor.extract_tt()``
+
+    - `columns` and `rows` of each operating condition are set to access the data as arrays
+    - if `n_processes` > 1, partitions of the period are queried in worker processes with their own DB connections,
+      and they are merged in time order before filtering
+      (filters are applied to the merged data, because `keep_result_in_minute` of a filter continues across partitions)
+
+    :type route_id: int
+    :type start_date: datetime.date
+    :type end_date: datetime.date
+    :type start_time: datetime.time
+    :type end_time: datetime.time
+    :type operating_conditions: list[pyticas_tetres.rengine.filter.ExtFilterGroup]
+    :param n_processes: number of worker processes to query partitions (queried in the current process if 1)
+    :type n_processes: int
+    :param partition: 'year' or 'month'
+    :type partition: str
+    :rtype: TTColumns
+    """
+    from pyticas_tetres.rengine import extractor
+
+    remove_holiday = kwargs.get('remove_holiday', False)
+    target_days = kwargs.get('target_days', [0, 1, 2, 3, 4, 5, 6])
+
+    # python : 0 => Mon
+    # postgresql : 1 => Mon
+    target_days = [(d + 1) % 7 for d in target_days]  # convert to postgresql week days
+
+    if kwargs.get('partition', 'year') == 'month':
+        periods = extractor._divide_period_by_month(start_date, end_date)
+    else:
+        periods = extractor._divide_period_by_year(start_date, end_date)
+
+    cols = load_columns(route_id, periods, start_time, end_time, target_days, remove_holiday,
+                        n_processes=kwargs.get('n_processes', 1), db_info=kwargs.get('db_info', None))
+
+    for ef in operating_conditions:
+        filter_columns(cols, ef)
+
+    return cols
+
+
+def load_columns(route_id, periods, start_time, end_time, target_days, remove_holiday, **kwargs):
+    """ load travel time data and linked non-traffic data as arrays
+
+    :type route_id: int
+    :param periods: time periods that are not across years (in time order)
+    :type periods: list[[datetime.datetime, datetime.datetime]]
+    :type start_time: datetime.time
+    :type end_time: datetime.time
+    :param target_days: postgresql week days (0 => Sun)
+    :type target_days: list[int]
+    :type remove_holiday: bool
+    :param n_processes: number of worker processes to query partitions (queried in the current process if 1)
+    :type n_processes: int
+    :param db_info: database information to connect in worker processes (default: `conn.get_db_info()`)
+    :type db_info: dict
+    :rtype: TTColumns
+    """
+    logger = getLogger(__name__)
+    query_kwargs = {'start_time': start_time, 'end_time': end_time, 'weekdays': target_days}
+    n_periods = len(periods)
+    n_processes = min(kwargs.get('n_processes', 1) or 1, n_periods)
+    db_info = kwargs.get('db_info', None) or conn.get_db_info()
+
+    if n_processes > 1 and db_info:
+        executor = _get_executor(kwargs['n_processes'], db_info)
+        # `map()` returns results in the order of the periods
+        partitions = list(executor.map(_query_partition,
+                                       [route_id] * n_periods,
+                                       [sdate for (sdate, edate) in periods],
+                                       [edate for (sdate, edate) in periods],
+                                       [query_kwargs] * n_periods,
+                                       [remove_holiday] * n_periods))
+    else:
+        partitions = [_query_partition(route_id, sdate, edate, query_kwargs, remove_holiday)
+                      for (sdate, edate) in periods]
+
+    cols = _merge_partitions(route_id, [(sdate.year, part) for (sdate, edate), part in zip(periods, partitions)])
+
+    n_no_weather = int(np.sum(cols.links[SLOT_WEATHER].counts == 0))
+    if n_no_weather:
+        logger.warning('No weather data for route(%d) : %d travel time data' % (route_id, n_no_weather))
+
+    return cols
+
+
+def _get_executor(n_processes, db_info):
+    """ return the pool of worker processes shared by ``load_columns()`` calls
+
+    - worker processes are spawned (not forked) not to share DB connections of this process
+    - the pool is made again if the number of processes or the database information is changed,
+      or if a worker process of the pool was terminated abruptly
+
+    :type n_processes: int
+    :type db_info: dict
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    global _executor, _executor_key
+
+    key = (n_processes, json.dumps(db_info, sort_keys=True, default=str))
+    with _executor_lock:
+        if _executor is not None and (_executor_key != key or getattr(_executor, '_broken', False)):
+            _executor.shutdown(wait=False)
+            _executor = None
+        if _executor is None:
+            _executor = concurrent.futures.ProcessPoolExecutor(max_workers=n_processes,
+                                                               mp_context=multiprocessing.get_context('spawn'),
+                                                               initializer=_initialize_worker,
+                                                               initargs=(db_info,))
+            _executor_key = key
+        return _executor
+
+
+def _initialize_worker(db_info):
+    """ initialize a worker process of ``load_columns()``
+
+    :type db_info: dict
+    """
+    conn.connect(db_info)
+
+
+def _query_partition(route_id, sdate, edate, query_kwargs, remove_holiday):
+    """ query travel time data and link data of a partition
+
+    :type route_id: int
+    :type sdate: datetime.datetime
+    :type edate: datetime.datetime
+    :type query_kwargs: dict
+    :type remove_holiday: bool
+    :return: None if there is no data, or dict of arrays
+             (`links` : {slot : (index of travel time data, (external data id, link column values...))})
+    :rtype: dict
+    """
+    prd = period.Period(sdate, edate, cfg.TT_DATA_INTERVAL)
+    sess = conn.get_session()
+    da_tt = tt.TravelTimeDataAccess(sdate.year, session=sess)
+    rows = da_tt.columns_by_period(route_id, prd, ['id', 'time', 'meta_data'] + TT_VALUE_COLUMNS, **query_kwargs)
+    if remove_holiday:
+        holidays = set(hday['date'] for hday in period.get_holidays(sdate.year))
+        rows = [row for row in rows if row[1].date() not in holidays]
+    if not rows:
+        return None
+
+    ids = np.array([row[0] for row in rows], dtype=np.int64)
+    part = {
+        'ids': ids,
+        'times': np.array([row[1] for row in rows], dtype='datetime64[s]'),
+        'values': {col: np.array([row[cidx + 3] for row in rows], dtype=np.float64)
+                   for cidx, col in enumerate(TT_VALUE_COLUMNS)},
+        'meta_data': [row[2] for row in rows],
+        'links': {},
+    }
+
+    id_order = np.argsort(ids)
+    sorted_ids = ids[id_order]
+    for slot, da_class, columns, ext_attr in LINK_SLOTS:
+        link_rows = da_class(sdate.year, session=sess).list_columns(route_id, prd, columns, **query_kwargs)
+        tt_ids = np.array([lrow[0] for lrow in link_rows], dtype=np.int64)
+        pos = np.minimum(np.searchsorted(sorted_ids, tt_ids), len(sorted_ids) - 1)
+        found = sorted_ids[pos] == tt_ids  # links of holidays are not found
+        part['links'][slot] = (id_order[pos[found]],
+                               [lrow[1:] for lrow, is_found in zip(link_rows, found) if is_found])
+
+    return part
+
+
+def _merge_partitions(route_id, partitions):
+    """ merge partitions in the given order, and load external data models of the links
+
+    :type route_id: int
+    :param partitions: list of (year, return value of ``_query_partition()``)
+    :type partitions: list[(int, dict)]
+    :rtype: TTColumns
+    """
+    sess = conn.get_session()
+    partitions = [(year, part) for (year, part) in partitions if part]
+    links = {slot: ([], [], {}) for (slot, _, _, _) in LINK_SLOTS}
+    n_rows = 0
+
+    for year, part in partitions:
+        for slot, _, _, _ in LINK_SLOTS:
+            owners, codes, distinct = links[slot]
+            part_owners, keys = part['links'][slot]
+            owners.append(n_rows + part_owners)
+            codes.append(np.array([distinct.setdefault(key, len(distinct)) for key in keys], dtype=np.int64))
+
+        n_rows += len(part['ids'])
+
+    cols = TTColumns(route_id)
+    if partitions:
+        cols.ids = np.concatenate([part['ids'] for (year, part) in partitions])
+        cols.times = np.concatenate([part['times'] for (year, part) in partitions])
+        cols.values = {col: np.concatenate([part['values'][col] for (year, part) in partitions])
+                       for col in TT_VALUE_COLUMNS}
+        cols.meta_data = [md for (year, part) in partitions for md in part['meta_data']]
+
+    for slot, da_class, columns, ext_attr in LINK_SLOTS:
+        owners, codes, distinct = links[slot]
+        # external data models are not partitioned by year, so they are loaded at once for all partitions
+        ext_models = {}
+        if distinct:
+            ext_models = da_class(partitions[0][0], session=sess).ext_models(key[0] for key in distinct)
+        items = [LinkItem(ext_attr, ext_models.get(key[0], None), columns, key[1:]) for key in distinct]
+        cols.links[slot] = LinkColumns(n_rows,
+                                       np.concatenate(owners) if owners else np.zeros(0, dtype=np.int64),
+                                       np.concatenate(codes) if codes else np.zeros(0, dtype=np.int64),
+                                       items,
+                                       single=(slot == SLOT_WEATHER))
+
+    return cols
+
+
+def filter_columns(cols, ef):
+    """ filter data with the operating condition, and add the passed data to `whole_data`
+
+    :type cols: TTColumns
+    :type ef: pyticas_tetres.rengine.filter.ExtFilterGroup
+    :return: boolean mask of the passed data
+    :rtype: numpy.ndarray
+    """
+    passed = np.ones(len(cols), dtype=bool)
+    errors = np.zeros(len(cols), dtype=bool)
+
+    # same as `ExtFilterGroup._check()`
+    for _filter in ef.ext_filters:
+        links = cols.links.get(_filter.name, None)
+        if links is None:
+            raise Exception('Invalid Data Filter : %s' % _filter.name)
+        skipped = passed & (links.counts == 0) if _filter.pass_on_nodata else np.zeros(len(cols), dtype=bool)
+        checked = passed & ~skipped
+        f_passed, f_errors = _check(_filter, cols, links, checked)
+        errors |= checked & f_errors
+        passed = skipped | (checked & f_passed & ~f_errors)
+
+    if errors.any():
+        getLogger(__name__).warning('%d travel time data are skipped by errors in filtering (%s)'
+                                    % (int(np.sum(errors)), ef.label))
+
+    rows = np.flatnonzero(passed)
+    ef.columns = cols
+    ef.rows = rows
+    ef.whole_data.extend(cols.ext_data(idx) for idx in rows)
+    return passed
+
+
+def _check(_filter, cols, links, target):
+    """ same as ``IExtFilter.check()`` for the target travel time data
+
+    :type _filter: pyticas_tetres.rengine.filter.ftypes.IExtFilter
+    :type cols: TTColumns
+    :type links: LinkColumns
+    :type target: numpy.ndarray
+    :return: (passed, exception is raised)
+    :rtype: (numpy.ndarray, numpy.ndarray)
+    """
+    errors = np.zeros(len(target), dtype=bool)
+
+    if isinstance(_filter, And_):
+        passed = target.copy()
+        for sub_filter in _filter.filters:
+            f_passed, f_errors = _check(sub_filter, cols, links, passed)
+            errors |= passed & f_errors
+            passed &= f_passed & ~f_errors
+        return passed, errors
+
+    if isinstance(_filter, Or_):
+        passed = np.zeros(len(target), dtype=bool)
+        remains = target.copy()
+        for sub_filter in _filter.filters:
+            f_passed, f_errors = _check(sub_filter, cols, links, remains)
+            errors |= remains & f_errors
+            passed |= remains & f_passed & ~f_errors
+            remains &= ~f_passed & ~f_errors
+        return passed, errors
+
+    if not isinstance(_filter, ExtFilter):
+        raise Exception('Unsupported filter type : %s' % type(_filter))
+
+    has_data = links.counts > 0
+    skipped = target & ~has_data if _filter.pass_on_nodata else np.zeros(len(target), dtype=bool)
+    checked = target & ~skipped
+
+    if links.single:
+        # a single item : filter functions are applied until one of them fails
+        # no item : same as empty list
+        passed = checked & has_data if _filter.filters else checked.copy()
+        for func in _filter.filters:
+            values, f_errors = links.apply(func)
+            row_values = np.zeros(len(target), dtype=bool)
+            row_errors = np.zeros(len(target), dtype=bool)
+            row_values[links.owners], row_errors[links.owners] = values, f_errors
+            errors |= passed & row_errors
+            passed &= row_values & ~row_errors
+    else:
+        # list of items : all filter functions are applied to all items
+        passed = checked.copy()
+        for func in _filter.filters:
+            values, f_errors = links.apply(func)
+            errors |= checked & links.any(f_errors)
+            has_passed = links.any(values & ~f_errors)
+            has_not_passed = links.any(~values & ~f_errors)
+            if _filter.all_items_should_pass:
+                passed &= has_passed & ~has_not_passed
+            else:
+                passed &= has_passed
+
+    if _filter.keep_result_in_minute:
+        _keep_result(_filter, cols, checked & ~errors, passed)
+
+    return skipped | passed, errors
+
+
+def _keep_result(_filter, cols, checked, passed):
+    """ same as the part of ``ExtFilter.check()`` using `keep_result_in_minute` (`passed` is updated)
+
+    :type _filter: ExtFilter
+    :type cols: TTColumns
+    :type checked: numpy.ndarray
+    :type passed: numpy.ndarray
+    """
+    seconds = cols.seconds()
+    prev_time = None
+    for idx in np.flatnonzero(checked):
+        if passed[idx]:
+            prev_time = seconds[idx]
+        elif prev_time is not None:
+            # `timedelta.seconds` does not include days
+            if ((seconds[idx] - prev_time) % 86400) / 60.0 < _filter.keep_result_in_minute:
+                passed[idx] = True
+            else:
+                prev_time = None
+
+
+def _to_value(v):
+    """
+    :type v: numpy.float64
+    :rtype: float
+    """
+    return None if np.isnan(v) else float(v)
@@ -195,6 +195,10 @@ class ExtFilterGroup(object):
         """:type: list[datetime.date]"""
         self.all_times = []
         """:type: list[datetime.time]"""
+        self.columns = None
+        """:type: pyticas_tetres.rengine.extractor_columnar.TTColumns"""
+        self.rows = None
+        """:type: numpy.ndarray"""  # indices of `whole_data` in `columns` (columnar extraction only)
 
     def _vmt(self, m_vmt=None):
         """
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Interval Index Module
+=====================
+
+- time-interval index that is shared by the categorization modules (incident, workzone, special event, snow management)
+- intervals are sorted by start time once, and all travel time timestamps are looked up in one sweep
+
+    e.g.
+        index = IntervalIndex()
+        for (distance, incd) in incidents:
+            index.add(incd.str2datetime(incd.cdts), incd.str2datetime(incd.xdts), (distance, incd))
+
+        times = [tti.str2datetime(tti.time) for tti in ttdata]
+        for tti, incds in zip(ttdata, index.find_all(times)):
+            ...
+
+"""
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class IntervalIndex(object):
+    def __init__(self, include_end=True):
+        """
+        :param include_end: if False, an interval does not include its end time (`start <= dt < end`)
+        :type include_end: bool
+        """
+        self.include_end = include_end
+        self._intervals = []
+        """:type: list[(datetime.datetime, datetime.datetime, object)] """
+        self._start_order = None
+        """:type: list[int] """
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def add(self, start, end, value):
+        """ add interval
+
+        :type start: datetime.datetime
+        :type end: datetime.datetime
+        :param value: value returned when a time is in the interval
+        :type value: object
+        """
+        self._intervals.append((start, end, value))
+        self._start_order = None
+
+    def find(self, dt):
+        """ return values of the intervals including the given time
+
+        :type dt: datetime.datetime
+        :rtype: list[object]
+        """
+        return self.find_all([dt])[0]
+
+    def find_all(self, times):
+        """ return values of the intervals including each time
+
+        - values of a time are returned in the order in which the intervals were added
+        - `times` do not need to be sorted
+
+        :type times: list[datetime.datetime]
+        :rtype: list[list[object]]
+        """
+        if self._start_order is None:
+            self._start_order = sorted(range(len(self._intervals)), key=lambda idx: self._intervals[idx][0])
+
+        res = [[] for _ in times]
+        if not self._intervals:
+            return res
+
+        n_intervals = len(self._intervals)
+        next_pos = 0
+        active = {}
+        for tidx in sorted(range(len(times)), key=lambda idx: times[idx]):
+            dt = times[tidx]
+
+            # open intervals started before `dt`
+            while next_pos < n_intervals:
+                idx = self._start_order[next_pos]
+                if self._intervals[idx][0] > dt:
+                    break
+                active[idx] = self._intervals[idx]
+                next_pos += 1
+
+            # close intervals ended before `dt` (times are visited in ascending order)
+            expired = [idx for idx, (start, end, value) in active.items()
+                       if end < dt or (end == dt and not self.include_end)]
+            for idx in expired:
+                del active[idx]
+
+            if active:
+                res[tidx] = [active[idx][2] for idx in sorted(active)]
+
+        return res
@@ -1,15 +1,119 @@
 # -*- coding: utf-8 -*-
 
+import math
 import sys
 
+import numpy as np
+
 from pyticas import route
 from pyticas.logger import getLogger
 from pyticas.rn import geo
 from pyticas.tool import distance as distutil
+from pyticas.tool.cache import LRUCache
 from pyticas_tetres.ttypes import LOC_TYPE
 
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+CORRIDOR_INDEX_CACHE_SIZE = 500
+
+# corridor objects are keyed by (name, infra_cfg_date),
+# so indices of an old infra configuration are not used after the infra is updated
+_index_cache = LRUCache(maxsize=CORRIDOR_INDEX_CACHE_SIZE)
+
+
+class _CorridorIndex(object):
+    def __init__(self, corr):
+        """ coordinates and cumulative mile points of rnodes in a corridor
+
+        :type corr: pyticas.ttypes.CorridorObject
+        """
+        self.rnodes = list(corr.rnodes)
+        """:type: list[pyticas.ttypes.RNodeObject] """
+
+        self.rnode_index = {rn.name: idx for idx, rn in enumerate(self.rnodes)}
+        self.lats = np.array([float(rn.lat) for rn in self.rnodes], dtype=np.float64)
+        self.lons = np.array([float(rn.lon) for rn in self.rnodes], dtype=np.float64)
+
+        # mile point of each rnode from the most upstream rnode of the corridor
+        self.mile_points = np.zeros(len(self.rnodes), dtype=np.float64)
+        for idx in range(1, len(self.rnodes)):
+            self.mile_points[idx] = (self.mile_points[idx - 1]
+                                     + distutil.distance_in_mile(self.rnodes[idx - 1], self.rnodes[idx]))
+
+        self.mile_point_map = geo.get_mile_point_map(self.rnodes)
+        """:type: dict[str, float] """
+
+    def find_updown(self, lat, lon, d_limit=1):
+        """ same as `geo.find_updown_rnodes()`, but returns rnode indices
+
+        :type lat: float
+        :type lon: float
+        :type d_limit: float
+        :rtype: (int, int)
+        """
+        if not self.rnodes:
+            return None, None
+
+        dists = distutil.distances_in_mile_with_coordinate(lat, lon, self.lats, self.lons)
+        dists[dists > d_limit] = np.inf
+        nb_index = int(np.argmin(dists))
+        if np.isinf(dists[nb_index]):
+            return None, None
+
+        n_rnodes = len(self.rnodes)
+        if n_rnodes < 2:
+            return None, None
+
+        ref_index = nb_index - 1 if nb_index > 0 else nb_index + 1
+
+        # find algle 'p0 -> p1 -> p2'
+        p0 = (lat, lon)
+        p1 = (self.lats[nb_index], self.lons[nb_index])
+        p2 = (self.lats[ref_index], self.lons[ref_index])
+        a = (p1[0] - p0[0]) ** 2 + (p1[1] - p0[1]) ** 2
+        b = (p1[0] - p2[0]) ** 2 + (p1[1] - p2[1]) ** 2
+        c = (p2[0] - p0[0]) ** 2 + (p2[1] - p0[1]) ** 2
+        angle = math.acos((a + b - c) / math.sqrt(4 * a * b)) * (180 / math.pi)
+
+        if nb_index > 0:
+            if angle <= 90:
+                return ref_index, nb_index
+            else:
+                return nb_index, nb_index + 1 if nb_index < n_rnodes - 1 else None
+        else:
+            if angle <= 90:
+                return nb_index, ref_index
+            else:
+                return None, nb_index
+
+
+@_index_cache.cache
+def _corridor_index(corr):
+    """
+    :type corr: pyticas.ttypes.CorridorObject
+    :rtype: _CorridorIndex
+    """
+    return _CorridorIndex(corr)
+
+
+@_index_cache.cache
+def _mile_point_map(corrs):
+    """ distance map from the most upstream of corridor for a route through multiple corridor
+
+    :type corrs: list[pyticas.ttypes.CorridorObject]
+    :rtype: dict[str, float]
+    """
+    mmap = {}
+    last_mp = 0
+    for corr in corrs:
+        t_mmap = dict(_corridor_index(corr).mile_point_map)
+        for rn_name, mp in t_mmap.items():
+            t_mmap[rn_name] = mp + last_mp
+        last_mp = t_mmap[corr.rnodes[-1].name]
+        mmap.update(t_mmap)
+    return mmap
+
+
 def location(host, guest):
     """
 
@@ -29,15 +133,7 @@ def location(host, guest):
     # for a route through multiple corridor
     corrs1 = route.corridors(host)
     corrs2 = route.corridors(guest)
-    corrs = corrs1 if len(corrs1) >= len(corrs2) else corrs2
-    mmap = {}
-    last_mp = 0
-    for corr in corrs:
-        t_mmap = geo.get_mile_point_map(corr.rnodes)
-        for rn_name, mp in t_mmap.items():
-            t_mmap[rn_name] = mp + last_mp
-        last_mp = t_mmap[corr.rnodes[-1].name]
-        mmap.update(t_mmap)
+    mmap = _mile_point_map(corrs1 if len(corrs1) >= len(corrs2) else corrs2)
 
     s1mp = mmap.get(s1.name, None)
     e1mp = mmap.get(e1.name, None)
@@ -87,41 +183,28 @@ def location_by_coordinate(r, lat, lon):
     :rtype: float
     """
     upstream_rnode = r.rnodes[0]
-    corr = upstream_rnode.corridor
-    (upnode, dnnode) = geo.find_updown_rnodes(lat, lon, corr.rnodes, d_limit=1)
-    if not upnode:
+    corr_index = _corridor_index(upstream_rnode.corridor)
+    (up_index, dn_index) = corr_index.find_updown(lat, lon, d_limit=1)
+    start_index = corr_index.rnode_index.get(upstream_rnode.name, None)
+    if up_index is None or start_index is None:
         return False
 
-    f_done = False
+    mile_points = corr_index.mile_points
 
     # check to downstream
-    dist = distutil.distance_in_mile_with_coordinate(upnode.lat, upnode.lon, lat, lon)
-    cur_node = upstream_rnode
-    for next_node in geo.iter_to_downstream(upstream_rnode):
-        dist += distutil.distance_in_mile(cur_node, next_node)
-        if upnode == next_node:
-            f_done = True
-            break
-        cur_node = next_node
-
-    if not f_done:
-        # check to upstream
-        dist = distutil.distance_in_mile_with_coordinate(dnnode.lat, dnnode.lon, lat, lon)
-        cur_node = upstream_rnode
-        for next_node in geo.iter_to_upstream(upstream_rnode):
-            dist += distutil.distance_in_mile(cur_node, next_node)
-            if dnnode == next_node:
-                f_done = True
-                break
-            cur_node = next_node
-        if f_done:
-            dist = -1 * dist
-
-    if f_done:
-        return dist
-    else:
-        return False
-
+    if up_index > start_index:
+        return float(distutil.distance_in_mile_with_coordinate(corr_index.lats[up_index], corr_index.lons[up_index],
+                                                               lat, lon)
+                     + mile_points[up_index] - mile_points[start_index])
+
+    # check to upstream
+    # (`up_rnode` of rnodes is linked to the second rnode of the corridor at the most)
+    if dn_index is not None and 0 < dn_index < start_index:
+        return -1 * float(distutil.distance_in_mile_with_coordinate(corr_index.lats[dn_index], corr_index.lons[dn_index],
+                                                                    lat, lon)
+                          + mile_points[start_index] - mile_points[dn_index])
+
+    return False
 
 
 def minimum_distance(r, lat, lon):
@@ -195,3 +195,4 @@ def _update_lanecfg(r, lane_cfg_map):
                 ns.node2.node_config = wz_cfg
 
     route_config.organize(r.cfg)
+    r.invalidate_detector_checker()
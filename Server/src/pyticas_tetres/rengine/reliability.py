@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
 
+import bisect
 import datetime
 import statistics
 
+import numpy as np
+
 from pyticas import rc
 from pyticas.moe.moe import VIRTUAL_RNODE_DISTANCE
 from pyticas.tool import num
@@ -31,25 +34,72 @@ def calculate(ttri, extdata_list):
     :rtype: dict
     """
     # Preparing travel time data
-    tts = [extdata.tti.tt for extdata in extdata_list if extdata.tti.tt > 0]
+    tts = sorted(extdata.tti.tt for extdata in extdata_list if extdata.tti.tt > 0)
 
     if not tts:
         return None
 
+    return _calculate_sorted(tts, _tt_by_freeflowspeed(ttri), milepoint_routeLength(ttri))
+
+
+def calculate_groups(ttri, tts, keys):
+    """ calculate reliabilities of travel time data for each group
+
+    - data are sorted once by (group key, travel time),
+      and all indices of a group are calculated from its sorted travel times
+    - groups without valid travel time (> 0) are not included in the result
+
+        e.g. time-of-day reliabilities of each year
+            keys = years * 1440 + minutes_of_day
+            res = reliability.calculate_groups(ttri, tts, keys)
+
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :type tts: numpy.ndarray
+    :param keys: group key of each travel time
+    :type keys: numpy.ndarray
+    :rtype: dict[int, dict]
+    """
+    tts = np.asarray(tts, dtype=np.float64)
+    keys = np.asarray(keys, dtype=np.int64)
+    valid = tts > 0
+    tts, keys = tts[valid], keys[valid]
+    if not len(tts):
+        return {}
+
+    order = np.lexsort((tts, keys))
+    tts, keys = tts[order], keys[order]
+    bounds = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate(([0], bounds))
+    ends = np.concatenate((bounds, [len(tts)]))
+
+    ffs_tt = _tt_by_freeflowspeed(ttri)
+    route_length = milepoint_routeLength(ttri)
+    return {int(keys[sidx]): _calculate_sorted(tts[sidx:eidx].tolist(), ffs_tt, route_length)
+            for sidx, eidx in zip(starts, ends)}
+
+
+def _calculate_sorted(tts, ffs_tt, route_length):
+    """
+
+    :param tts: sorted travel times (> 0)
+    :type tts: list[float]
+    :param ffs_tt: travel time by free flow speed
+    :type ffs_tt: float
+    :type route_length: float
+    :rtype: dict
+    """
     # Calculating reference travel times
     avg_tt = statistics.mean(tts)
-    median_tt = statistics.median(tts)
-    #tt_rate = avg_tt / ttri.route.length()
-    tt_rate = avg_tt / milepoint_routeLength(ttri)
-    ffs_tt = _tt_by_freeflowspeed(ttri) 
-    congested_tts = _congested_travel_times(ffs_tt, tts)
+    median_tt = _percentile_sorted(tts, 0.5)
+    tt_rate = avg_tt / route_length
+    congested_tts = tts[bisect.bisect_right(tts, ffs_tt * CONGESTED_HOUR_FACTOR):]
     congested_avg_tt = statistics.mean(congested_tts) if congested_tts else MISSING_VALUE
 
     # Travel Time Index
     traveltime_index = (congested_avg_tt /ffs_tt ) if congested_tts else  MISSING_VALUE
 
     # Misery Index
-    misery_index = (num.percentile(tts, 0.975) / ffs_tt)
+    misery_index = (_percentile_sorted(tts, 0.975) / ffs_tt)
 
     # Buffer Index and Planning Time Index
     percentiles = [0.5, 0.8, 0.85, 0.9, 0.95]
@@ -62,7 +112,7 @@ def calculate(ttri, extdata_list):
     for idx, pct in enumerate(percentiles):
 
         ipct = ipercentiles[idx]
-        pct_tt = num.percentile(tts, pct)
+        pct_tt = _percentile_sorted(tts, pct)
         percentile_tts[ipct] = pct_tt
         if pct < 0.8:
             continue
@@ -75,20 +125,19 @@ def calculate(ttri, extdata_list):
         buffer_indice[ipct] = bi
         buffer_indice_median[ipct] = bim
         planning_indice[ipct] = (pct_tt / ffs_tt)
-        traveltime_Rate[ipct]= pct_tt/milepoint_routeLength(ttri)
-        
+        traveltime_Rate[ipct]= pct_tt / route_length
 
     # Level of Travel Time Reliability (FHWA)
     #    - source: https://www.fhwa.dot.gov/tpm/faq.cfm
     lottr = percentile_tts[80] / percentile_tts[50]
 
     # On-Time-Arrival
-    ontime_tt = RATE_FOR_ON_TIME_RATE * num.percentile(tts, 0.5)
-    ontime_count = len([tt for tt in tts if tt < ontime_tt])
+    ontime_tt = RATE_FOR_ON_TIME_RATE * percentile_tts[50]
+    ontime_count = bisect.bisect_left(tts, ontime_tt)
     on_time_arrival = ontime_count / len(tts)
 
     # Semi-Variance
-    tts_for_sv = [tt for tt in tts if tt > avg_tt]
+    tts_for_sv = tts[bisect.bisect_right(tts, avg_tt):]
     if len(tts_for_sv) > N_LIMIT_FOR_SEMI_VAR:
         semi_variance = num.variance(tts_for_sv)
     else:
@@ -120,6 +169,22 @@ def calculate(ttri, extdata_list):
     return res
 
 
+def _percentile_sorted(sdata, p):
+    """ same as ``num.percentile()`` with linear interpolation for sorted data
+
+    :type sdata: list[float]
+    :type p: float
+    :rtype: float
+    """
+    N = len(sdata)
+    realIndex = p * (N - 1)
+    idx = int(realIndex)
+    frac = realIndex - idx
+    if idx + 1 < N:
+        return sdata[idx] * (1 - frac) + sdata[idx + 1] * frac
+    return sdata[idx]
+
+
 def calculate_old(ttri, sdate, edate, stime, etime):
     """
 
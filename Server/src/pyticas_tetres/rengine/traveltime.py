@@ -1,29 +1,35 @@
 # -*- coding: utf-8 -*-
+import concurrent.futures
+import gc
 import json
-import statistics
-import sys
+import multiprocessing
+import time
 from typing import List
 
 import numpy as np
 from colorama import Fore
+from pyticas import ticas
 from pyticas.cfg import MISSING_VALUE
 from pyticas.moe import moe
 from pyticas.moe.imputation import spatial_avg
 from pyticas.moe.mods import total_flow_with_virtual_nodes, speed_with_virtual_nodes, density_with_virtual_nodes
 from pyticas.moe.mods.accel import _calculate_accel
-from pyticas.moe.mods.cm import calculate_cm_dynamically
-from pyticas.moe.mods.cmh import calculate_cmh_dynamically
-from pyticas.moe.mods.dvh import calculate_dvh_dynamically
-from pyticas.moe.mods.lvmt import calculate_lvmt_dynamically
-from pyticas.moe.mods.uvmt import calculate_uvmt_dynamically
-from pyticas.moe.mods.vht import calculate_vht_dynamically
-from pyticas.moe.mods.vmt import calculate_vmt_dynamically
+from pyticas.moe.mods.cm import calculate_cm_array
+from pyticas.moe.mods.cmh import calculate_cmh_array
+from pyticas.moe.mods.dvh import calculate_dvh_array
+from pyticas.moe.mods.lvmt import calculate_lvmt_array
+from pyticas.moe.mods.uvmt import calculate_uvmt_array
+from pyticas.moe.mods.vht import calculate_vht_array
+from pyticas.moe.mods.vmt import calculate_vmt_array
 from pyticas.rc import route_config
 from pyticas.tool import tb
 from pyticas.ttypes import RNodeData
+from pyticas_tetres import cfg
 from pyticas_tetres.cfg import TT_DATA_INTERVAL
 from pyticas_tetres.da.route import TTRouteDataAccess
 from pyticas_tetres.da.tt import TravelTimeDataAccess
+from pyticas_tetres.db.tetres import conn
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.ttypes import RouteWiseMOEParametersInfo
 from pyticas_tetres.util.noop_context import nonop_with
@@ -39,11 +45,21 @@ Travel Time Calculation
 
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+# number of travel time data to be recalculated at once in `recalculate_moe_values_from_meta_data()`
+RECALCULATION_CHUNK_SIZE = 2000
+
+# columns updated when travel time data of the same route and time exist
+UPDATABLE_MOE_COLUMNS = ['tt', 'speed', 'vmt', 'vht', 'dvh', 'lvmt', 'uvmt', 'cm', 'cmh', 'acceleration', 'meta_data']
+
 
 def calculate_all_routes(prd, **kwargs):
     """ calculate travel time, average speed and VMT during the given time period
     and put whole_data to database (travel time table)
 
+    - routes are calculated in `n_processes` worker processes
+      and the calculated data are saved by the calling process
+    - routes are calculated one by one in the calling process if `n_processes` is 1
+
     :type prd: pyticas.ttypes.Period
     :rtype: list[dict]
     """
@@ -55,6 +71,13 @@ def calculate_all_routes(prd, **kwargs):
     routes = ttr_route_da.list()
     ttr_route_da.close_session()
     total = len(routes)
+
+    n_processes = min(kwargs.get('n_processes', cfg.N_PROCESSES_FOR_TT_CALCULATION), total)
+    db_info = kwargs.get('db_info', None) or conn.get_db_info()
+    if n_processes > 1 and db_info:
+        return _calculate_all_routes_in_processes(prd, routes, n_processes, db_info,
+                                                  lock=kwargs.get('lock', nonop_with()))
+
     for ridx, ttri in enumerate(routes):
         logger.info('(%d/%d) calculating travel time for %s(%s) : %s'
                     % ((ridx + 1), total, ttri.name, ttri.id, prd.get_period_string()))
@@ -64,6 +87,106 @@ def calculate_all_routes(prd, **kwargs):
     return res
 
 
+def _calculate_all_routes_in_processes(prd, routes, n_processes, db_info, **kwargs):
+    """ calculate travel times of routes in worker processes and save them in this process
+
+    :type prd: pyticas.ttypes.Period
+    :type routes: list[pyticas_tetres.ttypes.TTRouteInfo]
+    :type n_processes: int
+    :type db_info: dict
+    :rtype: list[dict]
+    """
+    logger = getLogger(__name__)
+    lock = kwargs.get('lock', nonop_with())
+    total = len(routes)
+    done = {}
+
+    da_tt = TravelTimeDataAccess(prd.start_date.year)
+    with _route_executor(n_processes, db_info) as executor:
+        futures = {executor.submit(_calculate_route_in_worker, prd, ttri.id): ttri for ttri in routes}
+        for ridx, future in enumerate(concurrent.futures.as_completed(futures)):
+            ttri = futures[future]
+            try:
+                tt_data_list = future.result()
+            except Exception as ex:
+                # e.g. the worker process is terminated abruptly
+                logger.warning('fail to calculate travel time for %s(%s) : %s' % (ttri.name, ttri.id, str(ex)))
+                tt_data_list = None
+
+            logger.info('(%d/%d) travel time for %s(%s) is calculated : %s'
+                        % ((ridx + 1), total, ttri.name, ttri.id, prd.get_period_string()))
+            if not tt_data_list:
+                logger.warning('fail to calculate travel time for %s(%s)' % (ttri.name, ttri.id))
+                done[ttri.id] = False
+                continue
+
+            with lock:
+                is_deleted = da_tt.delete_range(ttri.id, prd.start_date, prd.end_date, print_exception=True)
+                if not is_deleted or not da_tt.commit():
+                    logger.warning('fail to delete the existing travel time data')
+                    done[ttri.id] = False
+                    continue
+            done[ttri.id] = _insert_tt_data(da_tt, tt_data_list, lock)
+            result_cache.invalidate([ttri.id], prd.start_date, prd.end_date)
+    da_tt.close_session()
+
+    return [{'route_id': ttri.id, 'done': done.get(ttri.id, False)} for ttri in routes]
+
+
+def _route_executor(n_processes, db_info):
+    """ return a pool of worker processes for ``_calculate_all_routes_in_processes()``
+
+    - worker processes are spawned (not forked) not to share DB connections and data of this process
+
+    :type n_processes: int
+    :type db_info: dict
+    :rtype: concurrent.futures.ProcessPoolExecutor
+    """
+    return concurrent.futures.ProcessPoolExecutor(max_workers=n_processes,
+                                                  mp_context=multiprocessing.get_context('spawn'),
+                                                  initializer=_initialize_route_worker,
+                                                  initargs=(ticas._TICAS_.data_path, db_info))
+
+
+_worker_route_da = None
+""":type: TTRouteDataAccess """
+
+
+def _initialize_route_worker(data_path, db_info):
+    """ initialize a worker process of ``_calculate_all_routes_in_processes()``
+
+    :type data_path: str
+    :type db_info: dict
+    """
+    global _worker_route_da
+    from pyticas.infra import Infra
+    ticas.initialize(data_path)
+    Infra.get_infra()
+    conn.connect(db_info)
+    _worker_route_da = TTRouteDataAccess()
+
+
+def _calculate_route_in_worker(prd, ttr_id):
+    """ calculate travel time data of a route in a worker process
+
+    :type prd: pyticas.ttypes.Period
+    :type ttr_id: int
+    :rtype: list[dict]
+    """
+    logger = getLogger(__name__)
+    try:
+        ttri = _worker_route_da.get_by_id(ttr_id)
+        if not ttri:
+            logger.warning('route is not found (%s)' % ttr_id)
+            return None
+        return _calculate_tt_data(prd, ttri)
+    except Exception as ex:
+        logger.warning(tb.traceback(ex, f_print=False))
+        return None
+    finally:
+        gc.collect()
+
+
 def print_rnode_data(lst: List[RNodeData]) -> None:
     for i in range(len(lst)):
         print(f"> {Fore.MAGENTA}Title[{lst[i].get_title(no_lane_info=True)}] DataListLength[{len(lst[i].data)}]")
@@ -82,7 +205,6 @@ def calculate_a_route(prd, ttri, **kwargs):
         da_tt = TravelTimeDataAccess(prd.start_date.year, session=dbsession)
     else:
         da_tt = TravelTimeDataAccess(prd.start_date.year)
-    creatable_list = list()
     lock = kwargs.get('lock', nonop_with())
     # delete data to avoid duplicated data
     with lock:
@@ -93,13 +215,34 @@ def calculate_a_route(prd, ttri, **kwargs):
                 da_tt.close_session()
             return False
 
+    creatable_list = _calculate_tt_data(prd, ttri)
+    if not creatable_list:
+        logger.warning('fail to calculate travel time')
+        result_cache.invalidate([ttri.id], prd.start_date, prd.end_date)
+        return False
+
+    inserted_ids = _insert_tt_data(da_tt, creatable_list, lock)
+    if not dbsession:
+        da_tt.close_session()
+    result_cache.invalidate([ttri.id], prd.start_date, prd.end_date)
+    return inserted_ids
+
+
+def _calculate_tt_data(prd, ttri):
+    """ calculate travel time, average speed and VMT of a route
+
+    :type prd: pyticas.ttypes.Period
+    :type ttri: pyticas_tetres.ttypes.TTRouteInfo
+    :return: travel time data to be inserted into travel time table
+    :rtype: list[dict]
+    """
     print(f"{Fore.GREEN}CALCULATING TRAVEL-TIME FOR ROUTE[{ttri.name}]")
     res_dict = _calculate_tt(ttri.route, prd)
 
     if not res_dict or not res_dict['tt']:
-        logger.warning('fail to calculate travel time')
-        return False
+        return None
 
+    creatable_list = list()
     travel_time_results = res_dict['tt']
     travel_time = travel_time_results[-1].data
     avg_speeds = _route_avgs(res_dict['speed'])
@@ -115,14 +258,24 @@ def calculate_a_route(prd, ttri, **kwargs):
             'vmt': res_vmt[index],
         }
         creatable_list.append(tt_data)
+    return creatable_list
+
+
+def _insert_tt_data(da_tt, creatable_list, lock):
+    """
+
+    :type da_tt: TravelTimeDataAccess
+    :type creatable_list: list[dict]
+    :return: inserted ids
+    :rtype: list[int]
+    """
     inserted_ids = list()
     if creatable_list:
         with lock:
-            inserted_ids = da_tt.bulk_insert(creatable_list)
+            inserted_ids = da_tt.copy_insert(creatable_list)
             if not inserted_ids or not da_tt.commit():
+                logger = getLogger(__name__)
                 logger.warning('fail to insert the calculated travel time into database')
-    if not dbsession:
-        da_tt.close_session()
     return inserted_ids
 
 
@@ -165,85 +318,139 @@ def _calculate_tt(r, prd, **kwargs):
         getLogger(__name__).warning(tb.traceback(ex))
 
 
-def generate_meta_data(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data, density_with_virtual_nodes_data,
-                       flow_objects_with_virtual_nodes, flow_data_without_virtual_nodes,
-                       speed_data_without_virtual_nodes, density_data_without_virtual_nodes,
-                       speed_without_virtual_nodes, mrf_data, acceleration_data, moe_param_config, time_index):
+def generate_meta_data_list(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data, density_with_virtual_nodes_data,
+                            flow_objects_with_virtual_nodes, flow_data_without_virtual_nodes,
+                            speed_data_without_virtual_nodes, density_data_without_virtual_nodes,
+                            speed_without_virtual_nodes, mrf_data, acceleration_data, moe_param_config):
+    """ generate meta data of all time steps
+
+    :return: list of meta data dict for each time step
+    :rtype: list[dict]
+    """
     logger = getLogger(__name__)
-    raw_meta_data = {
-        "flow": [],
-        "speed": [],
-        "density": [],
-        "flow_without_virtual_nodes": [each_station_data[time_index] for each_station_data in flow_data_without_virtual_nodes],
-        "speed_without_virtual_nodes": [each_station_data[time_index] for each_station_data in speed_data_without_virtual_nodes],
-        "density_without_virtual_nodes": [each_station_data[time_index] for each_station_data in density_data_without_virtual_nodes],
-        "accelerations": [each_station_data[time_index] for each_station_data in acceleration_data],
-        "lanes": [],
-        "speed_limit": [],
-        "speed_average": 0,
-        "speed_variance": 0,
-        "speed_max_u": 0,
-        "speed_min_u": 0,
-        "speed_difference": 0,
-        "number_of_vehicles_entered": 0,
-        "number_of_vehicles_exited": 0,
-        "moe_lane_capacity": moe_param_config.moe_lane_capacity,
-        "moe_critical_density": moe_param_config.moe_critical_density,
-        "moe_congestion_threshold_speed": moe_param_config.moe_congestion_threshold_speed}
-    for flow, speed, flow_object, density in zip(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data,
-                                                 flow_objects_with_virtual_nodes, density_with_virtual_nodes_data):
-        raw_meta_data['flow'].append(flow[time_index])
-        raw_meta_data['speed'].append(speed[time_index])
-        raw_meta_data['density'].append(density[time_index])
-        raw_meta_data['lanes'].append(flow_object.lanes)
-        raw_meta_data['speed_limit'].append(flow_object.speed_limit)
-    speed_meta_data = list()
-    for speed_rnode_data in speed_without_virtual_nodes:
-        if speed_rnode_data and speed_rnode_data.data:
-            speed_data = speed_rnode_data.data
-            if speed_data[time_index] and speed_data[time_index] != MISSING_VALUE:
-                speed_meta_data.append(speed_data[time_index])
+    n_data = len(flow_with_virtual_nodes_data[0]) if flow_with_virtual_nodes_data else 0
+
+    speed_stats = _speed_stats([rnd.data for rnd in speed_without_virtual_nodes if rnd and rnd.data], n_data)
+    n_entered, n_exited = [0] * n_data, [0] * n_data
     if mrf_data:
         try:
-            ent_data = [rnd.data[time_index] for rnd in mrf_data
-                        if rnd.data[time_index] > 0 and not isinstance(rnd.rnode, str) and rnd.rnode.is_entrance()]
-            ent_total = sum(ent_data)
-            raw_meta_data["number_of_vehicles_entered"] = ent_total
+            n_entered = _positive_total([rnd.data for rnd in mrf_data
+                                         if not isinstance(rnd.rnode, str) and rnd.rnode.is_entrance()], n_data)
         except Exception as e:
             logger.warning('fail to calculate number of vehicles entered. Error: {}'.format(e))
         try:
-            ext_data = [rnd.data[time_index] for rnd in mrf_data
-                        if rnd.data[time_index] > 0 and not isinstance(rnd.rnode, str) and rnd.rnode.is_exit()]
-
-            ext_total = sum(ext_data)
-            raw_meta_data["number_of_vehicles_exited"] = ext_total
+            n_exited = _positive_total([rnd.data for rnd in mrf_data
+                                        if not isinstance(rnd.rnode, str) and rnd.rnode.is_exit()], n_data)
         except Exception as e:
             logger.warning('fail to calculate number of vehicles exited. Error: {}'.format(e))
-    try:
-        avg = statistics.mean(speed_meta_data)
-        raw_meta_data["speed_average"] = avg
-    except Exception as e:
-        logger.warning('fail to calculate speed average. Error: {}'.format(e))
-    try:
-        variance = statistics.variance(speed_meta_data)
-        raw_meta_data["speed_variance"] = variance
-    except Exception as e:
-        logger.warning('fail to calculate speed variance. Error: {}'.format(e))
-    try:
-        max_u = max(speed_meta_data)
-        raw_meta_data["speed_max_u"] = max_u
-    except Exception as e:
-        logger.warning('fail to calculate speed max. Error: {}'.format(e))
-    try:
-        min_u = min(speed_meta_data)
-        raw_meta_data["speed_min_u"] = min_u
-    except Exception as e:
-        logger.warning('fail to calculate speed min. Error: {}'.format(e))
-    try:
-        raw_meta_data["speed_difference"] = max_u - min_u
-    except Exception:
-        pass
-    return raw_meta_data
+
+    lanes = [flow_object.lanes for flow_object in flow_objects_with_virtual_nodes]
+    speed_limits = [flow_object.speed_limit for flow_object in flow_objects_with_virtual_nodes]
+
+    # station x time data are transposed once to time x station
+    columns = [
+        list(zip(*data)) if data else [()] * n_data
+        for data in [flow_with_virtual_nodes_data, speed_with_virtual_nodes_data, density_with_virtual_nodes_data,
+                     flow_data_without_virtual_nodes, speed_data_without_virtual_nodes,
+                     density_data_without_virtual_nodes, acceleration_data]
+    ]
+
+    meta_data_list = []
+    for (flow, speed, density, flow_wo, speed_wo, density_wo, accel,
+         avg, variance, max_u, min_u, n_ent, n_ext) in zip(*columns, *speed_stats, n_entered, n_exited):
+        meta_data_list.append({
+            "flow": list(flow),
+            "speed": list(speed),
+            "density": list(density),
+            "flow_without_virtual_nodes": list(flow_wo),
+            "speed_without_virtual_nodes": list(speed_wo),
+            "density_without_virtual_nodes": list(density_wo),
+            "accelerations": list(accel),
+            "lanes": lanes,
+            "speed_limit": speed_limits,
+            "speed_average": avg,
+            "speed_variance": variance,
+            "speed_max_u": max_u,
+            "speed_min_u": min_u,
+            "speed_difference": max_u - min_u,
+            "number_of_vehicles_entered": n_ent,
+            "number_of_vehicles_exited": n_ext,
+            "moe_lane_capacity": moe_param_config.moe_lane_capacity,
+            "moe_critical_density": moe_param_config.moe_critical_density,
+            "moe_congestion_threshold_speed": moe_param_config.moe_congestion_threshold_speed})
+    return meta_data_list
+
+
+def calculate_moes(meta_data_arrays, moe_param_config, interval=TT_DATA_INTERVAL, moe_names=None):
+    """ calculate VMT, VHT, DVH, LVMT, UVMT, CM and CMH of all time steps
+
+    :param meta_data_arrays: dict of 'flow', 'speed', 'density' (rnode x time array with virtual nodes),
+                             'lanes' and 'speed_limit'
+    :type meta_data_arrays: dict
+    :type moe_param_config: pyticas_tetres.ttypes.RouteWiseMOEParametersInfo
+    :type interval: int
+    :param moe_names: MOEs to calculate (default: all)
+    :type moe_names: list[str]
+    :return: dict of MOE name and list of values for each time step
+    :rtype: dict[str, list[float]]
+    """
+    flow = meta_data_arrays['flow']
+    speed = meta_data_arrays['speed']
+    density = meta_data_arrays['density']
+    lanes = meta_data_arrays['lanes']
+    moe_critical_density = moe_param_config.moe_critical_density
+    moe_lane_capacity = moe_param_config.moe_lane_capacity
+    moe_congestion_threshold_speed = moe_param_config.moe_congestion_threshold_speed
+    funcs = {
+        'vmt': lambda: calculate_vmt_array(flow, interval),
+        'vht': lambda: calculate_vht_array(flow, speed, interval),
+        'dvh': lambda: calculate_dvh_array(flow, speed, meta_data_arrays['speed_limit'], interval),
+        'lvmt': lambda: calculate_lvmt_array(flow, density, lanes, interval, moe_critical_density, moe_lane_capacity),
+        'uvmt': lambda: calculate_uvmt_array(flow, density, lanes, interval, moe_critical_density, moe_lane_capacity),
+        'cm': lambda: calculate_cm_array(speed, moe_congestion_threshold_speed),
+        'cmh': lambda: calculate_cmh_array(speed, interval, moe_congestion_threshold_speed),
+    }
+    return {name: funcs[name]().tolist() for name in (moe_names or funcs.keys())}
+
+
+def _speed_stats(data_list, n_data):
+    """ average, variance, max and min of valid speeds of stations at each time step
+
+    :type data_list: list[list[float]]
+    :type n_data: int
+    :rtype: (list[float], list[float], list[float], list[float])
+    """
+    if not data_list:
+        return [0] * n_data, [0] * n_data, [0] * n_data, [0] * n_data
+    us = np.array(data_list, dtype=np.float64)
+    valid = (us != 0) & (us != MISSING_VALUE) & ~np.isnan(us)
+    n_valid = valid.sum(axis=0)
+    values = np.where(valid, us, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg = values.sum(axis=0) / n_valid
+        variance = np.where(valid, us - avg, 0)
+        variance = (variance * variance).sum(axis=0) / (n_valid - 1)
+    max_u = np.where(valid, us, -np.inf).max(axis=0)
+    min_u = np.where(valid, us, np.inf).min(axis=0)
+    # statistics are 0 when there is not enough speed data
+    avg[n_valid < 1] = 0
+    variance[n_valid < 2] = 0
+    max_u[n_valid < 1] = 0
+    min_u[n_valid < 1] = 0
+    return avg.tolist(), variance.tolist(), max_u.tolist(), min_u.tolist()
+
+
+def _positive_total(data_list, n_data):
+    """ sum of positive values at each time step
+
+    :type data_list: list[list[float]]
+    :type n_data: int
+    :rtype: list[float]
+    """
+    if not data_list:
+        return [0] * n_data
+    data = np.array(data_list)
+    return np.where(data > 0, data, 0).sum(axis=0).tolist()
 
 
 def _route_avgs(res_list):
@@ -263,15 +470,13 @@ def _route_avgs(res_list):
     return avgs
 
 
-def _raw_route_avgs(data_list, prd):
-    imputated_data = spatial_avg.imputation(data_list)
-    n_stations = len(data_list)
-    n_data = len(prd.get_timeline())
-    avgs = []
-    for didx in range(n_data):
-        data = [imputated_data[sidx][didx] for sidx in range(n_stations) if imputated_data[sidx][didx] >= 0]
-        avgs.append(np.mean(data))
-    return avgs
+def _raw_route_avgs(data_list, prd, imputed=False):
+    data = np.array(data_list, dtype=np.float64)
+    imputated_data = data if imputed else spatial_avg.imputation_array(data)
+    valid = imputated_data >= 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avgs = np.where(valid, imputated_data, 0).sum(axis=0) / valid.sum(axis=0)
+    return avgs.tolist()
 
 
 def _route_total(res_list):
@@ -291,22 +496,6 @@ def _route_total(res_list):
     return total_values
 
 
-def generate_updatable_moe_dict(tt_data):
-    return {
-        'tt': tt_data['tt'],
-        'speed': tt_data['speed'],
-        'vmt': tt_data['vmt'],
-        'vht': tt_data['vht'],
-        'dvh': tt_data['dvh'],
-        'lvmt': tt_data['lvmt'],
-        'uvmt': tt_data['uvmt'],
-        'cm': tt_data['cm'],
-        'cmh': tt_data['cmh'],
-        'acceleration': tt_data['acceleration'],
-        'meta_data': tt_data['meta_data'],
-    }
-
-
 def calculate_tt_moe_a_route(prd, ttri, **kwargs):
     """
 
@@ -329,13 +518,7 @@ def calculate_tt_moe_a_route(prd, ttri, **kwargs):
         da_tt = TravelTimeDataAccess(prd.start_date.year, session=dbsession)
     else:
         da_tt = TravelTimeDataAccess(prd.start_date.year)
-    creatable_list = list()
-    updatable_dict = {}
-    existing_data_dict = {}
-    if create_or_update:
-        existing_data_list = da_tt.list_by_period(ttri.id, prd)
-        for existing_data in existing_data_list:
-            existing_data_dict[(existing_data.route_id, existing_data.time)] = existing_data
+    tt_data_list = list()
     lock = kwargs.get('lock', nonop_with())
     if not create_or_update:
         # delete data to avoid duplicated data
@@ -352,6 +535,8 @@ def calculate_tt_moe_a_route(prd, ttri, **kwargs):
 
     if not res_dict:
         logger.warning('fail to calculate travel time')
+        if not create_or_update:
+            result_cache.invalidate([ttri.id], prd.start_date, prd.end_date)
         return False
 
     flow_without_virtual_nodes, flow_without_virtual_nodes_data, flow_with_virtual_nodes, flow_with_virtual_nodes_data = \
@@ -363,69 +548,54 @@ def calculate_tt_moe_a_route(prd, ttri, **kwargs):
     travel_time_results = res_dict['tt']
     res_mrf = res_dict["mrf"]
     travel_time = travel_time_results[-1].data
-    avg_speeds = _route_avgs(speed_without_virtual_nodes)
+    avg_speeds = _raw_route_avgs(speed_without_virtual_nodes_data, prd, imputed=True)
     acceleration_data = _calculate_accel(speed_without_virtual_nodes, prd.interval, **kwargs)
     accelerator_avgs = _raw_route_avgs(acceleration_data, prd)
     timeline = prd.get_timeline(as_datetime=False, with_date=True)
     print(f"{Fore.CYAN}Start[{timeline[0]}] End[{timeline[-1]}] TimelineLength[{len(timeline)}]")
+    meta_data_list = generate_meta_data_list(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data,
+                                             density_with_virtual_nodes_data, flow_with_virtual_nodes,
+                                             flow_without_virtual_nodes_data, speed_without_virtual_nodes_data,
+                                             density_without_virtual_nodes_data, speed_without_virtual_nodes, res_mrf,
+                                             acceleration_data, moe_param_config)
+    meta_data_strings = [json.dumps(meta_data) for meta_data in meta_data_list]
+    moes = calculate_moes({
+        'flow': np.array(flow_with_virtual_nodes_data, dtype=np.float64),
+        'speed': np.array(speed_with_virtual_nodes_data, dtype=np.float64),
+        'density': np.array(density_with_virtual_nodes_data, dtype=np.float64),
+        'lanes': [rnode_data.lanes for rnode_data in flow_with_virtual_nodes],
+        'speed_limit': [rnode_data.speed_limit for rnode_data in flow_with_virtual_nodes],
+    }, moe_param_config)
     for index, dateTimeStamp in enumerate(timeline):
-        meta_data = generate_meta_data(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data,
-                                       density_with_virtual_nodes_data, flow_with_virtual_nodes,
-                                       flow_without_virtual_nodes_data, speed_without_virtual_nodes_data,
-                                       density_without_virtual_nodes_data, speed_without_virtual_nodes, res_mrf,
-                                       acceleration_data, moe_param_config, index)
-        meta_data_string = json.dumps(meta_data)
-        interval = TT_DATA_INTERVAL
-        moe_critical_density = moe_param_config.moe_critical_density
-        moe_lane_capacity = moe_param_config.moe_lane_capacity
-        moe_congestion_threshold_speed = moe_param_config.moe_congestion_threshold_speed
-        vmt = calculate_vmt_dynamically(meta_data, interval)
-        vht = calculate_vht_dynamically(meta_data, interval)
-        dvh = calculate_dvh_dynamically(meta_data, interval)
-        lvmt = calculate_lvmt_dynamically(meta_data, interval, moe_critical_density, moe_lane_capacity)
-        uvmt = calculate_uvmt_dynamically(meta_data, interval, moe_critical_density, moe_lane_capacity)
-        cm = calculate_cm_dynamically(meta_data, moe_congestion_threshold_speed)
-        cmh = calculate_cmh_dynamically(meta_data, interval, moe_congestion_threshold_speed)
         tt_data = {
             'route_id': ttri.id,
             'time': dateTimeStamp,
             'tt': travel_time[index],
             'speed': avg_speeds[index],
-            'vmt': vmt,
-            'vht': vht,
-            'dvh': dvh,
-            'lvmt': lvmt,
-            'uvmt': uvmt,
-            'cm': cm,
-            'cmh': cmh,
+            'vmt': moes['vmt'][index],
+            'vht': moes['vht'][index],
+            'dvh': moes['dvh'][index],
+            'lvmt': moes['lvmt'][index],
+            'uvmt': moes['uvmt'][index],
+            'cm': moes['cm'][index],
+            'cmh': moes['cmh'][index],
             'acceleration': accelerator_avgs[index],
-            'meta_data': meta_data_string,
+            'meta_data': meta_data_strings[index],
 
         }
-        if create_or_update:
-            existing_data = existing_data_dict.get((tt_data['route_id'], tt_data['time']))
-            if existing_data:
-                updatable_dict[existing_data.id] = tt_data
-            else:
-                creatable_list.append(tt_data)
-        else:
-            creatable_list.append(tt_data)
+        tt_data_list.append(tt_data)
     inserted_ids = list()
-    if creatable_list:
+    if tt_data_list:
+        # existing data of the same route and time are updated
         with lock:
-            inserted_ids = da_tt.bulk_insert(creatable_list)
+            inserted_ids = da_tt.bulk_upsert(tt_data_list, UPDATABLE_MOE_COLUMNS, print_exception=True)
             if not inserted_ids or not da_tt.commit():
                 logger.warning('fail to insert the calculated travel time into database')
     if not inserted_ids:
         inserted_ids = list()
-    if updatable_dict:
-        with lock:
-            for id, tt_data in updatable_dict.items():
-                da_tt.update(id, generate_updatable_moe_dict(tt_data))
-                inserted_ids.append(id)
-            da_tt.commit()
     if not dbsession:
         da_tt.close_session()
+    result_cache.invalidate([ttri.id], prd.start_date, prd.end_date)
     return inserted_ids
 
 
@@ -458,12 +628,14 @@ def _calculate_tt_moe(r, prd, **kwargs):
 
         # 2. calculate TT and Speed and VMT
     try:
+        # traffic data are loaded once and shared by all MOE modules
+        bundle = moe.route_data_bundle(updated_route, prd)
         return {
-            "flow_data": total_flow_with_virtual_nodes.run(updated_route, prd),
-            "speed_data": speed_with_virtual_nodes.run(updated_route, prd),
-            "density_data": density_with_virtual_nodes.run(updated_route, prd),
-            "tt": moe.travel_time(updated_route, prd),
-            "mrf": moe.mrf(updated_route, prd)
+            "flow_data": total_flow_with_virtual_nodes.run(updated_route, prd, bundle=bundle),
+            "speed_data": speed_with_virtual_nodes.run(updated_route, prd, bundle=bundle),
+            "density_data": density_with_virtual_nodes.run(updated_route, prd, bundle=bundle),
+            "tt": moe.travel_time(updated_route, prd, bundle=bundle),
+            "mrf": moe.mrf(updated_route, prd, bundle=bundle),
         }
 
     except Exception as ex:
@@ -476,47 +648,138 @@ def recalculate_moe_values_from_meta_data_a_route(prd, ttri_id, **kwargs):
     :type prd: pyticas.ttypes.Period
     :type ttri: pyticas_tetres.ttypes.TTRouteInfo
     """
-    import json
     dbsession = kwargs.get('dbsession', None)
 
     if dbsession:
         da_tt = TravelTimeDataAccess(prd.start_date.year, session=dbsession)
     else:
         da_tt = TravelTimeDataAccess(prd.start_date.year)
-    updatable_dict = {}
     existing_data_list = da_tt.list_by_period(ttri_id, prd)
     updatable_moe_values = kwargs.get("updatable_moe_values")
+    ids, meta_data_list = [], []
     for existing_data in existing_data_list:
-        meta_data = json.loads(existing_data.meta_data)
+        meta_data = json.loads(existing_data.meta_data) if existing_data.meta_data else None
         if not meta_data:
             getLogger(__name__).warning(
                 "Can't find meta data for the route: {} and for time period: {}".format(ttri_id, prd))
             continue
-        updatable_data = dict()
-        interval = TT_DATA_INTERVAL
-        moe_critical_density = meta_data["moe_critical_density"]
-        moe_lane_capacity = meta_data["moe_lane_capacity"]
-        moe_congestion_threshold_speed = meta_data["moe_congestion_threshold_speed"]
-        for key in updatable_moe_values:
-            function_name = "calculate_{}_dynamically".format(key)
-            if key in ["lvmt", "uvmt"]:
-                updatable_data[key] = getattr(sys.modules[__name__], function_name)(meta_data, interval,
-                                                                                    moe_critical_density,
-                                                                                    moe_lane_capacity)
-            elif key in ["cm"]:
-                updatable_data[key] = getattr(sys.modules[__name__], function_name)(meta_data,
-                                                                                    moe_congestion_threshold_speed)
-            elif key in ["cmh"]:
-                updatable_data[key] = getattr(sys.modules[__name__], function_name)(meta_data, interval,
-                                                                                    moe_congestion_threshold_speed)
-            else:
-                updatable_data[key] = getattr(sys.modules[__name__], function_name)(meta_data, interval)
-        if updatable_data:
-            updatable_dict[existing_data.id] = updatable_data
+        ids.append(existing_data.id)
+        meta_data_list.append(meta_data)
+    updatable_list = _updatable_moe_values(ids, meta_data_list, updatable_moe_values)
     lock = kwargs.get('lock', nonop_with())
-    if updatable_dict:
+    if updatable_list:
         with lock:
-            for id, updatable_data in updatable_dict.items():
-                da_tt.update(id, updatable_data)
+            if not da_tt.bulk_update(updatable_list, print_exception=True):
+                getLogger(__name__).warning('fail to update the recalculated MOE values')
             da_tt.commit()
+        result_cache.invalidate([ttri_id], prd.start_date, prd.end_date)
+    da_tt.close_session()
+
+
+def recalculate_moe_values_from_meta_data(year, sdt, edt, updatable_moe_values, **kwargs):
+    """ recalculate MOE values of travel time data in a year from the stored meta data
+
+    - data are read in chunks with a server-side cursor
+    - MOE values of a chunk are calculated at once and updated with one query
+
+    :type year: int
+    :type sdt: datetime.datetime
+    :type edt: datetime.datetime
+    :param updatable_moe_values: MOE names to recalculate (e.g. ['vmt', 'lvmt'])
+    :type updatable_moe_values: list[str]
+    :return: dict of `year`, `n_rows` (number of recalculated data) and `elapsed` (in second)
+    :rtype: dict
+    """
+    logger = getLogger(__name__)
+    route_ids = kwargs.get('route_ids', None)
+    chunk_size = kwargs.get('chunk_size', RECALCULATION_CHUNK_SIZE)
+    lock = kwargs.get('lock', nonop_with())
+
+    da_tt = TravelTimeDataAccess(year)
+    n_total = da_tt.get_meta_data_count(sdt, edt, route_ids)
+    logger.info('[MOE-Recalculation %d] %d travel time data to recalculate %s' % (year, n_total, updatable_moe_values))
+
+    started_at = time.time()
+    n_rows = 0
+    for rows in da_tt.meta_data_chunks(sdt, edt, route_ids, chunk_size):
+        ids, meta_data_list = [], []
+        for tt_id, meta_data in rows:
+            meta_data = json.loads(meta_data) if meta_data else None
+            if meta_data:
+                ids.append(tt_id)
+                meta_data_list.append(meta_data)
+
+        updatable_list = _updatable_moe_values(ids, meta_data_list, updatable_moe_values)
+        with lock:
+            if not da_tt.bulk_update(updatable_list, print_exception=True) or not da_tt.commit():
+                logger.warning('[MOE-Recalculation %d] fail to update the recalculated MOE values' % year)
+
+        n_rows += len(rows)
+        elapsed = time.time() - started_at
+        logger.info('[MOE-Recalculation %d] %d/%d (%.1f%%) %.1f rows/s' % (
+            year, n_rows, n_total, (n_rows * 100.0 / n_total) if n_total else 100.0,
+            (n_rows / elapsed) if elapsed else 0))
+
     da_tt.close_session()
+    if n_rows:
+        result_cache.invalidate(route_ids, sdt, edt)
+    return {'year': year, 'n_rows': n_rows, 'elapsed': time.time() - started_at}
+
+
+def recalculate_moes(meta_data_list, updatable_moe_values):
+    """ calculate MOE values from meta data
+
+    - meta data having the same rnodes and MOE parameters are calculated at once
+
+    :type meta_data_list: list[dict]
+    :type updatable_moe_values: list[str]
+    :return: dict of MOE name and values in the order of the given meta data
+    :rtype: dict[str, list[float]]
+    """
+    res = {key: [0] * len(meta_data_list) for key in updatable_moe_values}
+
+    groups = {}
+    for idx, meta_data in enumerate(meta_data_list):
+        group_key = (len(meta_data['flow']),
+                     tuple(meta_data['lanes']),
+                     tuple(meta_data['speed_limit']),
+                     meta_data.get('moe_critical_density'),
+                     meta_data.get('moe_lane_capacity'),
+                     meta_data.get('moe_congestion_threshold_speed'))
+        groups.setdefault(group_key, []).append(idx)
+
+    for (n_rnodes, lanes, speed_limit, critical_density, lane_capacity, threshold_speed), indices in groups.items():
+        moe_param_config = RouteWiseMOEParametersInfo()
+        moe_param_config.moe_critical_density = critical_density
+        moe_param_config.moe_lane_capacity = lane_capacity
+        moe_param_config.moe_congestion_threshold_speed = threshold_speed
+        # rnode x time arrays (a column for each meta data)
+        values = calculate_moes({
+            'flow': np.array([meta_data_list[idx]['flow'] for idx in indices], dtype=np.float64).T,
+            'speed': np.array([meta_data_list[idx]['speed'] for idx in indices], dtype=np.float64).T,
+            'density': np.array([meta_data_list[idx]['density'] for idx in indices], dtype=np.float64).T,
+            'lanes': list(lanes),
+            'speed_limit': list(speed_limit),
+        }, moe_param_config, moe_names=updatable_moe_values)
+        for key in updatable_moe_values:
+            for idx, value in zip(indices, values[key]):
+                res[key][idx] = value
+    return res
+
+
+def _updatable_moe_values(ids, meta_data_list, updatable_moe_values):
+    """
+    :type ids: list[int]
+    :type meta_data_list: list[dict]
+    :type updatable_moe_values: list[str]
+    :return: list of dict that has `id` and the recalculated MOE values
+    :rtype: list[dict]
+    """
+    moe_values = recalculate_moes(meta_data_list, updatable_moe_values)
+    updatable_list = []
+    for idx, tt_id in enumerate(ids):
+        updatable_data = {'id': tt_id}
+        for key in updatable_moe_values:
+            updatable_data[key] = moe_values[key][idx]
+        updatable_list.append(updatable_data)
+    return updatable_list
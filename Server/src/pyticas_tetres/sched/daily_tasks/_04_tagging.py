@@ -23,19 +23,36 @@ def run(prd):
     ttr_route_da.close_session()
     logger = getLogger(__name__)
     has_error = 0
-    for ttri in routes:
-        try:
-            result = DataCategorizer.categorize(ttri, prd)
+
+    try:
+        results = DataCategorizer.categorize_routes(routes, prd)
+    except Exception as ex:
+        logger.debug('  - exception occured when doing categorization for all routes during %s (%s)'
+                     % (prd.get_date_string(), str(ex)))
+        results = None
+
+    if results is not None:
+        for ttri, result in zip(routes, results):
             if result['has_error']:
                 logger.debug('  - error occured when doing categorization for route %s (id=%s) during %s'
                              % (ttri.name, ttri.id, prd.get_date_string()))
                 tlogger.add_log({'time': tlogger.now(), 'route_id': ttri.id, 'target_period': prd, 'failed': True})
                 has_error += 1
-        except Exception as ex:
-            logger.debug('  - exception occured when doing categorization for route %s (id=%s) during %s'
-                         % (ttri.name, ttri.id, prd.get_date_string()))
-            tlogger.add_log({'time': tlogger.now(), 'route_id': ttri.id, 'target_period': prd, 'failed': True})
-            has_error += 1
+    else:
+        # categorize route by route
+        for ttri in routes:
+            try:
+                result = DataCategorizer.categorize(ttri, prd)
+                if result['has_error']:
+                    logger.debug('  - error occured when doing categorization for route %s (id=%s) during %s'
+                                 % (ttri.name, ttri.id, prd.get_date_string()))
+                    tlogger.add_log({'time': tlogger.now(), 'route_id': ttri.id, 'target_period': prd, 'failed': True})
+                    has_error += 1
+            except Exception as ex:
+                logger.debug('  - exception occured when doing categorization for route %s (id=%s) during %s'
+                             % (ttri.name, ttri.id, prd.get_date_string()))
+                tlogger.add_log({'time': tlogger.now(), 'route_id': ttri.id, 'target_period': prd, 'failed': True})
+                has_error += 1
 
     logger.debug('  - categorization for %s routes are done (has_error=%s)' % (len(routes), has_error))
 
@@ -20,6 +20,7 @@ from pyticas_tetres.da.incident import IncidentDataAccess
 from pyticas_tetres.da.tt import TravelTimeDataAccess
 from pyticas_tetres.da.config import ConfigDataAccess
 from pyticas_tetres.db.tetres import tablefinder
+from pyticas_tetres.est import result_cache
 from pyticas_tetres.logger import getLogger
 from pyticas_tetres.systasks import initial_data_maker
 
@@ -392,6 +393,7 @@ def _handler_systemconfig(da, item, action_log):
                 for a_route in routes:
                     tt_da.delete_range(a_route.id, sdt, edt)
                 tt_da.close_session()
+                result_cache.invalidate(None, sdt, edt)
 
                 weather_da = NoaaWeatherDataAccess(y)
                 weather_da.delete_range(None, None, start_time=sdt, end_time=edt)
@@ -15,6 +15,7 @@
 
 __author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
 
+import concurrent.futures
 import datetime
 import gc
 from multiprocessing import Process, Manager, Lock
@@ -72,7 +73,7 @@ def create_or_update_tt_and_moe(start_date, end_date, db_info, rw_moe_param_json
 
 
 def recalculate_moe_values(start_date, end_date, db_info, updatable_moe_values, route_ids):
-    _recalculate_moe_values(start_date, end_date, db_info, updatable_moe_values, route_ids)
+    return _recalculate_moe_values(start_date, end_date, db_info, updatable_moe_values, route_ids)
 
 
 def categorize_tt_only(start_date, end_date, db_info, **kwargs):
@@ -243,17 +244,41 @@ def _create_or_update_tt_and_moe(start_date, end_date, db_info, rw_moe_param_jso
 
 
 def _recalculate_moe_values(start_date, end_date, db_info, updatable_moe_values, route_ids):
-    """
+    """ recalculate MOE values from meta data (years are processed in parallel)
 
     :type start_date: datetime.date
     :type end_date: datetime.date
     :type db_info: dict
+    :return: list of dict of `year`, `n_rows` and `elapsed` (see `traveltime.recalculate_moe_values_from_meta_data()`)
+    :rtype: list[dict]
     """
     logger = getLogger(__name__)
     logger.debug('>> Recalculating MOE values: {}'.format(updatable_moe_values))
-    _run_multi_process(_worker_process_to_recalculate_moe_values, start_date, end_date, db_info,
-                       updatable_moe_values=updatable_moe_values, route_ids=route_ids)
+
+    data_path = ticas._TICAS_.data_path
+    years = list(range(start_date.year, end_date.year + 1))
+    results = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(DEFAULT_NUMBER_OF_PROCESSES, len(years))) as executor:
+        futures = {}
+        for year in years:
+            sdt = datetime.datetime.combine(max(start_date, datetime.date(year, 1, 1)), datetime.time(0, 0, 0))
+            edt = datetime.datetime.combine(min(end_date, datetime.date(year, 12, 31)), datetime.time(23, 59, 59))
+            future = executor.submit(_worker_process_to_recalculate_moe_values, data_path, db_info, year, sdt, edt,
+                                     updatable_moe_values=updatable_moe_values, route_ids=route_ids)
+            futures[future] = year
+
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                res = future.result()
+            except Exception as ex:
+                logger.warning('  - fail to recalculate MOE values in %d : %s' % (futures[future], str(ex)))
+                continue
+            logger.debug('  - %d : %d travel time data are recalculated in %.1f seconds (%.1f rows/s)' % (
+                res['year'], res['n_rows'], res['elapsed'], (res['n_rows'] / res['elapsed']) if res['elapsed'] else 0))
+            results.append(res)
+
     logger.debug('<< End of Recalculating MOE values')
+    return sorted(results, key=lambda v: v['year'])
 
 
 def _categorize_tt_only(start_date, end_date, db_info, **kwargs):
@@ -475,39 +500,23 @@ def _worker_process_to_create_or_update_tt_and_moe(idx, queue, lck, data_path, d
             continue
 
 
-def _worker_process_to_recalculate_moe_values(idx, queue, lck, data_path, db_info, **kwargs):
+def _worker_process_to_recalculate_moe_values(data_path, db_info, year, sdt, edt, **kwargs):
+    """
+    :type data_path: str
+    :type db_info: dict
+    :type year: int
+    :type sdt: datetime.datetime
+    :type edt: datetime.datetime
+    :rtype: dict
+    """
     from pyticas_tetres.db.tetres import conn
-    from pyticas.infra import Infra
-    from pyticas.tool import tb
 
     logger = getLogger(__name__)
-    # initialize
-    logger.debug('[MOE-Recalculation Worker %d] starting...' % (idx))
+    logger.debug('[MOE-Recalculation Worker %d] starting...' % year)
     ticas.initialize(data_path)
-    infra = Infra.get_infra()
     conn.connect(db_info)
-    da_route = TTRouteDataAccess()
-    logger.debug('[MOE-Recalculation Worker %d] is ready' % (idx))
-    updatable_moe_values = kwargs.get("updatable_moe_values")
-    while True:
-        ttr_id, prd, num, total = queue.get()
-        if prd is None:
-            da_route.close_session()
-            exit(1)
-        try:
-            ttri = da_route.get_by_id(ttr_id)
-            if not ttri:
-                logger.debug('[MOE-Recalculation Worker %d] route is not found (%s)' % (idx, ttr_id))
-                continue
-            traveltime.recalculate_moe_values_from_meta_data_a_route(prd, ttr_id, dbsession=da_route.get_session(),
-                                                                     lock=lck,
-                                                                     updatable_moe_values=updatable_moe_values)
-            gc.collect()
-
-        except Exception as ex:
-            logger.warning('[TT-Categorization Worker %d]  - fail to add travel time data' % idx)
-            tb.traceback(ex)
-            continue
+    return traveltime.recalculate_moe_values_from_meta_data(year, sdt, edt, kwargs.get('updatable_moe_values'),
+                                                            route_ids=kwargs.get('route_ids', None))
 
 
 def _worker_process_to_categorize_tt_only(idx, queue, lck, data_path, db_info, **kwargs):
@@ -18,6 +18,9 @@ def has_traffic_files(start_date_str, end_date_str):
             day_path = os.path.join(detector_path, "{}".format(start_date.year),
                                     "{}{}{}".format(start_date.year, str(start_date.month).zfill(2),
                                                     str(start_date.day).zfill(2)))
+            if os.path.exists(day_path + '.pack'):
+                start_date += datetime.timedelta(days=1)
+                continue
             if not os.listdir(day_path):
                 return False
             start_date += datetime.timedelta(days=1)
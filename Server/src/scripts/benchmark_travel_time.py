@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+import datetime
+import sys
+import time
+
+sys.path.append("Server/src")
+import global_settings
+import dbinfo
+
+if __name__ == '__main__':
+    print('')
+    print('# compares the per-departure travel time calculation with the trajectory-based calculation')
+    print('# for a travel time reliability route')
+    print('')
+
+    dt_str = input('# Enter date to calculate travel time (e.g. 2017-01-05) : ')
+    date = datetime.datetime.strptime(dt_str, '%Y-%m-%d').date()
+    route_id = int(input("# Enter the route id: "))
+
+    from pyticas import ticas, period
+    from pyticas.infra import Infra
+    from pyticas.moe import moe_helper
+    from pyticas.moe.imputation import spatial_avg
+    from pyticas.moe.mods import tt
+    from pyticas_tetres.db.tetres import conn
+
+    ticas.initialize(global_settings.DATA_PATH)
+    infra = Infra.get_infra()
+    conn.connect(dbinfo.tetres_db_info())
+
+    from pyticas_tetres.cfg import TT_DATA_INTERVAL
+    from pyticas_tetres.da.route import TTRouteDataAccess
+
+    ttr_da = TTRouteDataAccess()
+    ttri = ttr_da.get_by_id(route_id)
+    ttr_da.close_session()
+
+    prd = period.create_period(datetime.datetime.combine(date, datetime.time(0, 0)),
+                               datetime.datetime.combine(date, datetime.time(23, 59)),
+                               TT_DATA_INTERVAL)
+    ext_prd = prd.clone().extend_end_hour(tt.DEFAULT_END_HOUR_EXTENSION)
+    n_origin_data = len(prd.get_timeline())
+
+    us = moe_helper.get_speed(ttri.route.get_stations(), ext_prd)
+    us_data = spatial_avg.imputation([res.data for res in moe_helper.add_virtual_rnodes(us, ttri.route)])
+    print('- route=%s, rnodes(including virtual rnodes)=%d, departures=%d'
+          % (ttri.name, len(us_data), n_origin_data))
+
+    stime = time.time()
+    old_tts = []
+    for tidx in range(n_origin_data):
+        try:
+            old_tts.append(tt._calculate_tt([pd[tidx:] for pd in us_data], prd.interval))
+        except TypeError:
+            # the per-departure calculation fails when the trajectory runs out of data
+            old_tts.append(None)
+    old_elapsed = time.time() - stime
+
+    stime = time.time()
+    new_tts = tt._calculate_tts(us_data, n_origin_data, prd.interval)
+    new_elapsed = time.time() - stime
+
+    n_different = len([tidx for tidx, tts in enumerate(old_tts) if tts and tts != new_tts[tidx].tolist()])
+    print('- per-departure calculation : %.3fs' % old_elapsed)
+    print('- trajectory-based calculation : %.3fs (x%.1f)' % (new_elapsed, old_elapsed / max(new_elapsed, 1e-9)))
+    print('- departures with different results : %d' % n_different)
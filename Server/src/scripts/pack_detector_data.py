@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+import datetime
+import sys
+
+sys.path.append("Server/src")
+import global_settings
+
+if __name__ == '__main__':
+    print('')
+    print('!! Stop TeTRES Server if it is running.')
+    print('')
+    print('# packs cached detector data files of each day into one file (cache/det/YYYY/YYYYMMDD.pack)')
+    print('')
+
+    sdt_str = input('# Enter start date to pack data (e.g. 2015-01-01) : ')
+    sdate = datetime.datetime.strptime(sdt_str, '%Y-%m-%d').date()
+
+    edt_str = input('# Enter end date to pack data (e.g. 2017-12-31) : ')
+    edate = datetime.datetime.strptime(edt_str, '%Y-%m-%d').date()
+
+    res = input('# Do you want to remove the loose data files after packing ? [N/y] : ')
+    remove_loose_files = res.lower() in ['y', 'ye', 'yes']
+
+    from pyticas import ticas
+    from pyticas.dr import det_pack
+
+    ticas.initialize(global_settings.DATA_PATH)
+
+    cursor = sdate
+    while cursor <= edate:
+        try:
+            n_files = det_pack.pack_day(cursor, remove_loose_files=remove_loose_files)
+            print('- %s : %d files are packed' % (cursor.strftime('%Y-%m-%d'), n_files))
+        except Exception as ex:
+            print('- %s : fail to pack data files (%s)' % (cursor.strftime('%Y-%m-%d'), str(ex)))
+        cursor += datetime.timedelta(days=1)
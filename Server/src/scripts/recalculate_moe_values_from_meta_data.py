@@ -72,9 +72,12 @@ if __name__ == '__main__':
             ttr_ids = [ttri.id for ttri in ttr_route_da.list()]
             ttr_route_da.close_session()
 
-        initial_data_maker.recalculate_moe_values(sdate, edate, db_info=dbinfo.tetres_db_info(),
-                                                  updatable_moe_values=updatable_moe_values,
-                                                  route_ids=route_ids)
+        results = initial_data_maker.recalculate_moe_values(sdate, edate, db_info=dbinfo.tetres_db_info(),
+                                                            updatable_moe_values=updatable_moe_values,
+                                                            route_ids=route_ids)
+        for res in results:
+            print('# %d : %d travel time data are recalculated in %.1f seconds (%.1f rows/s)' % (
+                res['year'], res['n_rows'], res['elapsed'], (res['n_rows'] / res['elapsed']) if res['elapsed'] else 0))
 
         with open(filename, 'a+') as f:
             f.write('ended at ' + datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S') + '\n')
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+TEST_PATH = os.path.dirname(os.path.abspath(__file__))
+
+# tests import the packages in `Server/src`
+sys.path.insert(0, os.path.dirname(TEST_PATH))
+
+import global_settings
+
+# TeTRES modules read `tetres.conf` when they are imported
+if not os.path.exists(global_settings.CONFIG_FILE_PATH):
+    global_settings.CONFIG_FILE_PATH = os.path.join(TEST_PATH, 'tetres.conf')
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+LRU cache must evict entries in least-recently-used order and after TTL, and must key infra objects by values
+"""
+import concurrent.futures
+import datetime
+
+import pytest
+
+from pyticas.tool import cache
+from pyticas.ttypes import Period
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _Clock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+class _InfraObject(object):
+    _obj_type_ = 'DETECTOR'
+
+    def __init__(self, name, infra_cfg_date='2017-01-01'):
+        self.name = name
+        self.infra_cfg_date = infra_cfg_date
+        self.lane = 1
+
+
+class _Unhashable(object):
+    __hash__ = None
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(cache, 'time', clock)
+    return clock
+
+
+def _cached_func(lru):
+    calls = []
+
+    @lru.cache
+    def _func(*args, **kwargs):
+        calls.append(args)
+        return [len(calls)]
+
+    return _func, calls
+
+
+def test_eviction_order(clock):
+    lru = cache.LRUCache(maxsize=3)
+    func, calls = _cached_func(lru)
+
+    for v in [1, 2, 3]:
+        func(v)
+    # 1 is used recently, so 2 is the least-recently-used
+    func(1)
+    func(4)
+    assert calls == [(1,), (2,), (3,), (4,)]
+
+    func(3)
+    func(1)
+    assert calls == [(1,), (2,), (3,), (4,)]
+
+    func(2)
+    func(4)
+    assert calls == [(1,), (2,), (3,), (4,), (2,), (4,)]
+    assert lru.cache_info()['evictions'] == 3
+    assert lru.cache_info()['size'] == 3
+
+
+def test_ttl_expiry(clock):
+    lru = cache.LRUCache(maxsize=10, ttl=10)
+    func, calls = _cached_func(lru)
+
+    assert func(1) == [1]
+    clock.now += 10
+    assert func(1) == [1]
+    clock.now += 0.5
+    assert func(1) == [2]
+    assert lru.cache_info()['evictions'] == 1
+
+    # the time of the new entry is the time when it is cached
+    clock.now += 10
+    assert func(1) == [2]
+    assert calls == [(1,), (1,)]
+
+    # no expiry
+    lru = cache.LRUCache(maxsize=10)
+    func, calls = _cached_func(lru)
+    func(1)
+    clock.now += 3600 * 24 * 365
+    func(1)
+    assert calls == [(1,)]
+
+
+def test_cache_info(clock):
+    lru = cache.LRUCache(maxsize=2, ttl=60)
+    func, calls = _cached_func(lru)
+    assert lru.cache_info() == {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'maxsize': 2, 'ttl': 60}
+
+    func(1)
+    func(1)
+    func(2)
+    func(3)
+    clock.now += 61
+    func(3)
+    assert lru.cache_info() == {'hits': 1, 'misses': 4, 'evictions': 2, 'size': 2, 'maxsize': 2, 'ttl': 60}
+
+    lru.cache_clear()
+    assert lru.cache_info() == {'hits': 0, 'misses': 0, 'evictions': 0, 'size': 0, 'maxsize': 2, 'ttl': 60}
+    func(3)
+    assert calls[-2:] == [(3,), (3,)]
+
+
+def test_keys_of_period_and_infra_objects(clock):
+    lru = cache.LRUCache(maxsize=100)
+    func, calls = _cached_func(lru)
+
+    def _prd(interval=300):
+        return Period(datetime.datetime(2017, 3, 1, 7, 0), datetime.datetime(2017, 3, 1, 8, 0), interval)
+
+    # objects of the same values
+    assert func(_InfraObject('D100'), _prd()) == func(_InfraObject('D100'), _prd())
+    assert len(calls) == 1
+
+    # values that are not in the key are not compared
+    det = _InfraObject('D100')
+    det.lane = 2
+    func(det, _prd())
+    assert len(calls) == 1
+
+    func(_InfraObject('D100'), _prd(30))
+    func(_InfraObject('D101'), _prd())
+    # infra is updated
+    func(_InfraObject('D100', '2017-06-01'), _prd())
+    assert len(calls) == 4
+
+    # keyword arguments, collections and primitive types
+    func(1, d={'b': [1, 2], 'a': {3, 1}}, t=datetime.time(7, 0))
+    func(1, t=datetime.time(7, 0), d={'a': {1, 3}, 'b': [1, 2]})
+    assert len(calls) == 5
+    func(1.0)
+    func(True)
+    func('1')
+    assert len(calls) == 8
+
+    with pytest.raises(ValueError):
+        func(_Unhashable())
+
+
+def test_list_is_copied_on_hit(clock):
+    lru = cache.LRUCache(maxsize=10)
+
+    @lru.cache
+    def _func(v):
+        return [v, v]
+
+    @lru.cache
+    def _func2(v):
+        return {'v': v}
+
+    res = _func(1)
+    res.append(3)
+    res[0] = 2
+    assert _func(1) == [1, 1]
+    assert _func(1) is not _func(1)
+
+    # the other types are returned as they are
+    assert _func2(1) is _func2(1)
+
+
+def test_concurrent_access():
+    lru = cache.LRUCache(maxsize=50)
+    func, calls = _cached_func(lru)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda v: func(v % 80), range(4000)))
+
+    assert len(results) == 4000
+    info = lru.cache_info()
+    assert info['hits'] + info['misses'] == 4000
+    assert info['misses'] == len(calls)
+    assert info['size'] == 50
+    # the function is called out of the lock, so that the same key can be missed in the threads at the same time
+    assert 0 < info['evictions'] <= info['misses'] - 50
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Values written as SQL literals and `COPY` CSV values must be read as the same values
+"""
+import csv
+import io
+import sqlite3
+import uuid
+
+import numpy as np
+import pytest
+
+from pyticas_tetres.da import base
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+TEXTS = ['plain', "it's", 'say "hi"', 'a,b', 'line 1\nline 2', 'line 1\r\nline 2, "quoted", \'single\'', '', ' ']
+
+
+def test_sql_literal():
+    assert base._to_sql_literal(None) == 'NULL'
+    assert base._to_sql_literal(True) == 'TRUE'
+    assert base._to_sql_literal(False) == 'FALSE'
+    assert base._to_sql_literal(3) == '3'
+    assert base._to_sql_literal(np.int64(3)) == '3'
+    assert base._to_sql_literal(np.float64(1.25)) == '1.25'
+    assert base._to_sql_literal(float('nan')) == "'NaN'::float8"
+    assert base._to_sql_literal(float('inf')) == "'Infinity'::float8"
+    assert base._to_sql_literal(-np.inf) == "'-Infinity'::float8"
+    assert base._to_sql_literal("it's") == "'it''s'"
+
+
+@pytest.mark.parametrize('value', TEXTS + [0, -7, 1.5, 1e-10, 123456789.125])
+def test_sql_literal_is_parsed_as_value(value):
+    with sqlite3.connect(':memory:') as db:
+        assert db.execute('SELECT %s' % base._to_sql_literal(value)).fetchone()[0] == value
+
+
+def test_csv_value():
+    assert base._to_csv_value(None) == ''
+    assert base._to_csv_value('') == '""'
+    assert base._to_csv_value(True) == 'true'
+    assert base._to_csv_value(False) == 'false'
+    assert base._to_csv_value(np.int64(3)) == '3'
+    assert base._to_csv_value(float('nan')) == 'NaN'
+    assert base._to_csv_value(float('inf')) == 'Infinity'
+    assert base._to_csv_value(-np.inf) == '-Infinity'
+
+
+def test_csv_row_is_parsed_as_values():
+    values = TEXTS + [0, 1.5, 1e-10]
+    line = ','.join(base._to_csv_value(v) for v in values) + '\n'
+    rows = list(csv.reader(io.StringIO(line, newline='')))
+    assert rows == [[str(v) if not isinstance(v, float) else repr(v) for v in values]]
+
+
+@pytest.fixture
+def session():
+    pytest.importorskip('pg8000')
+    import dbinfo
+    from pyticas_tetres.db.tetres import conn
+
+    db_info = dbinfo.tetres_db_info()
+    if not db_info['host']:
+        pytest.skip('database is not configured')
+    try:
+        conn.connect(db_info)
+    except Exception as ex:
+        pytest.skip('database is not available : %s' % ex)
+
+    sess = conn.get_session()
+    yield sess
+    sess.rollback()
+    sess.close()
+
+
+def test_copy_insert_is_same_as_bulk_insert(session):
+    from pyticas_tetres.db.tetres import model
+    from pyticas_tetres.ttypes import ConfigInfo
+
+    da = base.DataAccessBase(model.Config, ConfigInfo, session=session)
+    contents = TEXTS + [None]
+    prefix = '_test_%s' % uuid.uuid4().hex
+
+    def _insert(method, name):
+        dict_list = [{'name': '%s_%s_%d' % (prefix, name, idx), 'content': content}
+                     for idx, content in enumerate(contents)]
+        ids = getattr(da, method)(dict_list)
+        assert ids
+        rows = session.query(model.Config).filter(model.Config.id.in_(ids)).order_by(model.Config.id).all()
+        return [row.content for row in rows]
+
+    assert _insert('bulk_insert', 'bulk') == contents
+    assert _insert('copy_insert', 'copy') == contents
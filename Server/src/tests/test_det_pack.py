@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Detector data read from a pack file must be same as the packed data files
+"""
+import datetime
+import os
+
+import pytest
+
+from pyticas.dr import det_pack
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+DATE = datetime.date(2017, 3, 1)
+
+
+class _TrafficType(object):
+    def __init__(self, extension):
+        self.extension = extension
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(det_pack, 'get_path', lambda name: os.path.join(str(tmp_path), name))
+    monkeypatch.setattr(det_pack, '_opened_packs', det_pack.OrderedDict())
+    os.makedirs(os.path.dirname(det_pack.pack_path(DATE)))
+    return tmp_path
+
+
+def _write_loose_files(files):
+    day_dir = det_pack.day_dir_path(DATE)
+    os.makedirs(day_dir, exist_ok=True)
+    for file_name, bin_data in files.items():
+        with open(os.path.join(day_dir, file_name), 'wb') as f:
+            f.write(bin_data)
+
+
+def test_pack_day_round_trip(cache_dir):
+    files = {'100.v30': bytes(range(120)), '100.c30': bytes(range(240)), '101.v30': b'\x01\x02\x03'}
+    _write_loose_files(files)
+
+    assert det_pack.pack_day(DATE, remove_loose_files=True) == len(files)
+    assert not os.path.exists(det_pack.day_dir_path(DATE))
+
+    for file_name, bin_data in files.items():
+        det_name, ext = os.path.splitext(file_name)
+        assert bytes(det_pack.read(det_name, DATE, _TrafficType(ext))) == bin_data
+    assert det_pack.read('102', DATE, _TrafficType('.v30')) is None
+
+
+def test_pack_day_keeps_packed_files(cache_dir):
+    _write_loose_files({'100.v30': b'old', '101.v30': b'packed'})
+    det_pack.pack_day(DATE, remove_loose_files=True)
+
+    # data downloaded after packing overrides the packed data
+    _write_loose_files({'100.v30': b'new'})
+    assert det_pack.pack_day(DATE, remove_loose_files=True) == 2
+
+    assert bytes(det_pack.read('100', DATE, _TrafficType('.v30'))) == b'new'
+    assert bytes(det_pack.read('101', DATE, _TrafficType('.v30'))) == b'packed'
+
+
+def test_replaced_pack_is_reopened(cache_dir):
+    path = det_pack.pack_path(DATE)
+    det_pack.write_pack(path, [('100.v30', b'old')])
+    assert bytes(det_pack.read('100', DATE, _TrafficType('.v30'))) == b'old'
+
+    # the pack file is replaced by another process, so the opened pack is not released
+    other_path = os.path.join(str(cache_dir), 'other.pack')
+    det_pack.write_pack(other_path, [('100.v30', b'new')])
+    os.replace(other_path, path)
+    mtime = os.path.getmtime(path) + 10
+    os.utime(path, (mtime, mtime))
+
+    assert bytes(det_pack.read('100', DATE, _TrafficType('.v30'))) == b'new'
+
+    os.remove(path)
+    assert det_pack.read('100', DATE, _TrafficType('.v30')) is None
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Detector data decoded with numpy must be same as the data decoded byte by byte
+"""
+import array
+import datetime
+import os
+
+import numpy as np
+import pytest
+
+from pyticas import cfg
+from pyticas.dr import det_pack, det_reader_raw
+from pyticas.ttypes import TrafficType
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+VOLUME = TrafficType('volume', '.v30', 1, cfg.SAMPLES_PER_DAY, 'cumulative', 'sum_in_rnode')
+SCAN = TrafficType('scan', '.c30', 2, cfg.SAMPLES_PER_DAY, 'average', 'average_in_rnode')
+
+
+def _convert_to_list(bin_data, traffic_type):
+    """ byte by byte decoding (implementation before decoding with numpy) """
+    data = []
+    itr = iter(array.array('b', bin_data))
+    for v in itr:
+        if traffic_type.sample_size == 2:
+            value = ((v << 8) & 0x0000ff00) + (next(itr) & 0x000000ff)
+        else:
+            value = v
+        data.append(cfg.MISSING_VALUE if value < 0 else value)
+    return data
+
+
+@pytest.mark.parametrize('traffic_type', [VOLUME, SCAN])
+def test_convert_to_array(traffic_type):
+    bin_data = np.random.RandomState(0).randint(0, 256, 2 * cfg.SAMPLES_PER_DAY).astype(np.uint8).tobytes()
+    # all byte values
+    bin_data += bytes(range(256))
+
+    data = det_reader_raw._convert_to_array(bin_data, traffic_type)
+
+    assert data.tolist() == _convert_to_list(bin_data, traffic_type)
+    assert det_reader_raw._convert_to_list(bin_data, traffic_type) == _convert_to_list(bin_data, traffic_type)
+    assert det_reader_raw._convert_to_list(b'', traffic_type) == []
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    def _get_path(name):
+        return os.path.join(str(tmp_path), name)
+
+    monkeypatch.setattr(det_pack, 'get_path', _get_path)
+    monkeypatch.setattr(det_reader_raw, 'get_path', _get_path)
+    monkeypatch.setattr(det_pack, '_opened_packs', det_pack.OrderedDict())
+    os.makedirs(_get_path('cache'))
+    return tmp_path
+
+
+def test_read_cached_data_file_does_not_make_day_dir(cache_dir):
+    date = datetime.date(2017, 3, 1)
+    det_reader_raw._save_file_to_cache('100', date, b'\x01\x02', VOLUME)
+    assert bytes(det_reader_raw._read_cached_data_file('100', date, VOLUME)) == b'\x01\x02'
+
+    det_pack.pack_day(date, remove_loose_files=True)
+    assert not os.path.exists(det_pack.day_dir_path(date))
+
+    assert bytes(det_reader_raw._read_cached_data_file('100', date, VOLUME)) == b'\x01\x02'
+    assert det_reader_raw._read_cached_data_file('101', date, VOLUME) is None
+    assert det_reader_raw._read_cached_data_file('100', date, SCAN) is None
+    assert det_reader_raw._read_cached_data_file('100', datetime.date(2017, 3, 2), VOLUME) is None
+    assert not os.path.exists(det_pack.day_dir_path(date))
+    assert not os.path.exists(det_pack.day_dir_path(datetime.date(2017, 3, 2)))
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Compiled detector checker of a route must be same as the checker scanning the route configuration
+"""
+import pytest
+
+from pyticas.ttypes import Route, RouteConfig, RouteConfigInfo, RouteDetectorChecker
+from pyticas_tetres.rengine.helper import wz
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _RNode(object):
+    def __init__(self, name, n_lanes):
+        self.name = name
+        self.corridor = None
+        self.detectors = [_Detector('%s_%d' % (name, lane), lane, self) for lane in range(1, n_lanes + 2)]
+
+
+class _Detector(object):
+    def __init__(self, name, lane, rnode):
+        self.name = name
+        self.lane = lane
+        self.rnode = rnode
+
+
+def _closure_checker(r):
+    """ implementation of ``Route.get_detector_checker()`` before compiling the route configuration """
+    if not r.cfg:
+        return lambda det: True
+
+    def find_nodeset(rn):
+        for idx, node_set in enumerate(r.cfg.node_sets):
+            if node_set.node1.rnode == rn:
+                return node_set, node_set.node1
+            elif node_set.node2.rnode == rn:
+                return node_set, node_set.node2
+        return None, None
+
+    def checker(det):
+        node_set, node = find_nodeset(det.rnode)
+        if not node_set:
+            return False
+
+        if node_set.node1.rnode == det.rnode:
+            node1 = node_set.node1
+            lanes1 = [n for n in range(1, node1.lanes + 1)]
+            open_lanes = list(set(lanes1)
+                              - set(node1.node_config.closed_lanes)
+                              - set(node1.node_config.shifted_lanes)
+                              - set(node1.node_config.od_lanes))
+            return det.lane in open_lanes
+
+        elif node_set.node2.rnode == det.rnode:
+            node2 = node_set.node2
+            lanes2 = [n for n in range(1, node2.lanes + 1)]
+            open_lanes = list(set(lanes2)
+                              - set(node2.node_config.closed_lanes)
+                              - set(node2.node_config.shifted_lanes))
+
+            return det.lane in open_lanes and det.lane in node2.node_config.od_lanes
+
+    return checker
+
+
+def _node_config(closed=(), shifted=(), od=()):
+    info = RouteConfigInfo()
+    info.closed_lanes = list(closed)
+    info.shifted_lanes = list(shifted)
+    info.od_lanes = list(od)
+    return info
+
+
+@pytest.fixture
+def rnodes():
+    return {name: _RNode(name, n_lanes) for name, n_lanes in [('a', 4), ('b', 3), ('c', 3), ('d', 2), ('e', 2),
+                                                               ('x', 2)]}
+
+
+def _route_config(rnodes):
+    rc = RouteConfig()
+    rc.add_nodes([rnodes['a'], rnodes['c'], rnodes['e'], None],
+                 [rnodes['b'], rnodes['d'], None, rnodes['a']])
+    lanes = [(4, 3), (3, 2), (2, 0), (0, 4)]
+    configs = [(_node_config(closed=[1], shifted=[2], od=[4]), _node_config(closed=[3], od=[1, 2, 3])),
+               (_node_config(), _node_config(shifted=[1], od=[1, 2])),
+               (_node_config(od=[2]), _node_config()),
+               # node set of the rnode that is in the other node set is not used
+               (_node_config(), _node_config(od=[1, 2, 3, 4]))]
+    for node_set, (ln1, ln2), (cfg1, cfg2) in zip(rc.node_sets, lanes, configs):
+        node_set.node1.lanes, node_set.node2.lanes = ln1, ln2
+        node_set.node1.node_config, node_set.node2.node_config = cfg1, cfg2
+    return rc
+
+
+def _route(rnodes):
+    r = Route('route 1')
+    r.rnodes = [rnodes['a'], rnodes['c'], rnodes['e']]
+    r.cfg = _route_config(rnodes)
+    return r
+
+
+def _detectors(rnodes):
+    dets = [det for rn in rnodes.values() for det in rn.detectors]
+    # detector that is not listed in the detectors of its rnode
+    return dets + [_Detector('a_extra', 3, rnodes['a']), _Detector('b_extra', 2, rnodes['b'])]
+
+
+def _assert_same_checker(r, rnodes):
+    checker = r.get_detector_checker()
+    expected = _closure_checker(r)
+    assert [checker(det) for det in _detectors(rnodes)] == [bool(expected(det)) for det in _detectors(rnodes)]
+
+
+def test_checker_is_same_as_closure(rnodes):
+    r = _route(rnodes)
+    checker = r.get_detector_checker()
+    assert isinstance(checker, RouteDetectorChecker)
+    _assert_same_checker(r, rnodes)
+
+    # lanes of both nodes are checked
+    assert [det.lane for det in rnodes['a'].detectors if checker(det)] == [3]
+    assert [det.lane for det in rnodes['b'].detectors if checker(det)] == [1, 2]
+    assert [det.lane for det in rnodes['d'].detectors if checker(det)] == [2]
+    assert not any(checker(det) for det in rnodes['x'].detectors)
+    assert checker.find_nodeset(rnodes['a']) == (r.cfg.node_sets[0], r.cfg.node_sets[0].node1)
+    assert checker.find_nodeset(rnodes['x']) == (None, None)
+
+
+def test_checker_is_made_again_when_cfg_is_replaced(rnodes):
+    r = _route(rnodes)
+    checker = r.get_detector_checker()
+    assert r.get_detector_checker() is checker
+
+    rc = _route_config(rnodes)
+    rc.node_sets[0].node1.node_config = _node_config(closed=[3])
+    r.cfg = rc
+    assert r.get_detector_checker() is not checker
+    _assert_same_checker(r, rnodes)
+
+    r.cfg = None
+    assert all(r.get_detector_checker()(det) for det in _detectors(rnodes))
+
+
+def test_checker_is_made_again_after_workzone_lane_config(rnodes, monkeypatch):
+    # virtual node sets are not needed to check detectors
+    monkeypatch.setattr(wz.route_config, 'organize', lambda rc: rc)
+    r = _route(rnodes)
+    checker = r.get_detector_checker()
+
+    wz._update_lanecfg(r, {'c': _node_config(closed=[1, 2]), 'b': _node_config(od=[3])})
+
+    assert r.get_detector_checker() is not checker
+    _assert_same_checker(r, rnodes)
+    assert [det.lane for det in rnodes['c'].detectors if r.get_detector_checker()(det)] == [3]
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+Estimation tasks must be dispatched by (priority, user, job, request order) without over-dispatching to workers
+"""
+import collections
+import itertools
+import threading
+
+import pytest
+
+pytest.importorskip('matplotlib')  # imported by the estimation reports
+
+from pyticas_tetres.est import workers
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _TaskQueue(object):
+    def __init__(self):
+        self.items = collections.deque()
+
+    def put(self, item):
+        self.items.append(item)
+
+    def get(self):
+        return self.items.popleft()
+
+
+class _Manager(object):
+    def Queue(self):
+        return _TaskQueue()
+
+    def dict(self):
+        return {}
+
+
+class _Process(object):
+    def is_alive(self):
+        return True
+
+    def join(self, timeout=None):
+        pass
+
+
+class _Request(object):
+    def __init__(self, name):
+        self.name = name
+
+
+@pytest.fixture
+def finished(monkeypatch):
+    uids = ('job-%d' % idx for idx in itertools.count())
+    finished = {'packed': [], 'removed': [], 'event': threading.Event()}
+
+    def _record(name):
+        def _func(uid):
+            finished[name].append(uid)
+            finished['event'].set()
+
+        return _func
+
+    monkeypatch.setattr(workers, 'Manager', _Manager)
+    monkeypatch.setattr(workers, '_get_uid', lambda: next(uids))
+    monkeypatch.setattr(workers, '_pack_result', _record('packed'))
+    monkeypatch.setattr(workers, '_remove_result', _record('removed'))
+    return finished
+
+
+def _scheduler(n_workers):
+    sch = workers.Scheduler(n_workers, ())
+    for wid in range(n_workers):
+        sch.workers[wid] = _Process()
+        sch.worker_states[wid] = 'starting'
+        sch._handle_event(('ready', wid))
+    return sch
+
+
+def _dispatch(sch):
+    """ dispatch tasks as ``Scheduler._dispatch_loop()`` does
+
+    :rtype: list[int]
+    """
+    route_ids = []
+    while True:
+        next_task = sch._next_task(sorted(sch._waiting_jobs(), key=sch._job_order))
+        if not next_task or sch._n_workers('idle') - sch.n_queued <= 0:
+            return route_ids
+        sch._dispatch(*next_task)
+        route_ids.append(next_task[1])
+
+
+def _take(sch, wid):
+    """ take a task from the queue as ``_estimation_process()`` does
+
+    :rtype: (int, _Request, str)
+    """
+    task = sch.task_queue.get()
+    sch._handle_event(('take', wid, task is not None))
+    if task is not None:
+        route_id, eparam, uid = task
+        sch._handle_event(('start', wid, uid, route_id))
+    return task
+
+
+def _done(sch, wid, task, result=workers.TASK_DONE):
+    route_id, eparam, uid = task
+    sch._handle_event(('done', wid, uid, route_id, result))
+
+
+def _wait(sch, uid, finished):
+    assert finished['event'].wait(5)
+    for _ in range(500):
+        with sch.cond:
+            if sch.jobs[uid].state != workers.JOB_RUNNING:
+                return sch.jobs[uid].state
+            sch.cond.wait(0.01)
+    raise AssertionError('job is not finished')
+
+
+def test_priority_and_user_order(finished):
+    sch = _scheduler(3)
+    uid_a = sch.submit([1, 2], _Request('a'), user='user1')
+    uid_b = sch.submit([3], _Request('b'), user='user1')
+    uid_c = sch.submit([4], _Request('c'), user='user2')
+    uid_d = sch.submit([5], _Request('d'), user='user3', priority=workers.PRIORITY_HIGH)
+    uid_e = sch.submit([6], _Request('e'), user='user2', priority=workers.PRIORITY_LOW)
+
+    assert [job.uid for job in sorted(sch._waiting_jobs(), key=sch._job_order)] == [uid_d, uid_a, uid_b, uid_c, uid_e]
+
+    # the high priority job first, and then one task for each user
+    assert _dispatch(sch) == [5, 1, 4]
+    assert sch.jobs[uid_a].state == workers.JOB_RUNNING
+
+    # the job without running tasks is served before the other job of the same user
+    assert [sch.status(uid)['queue_position'] for uid in [uid_b, uid_a, uid_e]] == [0, 1, 2]
+    assert [sch.status(uid)['queue_position'] for uid in [uid_c, uid_d]] == [None, None]
+
+
+def test_no_double_dispatch(finished):
+    sch = _scheduler(2)
+    uid = sch.submit([1, 2, 3, 4], _Request('a'), user='user1')
+
+    assert _dispatch(sch) == [1, 2]
+    assert sch.n_queued == 2
+
+    # the worker that took a task is not idle even before it reports the start of the task
+    task = sch.task_queue.get()
+    sch._handle_event(('take', 0, True))
+    assert sch.worker_states[0] == 'busy'
+    assert _dispatch(sch) == []
+    sch._handle_event(('start', 0, uid, task[0]))
+
+    _take(sch, 1)
+    assert sch.n_queued == 0
+    assert _dispatch(sch) == []
+
+    _done(sch, 0, task)
+    assert sch.worker_states[0] == 'idle'
+    assert _dispatch(sch) == [3]
+    assert sch.status(uid)['n_done'] == 1
+
+
+def test_stopping_worker_is_not_idle(finished):
+    sch = _scheduler(2)
+    sch.task_queue.put(None)
+    sch.n_queued += 1
+    sch.submit([1, 2], _Request('a'), user='user1')
+
+    assert _dispatch(sch) == [1]
+    assert _take(sch, 0) is None
+    assert sch.worker_states[0] == 'stopping'
+    assert _dispatch(sch) == []
+
+
+def test_same_request_is_not_estimated_twice(finished):
+    sch = _scheduler(2)
+    uid_a = sch.submit([1], _Request('a'), user='user1')
+    uid_b = sch.submit([1], _Request('a'), user='user2')
+
+    assert _dispatch(sch) == [1]
+    task = _take(sch, 0)
+    assert task[2] == uid_a
+    _done(sch, 0, task)
+
+    # the same request is dispatched after the running one finishes (and it uses the cached result)
+    assert _dispatch(sch) == [1]
+    assert _take(sch, 1)[2] == uid_b
+    assert _wait(sch, uid_a, finished) == workers.JOB_DONE
+    assert finished['packed'] == [uid_a]
+
+
+def test_cancel_pending_job(finished):
+    sch = _scheduler(1)
+    uid = sch.submit([1, 2], _Request('a'), user='user1')
+
+    assert sch.cancel(uid)
+    assert sch.jobs[uid].results == {1: workers.TASK_CANCELLED, 2: workers.TASK_CANCELLED}
+    assert _dispatch(sch) == []
+    assert finished['event'].wait(5)
+    assert finished['removed'] == [uid]
+    assert sch.status(uid)['state'] == workers.JOB_CANCELLED
+    assert not sch.cancel(uid)
+
+
+def test_cancel_running_job(finished):
+    sch = _scheduler(1)
+    uid = sch.submit([1, 2], _Request('a'), user='user1')
+    assert _dispatch(sch) == [1]
+    task = _take(sch, 0)
+
+    assert sch.cancel(uid)
+    assert uid in sch.cancelled
+    assert sch.jobs[uid].pending == []
+    assert sch.jobs[uid].finished is None
+
+    # the running task stops at the next stage
+    _done(sch, 0, task, workers.TASK_CANCELLED)
+    assert finished['event'].wait(5)
+    assert finished['removed'] == [uid]
+    assert sch.status(uid)['n_running'] == 0
+    assert sch.user_running['user1'] == 0
+    assert not sch.cancel(uid)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Filtering travel time data as columns must give the same result as ``ExtFilterGroup.check()`` for each data
+"""
+import concurrent.futures
+import datetime
+import time
+
+import numpy as np
+import pytest
+
+from pyticas_tetres.rengine import extractor, extractor_columnar
+from pyticas_tetres.rengine.filter.ftypes import ExtFilter, ExtFilterGroup, And_, Or_
+from pyticas_tetres.rengine.filter.ftypes import SLOT_WEATHER, SLOT_INCIDENT, SLOT_WORKZONE, SLOT_SPECIALEVENT, \
+    SLOT_SNOWMANAGEMENT
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _ExtModel(object):
+    def __init__(self, id):
+        self.id = id
+        self.precip = (id % 7) / 10.0
+        self.impact = id % 3
+
+
+class _ExtDataAccess(object):
+    loaded = []
+
+    def __init__(self, year, session=None):
+        self.year = year
+
+    def ext_models(self, ids):
+        ids = list(ids)
+        self.loaded.append(ids)
+        return {id: _ExtModel(id) for id in ids}
+
+
+def _partition(rs, month, n_rows):
+    """ return partition in the form of ``_query_partition()`` """
+    if not n_rows:
+        return None
+    # 5-minute data in the morning of several days
+    times = [datetime.datetime(2017, month, 1 + idx // 30, 7, 0) + datetime.timedelta(minutes=5 * (idx % 30))
+             for idx in range(n_rows)]
+    links = {}
+    for slot, _, link_columns, _ in extractor_columnar.LINK_SLOTS:
+        n_links = rs.poisson(0.9 if slot == SLOT_WEATHER else 0.6, n_rows)
+        owners = np.repeat(np.arange(n_rows), n_links)
+        keys = [(int(rs.randint(1, 12)),) + tuple(int(rs.randint(0, 4)) for _ in link_columns)
+                for _ in owners]
+        links[slot] = (owners, keys)
+    return {
+        'ids': np.arange(n_rows, dtype=np.int64) + month * 1000,
+        'times': np.array(times, dtype='datetime64[s]'),
+        'values': {col: rs.uniform(0, 100, n_rows) for col in extractor_columnar.TT_VALUE_COLUMNS},
+        'meta_data': [None] * n_rows,
+        'links': links,
+    }
+
+
+@pytest.fixture
+def fake_da(monkeypatch):
+    monkeypatch.setattr(extractor_columnar, 'LINK_SLOTS',
+                        [(slot, _ExtDataAccess, link_columns, ext_attr)
+                         for (slot, _, link_columns, ext_attr) in extractor_columnar.LINK_SLOTS])
+    monkeypatch.setattr(extractor_columnar.conn, 'get_session', lambda: None)
+    _ExtDataAccess.loaded = []
+
+
+@pytest.fixture
+def columns(fake_da):
+
+    rs = np.random.RandomState(0)
+    partitions = [(2017, _partition(rs, month, n_rows)) for month, n_rows in [(1, 150), (2, 0), (3, 120)]]
+    return extractor_columnar._merge_partitions(1, partitions)
+
+
+def _operating_conditions():
+    return [
+        ExtFilterGroup([ExtFilter(SLOT_WEATHER, [lambda w: w._weather.precip < 0.3])], 'dry'),
+        ExtFilterGroup([ExtFilter(SLOT_WEATHER, [lambda w: w._weather.precip >= 0.3], keep_result_in_minute=15)],
+                       'wet with keeping result'),
+        ExtFilterGroup([ExtFilter(SLOT_INCIDENT, [lambda i: i.distance < 2], pass_on_nodata=True),
+                        ExtFilter(SLOT_WORKZONE, [lambda w: w.loc_type == 1], all_items_should_pass=True)],
+                       'incident and workzone'),
+        ExtFilterGroup([Or_(ExtFilter(SLOT_SPECIALEVENT, [lambda e: e.event_type == 0]),
+                            ExtFilter(SLOT_SPECIALEVENT, [lambda e: e._specialevent.impact == 2],
+                                      keep_result_in_minute=10))],
+                       'special event'),
+        ExtFilterGroup([And_(ExtFilter(SLOT_SNOWMANAGEMENT, [lambda s: s.road_status > 0], pass_on_nodata=True),
+                             ExtFilter(SLOT_SNOWMANAGEMENT, [lambda s: s.recovery_level < 3, lambda s: s.distance < 3],
+                                       pass_on_nodata=True))],
+                       'snow management'),
+    ]
+
+
+def test_ext_models_are_loaded_once_for_each_slot(columns):
+    assert len(columns) == 270
+    assert len(_ExtDataAccess.loaded) == len(extractor_columnar.LINK_SLOTS)
+
+
+def test_filter_columns_is_same_as_check(columns):
+    for ef, expected_ef in zip(_operating_conditions(), _operating_conditions()):
+        passed = extractor_columnar.filter_columns(columns, ef)
+        expected = [expected_ef.check(columns.ext_data(idx)) for idx in range(len(columns))]
+
+        assert passed.tolist() == expected, ef.label
+        assert 0 < sum(expected) < len(columns), ef.label
+        assert [extdata.tti.id for extdata in ef.whole_data] == [extdata.tti.id for extdata in expected_ef.whole_data]
+
+
+def test_divide_period_by_month():
+    periods = extractor._divide_period_by_month(datetime.date(2017, 11, 15), datetime.date(2018, 2, 3))
+    assert periods == [
+        [datetime.datetime(2017, 11, 15, 0, 0, 0), datetime.datetime(2017, 11, 30, 23, 59, 59)],
+        [datetime.datetime(2017, 12, 1, 0, 0, 0), datetime.datetime(2017, 12, 31, 23, 59, 59)],
+        [datetime.datetime(2018, 1, 1, 0, 0, 0), datetime.datetime(2018, 1, 31, 23, 59, 59)],
+        [datetime.datetime(2018, 2, 1, 0, 0, 0), datetime.datetime(2018, 2, 3, 23, 59, 59)],
+    ]
+
+    # leap year
+    assert extractor._divide_period_by_month(datetime.date(2016, 2, 1), datetime.date(2016, 2, 29)) == [
+        [datetime.datetime(2016, 2, 1, 0, 0, 0), datetime.datetime(2016, 2, 29, 23, 59, 59)]]
+
+    # a day
+    assert extractor._divide_period_by_month(datetime.date(2017, 12, 31), datetime.date(2017, 12, 31)) == [
+        [datetime.datetime(2017, 12, 31, 0, 0, 0), datetime.datetime(2017, 12, 31, 23, 59, 59)]]
+
+
+def test_load_columns_in_processes_is_same_as_in_current_process(fake_da, monkeypatch):
+    rs = np.random.RandomState(1)
+    n_rows = {1: 60, 2: 0, 3: 90, 4: 30}
+    parts = {month: _partition(rs, month, n) for month, n in n_rows.items()}
+
+    def _query_partition(route_id, sdate, edate, query_kwargs, remove_holiday):
+        assert (route_id, remove_holiday) == (1, True)
+        assert query_kwargs == {'start_time': datetime.time(7, 0), 'end_time': datetime.time(9, 0),
+                                'weekdays': [1, 2, 3]}
+        # the earlier partition is finished later
+        time.sleep(0.01 * (5 - sdate.month))
+        return parts[sdate.month]
+
+    executors = []
+
+    def _get_executor(n_processes, db_info):
+        assert db_info == {'db': 'tetres'}
+        executors.append(concurrent.futures.ThreadPoolExecutor(max_workers=n_processes))
+        return executors[-1]
+
+    monkeypatch.setattr(extractor_columnar, '_query_partition', _query_partition)
+    monkeypatch.setattr(extractor_columnar, '_get_executor', _get_executor)
+
+    periods = extractor._divide_period_by_month(datetime.date(2017, 1, 1), datetime.date(2017, 4, 30))
+    args = (1, periods, datetime.time(7, 0), datetime.time(9, 0), [1, 2, 3], True)
+    expected = extractor_columnar.load_columns(*args, n_processes=1, db_info={'db': 'tetres'})
+    assert not executors
+
+    cols = extractor_columnar.load_columns(*args, n_processes=4, db_info={'db': 'tetres'})
+    assert len(executors) == 1
+    executors[0].shutdown()
+
+    assert len(cols) == sum(n_rows.values())
+    assert cols.ids.tolist() == expected.ids.tolist()
+    assert cols.times.tolist() == expected.times.tolist()
+    for col in extractor_columnar.TT_VALUE_COLUMNS:
+        assert cols.values[col].tolist() == expected.values[col].tolist()
+    for slot, link in cols.links.items():
+        expected_link = expected.links[slot]
+        assert [link.data(idx) and _link_values(link.data(idx)) for idx in range(len(cols))] == \
+               [expected_link.data(idx) and _link_values(expected_link.data(idx)) for idx in range(len(cols))]
+
+
+def _link_values(data):
+    items = data if isinstance(data, list) else [data]
+    return [sorted((k, getattr(v, 'id', v)) for k, v in vars(item).items()) for item in items]
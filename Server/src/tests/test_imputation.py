@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized imputations must be same as the cell-by-cell imputations
+"""
+import copy
+
+import numpy as np
+import pytest
+
+from pyticas import cfg
+from pyticas.moe.imputation import spatial_avg, time_avg
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+def _fill(imp_data, r, c, prev_data, next_data):
+    if cfg.MISSING_VALUE not in [prev_data, next_data]:
+        imp_data[r][c] = sum([prev_data, next_data]) / 2
+    elif prev_data != cfg.MISSING_VALUE:
+        imp_data[r][c] = prev_data
+    elif next_data != cfg.MISSING_VALUE:
+        imp_data[r][c] = next_data
+
+
+def _spatial_imputation(data):
+    imp_data = copy.deepcopy(data)
+    for r in range(len(imp_data)):
+        for c in range(len(imp_data[0])):
+            if imp_data[r][c] == cfg.MISSING_VALUE:
+                _fill(imp_data, r, c, *spatial_avg.find_up_dn_data(r, c, imp_data))
+    return imp_data
+
+
+def _time_imputation(data, allowed_time_diff):
+    imp_data = copy.deepcopy(data)
+    for r in range(len(imp_data)):
+        for c in range(len(imp_data[0])):
+            if imp_data[r][c] == cfg.MISSING_VALUE:
+                _fill(imp_data, r, c,
+                      *time_avg.find_prev_next_data(r, c, imp_data, allowed_time_diff=allowed_time_diff))
+    return imp_data
+
+
+def _data(seed, missing_rate):
+    rs = np.random.RandomState(seed)
+    arr = np.round(rs.uniform(0, 70, size=(15, 120)), 1)
+    arr[rs.rand(*arr.shape) < missing_rate] = cfg.MISSING_VALUE
+    # a station without data
+    arr[3] = cfg.MISSING_VALUE
+    return arr.tolist()
+
+
+@pytest.mark.parametrize('seed,missing_rate', [(0, 0.05), (1, 0.3), (2, 0.7), (3, 0.95)])
+def test_spatial_imputation(seed, missing_rate):
+    data = _data(seed, missing_rate)
+    expected = _spatial_imputation(data)
+
+    assert spatial_avg.imputation(data) == expected
+    assert spatial_avg.imputation_array(np.array(data)).tolist() == expected
+
+
+@pytest.mark.parametrize('seed,missing_rate', [(0, 0.05), (1, 0.3), (2, 0.7), (3, 0.95)])
+@pytest.mark.parametrize('allowed_time_diff', [1, 5, 200])
+def test_time_imputation(seed, missing_rate, allowed_time_diff):
+    data = _data(seed, missing_rate)
+    expected = _time_imputation(data, allowed_time_diff)
+
+    assert time_avg.imputation(data, allowed_time_diff=allowed_time_diff) == expected
+    assert time_avg.imputation_array(np.array(data), allowed_time_diff=allowed_time_diff).tolist() == expected
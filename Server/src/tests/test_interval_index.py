@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Intervals found by the interval index must be same as the intervals found by checking all intervals
+"""
+import datetime
+
+import numpy as np
+import pytest
+
+from pyticas_tetres.cfg import SE_ARRIVAL_WINDOW, SE_DEPARTURE_WINDOW1, SE_DEPARTURE_WINDOW2
+from pyticas_tetres.rengine.cats import specialevent
+from pyticas_tetres.rengine.helper.interval import IntervalIndex
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+BASE_TIME = datetime.datetime(2017, 3, 1, 0, 0)
+
+
+def _time(minutes):
+    return BASE_TIME + datetime.timedelta(minutes=int(minutes))
+
+
+def _brute_force(intervals, dt, include_end):
+    return [value for (start, end, value) in intervals
+            if start <= dt and (dt <= end if include_end else dt < end)]
+
+
+@pytest.mark.parametrize('include_end', [True, False])
+@pytest.mark.parametrize('seed', range(3))
+def test_find_all_is_same_as_brute_force(include_end, seed):
+    rs = np.random.RandomState(seed)
+    intervals = []
+    for idx in range(60):
+        # times are on 5-minute grid, so that times hit the boundaries of intervals
+        start = rs.randint(0, 288) * 5
+        intervals.append((_time(start), _time(start + rs.randint(0, 24) * 5), idx))
+    times = [_time(rs.randint(-10, 300) * 5) for _ in range(500)]
+
+    index = IntervalIndex(include_end=include_end)
+    for start, end, value in intervals:
+        index.add(start, end, value)
+
+    res = index.find_all(times)
+    assert len(index) == len(intervals)
+    assert res == [_brute_force(intervals, dt, include_end) for dt in times]
+    assert any(res) and not all(res)
+    assert index.find(times[0]) == res[0]
+
+    # intervals added after lookup
+    intervals.append((_time(0), _time(1200), 'added'))
+    index.add(*intervals[-1])
+    assert index.find_all(times) == [_brute_force(intervals, dt, include_end) for dt in times]
+
+
+def test_empty_index():
+    assert IntervalIndex().find_all([BASE_TIME, BASE_TIME]) == [[], []]
+
+
+class _SpecialEvent(object):
+    def __init__(self, id, start_time, end_time):
+        self.id = id
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def str2datetime(self, dt):
+        return dt
+
+
+def _find_ses(specialevents, dt):
+    """ implementation of special event lookup before the interval index """
+    seis = []
+    for idx, (sei, distance) in enumerate(specialevents):
+        sdt2 = sei.str2datetime(sei.start_time)
+        sdt1 = sdt2 - datetime.timedelta(minutes=SE_ARRIVAL_WINDOW)
+        edt = sei.str2datetime(sei.end_time)
+        edt1 = min(sdt2 + datetime.timedelta(minutes=SE_DEPARTURE_WINDOW1), edt)
+        edt2 = edt1 + datetime.timedelta(minutes=SE_DEPARTURE_WINDOW2)
+
+        if sdt1 <= dt <= sdt2:
+            seis.append((sei, distance, 'A'))  # Arrival
+        elif edt1 <= dt <= edt2:
+            seis.append((sei, distance, 'D'))  # Departure
+    return seis
+
+
+def test_arrival_first_is_same_as_brute_force():
+    rs = np.random.RandomState(0)
+    specialevents = []
+    for idx in range(30):
+        start = rs.randint(36, 250) * 5
+        # short events make the departure window overlap with the arrival window
+        specialevents.append((_SpecialEvent(idx, _time(start), _time(start + rs.randint(0, 60) * 5)), idx / 10.0))
+    times = [_time(minutes) for minutes in range(0, 1800, 5)]
+
+    index = specialevent._specialevent_index(specialevents)
+    res = [specialevent._arrival_first(matched) for matched in index.find_all(times)]
+
+    assert res == [_find_ses(specialevents, dt) for dt in times]
+    assert any(event_type == 'D' for seis in res for (_, _, event_type) in seis)
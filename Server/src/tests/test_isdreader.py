@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+ISD data read from the parsed data cache must be same as the data parsed from ISD files
+"""
+import datetime
+import os
+from collections import OrderedDict
+
+import pytest
+
+from pyticas_noaa.isd import isdreader
+from pyticas_noaa.isd.isdtypes import CDS, MDS, ISD_AA, ISD_AU, ISD_OC, ISDRawData, ISDData
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+def parse(filepath, data_filter=None, line_filter=None):
+    """ implementation of ``isdreader.parse()`` before using precomputed slices """
+    cds = CDS()
+    mds = MDS()
+    aa = ISD_AA()
+    au = ISD_AU()
+    oc = ISD_OC()
+    time_cache = []
+    for fpath in filepath:
+        with open(fpath, 'r') as f:
+            for num, line in enumerate(f):
+                if line_filter and not line_filter(line):
+                    continue
+                res_cds = cds.parse(line)
+                res_mds = mds.parse(line, cds.total_field_length())
+                ads_start = cds.total_field_length() + mds.total_field_length()
+                ad_line = isdreader._additional_data_string(line, ads_start)
+                if not ad_line:
+                    continue
+                ress_aa = aa.parse(ad_line)
+                ress_au = au.parse(ad_line)
+                ress_oc = oc.parse(ad_line)
+                isd_data = ISDData(ISDRawData(res_cds, res_mds, ress_aa, ress_au, ress_oc))
+                # to avoid duplicated data
+                dtime = isd_data.time().timestamp()
+                if dtime in time_cache:
+                    continue
+                if not data_filter or data_filter(isd_data):
+                    time_cache.append(dtime)
+                    yield isd_data
+
+
+def _section(isd_field, values):
+    """ make a data section with the given values (the other fields are filled with '9') """
+    text = ''
+    for field_name, field_len in isd_field.fields:
+        text += str(values.get(field_name, '9' * field_len)).rjust(field_len, '0')[:field_len]
+    return text
+
+
+def _line(dt, idx, with_additional_data=True):
+    """ ISD line of the observation at the given UTC time """
+    cds = _section(CDS, {
+        'total_variable_chars': '0123', 'station_usaf_id': '726580', 'station_wban_id': '14922',
+        'geophysical_point_observation_year': '%04d' % dt.year,
+        'geophysical_point_observation_month': '%02d' % dt.month,
+        'geophysical_point_observation_day': '%02d' % dt.day,
+        'geophysical_point_observation_hour': '%02d' % dt.hour,
+        'geophysical_point_observation_minute': '%02d' % dt.minute,
+        'geophysical_point_observation_data_source_flag': '4',
+        'geophysical_point_observation_lat': '+44883', 'geophysical_point_observation_lon': '-093229',
+        'geophysical_report_type': 'FM-15' if idx % 4 else 'FM-16',
+        'geophysical_point_observation_elevation_dimension': '+0265',
+        'fixed_weather_station_call_letter_id': 'KMSP ',
+        'meteorological_point_observation_quality_control_process_name': 'V030'})
+    mds = _section(MDS, {
+        'wind_observation_direction_angle': '%03d' % (idx * 10 % 360),
+        'wind_observation_direction_quality_code': '1', 'wind_observation_direction_type_code': 'N',
+        'wind_observation_speed_rate': '%04d' % (idx * 7 % 100), 'wind_observation_speed_quality_code': '1',
+        'visibility_observation_distance_dimension': '%06d' % (16093 - idx * 400),
+        'visibility_observation_quality_code': '1',
+        'air_temperature_observation_air_temperature': '%+05d' % (idx * 3 - 40),
+        'air_temperature_observation_air_temperature_quality_code': '1',
+        'air_temperature_observation_dew_point_temperature': '%+05d' % (idx * 2 - 60),
+        'air_temperature_observation_dew_point_quality_code': '1'})
+    if not with_additional_data:
+        return cds + mds + 'REMMET069METAR\n'
+    ads = 'ADD'
+    if idx % 2:
+        ads += 'AA1%02d%04d%s1' % (1 + idx % 6, idx * 3, idx % 10)
+    if idx % 3:
+        ads += 'AU1%s%s%02d%s0%s1' % (idx % 4, idx % 9, idx % 8, idx % 9, idx % 3)
+    if idx % 5 == 1:
+        ads += 'OC1%04d1' % (idx * 11)
+    ads += 'MA1102501098501'
+    return cds + mds + ads + 'REMMET069METAR KMSP\n'
+
+
+@pytest.fixture
+def isd_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(isdreader, '_loaded_parsed_data', OrderedDict())
+    start = datetime.datetime(2016, 12, 31, 0, 53)
+    times = [start + datetime.timedelta(minutes=20 * idx) for idx in range(240)]
+    # file of a year has some data of the next year (in UTC)
+    lines1 = [_line(dt, idx) for idx, dt in enumerate(times) if dt < datetime.datetime(2017, 1, 1, 2, 0)]
+    lines2 = [_line(dt, idx) for idx, dt in enumerate(times) if dt >= datetime.datetime(2017, 1, 1, 0, 0)]
+    # duplicated observations and the observation without additional data
+    lines2.insert(10, lines2[9])
+    lines2.insert(20, _line(times[-1] + datetime.timedelta(hours=1), 999, with_additional_data=False))
+
+    filepaths = []
+    for name, lines in [('726580-14922-2016', lines1), ('726580-14922-2017', lines2)]:
+        filepath = str(tmp_path / name)
+        with open(filepath, 'w') as f:
+            f.writelines(lines)
+        filepaths.append(filepath)
+    return filepaths
+
+
+def _values(isd_data_list):
+    return [sorted(vars(isd_data.raw).items()) for isd_data in isd_data_list]
+
+
+def test_read_is_same_as_parse(isd_files):
+    expected = list(parse(isd_files))
+    assert len(expected) == 240
+    assert _values(isdreader.read(isd_files)) == _values(expected)
+    assert _values(isdreader.parse(isd_files)) == _values(expected)
+
+    # data are read from the parsed data cache
+    assert all(os.path.exists(filepath + isdreader.PARSED_CACHE_EXTENSION) for filepath in isd_files)
+    isdreader._loaded_parsed_data.clear()
+    assert _values(isdreader.read(isd_files)) == _values(expected)
+
+    def _filter(isd_data):
+        return isd_data.raw.precipitation != 9999
+
+    assert _values(isdreader.read(isd_files, _filter)) == _values(parse(isd_files, _filter))
+
+
+def test_read_with_date_filter_is_same_as_line_filter(isd_files):
+    # filters of `isd.get_day_data()` for 2017-01-01
+    def _date_filter(line_year, line_month, line_day):
+        return line_year == 2017 and line_month == 1 and line_day in [0, 1, 2]
+
+    def _line_filter(line):
+        return _date_filter(int(line[15:19]), int(line[19:21]), int(line[21:23]))
+
+    def _filter(isd_data):
+        return datetime.datetime(2017, 1, 1, 0, 0, 0) <= isd_data.time() <= datetime.datetime(2017, 1, 1, 23, 59, 59)
+
+    expected = list(parse(isd_files, _filter, _line_filter))
+    assert expected
+    assert _values(isdreader.read(isd_files, _filter, _date_filter)) == _values(expected)
+
+
+@pytest.fixture
+def counter(monkeypatch):
+    counter = {'md5': 0, 'parse': 0}
+    md5, parse_file = isdreader._md5, isdreader._parse_file
+
+    def _md5(filepath):
+        counter['md5'] += 1
+        return md5(filepath)
+
+    def _parse_file(*args):
+        counter['parse'] += 1
+        return parse_file(*args)
+
+    monkeypatch.setattr(isdreader, '_md5', _md5)
+    monkeypatch.setattr(isdreader, '_parse_file', _parse_file)
+    return counter
+
+
+def _touch(filepath, seconds=10):
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 1000000000))
+
+
+def test_md5_is_checked_when_modified_time_is_changed(isd_files, counter):
+    filepath = isd_files[1]
+    expected = _values(isdreader.read([filepath]))
+    assert counter == {'md5': 1, 'parse': 1}
+
+    # not changed
+    list(isdreader.read([filepath]))
+    isdreader._loaded_parsed_data.clear()
+    list(isdreader.read([filepath]))
+    assert counter == {'md5': 1, 'parse': 1}
+
+    # downloaded again (the same file)
+    _touch(filepath)
+    assert _values(isdreader.read([filepath])) == expected
+    assert counter == {'md5': 2, 'parse': 1}
+
+    # modified time is saved in the parsed data cache
+    isdreader._loaded_parsed_data.clear()
+    list(isdreader.read([filepath]))
+    assert counter == {'md5': 2, 'parse': 1}
+
+
+def test_changed_file_is_parsed_again(isd_files, counter):
+    filepath = isd_files[1]
+    expected = _values(isdreader.read([filepath]))
+
+    # the same size, but the different data
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+    wind_direction = isdreader._MDS_SLICES[0]
+    assert wind_direction[0] == 'wind_observation_direction_angle'
+    lines[0] = lines[0][:wind_direction[1]] + '123' + lines[0][wind_direction[2]:]
+    with open(filepath, 'w') as f:
+        f.writelines(lines)
+    _touch(filepath)
+
+    res = _values(isdreader.read([filepath]))
+    assert counter == {'md5': 2, 'parse': 2}
+    assert res == _values(parse([filepath]))
+    assert res != expected
+
+    # the different size
+    with open(filepath, 'a') as f:
+        f.write(_line(datetime.datetime(2017, 1, 5, 0, 53), 1))
+    _touch(filepath, 20)
+    assert len(list(isdreader.read([filepath]))) == len(res) + 1
+    assert counter == {'md5': 3, 'parse': 3}
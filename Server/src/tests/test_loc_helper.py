@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Location of coordinates found with the corridor index must be same as the location found by walking rnode links
+"""
+import math
+
+import numpy as np
+import pytest
+
+from pyticas.rn import geo
+from pyticas.rn.orgs import corr_org
+from pyticas.tool import distance as distutil
+from pyticas_tetres.rengine.helper import loc
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _RNode(object):
+    _obj_type_ = 'RNODE'
+
+    def __init__(self, name, lat, lon, corridor):
+        self.name = name
+        self.lat = lat
+        self.lon = lon
+        self.corridor = corridor
+        self.infra_cfg_date = corridor.infra_cfg_date
+
+    def is_rnode(self):
+        return True
+
+    def is_station(self):
+        return True
+
+    def is_entrance(self):
+        return False
+
+    def is_exit(self):
+        return False
+
+
+class _Corridor(object):
+    _obj_type_ = 'CORRIDOR'
+
+    def __init__(self, name, lat, lon, n_rnodes, infra_cfg_date='2017-01-01'):
+        self.name = name
+        self.infra_cfg_date = infra_cfg_date
+        self.rnodes = []
+        # curved road to the north with irregular rnode spacings (about 0.1 ~ 0.5 mile)
+        for idx in range(n_rnodes):
+            self.rnodes.append(_RNode('%s_%d' % (name, idx), lat, lon, self))
+            lat += 0.0015 + 0.006 * ((idx * 7) % 5) / 5
+            lon += 0.002 * math.sin(idx / 3.0)
+        corr_org.link_rnodes(self)
+
+
+class _Route(object):
+    def __init__(self, rnodes):
+        self.rnodes = rnodes
+
+
+def _location_by_coordinate(r, lat, lon):
+    """ implementation of ``location_by_coordinate()`` before using the corridor index """
+    upstream_rnode = r.rnodes[0]
+    corr = upstream_rnode.corridor
+    (upnode, dnnode) = geo.find_updown_rnodes(lat, lon, corr.rnodes, d_limit=1)
+    if not upnode:
+        return False
+
+    f_done = False
+
+    # check to downstream
+    dist = distutil.distance_in_mile_with_coordinate(upnode.lat, upnode.lon, lat, lon)
+    cur_node = upstream_rnode
+    for next_node in geo.iter_to_downstream(upstream_rnode):
+        dist += distutil.distance_in_mile(cur_node, next_node)
+        if upnode == next_node:
+            f_done = True
+            break
+        cur_node = next_node
+
+    if not f_done:
+        # check to upstream
+        dist = distutil.distance_in_mile_with_coordinate(dnnode.lat, dnnode.lon, lat, lon)
+        cur_node = upstream_rnode
+        for next_node in geo.iter_to_upstream(upstream_rnode):
+            dist += distutil.distance_in_mile(cur_node, next_node)
+            if dnnode == next_node:
+                f_done = True
+                break
+            cur_node = next_node
+        if f_done:
+            dist = -1 * dist
+
+    if f_done:
+        return dist
+    else:
+        return False
+
+
+@pytest.fixture
+def corr():
+    loc._index_cache.cache_clear()
+    yield _Corridor('I-35W (NB)', 44.9, -93.3, 30)
+    loc._index_cache.cache_clear()
+
+
+def _coordinates(corr):
+    """ coordinates around rnodes, between rnodes, out of the both ends and far from the corridor """
+    rs = np.random.RandomState(0)
+    coords = []
+    for rn in corr.rnodes:
+        for _ in range(3):
+            coords.append((rn.lat + rs.uniform(-0.004, 0.004), rn.lon + rs.uniform(-0.004, 0.004)))
+    first, last = corr.rnodes[0], corr.rnodes[-1]
+    coords += [(first.lat - 0.003, first.lon), (first.lat - 0.02, first.lon),
+               (last.lat + 0.003, last.lon), (last.lat + 0.02, last.lon),
+               (first.lat, first.lon + 0.1)]
+    return coords
+
+
+def test_distances_are_same_as_distance(corr):
+    lats = np.array([rn.lat for rn in corr.rnodes])
+    lons = np.array([rn.lon for rn in corr.rnodes])
+    for lat, lon in _coordinates(corr)[::7]:
+        dists = distutil.distances_in_mile_with_coordinate(lat, lon, lats, lons)
+        expected = [distutil.distance_in_mile_with_coordinate(lat, lon, rn.lat, rn.lon) for rn in corr.rnodes]
+        assert dists.tolist() == pytest.approx(expected, rel=1e-12, abs=1e-12)
+
+
+def test_find_updown_is_same_as_geo(corr):
+    corr_index = loc._corridor_index(corr)
+    rnodes = corr.rnodes
+    for lat, lon in _coordinates(corr):
+        up_index, dn_index = corr_index.find_updown(lat, lon, d_limit=1)
+        expected = geo.find_updown_rnodes(lat, lon, rnodes, d_limit=1)
+        assert (rnodes[up_index] if up_index is not None else None,
+                rnodes[dn_index] if dn_index is not None else None) == expected
+
+
+def test_location_by_coordinate_is_same_as_walking_links(corr):
+    results = []
+    for start_index in [0, 1, 2, 5, 17, 28]:
+        r = _Route(corr.rnodes[start_index:start_index + 5])
+        for lat, lon in _coordinates(corr):
+            try:
+                expected = _location_by_coordinate(r, lat, lon)
+            except AttributeError:
+                # the previous implementation failed when there is no downstream rnode
+                expected = False
+            res = loc.location_by_coordinate(r, lat, lon)
+            if expected is False:
+                assert res is False, (start_index, lat, lon)
+            else:
+                assert res == pytest.approx(expected, rel=1e-9, abs=1e-9), (start_index, lat, lon)
+            results.append((start_index, loc._corridor_index(corr).find_updown(lat, lon)[1], res))
+
+    assert any(res is not False and res > 0 for _, _, res in results)
+    assert any(res is not False and res < 0 for _, _, res in results)
+    # the second rnode is the most upstream rnode that can be reached by `up_rnode` links
+    assert any(dn_index == 1 and res is not False and res < 0 for start_index, dn_index, res in results)
+    # coordinates upstream of the first rnode are not located
+    assert any(dn_index == 0 and start_index > 0 and res is False for start_index, dn_index, res in results)
+    assert any(res is False for _, _, res in results)
+
+
+def test_mile_point_map_is_same_as_corridor_mile_points(corr):
+    corr2 = _Corridor('I-94 (EB)', corr.rnodes[-1].lat + 0.001, corr.rnodes[-1].lon, 12)
+    corrs = [corr, corr2]
+
+    mmap = {}
+    last_mp = 0
+    for c in corrs:
+        t_mmap = geo.get_mile_point_map(c.rnodes)
+        for rn_name, mp in t_mmap.items():
+            t_mmap[rn_name] = mp + last_mp
+        last_mp = t_mmap[c.rnodes[-1].name]
+        mmap.update(t_mmap)
+
+    assert loc._mile_point_map(corrs) == mmap
+
+
+def test_index_is_made_again_for_new_infra(corr):
+    corr_index = loc._corridor_index(corr)
+    assert loc._corridor_index(corr) is corr_index
+
+    corr.infra_cfg_date = '2018-01-01'
+    assert loc._corridor_index(corr) is not corr_index
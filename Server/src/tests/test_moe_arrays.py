@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+MOEs calculated over station x time arrays must be same as the MOEs calculated for each time step
+"""
+import statistics
+
+import numpy as np
+import pytest
+
+from pyticas.cfg import MISSING_VALUE
+from pyticas.moe.mods import cm, cmh, dvh, lvmt, uvmt, vht, vmt
+from pyticas_tetres.cfg import TT_DATA_INTERVAL
+from pyticas_tetres.rengine import traveltime
+from pyticas_tetres.ttypes import RouteWiseMOEParametersInfo
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+N_DATA = 48
+
+
+class _RNode(object):
+    def __init__(self, n_type):
+        self.n_type = n_type
+
+    def is_entrance(self):
+        return self.n_type == 'entrance'
+
+    def is_exit(self):
+        return self.n_type == 'exit'
+
+
+class _RNodeData(object):
+    def __init__(self, data, lanes=None, speed_limit=None, rnode=None):
+        self.data = data
+        self.lanes = lanes
+        self.speed_limit = speed_limit
+        self.rnode = rnode
+
+
+def generate_meta_data(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data, density_with_virtual_nodes_data,
+                       flow_objects_with_virtual_nodes, flow_data_without_virtual_nodes,
+                       speed_data_without_virtual_nodes, density_data_without_virtual_nodes,
+                       speed_without_virtual_nodes, mrf_data, acceleration_data, moe_param_config, time_index):
+    """ implementation of ``generate_meta_data_list()`` before generating meta data of all time steps at once """
+    raw_meta_data = {
+        "flow": [],
+        "speed": [],
+        "density": [],
+        "flow_without_virtual_nodes": [each_station_data[time_index] for each_station_data in flow_data_without_virtual_nodes],
+        "speed_without_virtual_nodes": [each_station_data[time_index] for each_station_data in speed_data_without_virtual_nodes],
+        "density_without_virtual_nodes": [each_station_data[time_index] for each_station_data in density_data_without_virtual_nodes],
+        "accelerations": [each_station_data[time_index] for each_station_data in acceleration_data],
+        "lanes": [],
+        "speed_limit": [],
+        "speed_average": 0,
+        "speed_variance": 0,
+        "speed_max_u": 0,
+        "speed_min_u": 0,
+        "speed_difference": 0,
+        "number_of_vehicles_entered": 0,
+        "number_of_vehicles_exited": 0,
+        "moe_lane_capacity": moe_param_config.moe_lane_capacity,
+        "moe_critical_density": moe_param_config.moe_critical_density,
+        "moe_congestion_threshold_speed": moe_param_config.moe_congestion_threshold_speed}
+    for flow, speed, flow_object, density in zip(flow_with_virtual_nodes_data, speed_with_virtual_nodes_data,
+                                                 flow_objects_with_virtual_nodes, density_with_virtual_nodes_data):
+        raw_meta_data['flow'].append(flow[time_index])
+        raw_meta_data['speed'].append(speed[time_index])
+        raw_meta_data['density'].append(density[time_index])
+        raw_meta_data['lanes'].append(flow_object.lanes)
+        raw_meta_data['speed_limit'].append(flow_object.speed_limit)
+    speed_meta_data = list()
+    for speed_rnode_data in speed_without_virtual_nodes:
+        if speed_rnode_data and speed_rnode_data.data:
+            speed_data = speed_rnode_data.data
+            if speed_data[time_index] and speed_data[time_index] != MISSING_VALUE:
+                speed_meta_data.append(speed_data[time_index])
+    if mrf_data:
+        try:
+            ent_data = [rnd.data[time_index] for rnd in mrf_data
+                        if rnd.data[time_index] > 0 and not isinstance(rnd.rnode, str) and rnd.rnode.is_entrance()]
+            raw_meta_data["number_of_vehicles_entered"] = sum(ent_data)
+        except Exception:
+            pass
+        try:
+            ext_data = [rnd.data[time_index] for rnd in mrf_data
+                        if rnd.data[time_index] > 0 and not isinstance(rnd.rnode, str) and rnd.rnode.is_exit()]
+            raw_meta_data["number_of_vehicles_exited"] = sum(ext_data)
+        except Exception:
+            pass
+    try:
+        raw_meta_data["speed_average"] = statistics.mean(speed_meta_data)
+    except Exception:
+        pass
+    try:
+        raw_meta_data["speed_variance"] = statistics.variance(speed_meta_data)
+    except Exception:
+        pass
+    try:
+        max_u = max(speed_meta_data)
+        raw_meta_data["speed_max_u"] = max_u
+    except Exception:
+        pass
+    try:
+        min_u = min(speed_meta_data)
+        raw_meta_data["speed_min_u"] = min_u
+    except Exception:
+        pass
+    try:
+        raw_meta_data["speed_difference"] = max_u - min_u
+    except Exception:
+        pass
+    return raw_meta_data
+
+
+def _calculate_dynamically(meta_data, moe_param_config, interval=TT_DATA_INTERVAL):
+    """ implementation of ``calculate_moes()`` before calculating all time steps at once """
+    moe_critical_density = moe_param_config.moe_critical_density
+    moe_lane_capacity = moe_param_config.moe_lane_capacity
+    moe_congestion_threshold_speed = moe_param_config.moe_congestion_threshold_speed
+    return {
+        'vmt': vmt.calculate_vmt_dynamically(meta_data, interval),
+        'vht': vht.calculate_vht_dynamically(meta_data, interval),
+        'dvh': dvh.calculate_dvh_dynamically(meta_data, interval),
+        'lvmt': lvmt.calculate_lvmt_dynamically(meta_data, interval, moe_critical_density, moe_lane_capacity),
+        'uvmt': uvmt.calculate_uvmt_dynamically(meta_data, interval, moe_critical_density, moe_lane_capacity),
+        'cm': cm.calculate_cm_dynamically(meta_data, moe_congestion_threshold_speed),
+        'cmh': cmh.calculate_cmh_dynamically(meta_data, interval, moe_congestion_threshold_speed),
+    }
+
+
+def _moe_param_config(critical_density=40, lane_capacity=2100, threshold_speed=45):
+    moe_param_config = RouteWiseMOEParametersInfo()
+    moe_param_config.moe_critical_density = critical_density
+    moe_param_config.moe_lane_capacity = lane_capacity
+    moe_param_config.moe_congestion_threshold_speed = threshold_speed
+    return moe_param_config
+
+
+def _data(rs, n_rnodes, high, missing_ratio=0.1, zero_ratio=0.05):
+    data = rs.uniform(0, high, (n_rnodes, N_DATA)).round(1)
+    data[rs.rand(n_rnodes, N_DATA) < missing_ratio] = MISSING_VALUE
+    data[rs.rand(n_rnodes, N_DATA) < zero_ratio] = 0
+    return data.tolist()
+
+
+@pytest.fixture
+def route_data():
+    rs = np.random.RandomState(0)
+    # virtual rnodes do not have speed limit ('')
+    lanes = [3, 3, 3, 2, 2, None, 2, 4, 4, 4]
+    speed_limits = [65, '', 65, 55, 55, 55, '', 70, None, 70]
+    n_rnodes, n_stations = len(lanes), 6
+    flow = _data(rs, n_rnodes, 2500)
+    flow_objects = [_RNodeData(rnd_flow, ln, sl) for rnd_flow, ln, sl in zip(flow, lanes, speed_limits)]
+    speed_wo = _data(rs, n_stations, 75)
+    # station without valid speed data at some time steps
+    for tidx in range(5):
+        for sidx in range(n_stations):
+            speed_wo[sidx][tidx] = MISSING_VALUE if sidx % 2 else 0
+    speed_wo[0][5] = 30.5
+    speed_wo_objects = [_RNodeData(data) for data in speed_wo] + [None, _RNodeData([])]
+    mrf = [_RNodeData(_data(rs, 1, 500)[0], rnode=_RNode(n_type))
+           for n_type in ['entrance', 'exit', 'station', 'entrance', 'exit']]
+    mrf.append(_RNodeData(_data(rs, 1, 500)[0], rnode='virtual'))
+    return (flow, _data(rs, n_rnodes, 75), _data(rs, n_rnodes, 120), flow_objects,
+            _data(rs, n_stations, 2500), speed_wo, _data(rs, n_stations, 120),
+            speed_wo_objects, mrf, _data(rs, n_stations, 5, zero_ratio=0))
+
+
+@pytest.mark.parametrize('moe_param_config', [_moe_param_config(), _moe_param_config(30, 1800, 55),
+                                              _moe_param_config(None, None, None)])
+def test_meta_data_list_is_same_as_meta_data(route_data, moe_param_config):
+    meta_data_list = traveltime.generate_meta_data_list(*route_data, moe_param_config)
+    assert len(meta_data_list) == N_DATA
+    for tidx, meta_data in enumerate(meta_data_list):
+        expected = generate_meta_data(*route_data, moe_param_config, tidx)
+        assert sorted(meta_data.keys()) == sorted(expected.keys())
+        for key, value in expected.items():
+            assert meta_data[key] == pytest.approx(value, rel=1e-9, abs=1e-9), (tidx, key)
+
+
+def test_meta_data_list_without_mrf_data(route_data):
+    meta_data_list = traveltime.generate_meta_data_list(*route_data[:8], [], *route_data[9:], _moe_param_config())
+    assert [meta_data['number_of_vehicles_entered'] for meta_data in meta_data_list] == [0] * N_DATA
+    assert [meta_data['number_of_vehicles_exited'] for meta_data in meta_data_list] == [0] * N_DATA
+
+
+@pytest.mark.parametrize('moe_param_config', [_moe_param_config(), _moe_param_config(30, 1800, 55),
+                                              _moe_param_config(None, None, None)])
+def test_moes_are_same_as_dynamically(route_data, moe_param_config):
+    flow, speed, density, flow_objects = route_data[:4]
+    moes = traveltime.calculate_moes({
+        'flow': np.array(flow, dtype=np.float64),
+        'speed': np.array(speed, dtype=np.float64),
+        'density': np.array(density, dtype=np.float64),
+        'lanes': [rnode_data.lanes for rnode_data in flow_objects],
+        'speed_limit': [rnode_data.speed_limit for rnode_data in flow_objects],
+    }, moe_param_config)
+
+    expected = [_calculate_dynamically(generate_meta_data(*route_data, moe_param_config, tidx), moe_param_config)
+                for tidx in range(N_DATA)]
+    for key in ['vmt', 'vht', 'dvh', 'lvmt', 'uvmt', 'cm', 'cmh']:
+        assert moes[key] == pytest.approx([values[key] for values in expected], rel=1e-9, abs=1e-12), key
+        if moe_param_config.moe_critical_density or key in ['vmt', 'vht', 'dvh']:
+            assert any(values[key] for values in expected), key
+
+
+def test_array_of_single_time_step():
+    meta_data = {'flow': [1200.0, MISSING_VALUE, 1800.0], 'speed': [30.0, 60.0, 0],
+                 'density': [50.0, 20.0, 60.0], 'lanes': [2, 2, 3], 'speed_limit': [55, 55, 60]}
+    flow, speed, density = [np.array([meta_data[key]]).T for key in ['flow', 'speed', 'density']]
+    interval = TT_DATA_INTERVAL
+
+    assert vmt.calculate_vmt_array(flow, interval).tolist() == \
+           pytest.approx([vmt.calculate_vmt_dynamically(meta_data, interval)])
+    assert vht.calculate_vht_array(flow, speed, interval).tolist() == \
+           pytest.approx([vht.calculate_vht_dynamically(meta_data, interval)])
+    assert dvh.calculate_dvh_array(flow, speed, meta_data['speed_limit'], interval).tolist() == \
+           pytest.approx([dvh.calculate_dvh_dynamically(meta_data, interval)])
+    assert lvmt.calculate_lvmt_array(flow, density, meta_data['lanes'], interval, 40, 2100).tolist() == \
+           pytest.approx([lvmt.calculate_lvmt_dynamically(meta_data, interval, 40, 2100)])
+    assert uvmt.calculate_uvmt_array(flow, density, meta_data['lanes'], interval, 40, 2100).tolist() == \
+           pytest.approx([uvmt.calculate_uvmt_dynamically(meta_data, interval, 40, 2100)])
+    assert cm.calculate_cm_array(speed, 45).tolist() == pytest.approx([cm.calculate_cm_dynamically(meta_data, 45)])
+    assert cmh.calculate_cmh_array(speed, interval, 45).tolist() == \
+           pytest.approx([cmh.calculate_cmh_dynamically(meta_data, interval, 45)])
+
+    # route without rnode
+    assert cm.calculate_cm_array(np.zeros((0, 3)), 45).tolist() == [0, 0, 0]
+    assert cm.calculate_cm_dynamically({'speed': []}, 45) == 0
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+Route data bundle must return the same data as MOE modules without bundle
+"""
+import datetime
+
+import pytest
+
+from pyticas.moe import moe, moe_helper
+from pyticas.moe.mods import total_flow_with_virtual_nodes, density_with_virtual_nodes, speed_with_virtual_nodes, tt
+from pyticas.ttypes import Period, RNodeData
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _Detector(object):
+    def __init__(self, name, lane, value):
+        self.name = name
+        self.lane = lane
+        self.value = value
+
+
+class _Station(object):
+    def __init__(self, name, mile_point, detectors):
+        self.name = name
+        self.mile_point = mile_point
+        self.detectors = detectors
+
+
+class _Route(object):
+    def __init__(self, stations):
+        self.stations = stations
+
+    def get_stations(self):
+        return self.stations
+
+    def get_rnodes(self):
+        return self.stations
+
+    def get_detector_checker(self):
+        # lane 2 is closed
+        return lambda det: det.lane != 2
+
+
+def _traffic_data(rnode_list, prd, datatype, **kwargs):
+    dc = kwargs.get('detector_checker', None)
+    results = []
+    for st in rnode_list:
+        rd = RNodeData(st, prd, None)
+        rd.rnode_name = st.name
+        dets = [det for det in st.detectors if not dc or dc(det)]
+        value = sum(det.value for det in dets)
+        rd.data = [value + tidx for tidx in range(len(prd.get_timeline()))]
+        rd.detectors = dets
+        results.append(rd)
+    return results
+
+
+@pytest.fixture
+def route(monkeypatch):
+    stations = [_Station('rnd_1', 0.0, [_Detector('1', 1, 30), _Detector('2', 2, 60)]),
+                _Station('rnd_2', 0.8, [_Detector('3', 1, 40)]),
+                _Station('rnd_3', 1.5, [_Detector('4', 1, 20), _Detector('5', 2, 10)])]
+    monkeypatch.setattr(moe_helper, 'get_traffic_data', _traffic_data)
+    monkeypatch.setattr(moe_helper, 'get_mile_point_map', lambda rnodes: {st.name: st.mile_point for st in rnodes})
+    return _Route(stations)
+
+
+@pytest.fixture
+def prd():
+    return Period(datetime.datetime(2017, 3, 1, 7, 0), datetime.datetime(2017, 3, 1, 8, 0), 300)
+
+
+def test_checker_excludes_detector(route, prd):
+    checked = moe_helper.get_total_flow(route.get_stations(), prd, detector_checker=route.get_detector_checker())
+    unchecked = moe_helper.get_total_flow(route.get_stations(), prd)
+    assert checked[0].data != unchecked[0].data
+
+
+@pytest.mark.parametrize('module', [total_flow_with_virtual_nodes, density_with_virtual_nodes, speed_with_virtual_nodes])
+def test_bundle_data_equal_to_module(route, prd, module):
+    expected = module.run(route, prd)
+    actual = module.run(route, prd, bundle=moe.route_data_bundle(route, prd))
+
+    assert [list(d) for d in actual[1]] == [list(d) for d in expected[1]]
+    assert [list(d) for d in actual[3]] == [list(d) for d in expected[3]]
+    assert [res.rnode_name for res in actual[2]] == [res.rnode_name for res in expected[2]]
+
+
+def test_bundle_speed_for_travel_time_uses_checker(route, prd):
+    bundle = moe.route_data_bundle(route, prd)
+    expected = moe_helper.get_speed(route.get_stations(), prd, detector_checker=route.get_detector_checker())
+    assert [res.data for res in bundle.speed_for(prd)] == [res.data for res in expected]
+
+
+def _module_data(res):
+    if isinstance(res, tuple):
+        return [[list(d) for d in res[1]], [list(d) for d in res[3]]]
+    return [list(rd.data) for rd in res]
+
+
+@pytest.mark.parametrize('module', [total_flow_with_virtual_nodes, density_with_virtual_nodes, speed_with_virtual_nodes, tt])
+def test_multi_period_data_equal_to_module(route, module, monkeypatch):
+    prds = [Period(datetime.datetime(2017, 3, day, 7, 0), datetime.datetime(2017, 3, day, 8, 0), 300)
+            for day in [1, 1, 2]]
+    prds[1] = Period(datetime.datetime(2017, 3, 1, 16, 0), datetime.datetime(2017, 3, 1, 18, 0), 300)
+    eval_name = module.__name__.split('.')[-1]
+    expected = [moe._do_moe(route, prd, eval_name) for prd in prds]
+
+    layouts = []
+    route_rnode_layout = moe_helper.route_rnode_layout
+    monkeypatch.setattr(moe_helper, 'route_rnode_layout', lambda r: layouts.append(r) or route_rnode_layout(r))
+    actual = moe._do_moe_md(route, prds, eval_name)
+
+    # the layout of the route is made once for all periods
+    assert layouts == [route]
+    assert [_module_data(res) for res in actual] == [_module_data(res) for res in expected]
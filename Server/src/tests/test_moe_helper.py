@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Virtual rnodes made from the route-level array must be same as the ones made rnode by rnode
+"""
+import datetime
+
+import numpy as np
+import pytest
+
+from pyticas.moe import moe_helper
+from pyticas.ttypes import Period, RNodeData
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _Station(object):
+    def __init__(self, name, mile_point):
+        self.name = name
+        self.mile_point = mile_point
+
+
+class _Route(object):
+    def __init__(self, stations):
+        self.stations = stations
+
+    def get_stations(self):
+        return self.stations
+
+
+def _station_data(route, seed):
+    rs = np.random.RandomState(seed)
+    prd = Period(datetime.datetime(2017, 3, 1, 7, 0), datetime.datetime(2017, 3, 1, 9, 0), 300)
+    results = []
+    for st in route.get_stations():
+        rd = RNodeData(None, prd, None)
+        rd.rnode_name = st.name
+        rd.lanes = int(rs.randint(1, 4))
+        rd.speed_limit = 55
+        rd.data = np.round(rs.uniform(0, 70, len(rd.data)), 1).tolist()
+        for tidx in rs.choice(len(rd.data), 4, replace=False):
+            rd.data[tidx] = -1 if tidx % 2 else 0
+        results.append(rd)
+    return results
+
+
+@pytest.fixture
+def route(monkeypatch):
+    rs = np.random.RandomState(0)
+    mile_points = np.round(np.cumsum(rs.uniform(0.1, 1.5, 12)), 1)
+    monkeypatch.setattr(moe_helper, 'get_mile_point_map', lambda rnodes: {st.name: st.mile_point for st in rnodes})
+    return _Route([_Station('rnd_%d' % idx, mp) for idx, mp in enumerate(mile_points)])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_matrix_is_same_as_rnode_by_rnode(route, seed):
+    results = _station_data(route, seed)
+    expected = moe_helper._add_virtual_rnodes(results, route)
+
+    rows = moe_helper.add_virtual_rnodes(results, route)
+    matrix = moe_helper.virtual_rnode_matrix(results, route)
+
+    assert len(rows) == len(expected) > len(results)
+    for res, exp in zip(rows, expected):
+        assert list(res.data) == list(exp.data)
+        assert (res.rnode_name, res.lanes, res.speed_limit) == (exp.rnode_name, exp.lanes, exp.speed_limit)
+    assert matrix.values.tolist() == [list(exp.data) for exp in expected]
+    assert matrix.is_virtual.tolist() == [not exp.rnode_name for exp in expected]
+    assert matrix.lanes == [exp.lanes for exp in expected]
+
+
+def test_layout_of_route_is_same_as_layout_of_data(route):
+    results = _station_data(route, 0)
+    assert moe_helper.route_rnode_layout(route) == moe_helper.virtual_rnode_layout(results, route)
+
+
+def test_data_in_different_length(route):
+    results = _station_data(route, 0)
+    # the first rnode is only used as upstream rnode in the rnode-by-rnode implementation
+    results[0].data = results[0].data[:-1]
+    expected = moe_helper._add_virtual_rnodes(results, route)
+
+    rows = moe_helper.add_virtual_rnodes(results, route)
+
+    assert [list(res.data) for res in rows] == [list(exp.data) for exp in expected]
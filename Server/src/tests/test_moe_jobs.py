@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Identical MOE requests must share one job, and the workbook is given only when the job is done
+"""
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from pyticas_server.ticas_app import moe_jobs
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+ROUTE_JSON = json.dumps({'name': 'route 1', 'rnodes': ['rnd_1', 'rnd_2'], 'cfg': {'lanes': [2, 3]}})
+PERIODS_JSON = json.dumps([{'start_date': '2017-03-01 07:00:00', 'end_date': '2017-03-01 08:00:00', 'interval': 300}])
+
+
+@pytest.fixture(autouse=True)
+def jobs(tmp_path, monkeypatch):
+    monkeypatch.setattr(moe_jobs, '_tmp_dir', lambda: str(tmp_path))
+    monkeypatch.setattr(moe_jobs, '_jobs', {})
+    monkeypatch.setattr(moe_jobs, '_in_flight', {})
+    monkeypatch.setattr(moe_jobs, '_executor', None)
+    yield
+    if moe_jobs._executor:
+        moe_jobs._executor.shutdown(wait=True)
+
+
+def _wait(uid):
+    for _ in range(500):
+        status = moe_jobs.status(uid)
+        if status['state'] in [moe_jobs.JOB_DONE, moe_jobs.JOB_FAILED]:
+            return status
+        time.sleep(0.01)
+    raise AssertionError('job is not finished')
+
+
+def test_request_key():
+    key = moe_jobs.request_key('Travel Time', ROUTE_JSON, PERIODS_JSON)
+
+    # the same request in the different json format
+    route_json = json.dumps(json.loads(ROUTE_JSON), sort_keys=True, indent=2)
+    periods_json = json.dumps(json.loads(PERIODS_JSON), separators=(',', ':'))
+    assert moe_jobs.request_key('Travel Time', route_json, periods_json) == key
+
+    assert moe_jobs.request_key('Speed', ROUTE_JSON, PERIODS_JSON) != key
+    assert moe_jobs.request_key('Travel Time', ROUTE_JSON.replace('rnd_2', 'rnd_3'), PERIODS_JSON) != key
+    assert moe_jobs.request_key('Travel Time', ROUTE_JSON, PERIODS_JSON.replace('07:00', '06:00')) != key
+
+
+def test_identical_requests_share_job():
+    key = moe_jobs.request_key('Travel Time', ROUTE_JSON, PERIODS_JSON)
+    started = threading.Event()
+
+    def _write(filepath):
+        started.wait(5)
+        with open(filepath, 'w') as f:
+            f.write('moe')
+
+    uid = moe_jobs.submit(key, 'Travel Time', _write)
+    assert moe_jobs.submit(key, 'Travel Time', _write) == uid
+    assert moe_jobs.result_path(uid) is None
+    started.set()
+
+    assert _wait(uid)['state'] == moe_jobs.JOB_DONE
+    with open(moe_jobs.result_path(uid)) as f:
+        assert f.read() == 'moe'
+
+    # a finished job is not shared
+    new_uid = moe_jobs.submit(key, 'Travel Time', _write)
+    assert new_uid != uid
+    assert _wait(new_uid)['state'] == moe_jobs.JOB_DONE
+
+
+def test_failed_job():
+    def _write(filepath):
+        with open(filepath, 'w') as f:
+            f.write('partial')
+        raise ValueError('no data')
+
+    uid = moe_jobs.submit('key', 'Travel Time', _write)
+
+    status = _wait(uid)
+    assert status['state'] == moe_jobs.JOB_FAILED
+    assert status['error'] == 'no data'
+    assert moe_jobs.result_path(uid) is None
+    assert not os.listdir(moe_jobs._tmp_dir())
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+MOE values recalculated from meta data in chunks must be same as the values calculated for each meta data
+"""
+import datetime
+import json
+
+import numpy as np
+import pytest
+
+from pyticas.cfg import MISSING_VALUE
+from pyticas.moe.mods.cm import calculate_cm_dynamically
+from pyticas.moe.mods.cmh import calculate_cmh_dynamically
+from pyticas.moe.mods.dvh import calculate_dvh_dynamically
+from pyticas.moe.mods.lvmt import calculate_lvmt_dynamically
+from pyticas.moe.mods.uvmt import calculate_uvmt_dynamically
+from pyticas.moe.mods.vht import calculate_vht_dynamically
+from pyticas.moe.mods.vmt import calculate_vmt_dynamically
+from pyticas_tetres.cfg import TT_DATA_INTERVAL
+from pyticas_tetres.da.tt import TravelTimeDataAccess
+from pyticas_tetres.rengine import traveltime
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+MOE_NAMES = ['vmt', 'vht', 'dvh', 'lvmt', 'uvmt', 'cm', 'cmh']
+
+# (lanes, speed limits, critical density, lane capacity, congestion threshold speed)
+GROUPS = [
+    ([3, 3, 2, 2, 2], [65, 65, 55, 55, 55], 40, 2100, 45),
+    ([3, 3, 2, 2, 2], [65, 65, 55, 55, 55], 35, 2000, 50),
+    ([3, 3, 2, 2, 2], [65, 60, 55, 55, 55], 40, 2100, 45),
+    ([2, 3, 2, 2, 2], [65, 65, 55, 55, 55], 40, 2100, 45),
+    ([4, 4, 3], [70, 70, None], 45, 2200, 40),
+    ([2, None, 2, 2], [60, 60, 60, 60], 40, 2100, 45),
+    ([2, 2], [60, 60], None, None, None),
+]
+
+
+def _recalculate_per_row(meta_data, updatable_moe_values):
+    """ implementation of ``recalculate_moe_values_from_meta_data_a_route()`` before calculating in chunks """
+    updatable_data = dict()
+    interval = TT_DATA_INTERVAL
+    moe_critical_density = meta_data["moe_critical_density"]
+    moe_lane_capacity = meta_data["moe_lane_capacity"]
+    moe_congestion_threshold_speed = meta_data["moe_congestion_threshold_speed"]
+    for key in updatable_moe_values:
+        function = globals()["calculate_{}_dynamically".format(key)]
+        if key in ["lvmt", "uvmt"]:
+            updatable_data[key] = function(meta_data, interval, moe_critical_density, moe_lane_capacity)
+        elif key in ["cm"]:
+            updatable_data[key] = function(meta_data, moe_congestion_threshold_speed)
+        elif key in ["cmh"]:
+            updatable_data[key] = function(meta_data, interval, moe_congestion_threshold_speed)
+        else:
+            updatable_data[key] = function(meta_data, interval)
+    return updatable_data
+
+
+def _meta_data(rs, group):
+    lanes, speed_limit, critical_density, lane_capacity, threshold_speed = group
+    n_rnodes = len(lanes)
+    flow = rs.uniform(0, 2500, n_rnodes).round(1)
+    speed = rs.uniform(0, 75, n_rnodes).round(1)
+    density = rs.uniform(0, 120, n_rnodes).round(1)
+    flow[rs.rand(n_rnodes) < 0.1] = MISSING_VALUE
+    speed[rs.rand(n_rnodes) < 0.1] = MISSING_VALUE
+    speed[rs.rand(n_rnodes) < 0.05] = 0
+    return {
+        'flow': flow.tolist(),
+        'speed': speed.tolist(),
+        'density': density.tolist(),
+        'lanes': list(lanes),
+        'speed_limit': list(speed_limit),
+        'moe_critical_density': critical_density,
+        'moe_lane_capacity': lane_capacity,
+        'moe_congestion_threshold_speed': threshold_speed,
+    }
+
+
+@pytest.fixture
+def meta_data_list():
+    rs = np.random.RandomState(0)
+    # meta data of the groups are mixed as data of several routes
+    return [_meta_data(rs, GROUPS[gidx]) for gidx in rs.randint(0, len(GROUPS), 300)]
+
+
+def test_recalculate_moes_is_same_as_per_row(meta_data_list):
+    res = traveltime.recalculate_moes(meta_data_list, MOE_NAMES)
+    expected = [_recalculate_per_row(meta_data, MOE_NAMES) for meta_data in meta_data_list]
+    for key in MOE_NAMES:
+        assert res[key] == pytest.approx([values[key] for values in expected], rel=1e-9, abs=1e-12), key
+        assert any(values[key] for values in expected), key
+
+    # only the given MOEs are calculated
+    res = traveltime.recalculate_moes(meta_data_list, ['cm', 'vmt'])
+    assert sorted(res.keys()) == ['cm', 'vmt']
+    assert res['cm'] == pytest.approx([values['cm'] for values in expected])
+
+
+class _TravelTimeDataAccess(object):
+    instances = []
+
+    def __init__(self, year, **kwargs):
+        self.year = year
+        self.rows = []
+        self.chunk_sizes = []
+        self.updated = []
+        self.is_closed = False
+        self.instances.append(self)
+
+    def get_meta_data_count(self, sdt, edt, route_ids=None):
+        return len([row for row in self.rows if row[1]])
+
+    def meta_data_chunks(self, sdt, edt, route_ids=None, chunk_size=1000):
+        self.chunk_sizes.append(chunk_size)
+        for idx in range(0, len(self.rows), chunk_size):
+            yield self.rows[idx:idx + chunk_size]
+
+    def bulk_update(self, dict_list, **kwargs):
+        self.updated.append(dict_list)
+        return True
+
+    def commit(self):
+        return True
+
+    def close_session(self):
+        self.is_closed = True
+
+
+def test_recalculate_in_chunks_is_same_as_per_row(meta_data_list, monkeypatch):
+    rows = [(idx + 1, json.dumps(meta_data)) for idx, meta_data in enumerate(meta_data_list)]
+    # data without meta data are not updated
+    rows[5] = (6, None)
+    rows[120] = (121, '')
+
+    def _data_access(year, **kwargs):
+        da = _TravelTimeDataAccess(year, **kwargs)
+        da.rows = rows
+        return da
+
+    invalidated = []
+    _TravelTimeDataAccess.instances = []
+    monkeypatch.setattr(traveltime, 'TravelTimeDataAccess', _data_access)
+    monkeypatch.setattr(traveltime.result_cache, 'invalidate', lambda *args: invalidated.append(args))
+
+    sdt, edt = datetime.datetime(2017, 1, 1, 0, 0, 0), datetime.datetime(2017, 12, 31, 23, 59, 59)
+    res = traveltime.recalculate_moe_values_from_meta_data(2017, sdt, edt, ['vmt', 'lvmt', 'cmh'],
+                                                           route_ids=[1, 2], chunk_size=64)
+
+    da = _TravelTimeDataAccess.instances[0]
+    assert res['year'] == 2017
+    assert res['n_rows'] == len(rows)
+    assert da.chunk_sizes == [64]
+    assert [len(updated) for updated in da.updated] == [63, 63, 64, 64, 44]
+    assert da.is_closed
+    assert invalidated == [([1, 2], sdt, edt)]
+
+    updated = {values['id']: values for dict_list in da.updated for values in dict_list}
+    assert sorted(updated.keys()) == [tt_id for tt_id, meta_data in rows if meta_data]
+    for tt_id, meta_data in rows:
+        if not meta_data:
+            continue
+        expected = _recalculate_per_row(json.loads(meta_data), ['vmt', 'lvmt', 'cmh'])
+        assert sorted(updated[tt_id].keys()) == ['cmh', 'id', 'lvmt', 'vmt']
+        for key, value in expected.items():
+            assert updated[tt_id][key] == pytest.approx(value, rel=1e-9, abs=1e-12), (tt_id, key)
+
+
+def test_nothing_to_recalculate(monkeypatch):
+    invalidated = []
+    _TravelTimeDataAccess.instances = []
+    monkeypatch.setattr(traveltime, 'TravelTimeDataAccess', _TravelTimeDataAccess)
+    monkeypatch.setattr(traveltime.result_cache, 'invalidate', lambda *args: invalidated.append(args))
+
+    sdt, edt = datetime.datetime(2017, 1, 1, 0, 0, 0), datetime.datetime(2017, 12, 31, 23, 59, 59)
+    res = traveltime.recalculate_moe_values_from_meta_data(2017, sdt, edt, ['vmt'])
+    assert res['n_rows'] == 0
+    assert _TravelTimeDataAccess.instances[0].chunk_sizes == [traveltime.RECALCULATION_CHUNK_SIZE]
+    assert not invalidated
+
+
+def test_meta_data_condition():
+    sdt, edt = datetime.datetime(2017, 1, 1, 0, 0, 0), datetime.datetime(2017, 1, 31, 23, 59, 59)
+    assert TravelTimeDataAccess._meta_data_condition(None, sdt, edt, None) == \
+           "meta_data IS NOT NULL AND time >= '2017-01-01 00:00:00' AND time <= '2017-01-31 23:59:59'"
+    assert TravelTimeDataAccess._meta_data_condition(None, sdt, edt, [3, '12']).endswith(' AND route_id IN (3, 12)')
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Reliabilities calculated from sorted travel times must be same as the previous calculation
+"""
+import statistics
+
+import numpy as np
+import pytest
+
+from pyticas.tool import num
+from pyticas_tetres.rengine import reliability
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+FFS_TT = 10.0
+ROUTE_LENGTH = 8.5
+
+
+@pytest.fixture(autouse=True)
+def route(monkeypatch):
+    monkeypatch.setattr(reliability, '_tt_by_freeflowspeed', lambda ttri: FFS_TT)
+    monkeypatch.setattr(reliability, 'milepoint_routeLength', lambda ttri: ROUTE_LENGTH)
+
+
+def _calculate(tts):
+    """ reliabilities calculated with unsorted travel times (implementation before sorting once) """
+    tts = [tt for tt in tts if tt > 0]
+    avg_tt = statistics.mean(tts)
+    median_tt = statistics.median(tts)
+    congested_tts = reliability._congested_travel_times(FFS_TT, tts)
+    congested_avg_tt = statistics.mean(congested_tts) if congested_tts else reliability.MISSING_VALUE
+
+    percentile_tts, buffer_indice, buffer_indice_median, planning_indice, traveltime_rate = {}, {}, {}, {}, {}
+    for pct in [0.5, 0.8, 0.85, 0.9, 0.95]:
+        ipct = int(pct * 100)
+        pct_tt = num.percentile(tts, pct)
+        percentile_tts[ipct] = pct_tt
+        if pct < 0.8:
+            continue
+        buffer_indice[ipct] = max((pct_tt - avg_tt) / avg_tt, 0)
+        buffer_indice_median[ipct] = max((pct_tt - median_tt) / median_tt, 0)
+        planning_indice[ipct] = pct_tt / FFS_TT
+        traveltime_rate[ipct] = pct_tt / ROUTE_LENGTH
+
+    ontime_tt = reliability.RATE_FOR_ON_TIME_RATE * num.percentile(tts, 0.5)
+    ontime_count = len([tt for tt in tts if tt < ontime_tt])
+    tts_for_sv = [tt for tt in tts if tt > avg_tt]
+
+    return {
+        'count': len(tts),
+        'avg_tt': avg_tt,
+        'tt_rate': avg_tt / ROUTE_LENGTH,
+        'tt_by_ffs': FFS_TT,
+        'congested_hour_factor': reliability.CONGESTED_HOUR_FACTOR,
+        'congested_avg_tt': congested_avg_tt,
+        'congested_count': len(congested_tts),
+        'travel_time_index': (congested_avg_tt / FFS_TT) if congested_tts else reliability.MISSING_VALUE,
+        'buffer_index': buffer_indice,
+        'buffer_index_median': buffer_indice_median,
+        'travel_time_rate': traveltime_rate,
+        'misery_index': num.percentile(tts, 0.975) / FFS_TT,
+        'on_time_arrival': ontime_count / len(tts),
+        'on_time_arrival_count': ontime_count,
+        'semi_variance': num.variance(tts_for_sv) if len(tts_for_sv) > reliability.N_LIMIT_FOR_SEMI_VAR else -1,
+        'semi_variance_count': len(tts_for_sv),
+        'lottr': percentile_tts[80] / percentile_tts[50],
+        'planning_time_index': planning_indice,
+        'percentile_tts': percentile_tts,
+    }
+
+
+@pytest.mark.parametrize('n_data', [1, 2, 3, 10, 11, 100, 1001])
+def test_percentile_sorted(n_data):
+    data = np.random.RandomState(n_data).uniform(5, 30, n_data).tolist()
+    sdata = sorted(data)
+    for p in [0, 0.1, 0.5, 0.8, 0.85, 0.9, 0.95, 0.975, 1]:
+        assert reliability._percentile_sorted(sdata, p) == num.percentile(data, p)
+
+
+def test_calculate_groups():
+    rs = np.random.RandomState(0)
+    n_data = 5000
+    tts = np.round(rs.lognormal(np.log(12), 0.3, n_data), 2)
+    # invalid travel times and ties at the thresholds
+    tts[rs.rand(n_data) < 0.05] = -1
+    tts[rs.rand(n_data) < 0.05] = FFS_TT * reliability.CONGESTED_HOUR_FACTOR
+    keys = rs.randint(0, 40, n_data)
+    keys[np.flatnonzero(tts <= 0)[0]] = 99  # a group without valid travel time
+
+    res = reliability.calculate_groups(None, tts, keys)
+
+    assert sorted(res.keys()) == sorted(set(keys[tts > 0].tolist()))
+    for key, group_res in res.items():
+        assert group_res == _calculate(tts[keys == key].tolist())
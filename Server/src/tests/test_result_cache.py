@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Estimation result cache must not return results made before the data were changed or deleted
+"""
+import datetime
+import os
+import time
+
+import pytest
+
+from pyticas_tetres.est import result_cache
+from pyticas_tetres.est.helper import util
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _TTRoute(object):
+    def __init__(self):
+        self.id = 3
+        self.corridor = 'I-94 (EB)'
+        self.name = 'route 3'
+        self.route = {'rnodes': ['rnd_1', 'rnd_2']}
+
+
+class _EstimationRequest(object):
+    def __init__(self):
+        self.travel_time_route = _TTRoute()
+        self.start_date = '2017-01-01'
+        self.end_date = '2017-12-31'
+        self.start_time = '07:00:00'
+        self.end_time = '08:00:00'
+
+
+@pytest.fixture
+def eparam(tmp_path, monkeypatch):
+    def output_path(sub_dir='', create=True):
+        output_dir = os.path.join(str(tmp_path), sub_dir)
+        if create and not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        return output_dir
+
+    monkeypatch.setattr(util, 'output_path', output_path)
+    return _EstimationRequest()
+
+
+def _estimate(eparam, uid):
+    ttri = eparam.travel_time_route
+    route_dir = os.path.join(util.output_path(uid), '%s - %s' % (ttri.corridor, ttri.name))
+    os.makedirs(route_dir)
+    with open(os.path.join(route_dir, 'reliabilities.xlsx'), 'wb') as f:
+        f.write(b'xlsx')
+    started = time.time()
+    assert result_cache.put(eparam, uid, started)
+
+
+def test_identical_request_hits_cache(eparam):
+    _estimate(eparam, 'uid-1')
+    entry = result_cache.get(_EstimationRequest())
+    assert entry
+    result_cache.restore(entry, 'uid-2')
+    assert os.listdir(util.output_path('uid-2')) == ['%s - %s' % (eparam.travel_time_route.corridor,
+                                                                 eparam.travel_time_route.name)]
+
+
+def test_entry_of_other_cache_version_is_not_used(eparam, monkeypatch):
+    _estimate(eparam, 'uid-1')
+    assert result_cache.get(eparam)
+
+    monkeypatch.setattr(result_cache, 'CACHE_VERSION', result_cache.CACHE_VERSION + 1)
+    assert not result_cache.get(eparam)
+
+
+def test_invalidation_of_overlapped_period(eparam):
+    _estimate(eparam, 'uid-1')
+    result_cache.invalidate([eparam.travel_time_route.id], '2018-01-01', '2018-01-31')
+    assert result_cache.get(eparam)
+
+    result_cache.invalidate([eparam.travel_time_route.id], datetime.datetime(2017, 5, 1, 7), '2017-05-02 00:00:00')
+    assert not result_cache.get(eparam)
+
+
+def test_invalidation_of_whole_period(eparam):
+    _estimate(eparam, 'uid-1')
+    result_cache.invalidate(None, None, None)
+    assert not result_cache.get(eparam)
+
+
+def test_delete_makes_identical_request_miss_cache(eparam, monkeypatch):
+    flask = pytest.importorskip('flask')
+    from pyticas_tetres import api_base
+    from pyticas_tetres.da.actionlog import ActionLogDataAccess
+
+    class _WorkZone(object):
+        id = 11
+        start_time = '2017-03-01 00:00:00'
+        end_time = '2017-03-31 00:00:00'
+
+    class _DataAccess(object):
+        def get_by_id(self, pkey):
+            return _WorkZone()
+
+        def delete_items(self, pkeys, **kwargs):
+            return True
+
+        def commit(self, **kwargs):
+            return True
+
+        def get_session(self):
+            return None
+
+        def close_session(self):
+            pass
+
+        def get_tablename(self):
+            return 'workzone'
+
+    api = api_base.TeTRESApi(None, ActionLogDataAccess.DT_WORKZONE, None, _DataAccess, {})
+    monkeypatch.setattr(api, 'add_actionlog', lambda *args, **kwargs: None)
+
+    _estimate(eparam, 'uid-1')
+    assert result_cache.get(eparam)
+
+    with flask.Flask(__name__).test_request_context(method='POST', data={'ids': '[11]'}):
+        api.delete()
+
+    assert not result_cache.get(_EstimationRequest())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Structural copy of `Serializable` objects must be same as the copy through json
+"""
+import datetime
+
+from pyticas.tool import json
+from pyticas.ttypes import Period, RNodeData, RouteConfig, RouteConfigInfo
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+def _json_clone(obj):
+    """ implementation of ``Serializable.clone()`` before the structural copy """
+    return json.loads(json.dumps(obj, only_name=False))
+
+
+def _assert_same_copy(obj, cloned):
+    assert type(cloned) is type(obj)
+    assert json.dumps(cloned, only_name=False) == json.dumps(_json_clone(obj), only_name=False)
+
+
+def _period():
+    return Period(datetime.datetime(2017, 3, 1, 7, 0), datetime.datetime(2017, 3, 1, 8, 0), 300)
+
+
+def test_clone_period():
+    prd = _period()
+    cloned = prd.clone()
+
+    _assert_same_copy(prd, cloned)
+    cloned.extend_end_hour(1)
+    assert prd.end_date == datetime.datetime(2017, 3, 1, 8, 0)
+
+
+def test_clone_route_config():
+    rc = RouteConfig()
+    rc.infra_cfg_date = '2017-03-01'
+    rc.add_nodes([None, None], [None, None])
+    info = rc.node_sets[1].node1.node_config
+    info.closed_lanes = [1, 2]
+    info.lane_types = ['L', 'R']
+    info.shift_dirs = {'1': 'L'}
+    cloned = rc.clone()
+
+    _assert_same_copy(rc, cloned)
+    assert isinstance(cloned.node_sets[1].node1.node_config, RouteConfigInfo)
+    cloned.node_sets[1].node1.node_config.closed_lanes.append(3)
+    cloned.node_sets.pop()
+    assert info.closed_lanes == [1, 2]
+    assert len(rc.node_sets) == 2
+
+
+def test_clone_rnode_data():
+    rd = RNodeData(None, _period(), None)
+    rd.data = [float(v) for v in range(len(rd.data))]
+    rd.detector_names = ['100', '101']
+    rd.detector_data = {'100': [1.0, 2.0], '101': [3.0, -1]}
+    rd.missing_lanes = [2]
+    rd.lanes = 3
+    cloned = rd.clone()
+
+    _assert_same_copy(rd, cloned)
+    cloned.data[0] = -1
+    cloned.detector_data['100'][0] = -1
+    cloned.prd.extend_end_hour(1)
+    assert rd.data[0] == 0.0
+    assert rd.detector_data['100'][0] == 1.0
+    assert rd.prd.end_date == datetime.datetime(2017, 3, 1, 8, 0)
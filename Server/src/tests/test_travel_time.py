@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Travel times of all departures calculated in one trajectory pass must be same as the per-departure calculation
+"""
+import numpy as np
+import pytest
+
+from pyticas.moe.mods import tt
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+INTERVAL = 30
+
+
+def _per_departure_tts(us_data, n_departures):
+    tts = []
+    for tidx in range(n_departures):
+        try:
+            tts.append(tt._calculate_tt([row[tidx:] for row in us_data], INTERVAL))
+        except TypeError:
+            # the per-departure calculation fails when the trajectory runs out of data
+            tts.append(None)
+    return tts
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_trajectory_pass_is_same_as_per_departure(seed):
+    rs = np.random.RandomState(seed)
+    n_rnodes, n_departures, n_times = 25, 60, 300
+    us_data = rs.uniform(5, 75, size=(n_rnodes, n_times))
+    # congested cells
+    us_data[rs.rand(n_rnodes, n_times) < 0.1] = 2
+    us_data = us_data.tolist()
+
+    tts = tt._calculate_tts(us_data, n_departures, INTERVAL)
+
+    assert tts.shape == (n_departures, n_rnodes)
+    for tidx, expected in enumerate(_per_departure_tts(us_data, n_departures)):
+        assert expected is not None
+        assert tts[tidx].tolist() == expected
+
+
+def test_trajectory_out_of_data():
+    # vehicles departing late can not arrive at the last rnode in the data range
+    n_rnodes, n_times = 20, 30
+    us_data = np.full((n_rnodes, n_times), 10.0).tolist()
+
+    tts = tt._calculate_tts(us_data, n_times, INTERVAL)
+
+    arrived = 0
+    for tidx, expected in enumerate(_per_departure_tts(us_data, n_times)):
+        if expected is None:
+            assert tts[tidx, 0] == 0 and tts[tidx, -1] == -1
+        else:
+            assert tts[tidx].tolist() == expected
+            arrived += 1
+    assert 0 < arrived < n_times
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Routes calculated in worker processes must be saved only by the calling process
+"""
+import concurrent.futures
+import datetime
+import threading
+
+import pytest
+
+from pyticas import period
+from pyticas_tetres.rengine import traveltime
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+class _Route(object):
+    def __init__(self, id):
+        self.id = id
+        self.name = 'route %d' % id
+
+
+class _TravelTimeDataAccess(object):
+    writes = []
+
+    def __init__(self, year, **kwargs):
+        self.year = year
+
+    def delete_range(self, route_id, sdate, edate, **kwargs):
+        self.writes.append(('delete', route_id, threading.current_thread()))
+        return route_id != 4
+
+    def copy_insert(self, creatable_list):
+        route_id = creatable_list[0]['route_id']
+        self.writes.append(('insert', route_id, threading.current_thread()))
+        return list(range(len(creatable_list)))
+
+    def commit(self):
+        return True
+
+    def close_session(self):
+        pass
+
+
+@pytest.fixture
+def calculated(monkeypatch):
+    workers = set()
+    invalidated = []
+
+    def _calculate_route_in_worker(prd, ttr_id):
+        workers.add(threading.current_thread())
+        if ttr_id == 2:
+            return None
+        if ttr_id == 3:
+            raise RuntimeError('worker process is terminated')
+        return [{'route_id': ttr_id, 'time': prd.start_date, 'tt': 10.0}]
+
+    executors = []
+
+    def _route_executor(n_processes, db_info):
+        assert (n_processes, db_info) == (2, {'db': 'tetres'})
+        executors.append(concurrent.futures.ThreadPoolExecutor(max_workers=n_processes))
+        return executors[-1]
+
+    _TravelTimeDataAccess.writes = []
+    monkeypatch.setattr(traveltime, 'TravelTimeDataAccess', _TravelTimeDataAccess)
+    monkeypatch.setattr(traveltime, '_calculate_route_in_worker', _calculate_route_in_worker)
+    monkeypatch.setattr(traveltime, '_route_executor', _route_executor)
+    monkeypatch.setattr(traveltime.result_cache, 'invalidate',
+                        lambda route_ids, sdate, edate: invalidated.extend(route_ids))
+
+    prd = period.Period(datetime.datetime(2017, 3, 1, 0, 0), datetime.datetime(2017, 3, 1, 23, 55), 300)
+    res = traveltime._calculate_all_routes_in_processes(prd, [_Route(id) for id in range(1, 6)], 2,
+                                                        {'db': 'tetres'})
+    assert len(executors) == 1
+    return res, workers, invalidated
+
+
+def test_failed_routes_are_not_done(calculated):
+    res, workers, invalidated = calculated
+    assert res == [{'route_id': 1, 'done': [0]},
+                   {'route_id': 2, 'done': False},
+                   {'route_id': 3, 'done': False},
+                   {'route_id': 4, 'done': False},
+                   {'route_id': 5, 'done': [0]}]
+    assert sorted(invalidated) == [1, 5]
+
+
+def test_only_calling_process_writes(calculated):
+    res, workers, invalidated = calculated
+    writes = _TravelTimeDataAccess.writes
+    assert sorted((action, route_id) for (action, route_id, _) in writes) == [
+        ('delete', 1), ('delete', 4), ('delete', 5), ('insert', 1), ('insert', 5)]
+    assert set(thread for (_, _, thread) in writes) == {threading.current_thread()}
+    assert threading.current_thread() not in workers
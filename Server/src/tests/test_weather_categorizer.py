@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""
+Weather data found with bisect must be same as the weather data found by scanning the list
+"""
+import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from pyticas.ttypes import Period
+from pyticas_tetres.da.noaaweather import NoaaWeatherDataAccess
+from pyticas_tetres.db.tetres import conn, model_yearly
+from pyticas_tetres.rengine.cats import weather
+from pyticas_tetres.ttypes import NoaaWeatherInfo, TravelTimeInfo
+
+__author__ = 'Chongmyung Park (chongmyung.park@gmail.com)'
+
+
+def _find_wd(wis, dt, start_idx):
+    """ implementation of ``_find_wds()`` before using bisect (for a travel time data) """
+    for idx, wd in enumerate(wis[start_idx:]):
+        if wd.dtime >= dt:
+            return start_idx + idx, wd
+
+    wdt = (datetime.datetime.strptime(wis[-1].dtime, '%Y-%m-%d %H:%M:%S')
+           if isinstance(wis[-1].dtime, str) else wis[-1].dtime)
+    dtt = datetime.datetime.strptime(dt, '%Y-%m-%d %H:%M:%S') if isinstance(dt, str) else dt
+    diff = wdt - dtt
+    diff_in_minute = abs(diff.seconds / 60.0)
+    if diff_in_minute <= 30:
+        return len(wis) - 1, wis[-1]
+
+    return -1, None
+
+
+def _weather_info(dtime, usaf='726580', wban='14922', precip=0.0):
+    wi = NoaaWeatherInfo()
+    wi.usaf, wi.wban, wi.precip = usaf, wban, precip
+    wi.dtime = dtime.strftime('%Y-%m-%d %H:%M:%S')
+    return wi
+
+
+def _tt_data(times):
+    ttdata = []
+    for idx, dt in enumerate(times):
+        tti = TravelTimeInfo()
+        tti.id = idx + 1
+        tti.time = dt.strftime('%Y-%m-%d %H:%M:%S')
+        ttdata.append(tti)
+    return ttdata
+
+
+@pytest.fixture
+def wis():
+    # hourly observations at 53 minutes with some special observations between them
+    start = datetime.datetime(2017, 3, 1, 5, 53)
+    dtimes = [start + datetime.timedelta(hours=hour) for hour in range(6)]
+    dtimes += [datetime.datetime(2017, 3, 1, 7, 20), datetime.datetime(2017, 3, 1, 7, 25)]
+    return [_weather_info(dt) for dt in sorted(dtimes)]
+
+
+def test_find_wds_is_same_as_scanning(wis):
+    # travel time data at every 5 minutes until the last weather data
+    times = [datetime.datetime(2017, 3, 1, 5, 0) + datetime.timedelta(minutes=5 * idx) for idx in range(70)]
+    ttdata = _tt_data(times)
+    wds = weather._find_wds(wis, ttdata)
+
+    sidx, expected = 0, []
+    for tti in ttdata:
+        sidx, wd = _find_wd(wis, tti.time, sidx)
+        expected.append(wd)
+    assert [wd.dtime for wd in wds] == [wd.dtime for wd in expected]
+
+    # the weather data at the time
+    assert wds[times.index(datetime.datetime(2017, 3, 1, 7, 20))].dtime == '2017-03-01 07:20:00'
+    assert wds[times.index(datetime.datetime(2017, 3, 1, 7, 25))].dtime == '2017-03-01 07:25:00'
+    assert wds[times.index(datetime.datetime(2017, 3, 1, 7, 30))].dtime == '2017-03-01 07:53:00'
+
+
+def test_weather_data_after_the_last_weather_data(wis):
+    last = datetime.datetime(2017, 3, 1, 10, 53)
+    times = [last + datetime.timedelta(minutes=minutes) for minutes in [0, 7, 30, 31, 60, 23 * 60 + 45]]
+    wds = weather._find_wds(wis, _tt_data(times))
+
+    # the last weather data is used if it is within 30 minutes before the travel time data
+    assert [wd.dtime if wd else None for wd in wds] == ['2017-03-01 10:53:00'] * 3 + [None] * 3
+
+    # the previous implementation used `timedelta.seconds` of the negative difference
+    # (e.g. -7 minutes is 23:53), so that the last weather data was used in the wrong range
+    expected = [_find_wd(wis, tti.time, 0)[1] for tti in _tt_data(times)]
+    assert [wd.dtime if wd else None for wd in expected] == \
+           ['2017-03-01 10:53:00', None, None, None, None, '2017-03-01 10:53:00']
+
+
+def test_find_wds_with_datetime(wis):
+    for wi in wis:
+        wi.dtime = wi.str2datetime(wi.dtime)
+    times = [datetime.datetime(2017, 3, 1, 7, 21), datetime.datetime(2017, 3, 1, 11, 0)]
+    wds = weather._find_wds(wis, _tt_data(times))
+    assert wds == [wis[3], wis[-1]]
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # the session of the data access is given, but the default session is made first
+    monkeypatch.setattr(conn, 'get_session', lambda: None)
+    # yearly tables can not be created in the database that is not connected (it retries every second)
+    monkeypatch.setattr(model_yearly.time, 'sleep', lambda seconds: None)
+    engine = create_engine('sqlite://')
+    model_yearly.get_noaa_table(2017).__table__.create(engine)
+    sess = Session(bind=engine)
+    yield sess
+    sess.close()
+
+
+def test_list_by_stations(session):
+    noaa_table = model_yearly.get_noaa_table(2017)
+    stations = [('726580', '14922'), ('726584', '04974'), ('727458', '94974')]
+    start = datetime.datetime(2017, 3, 1, 5, 53)
+    for hour in [3, 0, 2, 5, 1]:
+        for idx, (usaf, wban) in enumerate(stations):
+            session.add(noaa_table(usaf=usaf, wban=wban, dtime=start + datetime.timedelta(hours=hour, minutes=idx),
+                                   precip=float(hour)))
+    session.add(noaa_table(usaf='999999', wban='14922', dtime=start, precip=0.0))
+    session.commit()
+
+    da = NoaaWeatherDataAccess(2017, session=session)
+    prd = Period(datetime.datetime(2017, 3, 1, 6, 0), datetime.datetime(2017, 3, 1, 8, 0), 300)
+    res = da.list_by_stations(stations[:2] + [('726581', '14922')], prd)
+
+    assert sorted(res.keys()) == sorted(stations[:2] + [('726581', '14922')])
+    assert [wi.dtime for wi in res[stations[0]]] == ['2017-03-01 06:53:00', '2017-03-01 07:53:00']
+    assert [wi.dtime for wi in res[stations[1]]] == ['2017-03-01 06:54:00', '2017-03-01 07:54:00']
+    assert res[('726581', '14922')] == []
+    for (usaf, wban) in stations[:2]:
+        assert [wi.dtime for wi in res[(usaf, wban)]] == sorted(wi.dtime for wi in da.list_by_period(usaf, wban, prd))
+
+    assert da.list_by_stations([], prd) == {}